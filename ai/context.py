@@ -0,0 +1,188 @@
+"""Token-budgeted conversation history for ``AIController``.
+
+Every backend call resends the whole conversation, so without limits a
+long sound-design session gets slower and dearer with every turn.
+``ConversationContext`` keeps a rough token estimate per message and,
+before each request:
+
+* shortens tool results that have fallen out of the last ``keep_recent``
+  messages to their first line (the model can call the tool again);
+* drops the oldest messages while the total is over ``budget_tokens``.
+
+Tools in ``DIFFED_TOOLS`` (the full parameter listing) are stored in
+full once; while that listing is still in the context, repeated calls
+store only the lines that changed since the model last saw them.
+"""
+from __future__ import annotations
+import json
+from dataclasses import dataclass, replace
+from ai.llm import Message
+
+CHARS_PER_TOKEN = 4          # rough average for English text and parameter dumps
+MESSAGE_OVERHEAD_TOKENS = 4
+DEFAULT_BUDGET_TOKENS = 8000
+KEEP_RECENT = 6
+DIFFED_TOOLS = frozenset({"list_parameters"})
+_SUMMARY_CHARS = 160
+
+
+def estimate_tokens(message: Message) -> int:
+    chars = len(message.content)
+    if message.tool_calls:
+        chars += len(json.dumps(message.tool_calls))
+    return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+def tool_result_text(name: str, result: str) -> str:
+    return f"Tool result for {name}: {result}"
+
+
+def _keyed_lines(text: str) -> dict[str, str]:
+    """Lines of a listing keyed by the text before their first colon."""
+    return {line.partition(":")[0]: line for line in text.splitlines() if line.strip()}
+
+
+@dataclass
+class _Entry:
+    message: Message
+    tokens: int
+    tool: str | None = None       # set for tool results
+    listing: int | None = None    # id of the full listing a diffed result belongs to
+    compacted: bool = False
+
+
+class ConversationContext:
+    """Conversation history kept under a token budget; see module docstring."""
+
+    def __init__(self, budget_tokens: int = DEFAULT_BUDGET_TOKENS,
+                 keep_recent: int = KEEP_RECENT,
+                 diffed_tools: frozenset[str] = DIFFED_TOOLS) -> None:
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self._diffed_tools = diffed_tools
+        self._entries: list[_Entry] = []
+        self._listings: dict[str, tuple[int, dict[str, str]]] = {}  # tool -> (id, lines seen)
+        self._next_listing = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def tokens(self) -> int:
+        return sum(e.tokens for e in self._entries)
+
+    @property
+    def messages(self) -> list[Message]:
+        return [e.message for e in self._entries]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._listings.clear()
+        self.dropped = 0
+
+    def append(self, message: Message) -> None:
+        self._entries.append(_Entry(message, estimate_tokens(message)))
+
+    def add_tool_result(self, name: str, result: str) -> str:
+        """Append the result of tool *name*; returns the text actually stored."""
+        listing = None
+        if name in self._diffed_tools:
+            result, listing = self._diff_listing(name, result)
+        message = Message(role="user", content=tool_result_text(name, result))
+        self._entries.append(_Entry(message, estimate_tokens(message), tool=name,
+                                    listing=listing))
+        return message.content
+
+    def _diff_listing(self, name: str, result: str) -> tuple[str, int]:
+        lines = _keyed_lines(result)
+        known = self._listings.get(name)
+        if known is not None:
+            listing, seen = known
+            changed = [line for key, line in lines.items() if seen.get(key) != line]
+            removed = [key for key in seen if key not in lines]
+            if not changed and not removed:
+                diff = "unchanged since the last listing above"
+            else:
+                diff = "\n".join(["changed since the last listing above:", *changed]
+                                 + ([f"no longer listed: {', '.join(removed)}"] if removed else []))
+            if len(diff) < len(result) // 2:
+                self._listings[name] = (listing, lines)
+                return diff, listing
+        listing = self._next_listing
+        self._next_listing += 1
+        self._listings[name] = (listing, lines)
+        return result, listing
+
+    # -- fitting the budget --
+
+    def _compact(self, entry: _Entry) -> None:
+        if entry.listing is not None:
+            self._forget_listing(entry.tool, entry.listing)
+            return
+        prefix = tool_result_text(entry.tool, "")
+        body = entry.message.content[len(prefix):]
+        first, _, rest = body.partition("\n")
+        if len(first) > _SUMMARY_CHARS:
+            first = first[:_SUMMARY_CHARS] + "..."
+        extra = len(rest.splitlines())
+        note = f" [{extra} more lines omitted; call {entry.tool} again if needed]" if extra else ""
+        self._rewrite(entry, prefix + first + note)
+
+    def _rewrite(self, entry: _Entry, content: str) -> None:
+        if len(content) < len(entry.message.content):
+            entry.message = replace(entry.message, content=content)
+            entry.tokens = estimate_tokens(entry.message)
+        entry.compacted = True
+
+    def _forget_listing(self, tool: str, listing: int) -> None:
+        """Shorten a full listing and its diffs together; diffs mean nothing on their own."""
+        if self._listings.get(tool, (None,))[0] == listing:
+            del self._listings[tool]
+        note = tool_result_text(tool, f"[earlier listing omitted; call {tool} again if needed]")
+        for entry in self._entries:
+            if entry.listing == listing and not entry.compacted:
+                self._rewrite(entry, note)
+
+    def _live_listings(self) -> set[int]:
+        return {listing for listing, _ in self._listings.values()}
+
+    def fit(self) -> None:
+        """Compact stale tool results, then drop the oldest messages, to fit the budget.
+
+        The newest full listing of a diffed tool is kept while possible,
+        since later diffs refer to it.
+        """
+        live = self._live_listings()
+        for entry in self._entries[:max(0, len(self._entries) - self.keep_recent)]:
+            if entry.tool and not entry.compacted and entry.listing not in live:
+                self._compact(entry)
+        while self.tokens > self.budget_tokens and self._drop_oldest():
+            pass
+        # a request has to start with a user turn, not an orphaned reply
+        while len(self._entries) > 1 and self._entries[0].message.role != "user":
+            self._entries.pop(0)
+            self.dropped += 1
+        if self.tokens > self.budget_tokens:
+            for entry in self._entries[:-1]:
+                if entry.tool and not entry.compacted:
+                    self._compact(entry)
+
+    def _drop_oldest(self) -> bool:
+        """Drop the oldest message outside the recent window that no live diff needs."""
+        live = self._live_listings()
+        for i, entry in enumerate(self._entries[:len(self._entries) - self.keep_recent]):
+            if entry.tool is None or entry.listing not in live:
+                del self._entries[i]
+                self.dropped += 1
+                return True
+        return False
+
+    def request(self) -> list[Message]:
+        """The messages to send next, fitted to the budget."""
+        self.fit()
+        messages = self.messages
+        if self.dropped and messages:
+            note = f"[{self.dropped} earlier messages omitted to save context]\n"
+            messages[0] = replace(messages[0], content=note + messages[0].content)
+        return messages
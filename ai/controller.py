@@ -3,17 +3,20 @@ import threading
 import time
 from pathlib import Path
 from PyQt6.QtCore import QObject, pyqtSignal
+from ai.context import DEFAULT_BUDGET_TOKENS, ConversationContext
 from ai.llm import LLMBackend, Message
 from ai.tools import TOOL_DEFINITIONS
 import re
 from midi.params import ParamMap
-from midi.sysex_buffer import SysExProgramBuffer, DebouncedSysExWriter
+from midi.sysex_buffer import SysExProgramBuffer
+from midi.sysex_writer import DebouncedSysExWriter
 from midi.sysex import build_program_write
 from midi.effects import (
     EFFECT_TYPES, FX1_TYPE_PACKED, FX2_TYPE_PACKED, fx_param_packed,
     EffectParam,
 )
 from core.logger import AppLogger
+from audio.takes import TakeRegistry
 
 SYSTEM_PROMPT = """You are an AI sound designer for the Korg RK-100S 2 keytar synthesizer.
 You can control synth parameters in real-time via MIDI. When the user describes a sound they want,
@@ -55,8 +58,10 @@ All other params require SysEx program write (handled automatically with debounc
 When matching a sound from a WAV file:
 1. First analyze the WAV to understand its spectral characteristics
 2. Set initial parameters based on your analysis
-3. Trigger a note, record the output, and compare
+3. Audition a note (plays and records it in one step) and compare the take
 4. Iteratively adjust parameters to minimize the spectral difference
+5. Once the sound is close, call optimize_match with the few parameters that still
+   matter; it auditions dozens of candidates locally and applies the best values
 
 Think step-by-step about which parameters affect which sonic qualities."""
 
@@ -76,6 +81,7 @@ class AIController(QObject):
         logger: AppLogger,
         sysex_buffer: SysExProgramBuffer | None = None,
         sysex_writer: DebouncedSysExWriter | None = None,
+        context_budget_tokens: int = DEFAULT_BUDGET_TOKENS,
         parent=None,
     ) -> None:
         super().__init__(parent)
@@ -85,7 +91,7 @@ class AIController(QObject):
         self._logger = logger
         self._sysex_buffer = sysex_buffer
         self._sysex_writer = sysex_writer
-        self._history: list[Message] = []
+        self._context = ConversationContext(context_budget_tokens)
         self._param_state: dict[str, int] = {}
         self._stop_requested = False
         self._audio_device = None
@@ -94,10 +100,12 @@ class AIController(QObject):
         self._auto_note_velocity = 100
         self._auto_note_duration_ms = 300
         self._suppress_notes = False  # set True while MIDI file is playing
+        self._audition_latency_s: float | None = None  # measured on first audition
+        self._takes = TakeRegistry()
 
     def send_message(self, user_text: str) -> None:
         """Send a user message. Runs LLM call in a background thread."""
-        self._history.append(Message(role="user", content=user_text))
+        self._context.append(Message(role="user", content=user_text))
         thread = threading.Thread(target=self._run_chat, daemon=True)
         thread.start()
 
@@ -109,23 +117,19 @@ class AIController(QObject):
             self._stop_requested = False
             while not self._stop_requested:
                 response = self._backend.chat(
-                    messages=self._history,
+                    messages=self._context.request(),
                     system=SYSTEM_PROMPT,
                     tools=TOOL_DEFINITIONS,
                 )
                 if response.content:
                     self.response_ready.emit(response.content)
+                self._context.append(response)
                 if not response.tool_calls:
-                    self._history.append(response)
                     break
-                self._history.append(response)
                 for tc in response.tool_calls:
                     result = self._execute_tool(tc["name"], tc["input"])
                     self.tool_executed.emit(tc["name"], str(result))
-                    self._history.append(Message(
-                        role="user",
-                        content=f'Tool result for {tc["name"]}: {result}',
-                    ))
+                    self._context.add_tool_result(tc["name"], str(result))
         except Exception as exc:
             self.error.emit(str(exc))
 
@@ -143,12 +147,30 @@ class AIController(QObject):
                 args.get("velocity", 100),
                 args.get("duration_ms", 1000),
             )
+        if name == "audition":
+            return self._tool_audition(
+                args.get("note", 60),
+                args.get("velocity", 100),
+                args.get("duration_ms", 500),
+            )
+        if name == "save_take":
+            return self._tool_save_take(args["take_id"], args.get("path"))
         if name == "record_audio":
             return self._tool_record_audio(args.get("duration_s", 2.0))
         if name == "analyze_audio":
             return self._tool_analyze_audio(args["wav_path"])
         if name == "compare_audio":
             return self._tool_compare_audio(args["target_path"], args["recorded_path"])
+        if name == "optimize_match":
+            return self._tool_optimize_match(
+                args["target_path"],
+                args.get("params"),
+                args.get("max_evaluations", 120),
+                args.get("note", 60),
+                args.get("velocity", 100),
+                args.get("duration_ms", 500),
+                args.get("prescreen", 0),
+            )
         return f"Unknown tool: {name}"
 
     def _tool_set_parameter(self, name: str, value: int) -> str:
@@ -327,9 +349,9 @@ class AIController(QObject):
                 f"I want to match this sound. Here is the spectral analysis of the target WAV:\n\n"
                 f"{self._tool_analyze_audio(wav_path)}\n\n"
                 f"Based on this analysis, set the synth parameters to your best initial guess. "
-                f"Then trigger a note so we can record and compare."
+                f"Then audition a note so we can compare the take with the target."
             )
-            self._history.append(Message(role="user", content=prompt))
+            self._context.append(Message(role="user", content=prompt))
             for iteration in range(max_iterations):
                 if self._stop_requested:
                     self.response_ready.emit("Matching stopped by user.")
@@ -339,27 +361,165 @@ class AIController(QObject):
         except Exception as exc:
             self.error.emit(str(exc))
 
+    def optimize_match(self, wav_path: str, params: list[str] | None = None,
+                       max_evaluations: int = 120) -> None:
+        """Start numerical sound matching (no LLM calls) in a background thread."""
+        thread = threading.Thread(
+            target=self._run_optimize, args=(wav_path, params, max_evaluations), daemon=True
+        )
+        thread.start()
+
+    def _run_optimize(self, wav_path: str, params: list[str] | None,
+                      max_evaluations: int) -> None:
+        try:
+            self._stop_requested = False
+            self.response_ready.emit(self._tool_optimize_match(wav_path, params, max_evaluations))
+        except Exception as exc:
+            self.error.emit(str(exc))
+
+    def _tool_optimize_match(self, target_path: str, params: list[str] | None = None,
+                             max_evaluations: int = 120, note: int = 60,
+                             velocity: int = 100, duration_ms: int = 500,
+                             prescreen: int = 0) -> str:
+        from ai.optimizer import (
+            DEFAULT_MATCH_PARAMS, DeviceRenderer, MatchOptimizer, ParamSpace,
+            prescreen as surrogate_prescreen,
+        )
+        from audio.surrogate import values_from_program
+        from audio.audition import Auditioner, AuditionTimeout
+        from audio.compare import matcher_for, matcher_for_file
+        from audio.takes import is_take_id
+        if not self._device.connected:
+            return "Device not connected"
+        if self._suppress_notes:
+            return "Notes suppressed (MIDI file is playing)"
+        if self._sysex_buffer is None or self._sysex_buffer.size == 0:
+            return "Optimizing needs a loaded program; pull the current program first"
+        names = params or DEFAULT_MATCH_PARAMS
+        defs = [self._param_map.get(n) for n in names]
+        bad = [n for n, p in zip(names, defs) if p is None or p.sysex_offset is None]
+        if bad:
+            return f"Cannot optimize {', '.join(bad)}: unknown or not part of the program data"
+        try:
+            if is_take_id(target_path):
+                matcher = matcher_for(*self._takes.load(target_path))
+            else:
+                matcher = matcher_for_file(Path(target_path))
+        except KeyError as exc:
+            return str(exc.args[0])
+
+        space = ParamSpace(defs)
+        start = {p.name: self._sysex_buffer.get_param(p) for p in defs}
+        if prescreen > 0:
+            # start the hardware search from the best of many offline renders
+            program = values_from_program(self._sysex_buffer.to_bytes())
+            _, start = surrogate_prescreen(space, start, matcher, program,
+                                           candidates=prescreen, note=note, velocity=velocity,
+                                           duration_s=duration_ms / 1000.0)[0]
+            self._logger.ai(f"Prescreened {prescreen} candidates offline; starting from {start}")
+
+        def progress(evaluations: int, best: float) -> None:
+            if evaluations % 10 == 0:
+                self._logger.ai(f"Optimizing: {evaluations} takes, best distance {best:.4f}")
+
+        try:
+            with Auditioner(self._device, input_device=self._audio_device,
+                            latency_s=self._audition_latency_s or 0.0) as auditioner:
+                if self._audition_latency_s is None:
+                    self._audition_latency_s = auditioner.calibrate(note, velocity)
+                renderer = DeviceRenderer(self._device, self._sysex_buffer.to_bytes(), space,
+                                          auditioner, note, velocity, duration_ms / 1000.0)
+                result = MatchOptimizer(space, renderer, matcher).run(
+                    start, max_evaluations, on_progress=progress,
+                    should_stop=lambda: self._stop_requested)
+        except AuditionTimeout as exc:
+            # the device may hold a candidate; put the editor's program back
+            self._device.send(build_program_write(channel=1, data=self._sysex_buffer.to_bytes()))
+            return f"Optimization stopped: {exc}"
+
+        # the device holds the last candidate: load the best one, as a single undo step
+        self._sysex_buffer.replace(renderer.program_for(result.values), "optimize_match")
+        self._device.send(build_program_write(channel=1, data=self._sysex_buffer.to_bytes()))
+        self._sysex_buffer.mark_clean()
+        for name, value in result.values.items():
+            self._param_state[name] = value
+            self.parameter_changed.emit(name, value)
+        self._logger.ai(result.summary())
+        return result.summary()
+
     def _tool_record_audio(self, duration_s: float) -> str:
         from audio.engine import AudioRecorder
-        import tempfile
         recorder = AudioRecorder(device=self._audio_device)
         samples = recorder.record(duration_s)
-        path = Path(tempfile.mktemp(suffix=".wav"))
-        recorder.save_wav(samples, path)
-        self._logger.audio(f"Recorded {duration_s}s to {path}")
-        return f"Recorded to {path}"
+        take_id = self._takes.add(samples, recorder.sample_rate, "recording")
+        self._logger.audio(f"Recorded {duration_s}s as {take_id}")
+        return f"Recorded {duration_s}s as take {take_id}"
+
+    def _tool_audition(self, note: int, velocity: int, duration_ms: int) -> str:
+        from audio.audition import Auditioner, AuditionTimeout
+        if not self._device.connected:
+            return "Device not connected"
+        if self._suppress_notes:
+            return "Notes suppressed (MIDI file is playing)"
+        try:
+            with Auditioner(self._device, input_device=self._audio_device,
+                            latency_s=self._audition_latency_s or 0.0) as auditioner:
+                if self._audition_latency_s is None:
+                    self._audition_latency_s = auditioner.calibrate(note, velocity)
+                    self._logger.audio(
+                        f"MIDI-to-audio latency: {self._audition_latency_s * 1000:.0f} ms")
+                self.note_played.emit(note, velocity, True)
+                try:
+                    take = auditioner.play(note, velocity, duration_ms / 1000.0)
+                finally:
+                    self.note_played.emit(note, 0, False)
+        except AuditionTimeout as exc:
+            return f"Audition failed: {exc}"
+        take_id = self._takes.add(take.samples, take.sample_rate, f"note {note}")
+        self._logger.audio(f"Auditioned note {note}: {take.duration_s:.2f}s as {take_id}")
+        return f"Recorded {take.duration_s:.2f}s of note {note} as take {take_id}"
+
+    def _tool_save_take(self, take_id: str, path: str | None) -> str:
+        from core.config import downloads_dir
+        target = Path(path) if path else Path(downloads_dir()) / f"{take_id}.wav"
+        try:
+            self._takes.save(take_id, target)
+        except KeyError as exc:
+            return str(exc.args[0])
+        return f"Saved {take_id} to {target}"
+
+    def _audio_features(self, ref: str):
+        """Cached features of a take ID (in memory) or WAV path (disk cache)."""
+        from audio.feature_cache import shared_cache
+        from audio.takes import is_take_id
+        if is_take_id(ref):
+            return self._takes.features(ref)
+        return shared_cache().get_file(Path(ref))
 
     def _tool_analyze_audio(self, wav_path: str) -> str:
-        from audio.engine import AudioRecorder, AudioAnalyzer
-        samples, sr = AudioRecorder.load_wav(Path(wav_path))
-        analysis = AudioAnalyzer.analyze_samples(samples, sr)
+        try:
+            analysis = self._audio_features(wav_path).summary()
+        except KeyError as exc:
+            return str(exc.args[0])
         self._logger.audio(f"Analyzed {wav_path}: {analysis['fundamental_hz']:.1f} Hz")
         return str(analysis)
 
     def _tool_compare_audio(self, target_path: str, recorded_path: str) -> str:
-        from audio.engine import AudioRecorder, AudioAnalyzer
-        t_samples, t_sr = AudioRecorder.load_wav(Path(target_path))
-        r_samples, r_sr = AudioRecorder.load_wav(Path(recorded_path))
-        report = AudioAnalyzer.compare_samples(t_samples, r_samples, t_sr)
-        self._logger.audio(f"Spectral distance: {report['spectral_distance']:.4f}")
+        from audio.compare import matcher_for, matcher_for_file
+        from audio.engine import AudioAnalyzer
+        from audio.takes import is_take_id
+        # the match target is the same on every iteration: cache hits
+        try:
+            report = AudioAnalyzer.compare_analyses(self._audio_features(target_path).summary(),
+                                                    self._audio_features(recorded_path).summary())
+            if is_take_id(target_path):
+                matcher = matcher_for(*self._takes.load(target_path))
+            else:
+                matcher = matcher_for_file(Path(target_path))
+            match = matcher.compare(*self._takes.load(recorded_path))
+        except KeyError as exc:
+            return str(exc.args[0])
+        report["match"] = match.to_dict()
+        self._logger.audio(f"Spectral distance: {report['spectral_distance']:.4f}, "
+                           f"match distance: {match.distance:.4f}")
         return str(report)
@@ -0,0 +1,328 @@
+"""Closed-loop sound matching with CMA-ES.
+
+Instead of asking the LLM for every adjustment, ``MatchOptimizer`` searches
+a chosen subset of parameters numerically.  Each candidate is a point in
+the unit cube (``ParamSpace`` maps it to integer parameter values); a
+*render* callable plays it on the synth and returns the captured take, and
+the take is scored against the target with ``audio.compare.SoundMatcher``.
+
+Rendering owns the hardware and runs on the calling thread; scoring runs
+on a worker thread, so the next candidate's program write and note go out
+while the previous take is still being analysed.  Candidates that round to
+the same parameter values are scored once.  ``DeviceRenderer`` is the
+hardware render: a full program write of the candidate followed by an
+``Auditioner`` take.  ``prescreen`` picks a starting point by scoring
+thousands of candidates with the offline ``audio.surrogate`` model first.
+"""
+from __future__ import annotations
+import math
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+import numpy as np
+from midi.params import ParamDef
+
+# Parameters with the most influence on a single held note, searched when
+# no subset is given.
+DEFAULT_MATCH_PARAMS = [
+    "t1_filter1_cutoff", "t1_filter1_resonance", "t1_filter1_eg_int",
+    "t1_filter_eg_attack", "t1_filter_eg_decay", "t1_filter_eg_sustain", "t1_filter_eg_release",
+    "t1_amp_eg_attack", "t1_amp_eg_decay", "t1_amp_eg_sustain", "t1_amp_eg_release",
+]
+
+BOUND_PENALTY = 10.0     # added per squared unit a candidate lies outside the cube
+
+
+class ParamSpace:
+    """Maps points in [0, 1]^n to integer values of *params*."""
+
+    def __init__(self, params: list[ParamDef]) -> None:
+        if not params:
+            raise ValueError("No parameters to optimise")
+        self.params = params
+        self._lo = np.array([p.min_val for p in params], dtype=float)
+        self._span = np.array([p.max_val - p.min_val for p in params], dtype=float)
+
+    def __len__(self) -> int:
+        return len(self.params)
+
+    @property
+    def names(self) -> list[str]:
+        return [p.name for p in self.params]
+
+    def to_values(self, x: np.ndarray) -> dict[str, int]:
+        values = np.rint(self._lo + np.clip(x, 0.0, 1.0) * self._span).astype(int)
+        return {p.name: int(v) for p, v in zip(self.params, values)}
+
+    def to_unit(self, values: dict[str, int]) -> np.ndarray:
+        raw = np.array([values.get(p.name, p.min_val) for p in self.params], dtype=float)
+        return np.clip((raw - self._lo) / np.maximum(self._span, 1.0), 0.0, 1.0)
+
+
+class CMAES:
+    """(mu/mu_w, lambda)-CMA-ES with the default strategy parameters.
+
+    ``ask`` returns a population, ``tell`` takes it back with its costs.
+    """
+
+    def __init__(self, x0: np.ndarray, sigma0: float = 0.2, popsize: int | None = None,
+                 seed: int | None = None) -> None:
+        n = len(x0)
+        self.mean = np.asarray(x0, dtype=float).copy()
+        self.sigma = sigma0
+        self.popsize = popsize or 4 + int(3 * math.log(n))
+        self._rng = np.random.default_rng(seed)
+        mu = self.popsize // 2
+        w = math.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+        self._weights = w / w.sum()
+        self._mueff = 1.0 / float(np.sum(self._weights ** 2))
+        mueff = self._mueff
+        self._cc = (4 + mueff / n) / (n + 4 + 2 * mueff / n)
+        self._cs = (mueff + 2) / (n + mueff + 5)
+        self._c1 = 2 / ((n + 1.3) ** 2 + mueff)
+        self._cmu = min(1 - self._c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff))
+        self._damps = 1 + 2 * max(0.0, math.sqrt((mueff - 1) / (n + 1)) - 1) + self._cs
+        self._chi_n = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+        self._pc = np.zeros(n)
+        self._ps = np.zeros(n)
+        self._C = np.eye(n)
+        self._B = np.eye(n)
+        self._D = np.ones(n)
+        self.generation = 0
+
+    def ask(self) -> np.ndarray:
+        z = self._rng.standard_normal((self.popsize, len(self.mean)))
+        return self.mean + self.sigma * (z * self._D) @ self._B.T
+
+    def tell(self, xs: np.ndarray, costs: np.ndarray) -> None:
+        n = len(self.mean)
+        mu = len(self._weights)
+        best = np.argsort(costs)[:mu]
+        y = (xs[best] - self.mean) / self.sigma
+        step = self._weights @ y
+        self.mean = self.mean + self.sigma * step
+
+        inv_sqrt_c = self._B @ np.diag(1 / self._D) @ self._B.T
+        cs, cc = self._cs, self._cc
+        self._ps = (1 - cs) * self._ps + math.sqrt(cs * (2 - cs) * self._mueff) * inv_sqrt_c @ step
+        self.generation += 1
+        ps_norm = float(np.linalg.norm(self._ps))
+        hsig = ps_norm / math.sqrt(1 - (1 - cs) ** (2 * self.generation)) / self._chi_n \
+            < 1.4 + 2 / (n + 1)
+        self._pc = (1 - cc) * self._pc + hsig * math.sqrt(cc * (2 - cc) * self._mueff) * step
+        rank_mu = (y * self._weights[:, None]).T @ y
+        self._C = ((1 - self._c1 - self._cmu) * self._C
+                   + self._c1 * (np.outer(self._pc, self._pc)
+                                 + (1 - hsig) * cc * (2 - cc) * self._C)
+                   + self._cmu * rank_mu)
+        self.sigma *= math.exp((cs / self._damps) * (ps_norm / self._chi_n - 1))
+
+        self._C = (self._C + self._C.T) / 2
+        eigvals, self._B = np.linalg.eigh(self._C)
+        self._D = np.sqrt(np.maximum(eigvals, 1e-20))
+
+
+@dataclass
+class MatchResult:
+    values: dict[str, int]        # best parameter values found
+    distance: float               # their match distance (lower is better)
+    start_distance: float         # distance of the starting point
+    evaluations: int              # takes captured and scored
+    generations: int
+    elapsed_s: float
+    converged: bool               # stopped because no new values were being proposed
+    history: list[float] = field(default_factory=list)   # best distance after each evaluation
+
+    @property
+    def evals_per_minute(self) -> float:
+        return 60.0 * self.evaluations / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    def summary(self) -> str:
+        values = ", ".join(f"{k}={v}" for k, v in self.values.items())
+        return (f"Best match distance {self.distance:.4f} (start {self.start_distance:.4f}) "
+                f"after {self.evaluations} takes in {self.elapsed_s:.0f}s "
+                f"({self.evals_per_minute:.0f}/min): {values}")
+
+
+class MatchOptimizer:
+    """Searches *space* for the values whose take best matches *matcher*'s target.
+
+    *render* receives a ``{name: value}`` dict for every parameter of the
+    space and returns ``(samples, sample_rate)``; see module docstring.
+    """
+
+    def __init__(
+        self,
+        space: ParamSpace,
+        render: Callable[[dict[str, int]], tuple[np.ndarray, int]],
+        matcher,
+        sigma0: float = 0.2,
+        popsize: int | None = None,
+        seed: int | None = None,
+    ) -> None:
+        self.space = space
+        self._render = render
+        self._matcher = matcher
+        self._sigma0 = sigma0
+        self._popsize = popsize
+        self._seed = seed
+
+    def _score(self, samples: np.ndarray, sample_rate: int) -> float:
+        return self._matcher.compare(samples, sample_rate).distance
+
+    def run(
+        self,
+        start: dict[str, int],
+        max_evaluations: int = 120,
+        target_distance: float | None = None,
+        on_progress: Callable[[int, float], None] | None = None,
+        should_stop: Callable[[], bool] | None = None,
+    ) -> MatchResult:
+        """Optimise from *start* until *max_evaluations* takes or *target_distance*."""
+        began = time.monotonic()
+        x0 = self.space.to_unit(start)
+        es = CMAES(x0, self._sigma0, self._popsize, self._seed)
+        scored: dict[tuple[int, ...], Future] = {}
+        history: list[float] = []
+        best_values = self.space.to_values(x0)
+        best = math.inf
+        converged = False
+
+        def submit(values: dict[str, int]) -> Future:
+            key = tuple(values.values())
+            if key not in scored:
+                samples, sample_rate = self._render(values)
+                scored[key] = analysis.submit(self._score, samples, sample_rate)
+            return scored[key]
+
+        def record(values: dict[str, int], distance: float) -> None:
+            nonlocal best, best_values
+            if distance < best:
+                best, best_values = distance, values
+            history.append(best)
+            if on_progress is not None:
+                on_progress(len(history), best)
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="match-score") as analysis:
+            start_distance = submit(best_values).result()
+            record(best_values, start_distance)
+            while len(scored) < max_evaluations:
+                if should_stop is not None and should_stop():
+                    break
+                if target_distance is not None and best <= target_distance:
+                    break
+                xs = es.ask()
+                pending: list[tuple[dict[str, int], Future, bool]] = []
+                exhausted = False
+                for x in xs:
+                    values = self.space.to_values(x)
+                    fresh = tuple(values.values()) not in scored
+                    if fresh and len(scored) >= max_evaluations:
+                        exhausted = True
+                        break
+                    # returns once the take is captured; scoring overlaps the next render
+                    pending.append((values, submit(values), fresh))
+                if not exhausted and not any(fresh for _, _, fresh in pending):
+                    converged = True
+                    break
+                distances = [future.result() for _, future, _ in pending]
+                for (values, _, fresh), distance in zip(pending, distances):
+                    if fresh:
+                        record(values, distance)
+                if exhausted:
+                    break
+                outside = xs - np.clip(xs, 0.0, 1.0)
+                costs = np.array(distances) + BOUND_PENALTY * np.sum(outside ** 2, axis=1)
+                es.tell(xs, costs)
+
+        return MatchResult(values=best_values, distance=best, start_distance=start_distance,
+                           evaluations=len(history), generations=es.generation,
+                           elapsed_s=time.monotonic() - began, converged=converged,
+                           history=history)
+
+
+def prescreen(
+    space: ParamSpace,
+    start: dict[str, int],
+    matcher,
+    base: dict[str, int] | None = None,
+    candidates: int = 2000,
+    sigma: float = 0.3,
+    keep: int = 1,
+    seed: int | None = None,
+    note: int = 60,
+    velocity: int = 100,
+    duration_s: float = 0.5,
+    workers: int | None = None,
+) -> list[tuple[float, dict[str, int]]]:
+    """The *keep* most promising values near *start*, scored on the surrogate.
+
+    Candidates are drawn around *start* in the unit cube (plus *start*
+    itself), rendered offline on top of *base* (the rest of the program)
+    and compared with *matcher*'s target.  Returns ``(distance, values)``
+    pairs, best first.
+    """
+    from audio.surrogate import SAMPLE_RATE, render_batch
+    rng = np.random.default_rng(seed)
+    x0 = space.to_unit(start)
+    xs = np.vstack([x0, x0 + sigma * rng.standard_normal((candidates - 1, len(space)))])
+    unique = {tuple(v.values()): v for v in (space.to_values(x) for x in xs)}
+    values = list(unique.values())
+    audio = render_batch([{**(base or {}), **v} for v in values], note, velocity, duration_s,
+                         sample_rate=SAMPLE_RATE, workers=workers)
+    distances = np.concatenate([
+        [c.distance for c in matcher.compare_batch(audio[i:i + 64], SAMPLE_RATE)]
+        for i in range(0, len(audio), 64)])
+    order = np.argsort(distances)[:keep]
+    return [(float(distances[i]), values[i]) for i in order]
+
+
+class DeviceRenderer:
+    """Plays candidates on the synth: program write, settle, audition one note.
+
+    Each candidate is written into a private copy of *program*, so the
+    editor's buffer and undo history are untouched during the search.
+    """
+
+    def __init__(
+        self,
+        device,
+        program: bytes,
+        space: ParamSpace,
+        auditioner,
+        note: int = 60,
+        velocity: int = 100,
+        duration_s: float = 0.5,
+        max_release_s: float = 1.0,
+        settle_s: float = 0.05,
+        channel: int = 1,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._device = device
+        self._program = bytes(program)
+        self._params = {p.name: p for p in space.params}
+        self._auditioner = auditioner
+        self.note = note
+        self.velocity = velocity
+        self.duration_s = duration_s
+        self.max_release_s = max_release_s
+        self.settle_s = settle_s
+        self._channel = channel
+        self._sleep = sleep
+
+    def program_for(self, values: dict[str, int]) -> bytes:
+        from midi.sysex_buffer import SysExProgramBuffer
+        buf = SysExProgramBuffer(self._program)
+        for name, value in values.items():
+            buf.set_param(self._params[name], value)
+        return buf.to_bytes()
+
+    def __call__(self, values: dict[str, int]) -> tuple[np.ndarray, int]:
+        from midi.sysex import build_program_write
+        self._device.send(build_program_write(channel=self._channel,
+                                              data=self.program_for(values)))
+        self._sleep(self.settle_s)
+        take = self._auditioner.play(self.note, self.velocity, self.duration_s,
+                                     max_release_s=self.max_release_s)
+        return take.samples, take.sample_rate
@@ -44,9 +44,21 @@ TOOL_DEFINITIONS = [
             },
         },
     },
+    {
+        "name": "audition",
+        "description": "Play a note on the synth and record exactly that note (attack through the end of its release), aligned for MIDI-to-audio latency. Returns a take ID (e.g. take-3) that the other audio tools accept in place of a WAV path. Prefer this over trigger_note + record_audio when comparing sounds.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "note": {"type": "integer", "description": "MIDI note number (60 = middle C)", "default": 60},
+                "velocity": {"type": "integer", "description": "Note velocity (0-127)", "default": 100},
+                "duration_ms": {"type": "integer", "description": "How long the note is held in milliseconds", "default": 500},
+            },
+        },
+    },
     {
         "name": "record_audio",
-        "description": "Record audio from the computer's audio input for the specified duration. Returns the file path of the recorded WAV.",
+        "description": "Record audio from the computer's audio input for the specified duration. Returns a take ID (e.g. take-3) that the other audio tools accept in place of a WAV path.",
         "input_schema": {
             "type": "object",
             "properties": {
@@ -56,25 +68,58 @@ TOOL_DEFINITIONS = [
     },
     {
         "name": "analyze_audio",
-        "description": "Analyze a WAV file and return spectral characteristics: fundamental frequency, harmonic series, spectral centroid, amplitude envelope shape.",
+        "description": "Analyze a WAV file or recorded take and return spectral characteristics: fundamental frequency, harmonic series, spectral centroid, amplitude envelope shape.",
         "input_schema": {
             "type": "object",
             "properties": {
-                "wav_path": {"type": "string", "description": "Path to the WAV file to analyze"},
+                "wav_path": {"type": "string", "description": "Path to the WAV file, or a take ID, to analyze"},
             },
             "required": ["wav_path"],
         },
     },
     {
         "name": "compare_audio",
-        "description": "Compare two audio files spectrally and return a similarity report showing which frequencies differ most.",
+        "description": "Compare two audio files and return a similarity report: an overall match distance (lower is closer), multi-resolution spectral distances, envelope and noise differences, and per-octave-band level errors showing which frequencies differ most.",
         "input_schema": {
             "type": "object",
             "properties": {
-                "target_path": {"type": "string", "description": "Path to the target WAV file"},
-                "recorded_path": {"type": "string", "description": "Path to the recorded WAV file"},
+                "target_path": {"type": "string", "description": "Path to the target WAV file, or a take ID"},
+                "recorded_path": {"type": "string", "description": "Take ID of the recording (or a WAV file path)"},
             },
             "required": ["target_path", "recorded_path"],
         },
     },
+    {
+        "name": "save_take",
+        "description": "Write a recorded take to a WAV file, e.g. when the user wants to keep it. Takes otherwise stay in memory only.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "take_id": {"type": "string", "description": "Take ID returned by audition or record_audio"},
+                "path": {"type": "string", "description": "Destination WAV path (default: Downloads/<take_id>.wav)"},
+            },
+            "required": ["take_id"],
+        },
+    },
+    {
+        "name": "optimize_match",
+        "description": "Numerically optimize a few synth parameters to match a target sound. Auditions dozens of candidates on the synth (CMA-ES search, no further tool calls needed), then applies the best values. The current parameter values are the starting point, so set a good initial guess first. Returns the best match distance and values.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "target_path": {"type": "string", "description": "Path to the target WAV file, or a take ID"},
+                "params": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Parameters to search (default: timbre 1 filter and EG settings). 3-10 works best.",
+                },
+                "max_evaluations": {"type": "integer", "description": "Maximum number of auditions (default 120)"},
+                "note": {"type": "integer", "description": "MIDI note to audition (default 60)"},
+                "velocity": {"type": "integer", "description": "Velocity 1-127 (default 100)"},
+                "duration_ms": {"type": "integer", "description": "Note length in ms (default 500)"},
+                "prescreen": {"type": "integer", "description": "Score this many candidates on an offline approximation of the synth first and start from the best (e.g. 2000; default 0 = off). Useful when the starting point is far off."},
+            },
+            "required": ["target_path"],
+        },
+    },
 ]
@@ -0,0 +1,242 @@
+"""Play a note on the synth and capture exactly the sound it makes.
+
+``Auditioner`` keeps an input stream running into a ``RingBuffer`` indexed
+by absolute frame number.  Each callback records the ADC time of its first
+frame, so any moment on the stream clock maps to a frame.  ``play`` sends
+note-on, holds for the note length measured on that clock, sends note-off
+and keeps capturing only until the release has decayed into the noise
+floor, then cuts the take from the ring: from note-on plus the measured
+MIDI-to-audio latency, with leading and trailing silence trimmed.
+
+``calibrate`` measures that latency from a few short notes.  The stream
+is injectable (``stream_factory``) so the timing logic runs without
+sounddevice.  A stream that stops delivering audio makes ``play`` raise
+``AuditionTimeout`` instead of waiting forever.
+"""
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+import numpy as np
+
+SILENCE_DB = -50.0        # below the take's peak (or 2x the noise floor) counts as silence
+HOLD_S = 0.05             # the release is over after this much silence
+PREROLL_S = 0.005         # kept before the detected onset
+NOISE_WINDOW_S = 0.05     # input measured before note-on for the noise floor
+POLL_S = 0.005
+STALL_TIMEOUT_S = 2.0     # slack beyond the note and release before a take is abandoned
+
+
+class AuditionTimeout(RuntimeError):
+    """The input stream delivered no audio in time."""
+
+
+class RingBuffer:
+    """The most recent *capacity* input frames, addressed by absolute frame index."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._written = 0
+        self._lock = threading.Lock()
+
+    @property
+    def written(self) -> int:
+        """Absolute index one past the newest frame."""
+        return self._written
+
+    def write(self, block: np.ndarray) -> None:
+        block = np.asarray(block, dtype=np.float32).ravel()[-self.capacity:]
+        with self._lock:
+            start = self._written % self.capacity
+            first = min(len(block), self.capacity - start)
+            self._data[start:start + first] = block[:first]
+            self._data[:len(block) - first] = block[first:]
+            self._written += len(block)
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Frames [start, end); frames not yet written or already overwritten are zero."""
+        out = np.zeros(max(0, end - start), dtype=np.float32)
+        with self._lock:
+            lo = max(start, self._written - self.capacity, 0)
+            hi = min(end, self._written)
+            if hi > lo:
+                idx = np.arange(lo, hi) % self.capacity
+                out[lo - start:hi - start] = self._data[idx]
+        return out
+
+
+@dataclass
+class Take:
+    samples: np.ndarray
+    sample_rate: int
+    note: int
+    velocity: int
+    latency_s: float        # MIDI-to-audio latency the take was aligned with
+    onset_s: float          # where the sound started, relative to note-on + latency
+    release_s: float        # sound captured after note-off
+
+    @property
+    def duration_s(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    def save_wav(self, path: Path) -> None:
+        from scipy.io import wavfile
+        wavfile.write(str(path), self.sample_rate,
+                      np.int16(np.clip(self.samples, -1.0, 1.0) * 32767))
+
+
+def _sounddevice_stream(**kwargs):
+    import sounddevice as sd
+    return sd.InputStream(**kwargs)
+
+
+class Auditioner:
+    """Trigger notes on *device* and capture the aligned result; see module docstring."""
+
+    def __init__(
+        self,
+        device,
+        input_device: int | str | None = None,
+        sample_rate: int = 44100,
+        channel: int = 1,
+        buffer_s: float = 30.0,
+        latency_s: float = 0.0,
+        silence_db: float = SILENCE_DB,
+        stream_factory: Callable[..., object] | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._device = device
+        self._input_device = input_device
+        self.sample_rate = sample_rate
+        self._channel = channel
+        self.latency_s = latency_s
+        self.silence_db = silence_db
+        self.ring = RingBuffer(int(buffer_s * sample_rate))
+        self._stream_factory = stream_factory or _sounddevice_stream
+        self._sleep = sleep
+        self._clock = clock
+        self._deadline = float("inf")
+        self._stream = None
+        self._anchor: tuple[int, float] | None = None   # (frame, ADC time) of the newest block
+
+    # -- stream --
+
+    def _callback(self, indata, frames, time_info, status) -> None:
+        frame = self.ring.written
+        self.ring.write(indata[:, 0] if np.ndim(indata) > 1 else indata)
+        self._anchor = (frame, float(time_info.inputBufferAdcTime))
+
+    @property
+    def is_open(self) -> bool:
+        return self._stream is not None
+
+    def open(self) -> None:
+        if self._stream is not None:
+            return
+        self._stream = self._stream_factory(
+            samplerate=self.sample_rate, channels=1, dtype="float32",
+            device=self._input_device, callback=self._callback)
+        self._stream.start()
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+            self._anchor = None
+
+    def __enter__(self) -> Auditioner:
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def frame_at(self, stream_time: float) -> int:
+        """Absolute ring frame captured at *stream_time* (stream clock)."""
+        frame, adc_time = self._anchor
+        return frame + round((stream_time - adc_time) * self.sample_rate)
+
+    def _poll(self) -> None:
+        if self._clock() > self._deadline:
+            raise AuditionTimeout("No audio from the input device; check the audio input")
+        self._sleep(POLL_S)
+
+    def _wait_frames(self, frame: int) -> None:
+        while self.ring.written < frame:
+            self._poll()
+
+    def _wait_until(self, stream_time: float) -> None:
+        while self._stream.time < stream_time:
+            self._poll()
+
+    # -- auditioning --
+
+    def _threshold(self, floor: float, peak: float) -> float:
+        return max(peak * 10.0 ** (self.silence_db / 20.0), 2.0 * floor)
+
+    def play(self, note: int = 60, velocity: int = 100, duration_s: float = 0.5,
+             max_release_s: float = 3.0, trim: bool = True) -> Take:
+        """Play *note* for *duration_s* and return the take, aligned and trimmed.
+
+        Raises ``AuditionTimeout`` if the stream stalls for more than
+        ``STALL_TIMEOUT_S`` beyond the note and its longest release.
+        """
+        self.open()
+        self._deadline = self._clock() + duration_s + max_release_s + STALL_TIMEOUT_S
+        sr = self.sample_rate
+        hold = max(1, int(HOLD_S * sr))
+        noise = max(1, int(NOISE_WINDOW_S * sr))
+        while self._anchor is None or self.ring.written < noise:
+            self._poll()
+        before = self.ring.read(self.ring.written - noise, self.ring.written)
+        floor = float(np.sqrt(np.mean(before ** 2)))
+
+        on_time = self._stream.time
+        self._device.send_note_on(self._channel, note, velocity)
+        start = self.frame_at(on_time) + round(self.latency_s * sr)
+        try:
+            self._wait_until(on_time + duration_s)
+        finally:
+            self._device.send_note_off(self._channel, note)
+        off_frame = start + round(duration_s * sr)
+
+        # capture until the release has been silent for HOLD_S, or the cap
+        end = off_frame + hold
+        limit = off_frame + round(max_release_s * sr)
+        peak = 0.0
+        while True:
+            self._wait_frames(end)
+            peak = max(peak, float(np.abs(self.ring.read(start, end)).max()))
+            tail = self.ring.read(end - hold, end)
+            if np.sqrt(np.mean(tail ** 2)) < self._threshold(floor, peak) or end >= limit:
+                break
+            end = min(limit, end + hold)
+
+        samples = self.ring.read(start, end)
+        threshold = self._threshold(floor, peak)
+        loud = np.flatnonzero(np.abs(samples) >= threshold)
+        onset = int(loud[0]) if len(loud) else 0
+        if trim and len(loud):
+            first = max(0, onset - int(PREROLL_S * sr))
+            samples = samples[first:int(loud[-1]) + 1]
+        return Take(samples=samples, sample_rate=sr, note=note, velocity=velocity,
+                    latency_s=self.latency_s, onset_s=onset / sr,
+                    release_s=max(0, end - off_frame) / sr)
+
+    def calibrate(self, note: int = 60, velocity: int = 100, duration_s: float = 0.15,
+                  repeats: int = 3) -> float:
+        """Measure MIDI-to-audio latency from *repeats* short notes; sets ``latency_s``."""
+        saved = self.latency_s
+        self.latency_s = 0.0
+        try:
+            onsets = [self.play(note, velocity, duration_s, max_release_s=1.0).onset_s
+                      for _ in range(repeats)]
+        finally:
+            self.latency_s = saved
+        self.latency_s = float(np.median(onsets))
+        return self.latency_s
@@ -0,0 +1,272 @@
+"""Multi-resolution spectral comparison of a target sound and candidates.
+
+``SoundMatcher`` prepares the target once and scores any number of
+candidate recordings against it in one batch:
+
+* log-magnitude STFT distance (spectral convergence plus mean absolute
+  log difference) at several frame sizes, so both transients and fine
+  pitch/filter detail count;
+* per-octave-band error and level bias (dB, positive where the candidate
+  is louder), to tell *where* the spectra differ;
+* the amplitude envelope compared with dynamic time warping, which scores
+  the envelope shape without penalizing small timing offsets;
+* the difference in spectral flatness, i.e. how much noisier the
+  candidate is.
+
+Both signals are aligned at their onsets, candidates are cut or padded to
+the target length, and candidates at another sample rate are resampled
+to the target's.
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from math import gcd
+from pathlib import Path
+import numpy as np
+import scipy.fft
+from scipy.signal import resample_poly
+
+# (frame size, hop) pairs
+RESOLUTIONS = ((256, 64), (1024, 256), (4096, 1024))
+BAND_EDGES_HZ = (0.0, 125.0, 250.0, 500.0, 1000.0, 2000.0, 4000.0, 8000.0, 16000.0)
+WEIGHTS = {"stft": 1.0, "envelope": 5.0, "noise": 0.5}
+ONSET_DB = -50.0          # onset = first sample within this of the peak
+FLOOR_DB = -80.0          # magnitudes below this (re target peak) are treated as equal
+ENVELOPE_FLOOR_DB = -60.0
+ENVELOPE_HOP_S = 0.01
+MAX_ENVELOPE_FRAMES = 400
+DTW_RADIUS = 0.05         # Sakoe-Chiba band as a fraction of the envelope length
+_EPS = 1e-10
+
+
+def resample(samples: np.ndarray, from_rate: int, to_rate: int) -> np.ndarray:
+    """*samples* converted from *from_rate* to *to_rate* (polyphase)."""
+    samples = np.asarray(samples, dtype=np.float32)
+    if from_rate == to_rate:
+        return samples
+    g = gcd(int(from_rate), int(to_rate))
+    return resample_poly(samples, int(to_rate) // g, int(from_rate) // g,
+                         axis=-1).astype(np.float32)
+
+
+def trim_onset(samples: np.ndarray) -> np.ndarray:
+    """*samples* from the first one within ``ONSET_DB`` of the peak."""
+    peak = float(np.abs(samples).max()) if len(samples) else 0.0
+    if peak <= 0:
+        return samples
+    return samples[int(np.argmax(np.abs(samples) >= peak * 10.0 ** (ONSET_DB / 20.0))):]
+
+
+def _fit(samples: np.ndarray, length: int) -> np.ndarray:
+    out = np.zeros(length, dtype=np.float32)
+    n = min(length, len(samples))
+    out[:n] = samples[:n]
+    return out
+
+
+def _stft_mag(batch: np.ndarray, frame: int, hop: int) -> np.ndarray:
+    """(B, F, frame//2+1) float32 magnitudes, Hann window, centred frames."""
+    padded = np.pad(batch, ((0, 0), (frame // 2, frame // 2)))
+    frames = np.lib.stride_tricks.sliding_window_view(padded, frame, axis=-1)[:, ::hop]
+    window = np.hanning(frame).astype(np.float32)
+    return np.abs(scipy.fft.rfft(frames * window, axis=-1, workers=-1))
+
+
+def _envelope_db(batch: np.ndarray, hop: int, ref: float) -> np.ndarray:
+    """(B, F) RMS envelope in dB re *ref*, floored, scaled to [0, 1]."""
+    count = batch.shape[1] // hop
+    rms = np.sqrt((batch[:, :count * hop].reshape(len(batch), count, hop) ** 2).mean(axis=2))
+    db = 20.0 * np.log10(np.maximum(rms, _EPS) / max(ref, _EPS))
+    return (np.clip(db, ENVELOPE_FLOOR_DB, 0.0) - ENVELOPE_FLOOR_DB) / -ENVELOPE_FLOOR_DB
+
+
+def dtw_distance(a: np.ndarray, b: np.ndarray, radius: int | None = None) -> np.ndarray:
+    """DTW distance of sequence *a* (n,) to each row of *b* (B, m).
+
+    Absolute-difference cost, steps (1,0), (0,1), (1,1), normalized by
+    n + m.  Cells are filled one anti-diagonal at a time for the whole
+    batch; *radius* limits the warp to a Sakoe-Chiba band.
+    """
+    b = np.atleast_2d(b)
+    n, m = len(a), b.shape[1]
+    if n == 0 or m == 0:
+        return np.zeros(len(b))
+    if radius is None:
+        radius = max(n, m)
+    radius = max(radius, abs(n - m))
+    cost = np.abs(a[None, :, None] - b[:, None, :])
+    acc = np.full((len(b), n + 1, m + 1), np.inf)
+    acc[:, 0, 0] = 0.0
+    for k in range(2, n + m + 1):
+        i = np.arange(max(1, k - m), min(n, k - 1) + 1)
+        j = k - i
+        keep = np.abs(i - j) <= radius
+        i, j = i[keep], j[keep]
+        if not len(i):
+            continue
+        best = np.minimum(np.minimum(acc[:, i - 1, j], acc[:, i, j - 1]), acc[:, i - 1, j - 1])
+        acc[:, i, j] = cost[:, i - 1, j - 1] + best
+    return acc[:, n, m] / (n + m)
+
+
+@dataclass
+class Band:
+    low_hz: float
+    high_hz: float
+    error_db: float         # mean absolute level difference
+    bias_db: float          # mean signed difference, candidate minus target
+
+    @property
+    def label(self) -> str:
+        def fmt(hz: float) -> str:
+            return f"{hz / 1000:g}k" if hz >= 1000 else f"{hz:g}"
+        return f"{fmt(self.low_hz)}-{fmt(self.high_hz)} Hz"
+
+
+@dataclass
+class Comparison:
+    distance: float
+    stft: dict[int, float]                  # frame size -> SC + log-magnitude distance
+    envelope: float                         # DTW distance of the dB envelopes, 0..1
+    noise: float                            # flatness difference, candidate minus target
+    bands: list[Band] = field(default_factory=list)
+
+    def worst_bands(self, count: int = 3) -> list[Band]:
+        return sorted(self.bands, key=lambda b: -b.error_db)[:count]
+
+    def to_dict(self) -> dict:
+        return {
+            "distance": round(self.distance, 4),
+            "stft_distance": {size: round(v, 4) for size, v in self.stft.items()},
+            "envelope_distance": round(self.envelope, 4),
+            "noise_difference": round(self.noise, 4),
+            "bands": [{"band": b.label, "error_db": round(b.error_db, 1),
+                       "candidate_minus_target_db": round(b.bias_db, 1)} for b in self.bands],
+        }
+
+
+class SoundMatcher:
+    """Score candidate recordings against one *target*; see module docstring."""
+
+    def __init__(self, target: np.ndarray, sample_rate: int,
+                 resolutions: tuple[tuple[int, int], ...] = RESOLUTIONS) -> None:
+        self.sample_rate = int(sample_rate)
+        self.resolutions = resolutions
+        self._target = trim_onset(np.asarray(target, dtype=np.float32).ravel())
+        self.length = max(len(self._target), max(f for f, _ in resolutions))
+        target = _fit(self._target, self.length)[None]
+        self._peak = float(np.abs(target).max())
+        self._mags = [_stft_mag(target, frame, hop)[0] for frame, hop in resolutions]
+        # magnitudes are compared in dB re the target's loudest bin at each resolution
+        self._refs = [max(float(m.max()), _EPS) for m in self._mags]
+        self._db = [self._to_db(m, ref) for m, ref in zip(self._mags, self._refs)]
+        self._env_hop = max(int(self.sample_rate * ENVELOPE_HOP_S),
+                            -(-self.length // MAX_ENVELOPE_FRAMES))
+        self._envelope = _envelope_db(target, self._env_hop, self._peak)[0]
+        fine = self.resolutions[-1][0]
+        freqs = np.fft.rfftfreq(fine, 1.0 / self.sample_rate)
+        nyquist = self.sample_rate / 2
+        edges = [e for e in BAND_EDGES_HZ if e < nyquist] + [nyquist]
+        self._bands = [(lo, hi, np.flatnonzero((freqs >= lo) & (freqs < hi)))
+                       for lo, hi in zip(edges[:-1], edges[1:])]
+        self._bands = [b for b in self._bands if len(b[2])]
+        self._flatness = self._flatness_of(self._mags[len(self._mags) // 2][None])[0]
+
+    @staticmethod
+    def _to_db(mag: np.ndarray, ref: float) -> np.ndarray:
+        return np.maximum(20.0 * np.log10(mag / ref + _EPS), FLOOR_DB)
+
+    @staticmethod
+    def _flatness_of(mags: np.ndarray) -> np.ndarray:
+        """(B,) mean spectral flatness over frames with any energy."""
+        power = mags.astype(np.float64) ** 2 + _EPS
+        flat = np.exp(np.log(power).mean(axis=-1)) / power.mean(axis=-1)
+        loud = power.sum(axis=-1) > _EPS * power.shape[-1] * 10
+        counts = np.maximum(loud.sum(axis=-1), 1)
+        return (flat * loud).sum(axis=-1) / counts
+
+    def compare(self, candidate: np.ndarray, sample_rate: int | None = None) -> Comparison:
+        return self.compare_batch([candidate], sample_rate)[0]
+
+    def compare_batch(self, candidates, sample_rate: int | None = None) -> list[Comparison]:
+        """Scores for each candidate (a 2-D array or list of 1-D arrays), in order."""
+        rate = self.sample_rate if sample_rate is None else int(sample_rate)
+        batch = np.stack([_fit(trim_onset(resample(np.ravel(c), rate, self.sample_rate)),
+                               self.length) for c in candidates])
+        b = len(batch)
+        stft = np.zeros((b, len(self.resolutions)))
+        band_err = band_bias = None
+        for r, ((frame, hop), t_mag, t_db, ref) in enumerate(
+                zip(self.resolutions, self._mags, self._db, self._refs)):
+            mag = _stft_mag(batch, frame, hop)
+            sc = (np.linalg.norm((mag - t_mag).reshape(b, -1), axis=1)
+                  / max(float(np.linalg.norm(t_mag)), _EPS))
+            db = self._to_db(mag, ref)
+            diff = db - t_db
+            stft[:, r] = sc + np.abs(diff).mean(axis=(1, 2)) / 20.0 * np.log(10)
+            if r == len(self.resolutions) - 1:
+                band_err = np.stack([np.abs(diff[:, :, idx]).mean(axis=(1, 2))
+                                     for _, _, idx in self._bands], axis=1)
+                band_bias = np.stack([diff[:, :, idx].mean(axis=(1, 2))
+                                      for _, _, idx in self._bands], axis=1)
+            if r == len(self.resolutions) // 2:
+                noise = self._flatness_of(mag) - self._flatness
+        envelopes = _envelope_db(batch, self._env_hop, self._peak)
+        radius = max(1, int(DTW_RADIUS * len(self._envelope)))
+        envelope = dtw_distance(self._envelope, envelopes, radius)
+        total = (WEIGHTS["stft"] * stft.mean(axis=1) + WEIGHTS["envelope"] * envelope
+                 + WEIGHTS["noise"] * np.abs(noise))
+        return [
+            Comparison(
+                distance=float(total[i]),
+                stft={frame: float(stft[i, r]) for r, (frame, _) in enumerate(self.resolutions)},
+                envelope=float(envelope[i]),
+                noise=float(noise[i]),
+                bands=[Band(lo, hi, float(band_err[i, k]), float(band_bias[i, k]))
+                       for k, (lo, hi, _) in enumerate(self._bands)],
+            )
+            for i in range(b)
+        ]
+
+
+def compare(target: np.ndarray, target_rate: int, candidate: np.ndarray,
+            candidate_rate: int | None = None) -> Comparison:
+    """One-off comparison; use ``SoundMatcher`` to score many candidates."""
+    return SoundMatcher(target, target_rate).compare(candidate, candidate_rate)
+
+
+_matchers: OrderedDict[str, SoundMatcher] = OrderedDict()
+_matchers_lock = threading.Lock()
+
+
+def matcher_for(samples: np.ndarray, sample_rate: int) -> SoundMatcher:
+    """Prepared matcher for *samples*, reused for the same audio."""
+    from audio.feature_cache import audio_key
+    key = audio_key(samples, sample_rate)
+    with _matchers_lock:
+        matcher = _matchers.get(key)
+        if matcher is not None:
+            _matchers.move_to_end(key)
+            return matcher
+    matcher = SoundMatcher(samples, sample_rate)
+    with _matchers_lock:
+        _matchers[key] = matcher
+        while len(_matchers) > 4:
+            _matchers.popitem(last=False)
+    return matcher
+
+
+@lru_cache(maxsize=4)
+def _matcher_for(path: str, size: int, mtime_ns: int) -> SoundMatcher:
+    from audio.engine import AudioRecorder
+    samples, sr = AudioRecorder.load_wav(Path(path))
+    return SoundMatcher(samples, sr)
+
+
+def matcher_for_file(path: Path) -> SoundMatcher:
+    """Prepared matcher for the WAV at *path*, reused while the file is unchanged."""
+    path = Path(path).resolve()
+    st = path.stat()
+    return _matcher_for(str(path), st.st_size, st.st_mtime_ns)
@@ -33,6 +33,10 @@ class AudioRecorder:
         self._device = device
         self._sample_rate = sample_rate
 
+    @property
+    def sample_rate(self) -> int:
+        return self._sample_rate
+
     def record(self, duration_s: float) -> np.ndarray:
         import sounddevice as sd
         samples = sd.rec(
@@ -60,13 +64,19 @@ class AudioRecorder:
 
 
 class AudioMonitor:
-    """Real-time audio passthrough from input to output."""
+    """Real-time audio passthrough from input to output.
+
+    The input is also metered: ``meter.levels`` holds the latest peak/RMS
+    and spectrum while the monitor runs.
+    """
 
     def __init__(self, device=None, sample_rate: int = 44100, gain: float = 1.0) -> None:
+        from audio.meter import LevelMeter
         self._device = device
         self._sample_rate = sample_rate
         self._stream = None
         self.gain = gain
+        self.meter = LevelMeter(sample_rate)
 
     @property
     def is_running(self) -> bool:
@@ -101,7 +111,9 @@ class AudioMonitor:
                 device=device,
                 callback=self._callback,
             )
+        self.meter.reset(sample_rate)
         self._stream.start()
+        self.meter.start()
 
     def _same_api_output(self, sd):
         """Find the default output device on the same host API as the input."""
@@ -117,10 +129,12 @@ class AudioMonitor:
             self._stream.stop()
             self._stream.close()
             self._stream = None
+        self.meter.stop()
 
     def _callback(self, indata, outdata, frames, time, status):
-        import numpy as np
+        # runs on the PortAudio thread: no locks, no array allocation
         np.multiply(indata, self.gain, out=outdata)
+        self.meter.push(indata)
 
 
 class AudioAnalyzer:
@@ -128,48 +142,9 @@ class AudioAnalyzer:
 
     @staticmethod
     def analyze_samples(samples: np.ndarray, sample_rate: int) -> dict:
-        """Return spectral analysis of audio samples."""
-        n = len(samples)
-        fft_vals = np.abs(np.fft.rfft(samples))
-        freqs = np.fft.rfftfreq(n, 1.0 / sample_rate)
-
-        # Fundamental frequency (strongest peak above 20 Hz)
-        min_bin = int(20 * n / sample_rate)
-        peak_bin = min_bin + np.argmax(fft_vals[min_bin:])
-        fundamental_hz = freqs[peak_bin]
-
-        # Spectral centroid
-        magnitude_sum = np.sum(fft_vals)
-        if magnitude_sum > 0:
-            centroid = np.sum(freqs * fft_vals) / magnitude_sum
-        else:
-            centroid = 0.0
-
-        # Amplitude envelope (split into 50ms windows)
-        window_size = int(sample_rate * 0.05)
-        envelope = []
-        for i in range(0, len(samples), window_size):
-            chunk = samples[i:i + window_size]
-            envelope.append(float(np.sqrt(np.mean(chunk ** 2))))
-
-        # Harmonic content
-        harmonic_bins = []
-        for h in range(2, 9):
-            hfreq = fundamental_hz * h
-            hbin = int(hfreq * n / sample_rate)
-            if hbin < len(fft_vals):
-                harmonic_bins.append(float(fft_vals[hbin]))
-        harmonic_energy = sum(harmonic_bins) if harmonic_bins else 0
-        total_energy = float(np.sum(fft_vals[min_bin:]))
-        harmonic_ratio = harmonic_energy / total_energy if total_energy > 0 else 0
-
-        return {
-            "fundamental_hz": float(fundamental_hz),
-            "spectral_centroid_hz": float(centroid),
-            "harmonic_ratio": float(harmonic_ratio),
-            "envelope": envelope[:20],
-            "duration_s": len(samples) / sample_rate,
-        }
+        """Return spectral analysis of audio samples (see ``audio.features``)."""
+        from audio.features import extract
+        return extract(samples, sample_rate).summary()
 
     @staticmethod
     def compare_samples(
@@ -178,7 +153,11 @@ class AudioAnalyzer:
         """Compare two audio signals spectrally."""
         a1 = AudioAnalyzer.analyze_samples(target, sample_rate)
         a2 = AudioAnalyzer.analyze_samples(recorded, sample_rate)
+        return AudioAnalyzer.compare_analyses(a1, a2)
 
+    @staticmethod
+    def compare_analyses(a1: dict, a2: dict) -> dict:
+        """Compare two ``analyze_samples`` results."""
         freq_diff = abs(a1["fundamental_hz"] - a2["fundamental_hz"]) / max(a1["fundamental_hz"], 1)
         centroid_diff = abs(a1["spectral_centroid_hz"] - a2["spectral_centroid_hz"]) / max(a1["spectral_centroid_hz"], 1)
         harmonic_diff = abs(a1["harmonic_ratio"] - a2["harmonic_ratio"])
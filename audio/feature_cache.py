@@ -0,0 +1,276 @@
+"""Content-addressed cache of ``audio.features`` results.
+
+Features are keyed by a hash of the samples, the sample rate and
+``FEATURES_VERSION``, so the same audio under any file name is analyzed
+once and a new analyzer version never serves stale results.  Entries live
+in a small in-memory LRU and as compressed ``.npz`` files on disk.  A
+path index (size, mtime → key) lets repeated lookups of an unchanged WAV
+skip even reading the file.
+
+``index_paths`` fills the cache for whole folders of reference WAVs,
+spread across worker processes that write their entries straight to the
+shared cache directory.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from audio.features import FEATURES_VERSION, Features, extract
+
+FEATURE_CACHE_DIR = Path.home() / ".config" / "patchmasta" / "features"
+WAV_SUFFIXES = (".wav",)
+
+_ARRAYS = ("rms", "centroid_hz", "rolloff_hz", "flux", "mfcc", "f0_hz", "hnr_db",
+           "spectrum", "envelope")
+_ADSR = ("attack_s", "decay_s", "sustain_level", "release_s")
+
+
+def audio_key(samples: np.ndarray, sample_rate: int) -> str:
+    """Hash identifying *samples* at *sample_rate* for the current analyzer."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{FEATURES_VERSION}:{int(sample_rate)}:".encode())
+    h.update(np.ascontiguousarray(samples, dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
+def _file_stamp(path: Path) -> list[int]:
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _save(path: Path, features: Features) -> None:
+    meta = np.array([features.sample_rate, features.hop, features.duration_s, features.bin_hz]
+                    + [features.adsr.get(k, 0.0) for k in _ADSR], dtype=np.float64)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    np.savez_compressed(tmp, meta=meta, **{name: getattr(features, name) for name in _ARRAYS})
+    tmp.replace(path)
+
+
+def _load(path: Path) -> Features:
+    with np.load(path) as data:
+        meta = data["meta"]
+        arrays = {name: data[name] for name in _ARRAYS}
+    return Features(sample_rate=int(meta[0]), hop=int(meta[1]), duration_s=float(meta[2]),
+                    bin_hz=float(meta[3]), adsr=dict(zip(_ADSR, map(float, meta[4:]))),
+                    **arrays)
+
+
+def _load_wav(path: Path) -> tuple[np.ndarray, int]:
+    from audio.engine import AudioRecorder
+    return AudioRecorder.load_wav(path)
+
+
+class FeatureCache:
+    """Thread-safe memory + disk cache; see module docstring.
+
+    With *directory* None the cache is in memory only.
+    """
+
+    def __init__(self, directory: Path | None = FEATURE_CACHE_DIR, max_entries: int = 64,
+                 max_files: int = 2000) -> None:
+        self.directory = Path(directory) if directory is not None else None
+        self.max_entries = max_entries
+        self.max_files = max_files
+        self._stores = 0
+        self._memory: OrderedDict[str, Features] = OrderedDict()
+        self._files: dict[str, list] = {}     # path -> [size, mtime_ns, key]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            try:
+                self._files = json.loads(self._index_path.read_text())
+            except (OSError, json.JSONDecodeError):
+                self._files = {}
+
+    @property
+    def _index_path(self) -> Path:
+        return self.directory / "files.json"
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / f"{key}.npz"
+
+    def _remember(self, key: str, features: Features) -> None:
+        self._memory[key] = features
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _save_index(self) -> None:
+        if self.directory is None:
+            return
+        tmp = self._index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._files))
+        tmp.replace(self._index_path)
+
+    def lookup(self, key: str) -> Features | None:
+        with self._lock:
+            features = self._memory.get(key)
+            if features is not None:
+                self._memory.move_to_end(key)
+                return features
+        if self.directory is None or not self._entry_path(key).exists():
+            return None
+        try:
+            features = _load(self._entry_path(key))
+        except (OSError, ValueError, KeyError):
+            return None
+        with self._lock:
+            self._remember(key, features)
+        return features
+
+    def store(self, key: str, features: Features) -> None:
+        with self._lock:
+            self._remember(key, features)
+            self._stores += 1
+            prune = self._stores % 50 == 0
+        if self.directory is not None:
+            _save(self._entry_path(key), features)
+            if prune:
+                self.prune()
+
+    def prune(self) -> int:
+        """Delete the oldest disk entries beyond *max_files*; returns how many."""
+        if self.directory is None:
+            return 0
+        entries = sorted(self.directory.glob("*.npz"), key=lambda p: p.stat().st_mtime)
+        stale = entries[:max(0, len(entries) - self.max_files)]
+        for entry in stale:
+            entry.unlink(missing_ok=True)
+        if stale:
+            gone = {entry.stem for entry in stale}
+            with self._lock:
+                self._files = {k: v for k, v in self._files.items() if v[2] not in gone}
+                self._save_index()
+        return len(stale)
+
+    def get(self, samples: np.ndarray, sample_rate: int) -> Features:
+        """Features of *samples*, computed only on a cache miss."""
+        key = audio_key(samples, sample_rate)
+        features = self.lookup(key)
+        if features is None:
+            self.misses += 1
+            features = extract(samples, sample_rate)
+            self.store(key, features)
+        else:
+            self.hits += 1
+        return features
+
+    def get_file(self, path: Path) -> Features:
+        """Features of the WAV at *path*; an unchanged, known file is not re-read."""
+        path = Path(path)
+        name = str(path.resolve())
+        stamp = _file_stamp(path)
+        with self._lock:
+            known = self._files.get(name)
+        if known is not None and known[:2] == stamp:
+            features = self.lookup(known[2])
+            if features is not None:
+                self.hits += 1
+                return features
+        samples, sr = _load_wav(path)
+        features = self.get(samples, sr)
+        self.record_file(name, stamp, audio_key(samples, sr))
+        return features
+
+    def record_file(self, name: str, stamp: list[int], key: str) -> None:
+        with self._lock:
+            self._files[name] = stamp + [key]
+            self._save_index()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._files.clear()
+            if self.directory is not None:
+                for entry in self.directory.glob("*.npz"):
+                    entry.unlink(missing_ok=True)
+                self._save_index()
+
+
+_shared: FeatureCache | None = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache() -> FeatureCache:
+    """Process-wide cache in ``FEATURE_CACHE_DIR``."""
+    global _shared
+    with _shared_lock:
+        if _shared is None or _shared.directory != FEATURE_CACHE_DIR:
+            _shared = FeatureCache(FEATURE_CACHE_DIR)
+        return _shared
+
+
+# -- batch indexing --
+
+def find_wavs(inputs: list[Path]) -> list[Path]:
+    files: list[Path] = []
+    for path in map(Path, inputs):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() in WAV_SUFFIXES))
+        else:
+            files.append(path)
+    return files
+
+
+def _index_chunk(paths: list[str], directory: str | None,
+                 cache: FeatureCache | None = None) -> list[tuple[str, list, str | None, str]]:
+    """Analyze *paths* into the cache at *directory*; (path, stamp, key, error) each."""
+    if cache is None:
+        cache = FeatureCache(Path(directory) if directory else None, max_entries=1)
+    results = []
+    for name in paths:
+        try:
+            stamp = _file_stamp(Path(name))
+            samples, sr = _load_wav(Path(name))
+            key = audio_key(samples, sr)
+            if cache.lookup(key) is None:
+                cache.store(key, extract(samples, sr))
+            results.append((name, stamp, key, ""))
+        except (OSError, ValueError) as exc:
+            results.append((name, [], None, str(exc)))
+    return results
+
+
+def index_paths(cache: FeatureCache, inputs: list[Path], workers: int | None = None,
+                chunk_size: int = 16) -> tuple[int, list[tuple[str, str]]]:
+    """Pre-compute features for every WAV under *inputs* into *cache*.
+
+    Files already indexed and unchanged are skipped.  The rest are analyzed
+    in chunks of *chunk_size* across *workers* processes (default: CPU
+    count).  Returns (files_indexed, [(path, error), ...]).
+    """
+    names = []
+    for path in find_wavs(inputs):
+        name = str(path.resolve())
+        known = cache._files.get(name)
+        try:
+            if known is not None and known[:2] == _file_stamp(path) \
+                    and (cache.directory is None or cache._entry_path(known[2]).exists()):
+                continue
+        except OSError:
+            pass
+        names.append(name)
+    chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+    directory = str(cache.directory) if cache.directory is not None else None
+    workers = workers or os.cpu_count() or 1
+    if len(chunks) <= 1 or workers == 1 or directory is None:
+        results = [_index_chunk(c, directory, cache) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(_index_chunk, chunks, [directory] * len(chunks)))
+    failures: list[tuple[str, str]] = []
+    with cache._lock:
+        for name, stamp, key, error in (r for chunk in results for r in chunk):
+            if key is None:
+                failures.append((name, error))
+            else:
+                cache._files[name] = stamp + [key]
+        cache._save_index()
+    return len(names) - len(failures), failures
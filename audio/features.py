@@ -0,0 +1,341 @@
+"""Frame-based audio features from a single float32 STFT.
+
+``FeatureExtractor`` frames the signal (Hann window, *frame_size* samples
+every *hop*), zero-pads each frame to twice its length and takes one
+``scipy.fft.rfft``.  Every feature is derived from that spectrum with
+array operations over all frames at once:
+
+* RMS, spectral centroid, 85 % rolloff and (mel band) flux per frame;
+* MFCCs (log mel energies through a DCT-II);
+* a pitch track and harmonic-to-noise ratio from the autocorrelation,
+  which is the inverse FFT of the power spectrum (the zero padding makes
+  it linear rather than circular), normalized by the window's own
+  autocorrelation;
+* attack/decay/sustain/release estimates from the RMS envelope.
+
+Batches of signals share one STFT call.  Window, mel filterbank and lag
+tables are built once per extractor and extractors are cached per
+configuration (``get_extractor``); scipy keeps the FFT plans for the
+sizes it has seen, so repeated analyses skip the setup.  Long recordings
+are processed in blocks of frames to bound memory.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from functools import lru_cache
+import numpy as np
+import scipy.fft
+
+# Bump when the features computed for the same audio change (invalidates caches)
+FEATURES_VERSION = 1
+
+DEFAULT_FRAME_SIZE = 2048
+DEFAULT_HOP = 512
+N_MELS = 40
+N_MFCC = 13
+ROLLOFF = 0.85
+FMIN_HZ = 40.0
+FMAX_HZ = 2000.0
+VOICING = 0.45           # normalized autocorrelation peak for a frame to count as pitched
+SILENCE_DB = -60.0       # frames this far below the loudest are treated as silence
+ENVELOPE_WINDOW_S = 0.05
+_BLOCK_FRAMES = 512
+_EPS = 1e-10
+
+
+def _hz_to_mel(hz):
+    return 2595.0 * np.log10(1.0 + np.asarray(hz) / 700.0)
+
+
+def _mel_to_hz(mel):
+    return 700.0 * (10.0 ** (np.asarray(mel) / 2595.0) - 1.0)
+
+
+def _mel_filterbank(sample_rate: int, n_fft: int, n_mels: int) -> np.ndarray:
+    """(bins, n_mels) triangular filters, HTK mel scale."""
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    edges = _mel_to_hz(np.linspace(0.0, _hz_to_mel(sample_rate / 2), n_mels + 2))
+    lower, centre, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (freqs - lower) / (centre - lower)
+    falling = (upper - freqs) / (upper - centre)
+    return np.maximum(0.0, np.minimum(rising, falling)).T.astype(np.float32)
+
+
+@dataclass
+class Features:
+    """Per-frame features of one signal plus envelope estimates."""
+    sample_rate: int
+    hop: int
+    duration_s: float
+    rms: np.ndarray                 # (F,)
+    centroid_hz: np.ndarray         # (F,)
+    rolloff_hz: np.ndarray          # (F,)
+    flux: np.ndarray                # (F,)
+    mfcc: np.ndarray                # (F, N_MFCC)
+    f0_hz: np.ndarray               # (F,), NaN where unvoiced
+    hnr_db: np.ndarray              # (F,), NaN where unvoiced
+    spectrum: np.ndarray            # (bins,) mean magnitude
+    bin_hz: float
+    adsr: dict[str, float] = field(default_factory=dict)
+    envelope: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.float32))
+
+    @property
+    def frame_times(self) -> np.ndarray:
+        return np.arange(len(self.rms)) * self.hop / self.sample_rate
+
+    @property
+    def voiced(self) -> np.ndarray:
+        return ~np.isnan(self.f0_hz)
+
+    def _weights(self) -> np.ndarray:
+        energy = self.rms ** 2
+        total = energy.sum()
+        return energy / total if total > 0 else np.full(len(energy), 1.0 / max(len(energy), 1))
+
+    @property
+    def fundamental_hz(self) -> float:
+        """Median voiced pitch, or the strongest spectral peak above 20 Hz."""
+        if self.voiced.any():
+            return float(np.median(self.f0_hz[self.voiced]))
+        lo = int(20.0 / self.bin_hz) + 1
+        if lo >= len(self.spectrum) - 1:
+            return 0.0
+        return float(_parabolic_peak(self.spectrum[None, lo:])[0] + lo) * self.bin_hz
+
+    def harmonic_ratio(self, f0: float | None = None) -> float:
+        """Share of spectral magnitude at harmonics 2-8 of the fundamental."""
+        f0 = self.fundamental_hz if f0 is None else f0
+        lo = int(20.0 / self.bin_hz)
+        total = float(self.spectrum[lo:].sum())
+        if f0 <= 0 or total <= 0:
+            return 0.0
+        bins = np.rint(np.arange(2, 9) * f0 / self.bin_hz).astype(int)
+        bins = bins[bins < len(self.spectrum) - 1]
+        if not len(bins):
+            return 0.0
+        near = self.spectrum[np.clip(bins[:, None] + np.arange(-1, 2), 0, None)]
+        return float(near.max(axis=1).sum() / total)
+
+    def summary(self) -> dict:
+        """Energy-weighted scalar summary of the frame features."""
+        w = self._weights()
+        voiced = self.voiced
+        return {
+            "fundamental_hz": self.fundamental_hz,
+            "spectral_centroid_hz": float(w @ self.centroid_hz),
+            "spectral_rolloff_hz": float(w @ self.rolloff_hz),
+            "spectral_flux": float(self.flux.mean()) if len(self.flux) else 0.0,
+            "harmonic_ratio": self.harmonic_ratio(),
+            "hnr_db": float(np.median(self.hnr_db[voiced])) if voiced.any() else 0.0,
+            "voiced_fraction": float(voiced.mean()) if len(voiced) else 0.0,
+            "mfcc": [round(float(c), 3) for c in w @ self.mfcc],
+            "adsr": dict(self.adsr),
+            "envelope": [float(v) for v in self.envelope[:20]],
+            "duration_s": self.duration_s,
+        }
+
+
+def envelope_rms(samples: np.ndarray, sample_rate: int,
+                 window_s: float = ENVELOPE_WINDOW_S) -> np.ndarray:
+    """RMS of consecutive *window_s* windows (the last one may be short)."""
+    size = max(1, int(sample_rate * window_s))
+    samples = np.asarray(samples, dtype=np.float32)
+    n = len(samples)
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    count = -(-n // size)
+    padded = np.zeros(count * size, dtype=np.float32)
+    padded[:n] = samples
+    sums = (padded.reshape(count, size) ** 2).sum(axis=1)
+    lengths = np.full(count, size)
+    lengths[-1] = n - (count - 1) * size
+    return np.sqrt(sums / lengths)
+
+
+def _parabolic_peak(values: np.ndarray) -> np.ndarray:
+    """Fractional argmax along the last axis of a 2-D array."""
+    idx = np.argmax(values, axis=-1)
+    rows = np.arange(len(values))
+    inner = (idx > 0) & (idx < values.shape[-1] - 1)
+    left = values[rows, np.clip(idx - 1, 0, None)]
+    mid = values[rows, idx]
+    right = values[rows, np.clip(idx + 1, None, values.shape[-1] - 1)]
+    denom = left - 2 * mid + right
+    shift = np.where(inner & (denom != 0), 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0)
+    return idx + shift
+
+
+class FeatureExtractor:
+    """Vectorized STFT feature engine for one sample rate and frame setup."""
+
+    def __init__(self, sample_rate: int, frame_size: int = DEFAULT_FRAME_SIZE,
+                 hop: int = DEFAULT_HOP, n_mels: int = N_MELS, n_mfcc: int = N_MFCC,
+                 fmin: float = FMIN_HZ, fmax: float = FMAX_HZ) -> None:
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.hop = hop
+        self.n_fft = 2 * frame_size
+        self.n_mfcc = n_mfcc
+        self.window = np.hanning(frame_size).astype(np.float32)
+        self.freqs = np.fft.rfftfreq(self.n_fft, 1.0 / sample_rate).astype(np.float32)
+        self.bin_hz = sample_rate / self.n_fft
+        self.mel = _mel_filterbank(sample_rate, self.n_fft, n_mels)
+        # the autocorrelation only needs the band up to a few times fmax, so
+        # it is taken from the low bins at a decimated lag resolution
+        self._decim = 1
+        while self._decim * 2 <= sample_rate / (4 * fmax) and self.n_fft % (self._decim * 4) == 0:
+            self._decim *= 2
+        self._ac_size = self.n_fft // self._decim
+        self._ac_bins = self._ac_size // 2 + 1
+        ac_rate = sample_rate / self._decim
+        self._ac_rate = ac_rate
+        # autocorrelation of the window, to undo its taper on frame autocorrelations
+        w_power = np.abs(scipy.fft.rfft(self.window, self.n_fft)) ** 2
+        w_ac = scipy.fft.irfft(w_power[:self._ac_bins], self._ac_size)
+        self._window_ac = (w_ac / w_ac[0]).astype(np.float32)
+        self.min_lag = max(2, int(ac_rate / fmax))
+        self.max_lag = min(frame_size // (2 * self._decim), int(np.ceil(ac_rate / fmin)))
+
+    def _frames(self, batch: np.ndarray) -> np.ndarray:
+        """(B, F, frame_size) windowed frames, centred on multiples of *hop*."""
+        half = self.frame_size // 2
+        padded = np.pad(batch, ((0, 0), (half, half)))
+        frames = np.lib.stride_tricks.sliding_window_view(
+            padded, self.frame_size, axis=-1)[:, ::self.hop]
+        return frames * self.window
+
+    def _pitch(self, power: np.ndarray, rms: np.ndarray, floor: float
+               ) -> tuple[np.ndarray, np.ndarray]:
+        ac = scipy.fft.irfft(power[..., :self._ac_bins], self._ac_size, axis=-1,
+                             workers=-1)[..., :self.max_lag + 2]
+        ac = ac / self._window_ac[:ac.shape[-1]]
+        energy = ac[..., :1]
+        norm = np.divide(ac, energy, out=np.zeros_like(ac), where=energy > 0)
+        lags = norm[..., self.min_lag:self.max_lag + 1]
+        flat = lags.reshape(-1, lags.shape[-1])
+        peaks = np.zeros_like(flat, dtype=bool)
+        peaks[:, 1:-1] = (flat[:, 1:-1] >= flat[:, :-2]) & (flat[:, 1:-1] > flat[:, 2:])
+        heights = np.where(peaks, flat, -np.inf)
+        best = heights.max(axis=1)
+        # the first peak close to the best avoids picking a multiple of the period
+        first = np.argmax(heights >= 0.9 * best[:, None], axis=1)
+        rows = np.arange(len(flat))
+        lo = flat[rows, np.clip(first - 1, 0, None)]
+        mid = flat[rows, first]
+        hi = flat[rows, np.clip(first + 1, None, flat.shape[1] - 1)]
+        denom = lo - 2 * mid + hi
+        shift = np.where(denom != 0, 0.5 * (lo - hi) / np.where(denom == 0, 1, denom), 0)
+        lag = self.min_lag + first + np.clip(shift, -0.5, 0.5)
+        r = np.clip(mid, 0.0, 0.999).reshape(rms.shape)
+        voiced = (r >= VOICING) & (rms > floor) & np.isfinite(best).reshape(rms.shape)
+        f0 = np.where(voiced, self._ac_rate / lag.reshape(rms.shape), np.nan)
+        r = np.maximum(r, 1e-6)
+        hnr = np.where(voiced, 10.0 * np.log10(r / (1.0 - r)), np.nan)
+        return f0.astype(np.float32), hnr.astype(np.float32)
+
+    def _block(self, frames: np.ndarray, previous: np.ndarray | None, floor: np.ndarray):
+        spec = scipy.fft.rfft(frames, self.n_fft, axis=-1, workers=-1)
+        mag = np.abs(spec)
+        power = mag ** 2
+        total = mag.sum(axis=-1)
+        safe = np.where(total > 0, total, 1.0)
+        rms = np.sqrt((frames ** 2).sum(axis=-1) / self.window.dot(self.window))
+        centroid = (mag @ self.freqs) / safe
+        cumulative = np.cumsum(mag, axis=-1)
+        rolloff = self.freqs[np.argmax(cumulative >= ROLLOFF * cumulative[..., -1:], axis=-1)]
+        mel = power @ self.mel
+        # flux over loudness-normalized mel bands rather than every bin
+        bands = np.sqrt(mel)
+        bands /= np.maximum(bands.sum(axis=-1, keepdims=True), _EPS)
+        before = np.concatenate([bands[:, :1] if previous is None else previous[:, None],
+                                 bands[:, :-1]], axis=1)
+        flux = np.sqrt((np.maximum(bands - before, 0.0) ** 2).sum(axis=-1))
+        log_mel = np.log(mel + _EPS)
+        mfcc = scipy.fft.dct(log_mel, type=2, norm="ortho", axis=-1)[..., :self.n_mfcc]
+        f0, hnr = self._pitch(power, rms, floor[:, None])
+        return (rms, centroid, rolloff, flux, mfcc, f0, hnr), mag, bands[:, -1]
+
+    def _adsr(self, rms: np.ndarray) -> dict[str, float]:
+        frame_s = self.hop / self.sample_rate
+        if not len(rms) or rms.max() <= 0:
+            return {"attack_s": 0.0, "decay_s": 0.0, "sustain_level": 0.0, "release_s": 0.0}
+        top = int(np.argmax(rms))
+        peak = float(rms[top])
+        # the attack ends once the level is within 10 % of its peak
+        attack_end = int(np.argmax(rms >= 0.9 * peak))
+        loud = np.flatnonzero(rms >= 0.1 * peak)
+        onset, end = int(loud[0]), int(loud[-1])
+        tail = rms[top:end + 1]
+        sustain = float(np.median(tail)) / peak
+        settled = np.flatnonzero(tail <= peak * (sustain + 0.1 * (1.0 - sustain)))
+        decay = int(settled[0]) if len(settled) else 0
+        holding = np.flatnonzero(tail >= 0.9 * sustain * peak)
+        release_start = top + (int(holding[-1]) if len(holding) else 0)
+        return {
+            "attack_s": (attack_end - onset) * frame_s,
+            "decay_s": decay * frame_s,
+            "sustain_level": sustain,
+            "release_s": (end - release_start) * frame_s,
+        }
+
+    def extract_batch(self, signals) -> list[Features]:
+        """Features for each signal in *signals* (a 2-D array or a list of 1-D arrays)."""
+        if isinstance(signals, np.ndarray) and signals.ndim == 2:
+            lengths = [signals.shape[1]] * len(signals)
+            batch = signals.astype(np.float32, copy=False)
+        else:
+            signals = [np.asarray(s, dtype=np.float32).ravel() for s in signals]
+            lengths = [len(s) for s in signals]
+            batch = np.zeros((len(signals), max(lengths, default=0)), dtype=np.float32)
+            for row, s in zip(batch, signals):
+                row[:len(s)] = s
+        if not len(batch):
+            return []
+        frames = self._frames(batch)
+        n_frames = frames.shape[1]
+        # silence gate relative to each signal's loudest sample
+        floor = np.abs(batch).max(axis=1) * 10.0 ** (SILENCE_DB / 20.0)
+        counts = np.array([min(n_frames, n // self.hop + 1) if n else 0 for n in lengths])
+        columns: list[list[np.ndarray]] = [[] for _ in range(7)]
+        spectrum = np.zeros((len(batch), self.n_fft // 2 + 1), dtype=np.float64)
+        previous = None
+        for start in range(0, n_frames, _BLOCK_FRAMES):
+            block = np.ascontiguousarray(frames[:, start:start + _BLOCK_FRAMES])
+            values, mag, previous = self._block(block, previous, floor)
+            for col, value in zip(columns, values):
+                col.append(value)
+            own = start + np.arange(block.shape[1]) < counts[:, None]
+            spectrum += np.einsum("bfk,bf->bk", mag, own)
+        rms, centroid, rolloff, flux, mfcc, f0, hnr = (np.concatenate(c, axis=1) for c in columns)
+        result = []
+        for i, (n, count) in enumerate(zip(lengths, counts)):
+            result.append(Features(
+                sample_rate=self.sample_rate,
+                hop=self.hop,
+                duration_s=n / self.sample_rate,
+                rms=rms[i, :count], centroid_hz=centroid[i, :count],
+                rolloff_hz=rolloff[i, :count], flux=flux[i, :count], mfcc=mfcc[i, :count],
+                f0_hz=f0[i, :count], hnr_db=hnr[i, :count],
+                spectrum=(spectrum[i] / max(count, 1)).astype(np.float32),
+                bin_hz=self.bin_hz,
+                adsr=self._adsr(rms[i, :count]),
+                envelope=envelope_rms(batch[i, :n], self.sample_rate),
+            ))
+        return result
+
+    def extract(self, samples: np.ndarray) -> Features:
+        return self.extract_batch([samples])[0]
+
+
+@lru_cache(maxsize=8)
+def get_extractor(sample_rate: int, frame_size: int = DEFAULT_FRAME_SIZE,
+                  hop: int = DEFAULT_HOP) -> FeatureExtractor:
+    """Shared extractor for this configuration, so its tables are built once."""
+    return FeatureExtractor(sample_rate, frame_size, hop)
+
+
+def extract(samples: np.ndarray, sample_rate: int) -> Features:
+    return get_extractor(int(sample_rate)).extract(samples)
+
+
+def extract_batch(signals, sample_rate: int) -> list[Features]:
+    return get_extractor(int(sample_rate)).extract_batch(signals)
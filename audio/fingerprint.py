@@ -0,0 +1,326 @@
+"""Timbre fingerprints of library programs for "find similar sound" queries.
+
+``index_programs`` auditions every program once at each of ``NOTES`` and
+reduces each take to a short vector (MFCC mean and spread, spectral
+shape, harmonicity and envelope times).  ``FingerprintIndex`` stores the
+vectors on disk keyed by ``midi.layout.content_hash``, so an interrupted
+run resumes where it stopped and a re-run only auditions new programs.
+
+Rows are appended to ``vectors.f32`` and ``keys.tsv`` one program at a
+time; a crash can at most leave a torn last row, which is dropped on
+load.  Queries compare one note block after standardizing each
+dimension over the library.  Small indexes are searched exhaustively;
+larger ones through an inverted file (k-means cells, the nearest
+``nprobe`` cells re-ranked exactly), which keeps tens of thousands of
+programs in the low milliseconds.
+"""
+from __future__ import annotations
+import json
+import math
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+import numpy as np
+from audio.features import N_MFCC, Features, extract_batch
+
+FINGERPRINT_VERSION = 1
+FINGERPRINT_DIR = Path.home() / ".config" / "patchmasta" / "fingerprints" / "device"
+OFFLINE_FINGERPRINT_DIR = FINGERPRINT_DIR.with_name("offline")   # surrogate renders
+NOTES = (36, 60, 84)
+DIM = 2 * N_MFCC + 7
+IVF_MIN_SIZE = 2048       # below this a query scans every row
+NPROBE = 8
+_KMEANS_ITERATIONS = 12
+
+
+def _vector(features: Features) -> np.ndarray:
+    energy = features.rms.astype(np.float64) ** 2
+    w = energy / energy.sum() if energy.sum() > 0 else np.full(len(energy), 1.0 / max(len(energy), 1))
+    mfcc = features.mfcc
+    mean = w @ mfcc if len(mfcc) else np.zeros(N_MFCC)
+    spread = np.sqrt(np.maximum(w @ (mfcc - mean) ** 2, 0.0)) if len(mfcc) else np.zeros(N_MFCC)
+    voiced = features.voiced
+    hnr = float(np.median(features.hnr_db[voiced])) if voiced.any() else 0.0
+    adsr = features.adsr
+    return np.concatenate([
+        mean, spread,
+        [np.log1p(float(w @ features.centroid_hz)) if len(w) else 0.0,
+         np.log1p(float(w @ features.rolloff_hz)) if len(w) else 0.0,
+         features.harmonic_ratio(),
+         hnr / 20.0,
+         np.log1p(100.0 * adsr.get("attack_s", 0.0)),
+         np.log1p(100.0 * adsr.get("release_s", 0.0)),
+         adsr.get("sustain_level", 0.0)],
+    ]).astype(np.float32)
+
+
+def fingerprint(takes: Iterable[tuple[np.ndarray, int]]) -> np.ndarray:
+    """One ``DIM`` vector per (samples, sample_rate) take, as a (takes, DIM) array."""
+    takes = list(takes)
+    rows = []
+    for sr in dict.fromkeys(sr for _, sr in takes):
+        same = [i for i, (_, rate) in enumerate(takes) if rate == sr]
+        for i, features in zip(same, extract_batch([takes[i][0] for i in same], sr)):
+            rows.append((i, _vector(features)))
+    rows.sort(key=lambda row: row[0])
+    return np.array([v for _, v in rows], dtype=np.float32).reshape(len(takes), DIM)
+
+
+def nearest_note(f0_hz: float, notes: tuple[int, ...] = NOTES) -> int:
+    """Index in *notes* of the note closest to *f0_hz* (the middle one if unpitched)."""
+    if f0_hz <= 0:
+        return len(notes) // 2
+    midi = 69.0 + 12.0 * math.log2(f0_hz / 440.0)
+    return int(np.argmin([abs(midi - n) for n in notes]))
+
+
+@dataclass(frozen=True)
+class Neighbour:
+    key: str            # content hash of the program
+    name: str
+    distance: float
+
+
+def _sq_distances(x: np.ndarray, centres: np.ndarray) -> np.ndarray:
+    return (np.einsum("ij,ij->i", x, x)[:, None] - 2.0 * x @ centres.T
+            + np.einsum("ij,ij->i", centres, centres)[None, :])
+
+
+class _InvertedFile:
+    """k-means cells over the rows of one note block."""
+
+    def __init__(self, x: np.ndarray, seed: int = 0) -> None:
+        rng = np.random.default_rng(seed)
+        n_cells = max(1, int(math.sqrt(len(x))))
+        centres = x[rng.choice(len(x), n_cells, replace=False)].copy()
+        for _ in range(_KMEANS_ITERATIONS):
+            labels = np.argmin(_sq_distances(x, centres), axis=1)
+            counts = np.bincount(labels, minlength=n_cells)
+            sums = np.zeros_like(centres)
+            np.add.at(sums, labels, x)
+            filled = counts > 0
+            centres[filled] = sums[filled] / counts[filled, None]
+        labels = np.argmin(_sq_distances(x, centres), axis=1)
+        self.centres = centres
+        self.order = np.argsort(labels, kind="stable")
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(labels, minlength=n_cells))))
+
+    def candidates(self, q: np.ndarray, k: int, nprobe: int) -> np.ndarray:
+        """Row indices in the nearest *nprobe* cells (more if they hold fewer than *k*)."""
+        cells = np.argsort(_sq_distances(q[None, :], self.centres)[0])
+        taken, total = 0, 0
+        for taken, cell in enumerate(cells, 1):
+            total += self.offsets[cell + 1] - self.offsets[cell]
+            if taken >= nprobe and total >= k:
+                break
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]]
+                               for c in cells[:taken]])
+
+
+class FingerprintIndex:
+    """On-disk fingerprints keyed by program content hash; see module docstring."""
+
+    def __init__(self, directory: Path | None = FINGERPRINT_DIR,
+                 notes: tuple[int, ...] = NOTES) -> None:
+        self.directory = Path(directory) if directory is not None else None
+        self.notes = tuple(notes)
+        self.width = len(self.notes) * DIM
+        self.keys: list[str] = []
+        self.names: list[str] = []
+        self._positions: dict[str, int] = {}
+        self._chunks: list[np.ndarray] = []
+        self._matrix = np.zeros((0, self.width), dtype=np.float32)
+        self._search: dict[int, tuple] = {}
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._load()
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.directory / "meta.json"
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.directory / "vectors.f32"
+
+    @property
+    def _keys_path(self) -> Path:
+        return self.directory / "keys.tsv"
+
+    def _meta(self) -> dict:
+        return {"version": FINGERPRINT_VERSION, "notes": list(self.notes), "dim": DIM}
+
+    def _load(self) -> None:
+        try:
+            meta = json.loads(self._meta_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            meta = None
+        if meta != self._meta():
+            # another analyzer version or note set: start over
+            self._vectors_path.unlink(missing_ok=True)
+            self._keys_path.unlink(missing_ok=True)
+            self._meta_path.write_text(json.dumps(self._meta()))
+            return
+        try:
+            raw = self._vectors_path.read_bytes()
+            lines = self._keys_path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            raw, lines = b"", []
+        row_bytes = self.width * 4
+        entries = [line.split("\t", 1) for line in lines]
+        entries = [e for e in entries if len(e) == 2]
+        n = min(len(raw) // row_bytes, len(entries))
+        matrix = np.frombuffer(raw[:n * row_bytes], dtype=np.float32).reshape(n, self.width)
+        for key, name in entries[:n]:
+            self._positions.setdefault(key, len(self.keys))
+            self.keys.append(key)
+            self.names.append(name)
+        self._matrix = matrix.copy()
+        if n * row_bytes != len(raw) or n != len(lines):
+            # drop a torn row left by an interrupted run so appends line up again
+            self._vectors_path.write_bytes(raw[:n * row_bytes])
+            self._keys_path.write_text("".join(f"{k}\t{v}\n" for k, v in entries[:n]),
+                                       encoding="utf-8")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._positions
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """All fingerprints, one row of ``len(notes) * DIM`` per program."""
+        if self._chunks:
+            self._matrix = np.concatenate([self._matrix, *self._chunks])
+            self._chunks = []
+        return self._matrix
+
+    def add(self, key: str, name: str, vectors: np.ndarray) -> None:
+        """Store the (len(notes), DIM) fingerprint of program *key*."""
+        row = np.asarray(vectors, dtype=np.float32).reshape(1, self.width)
+        name = " ".join(str(name).split())
+        if self.directory is not None:
+            with open(self._vectors_path, "ab") as f:
+                f.write(row.tobytes())
+            with open(self._keys_path, "a", encoding="utf-8") as f:
+                f.write(f"{key}\t{name}\n")
+        self._positions.setdefault(key, len(self.keys))
+        self.keys.append(key)
+        self.names.append(name)
+        self._chunks.append(row)
+
+    def _block(self, note_index: int) -> tuple:
+        """(standardized rows, mean, scale, inverted file or None) for one note, cached."""
+        cached = self._search.get(note_index)
+        if cached is not None and cached[0].shape[0] == len(self):
+            return cached
+        x = self.matrix[:, note_index * DIM:(note_index + 1) * DIM]
+        mean = x.mean(axis=0)
+        scale = x.std(axis=0)
+        scale[scale < 1e-6] = 1.0
+        z = (x - mean) / scale
+        ivf = _InvertedFile(z) if len(z) >= IVF_MIN_SIZE else None
+        self._search[note_index] = (z, mean, scale, ivf)
+        return self._search[note_index]
+
+    def query(self, vector: np.ndarray, note_index: int | None = None, k: int = 5,
+              nprobe: int = NPROBE) -> list[Neighbour]:
+        """The *k* programs whose fingerprint at ``notes[note_index]`` is closest to *vector*."""
+        if not len(self):
+            return []
+        note_index = len(self.notes) // 2 if note_index is None else note_index
+        z, mean, scale, ivf = self._block(note_index)
+        q = (np.asarray(vector, dtype=np.float32).ravel() - mean) / scale
+        rows = ivf.candidates(q, k, nprobe) if ivf is not None else np.arange(len(z))
+        dist = np.sqrt(np.maximum(_sq_distances(q[None, :], z[rows])[0], 0.0))
+        best = np.argsort(dist)[:k]
+        return [Neighbour(self.keys[rows[i]], self.names[rows[i]], float(dist[i]))
+                for i in best]
+
+    def query_take(self, samples: np.ndarray, sample_rate: int, k: int = 5) -> list[Neighbour]:
+        """Nearest programs to a reference take, compared at its closest indexed note."""
+        features = extract_batch([samples], sample_rate)[0]
+        note_index = nearest_note(features.fundamental_hz, self.notes)
+        return self.query(_vector(features), note_index, k)
+
+
+# -- batch indexing --
+
+Render = Callable[[bytes], list[tuple[np.ndarray, int]]]
+
+
+class DeviceProgramRenderer:
+    """Sends a program to the synth and auditions each of *notes*."""
+
+    def __init__(self, device, auditioner, notes: tuple[int, ...] = NOTES,
+                 velocity: int = 100, duration_s: float = 0.5,
+                 max_release_s: float = 1.0, settle_s: float = 0.05, channel: int = 1,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        self._device = device
+        self._auditioner = auditioner
+        self.notes = tuple(notes)
+        self.velocity = velocity
+        self.duration_s = duration_s
+        self.max_release_s = max_release_s
+        self.settle_s = settle_s
+        self._channel = channel
+        self._sleep = sleep
+
+    def __call__(self, program: bytes) -> list[tuple[np.ndarray, int]]:
+        from midi.sysex import build_program_write
+        self._device.send(build_program_write(channel=self._channel, data=program))
+        self._sleep(self.settle_s)
+        takes = []
+        for note in self.notes:
+            take = self._auditioner.play(note, self.velocity, self.duration_s,
+                                         max_release_s=self.max_release_s)
+            takes.append((take.samples, take.sample_rate))
+        return takes
+
+
+def surrogate_renderer(notes: tuple[int, ...] = NOTES, velocity: int = 100,
+                       duration_s: float = 0.5) -> Render:
+    """Offline stand-in for ``DeviceProgramRenderer`` using ``audio.surrogate``."""
+    from audio.surrogate import SAMPLE_RATE, render, values_from_program
+
+    def render_program(program: bytes) -> list[tuple[np.ndarray, int]]:
+        values = values_from_program(program)
+        return [(render(values, note=note, velocity=velocity, duration_s=duration_s),
+                 SAMPLE_RATE) for note in notes]
+    return render_program
+
+
+def index_programs(
+    index: FingerprintIndex,
+    patches,
+    render: Render,
+    on_progress: Callable[[int, int, str], None] | None = None,
+    should_stop: Callable[[], bool] | None = None,
+) -> tuple[int, int]:
+    """Fingerprint every patch in *patches* that is not in *index* yet.
+
+    *render* turns packed program data into one take per ``index.notes``.
+    Each program is stored as soon as it is analyzed, so stopping early
+    keeps the work done so far.  Returns (indexed, already_indexed).
+    """
+    from midi.layout import content_hash
+    patches = [p for p in patches if p.sysex_data is not None]
+    todo = []
+    seen: set[str] = set()
+    for patch in patches:
+        key = content_hash(patch.sysex_data)
+        if key not in index and key not in seen:
+            seen.add(key)
+            todo.append((key, patch))
+    skipped = len(patches) - len(todo)
+    indexed = 0
+    for i, (key, patch) in enumerate(todo):
+        if should_stop is not None and should_stop():
+            break
+        index.add(key, patch.name, fingerprint(render(patch.sysex_data)))
+        indexed += 1
+        if on_progress is not None:
+            on_progress(i + 1, len(todo), patch.name)
+    return indexed, skipped
@@ -0,0 +1,177 @@
+"""Level and spectrum metering for the live monitor.
+
+The audio callback only copies each block into a ``BlockRing``: a
+preallocated single-producer/single-consumer ring whose write position is
+published after the copy, so the callback never takes a lock or allocates
+an array.  ``LevelMeter`` runs an analysis thread at display rate that
+reads the frames written since its last pass and publishes a ``Levels``
+snapshot: peak and RMS with a decaying peak hold, and a log-frequency
+spectrum smoothed with a fast rise and a slow fall.  The UI polls
+``LevelMeter.levels``; replacing the snapshot is atomic, so it needs no
+lock either.
+"""
+from __future__ import annotations
+import threading
+from dataclasses import dataclass
+import numpy as np
+
+FLOOR_DB = -90.0
+RATE_HZ = 30.0             # analysis passes per second
+N_FFT = 2048
+N_BANDS = 48
+LOW_HZ = 30.0
+PEAK_HOLD_S = 1.0          # the held peak stays this long, then falls
+FALL_DB_PER_S = 24.0       # release rate of the peak hold and the spectrum
+
+
+def _db(power: np.ndarray | float) -> np.ndarray | float:
+    return np.maximum(10.0 * np.log10(np.maximum(power, 1e-12)), FLOOR_DB)
+
+
+class BlockRing:
+    """Lock-free ring for one writer (the audio callback) and one reader.
+
+    ``write`` copies into preallocated storage and then advances
+    ``written``; a reader that falls more than ``capacity`` frames behind
+    simply loses the oldest frames.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self.written = 0
+
+    def write(self, block: np.ndarray) -> None:
+        """Append *block* (frames, or frames x channels; channel 0 is kept)."""
+        if block.ndim > 1:
+            block = block[:, 0]
+        n = min(len(block), self.capacity)
+        block = block[len(block) - n:]
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = block[:first]
+        if n > first:
+            self._data[:n - first] = block[first:]
+        self.written += len(block)
+
+    def read_into(self, end: int, out: np.ndarray) -> None:
+        """Fill *out* with the frames just before absolute frame *end*."""
+        n = len(out)
+        start = (end - n) % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self._data[start:start + first]
+        out[first:] = self._data[:n - first]
+
+
+@dataclass(frozen=True)
+class Levels:
+    peak_db: float
+    rms_db: float
+    hold_db: float              # decaying peak hold
+    spectrum_db: np.ndarray     # band power, dB re a full-scale sine
+    band_hz: np.ndarray         # band centre frequencies
+    clipped: bool = False
+
+
+def silent_levels(band_hz: np.ndarray) -> Levels:
+    return Levels(FLOOR_DB, FLOOR_DB, FLOOR_DB,
+                  np.full(len(band_hz), FLOOR_DB), band_hz)
+
+
+class LevelMeter:
+    """Meters the blocks pushed from an audio callback; see module docstring."""
+
+    def __init__(self, sample_rate: int = 44100, rate_hz: float = RATE_HZ,
+                 n_fft: int = N_FFT, n_bands: int = N_BANDS) -> None:
+        self.rate_hz = rate_hz
+        self._n_fft = n_fft
+        self._n_bands = n_bands
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.reset(sample_rate)
+
+    def reset(self, sample_rate: int) -> None:
+        """Clear all state and prepare for a stream at *sample_rate*."""
+        self.sample_rate = sample_rate
+        # a second of audio: the analysis thread can stall that long without losing frames
+        self.ring = BlockRing(max(int(sample_rate), 2 * self._n_fft))
+        self._window = np.hanning(self._n_fft).astype(np.float32)
+        self._frame = np.zeros(self._n_fft, dtype=np.float32)
+        self._scratch = np.zeros(self.ring.capacity, dtype=np.float32)
+        # log-spaced bands over the FFT bins; narrow low bands may share a bin
+        bin_hz = sample_rate / self._n_fft
+        n_bins = self._n_fft // 2 + 1
+        edges = np.round(np.geomspace(LOW_HZ, sample_rate / 2, self._n_bands + 1) / bin_hz)
+        self._lo = np.clip(edges[:-1].astype(int), 1, n_bins - 1)
+        self._hi = np.clip(np.maximum(edges[1:].astype(int), self._lo + 1), 1, n_bins)
+        self._band_hz = (self._lo + self._hi) / 2 * bin_hz
+        # one-sided power per bin, scaled so a full-scale sine sums to 0 dB
+        self._scale = 4.0 / (self._n_fft * float(np.dot(self._window, self._window)))
+        self._read = 0
+        self._hold_db = FLOOR_DB
+        self._hold_age = 0.0
+        self._spectrum_db = np.full(self._n_bands, FLOOR_DB)
+        self.levels = silent_levels(self._band_hz)
+
+    def push(self, block: np.ndarray) -> None:
+        """Audio-callback side: copy *block* into the ring."""
+        self.ring.write(block)
+
+    def analyze(self, dt: float | None = None) -> Levels:
+        """Analyse the frames pushed since the last pass and publish ``levels``."""
+        dt = 1.0 / self.rate_hz if dt is None else dt
+        written = self.ring.written
+        new = min(written - self._read, self.ring.capacity)
+        self._read = written
+        fall = FALL_DB_PER_S * dt
+        if new > 0:
+            recent = self._scratch[:new]
+            self.ring.read_into(written, recent)
+            peak = float(np.abs(recent).max())
+            peak_db = float(_db(peak * peak))
+            rms_db = float(_db(np.dot(recent, recent) / new))
+        else:
+            peak, peak_db, rms_db = 0.0, FLOOR_DB, FLOOR_DB
+
+        self._hold_age += dt
+        if peak_db >= self._hold_db:
+            self._hold_db, self._hold_age = peak_db, 0.0
+        elif self._hold_age > PEAK_HOLD_S:
+            self._hold_db = max(FLOOR_DB, self._hold_db - fall)
+
+        self.ring.read_into(written, self._frame)
+        np.multiply(self._frame, self._window, out=self._frame)
+        power = np.abs(np.fft.rfft(self._frame)) ** 2 * self._scale
+        total = np.concatenate(([0.0], np.cumsum(power)))
+        fresh = _db(total[self._hi] - total[self._lo])
+        self._spectrum_db = np.maximum(fresh, self._spectrum_db - fall)
+
+        self.levels = Levels(peak_db, rms_db, self._hold_db, self._spectrum_db.copy(),
+                             self._band_hz, clipped=peak >= 1.0)
+        return self.levels
+
+    # -- analysis thread --
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="level-meter", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.levels = silent_levels(self._band_hz)
+
+    def _run(self) -> None:
+        period = 1.0 / self.rate_hz
+        while not self._stop.wait(period):
+            self.analyze(period)
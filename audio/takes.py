@@ -0,0 +1,116 @@
+"""In-memory registry of recorded takes.
+
+Takes are kept as float32 arrays under short IDs (``take-1``,
+``take-2`` ...) so the audio tools can pass them between recording,
+analysis and comparison without writing WAV files.  The registry is
+bounded by total sample bytes; the least recently used takes are dropped
+first.  A take is only written to disk when ``save`` is asked to; its
+analysis is kept on the take too, so repeated comparisons of the same
+take neither re-analyze it nor touch the disk feature cache.
+"""
+from __future__ import annotations
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+_TAKE_ID = re.compile(r"^take-\d+$")
+
+
+@dataclass
+class StoredTake:
+    samples: np.ndarray         # float32, mono
+    sample_rate: int
+    label: str = ""
+    features: object | None = None   # audio.features.Features, filled on first use
+
+    @property
+    def duration_s(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+
+def is_take_id(ref: str) -> bool:
+    return bool(_TAKE_ID.match(str(ref).strip()))
+
+
+class TakeRegistry:
+    """Thread-safe, size-bounded LRU of takes; see module docstring."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._takes: OrderedDict[str, StoredTake] = OrderedDict()
+        self._bytes = 0
+        self._next = 1
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._takes)
+
+    def __contains__(self, take_id: str) -> bool:
+        return take_id in self._takes
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def add(self, samples: np.ndarray, sample_rate: int, label: str = "") -> str:
+        """Store *samples* and return the new take ID."""
+        samples = np.ascontiguousarray(samples, dtype=np.float32).ravel()
+        samples.flags.writeable = False
+        with self._lock:
+            take_id = f"take-{self._next}"
+            self._next += 1
+            self._takes[take_id] = StoredTake(samples, int(sample_rate), label)
+            self._bytes += samples.nbytes
+            # the newest take is always kept, even if it alone exceeds the budget
+            while self._bytes > self.max_bytes and len(self._takes) > 1:
+                _, old = self._takes.popitem(last=False)
+                self._bytes -= old.samples.nbytes
+        return take_id
+
+    def get(self, take_id: str) -> StoredTake:
+        """The take stored under *take_id*; KeyError if unknown or evicted."""
+        with self._lock:
+            take = self._takes.get(take_id.strip())
+            if take is None:
+                raise KeyError(f"Unknown take {take_id!r} (it may have been evicted)")
+            self._takes.move_to_end(take_id.strip())
+            return take
+
+    def features(self, take_id: str):
+        """``audio.features`` analysis of a take, computed once and kept in memory."""
+        take = self.get(take_id)
+        if take.features is None:
+            from audio.features import extract
+            take.features = extract(take.samples, take.sample_rate)
+        return take.features
+
+    def remove(self, take_id: str) -> None:
+        with self._lock:
+            take = self._takes.pop(take_id, None)
+            if take is not None:
+                self._bytes -= take.samples.nbytes
+
+    def ids(self) -> list[str]:
+        with self._lock:
+            return list(self._takes)
+
+    def save(self, take_id: str, path: Path) -> Path:
+        """Write the take to a 16-bit WAV at *path*."""
+        from scipy.io import wavfile
+        take = self.get(take_id)
+        path = Path(path)
+        wavfile.write(str(path), take.sample_rate,
+                      np.int16(np.clip(take.samples, -1.0, 1.0) * 32767))
+        return path
+
+    def load(self, ref: str) -> tuple[np.ndarray, int]:
+        """(samples, sample_rate) for a take ID or a WAV file path."""
+        if is_take_id(ref):
+            take = self.get(ref)
+            return take.samples, take.sample_rate
+        from audio.engine import AudioRecorder
+        return AudioRecorder.load_wav(Path(ref))
@@ -0,0 +1,472 @@
+"""Headless command line interface for device and library operations.
+
+Usage:
+    patchmasta ports
+    patchmasta pull (--slot N | --range A-B | --all) [--port NAME] [--library DIR]
+    patchmasta push BANK.json [--port NAME] [--library DIR] [--no-store | --verify]
+    patchmasta convert INPUT [-o OUTPUT]
+    patchmasta convert DIR -o OUTPUT_DIR [--jobs N]
+    patchmasta diff A B
+    patchmasta import PATH... [--library DIR] [--jobs N]
+    patchmasta search QUERY [--library DIR]
+    patchmasta generate COUNT [--from PROGRAM] [--rate R] [--seed N] [--library DIR]
+    patchmasta transform --step STEP... [--query QUERY] [--apply] [--library DIR]
+    patchmasta index-audio PATH... [--jobs N]
+    patchmasta fingerprint [--port NAME] [--input DEVICE] [--offline] [--library DIR]
+    patchmasta similar WAV [-k N] [--offline] [--library DIR]
+
+Nothing here imports PyQt6; modules are imported inside each subcommand so
+that startup stays fast on headless machines (cron backups, CI, etc.).
+"""
+
+from __future__ import annotations
+import argparse
+import sys
+from pathlib import Path
+
+APP_ROOT = Path(__file__).parent
+
+class CliError(Exception):
+    """Raised for user-facing errors; printed without a traceback."""
+
+
+# -- helpers --
+
+def _parse_range(text: str) -> list[int]:
+    """Parse a 1-based inclusive range like ``"1-16"`` into 0-based slots."""
+    from midi.sysex import NUM_PROGRAMS
+    try:
+        first, _, last = text.partition("-")
+        start = int(first)
+        end = int(last) if last else start
+    except ValueError:
+        raise CliError(f"Invalid range {text!r} (expected e.g. 1-16)")
+    if not (1 <= start <= end <= NUM_PROGRAMS):
+        raise CliError(f"Range must be within 1-{NUM_PROGRAMS}, got {text!r}")
+    return list(range(start - 1, end))
+
+
+def _open_device(port: str | None, logger):
+    from midi.device import MidiDevice, list_midi_ports, find_rk100s2_port
+    ports = list_midi_ports()
+    if port is None:
+        index = find_rk100s2_port(ports)
+    else:
+        index = next((i for i, name in enumerate(ports) if port in name), None)
+    if index is None:
+        raise CliError(f"No MIDI port found matching {port or 'RK-100S'!r}")
+    device = MidiDevice(logger=logger)
+    try:
+        device.connect(index, ports[index])
+    except RuntimeError as exc:
+        raise CliError(str(exc))
+    return device
+
+
+def load_program(path: Path) -> bytes:
+    """Load packed SysEx program data from a .rk100s2_prog, .syx or patch .json."""
+    suffix = path.suffix.lower()
+    if suffix == ".rk100s2_prog":
+        from tools.file_format import read_patch, prog_file_to_sysex
+        return prog_file_to_sysex(read_patch(path))
+    if suffix == ".json":
+        from model.patch import Patch
+        data = Patch.load(path).sysex_data
+        if data is None:
+            raise CliError(f"{path} has no SysEx data")
+        return data
+    from tools.sysex_diff import load_syx
+    return load_syx(path)
+
+
+# -- subcommands --
+
+def cmd_ports(args, logger) -> int:
+    from midi.device import list_midi_ports, find_rk100s2_port
+    ports = list_midi_ports()
+    default = find_rk100s2_port(ports)
+    for i, name in enumerate(ports):
+        print(f"{'*' if i == default else ' '} {i}: {name}")
+    return 0
+
+
+def cmd_pull(args, logger) -> int:
+    from midi.sysex import NUM_PROGRAMS
+    from midi.transfer import pull_slots
+    from model.library import Library
+
+    if args.all:
+        slots = list(range(NUM_PROGRAMS))
+    elif args.range:
+        slots = _parse_range(args.range)
+    else:
+        slots = _parse_range(str(args.slot))
+    library = Library(root=args.library)
+    device = _open_device(args.port, logger)
+    missing: list[int] = []
+
+    def on_patch(slot, patch):
+        if patch is None:
+            missing.append(slot)
+            print(f"Slot {slot + 1:03d}: no reply", file=sys.stderr)
+            return
+        path = library.save_patch(patch)
+        print(f"Slot {slot + 1:03d}: {patch.name} -> {path}")
+
+    try:
+        pull_slots(device, slots, timeout=args.timeout, logger=logger,
+                   on_patch=on_patch)
+    finally:
+        device.disconnect()
+    print(f"Pulled {len(slots) - len(missing)} of {len(slots)} programs")
+    return 1 if missing else 0
+
+
+def cmd_push(args, logger) -> int:
+    from model.bank import Bank
+    from model.patch import Patch
+    from midi.transfer import WritePacer, push_bank
+
+    if args.verify and not args.store:
+        raise CliError("--verify reads back the stored slots; it cannot be used with --no-store")
+    bank = Bank.load(args.bank)
+    entries = []
+    for slot, patch_file in bank.ordered_slots():
+        path = args.library / patch_file
+        if not path.exists():
+            raise CliError(f"Slot {slot + 1}: patch file not found: {path}")
+        patch = Patch.load(path)
+        if patch.sysex_data is None:
+            raise CliError(f"Slot {slot + 1}: {path} has no SysEx data")
+        entries.append((slot, patch.sysex_data))
+
+    def on_result(slot, ok, reason):
+        print(f"Slot {slot + 1:03d}: {'ok' if ok else reason}",
+              file=sys.stdout if ok else sys.stderr)
+
+    # Seed from the measured round trip when verifying; --delay is the start gap otherwise
+    pacer = None if args.verify else WritePacer(gap=args.delay)
+    device = _open_device(args.port, logger)
+    try:
+        report = push_bank(device, entries, store=args.store, verify=args.verify,
+                           retries=args.retries, pacer=pacer, logger=logger,
+                           on_result=on_result)
+    finally:
+        device.disconnect()
+    print(f"Bank {bank.name!r}: {report.summary()}")
+    return 1 if report.failed else 0
+
+
+def cmd_convert(args, logger) -> int:
+    from midi.sysex import build_program_write
+    from tools.file_format import sysex_to_prog_bytes
+
+    src = args.input
+    if src.is_dir():
+        return _convert_dir(args)
+    if src.suffix.lower() == ".rk100s2_prog":
+        dest = args.output or src.with_suffix(".syx")
+        data = bytes(build_program_write(channel=args.channel, data=load_program(src)))
+    else:
+        dest = args.output or src.with_suffix(".rk100s2_prog")
+        data = sysex_to_prog_bytes(load_program(src))
+    dest.write_bytes(data)
+    print(f"{src} -> {dest}")
+    return 0
+
+
+def _convert_dir(args) -> int:
+    from tools.file_format import convert_tree
+    if args.output is None:
+        raise CliError("converting a directory needs -o OUTPUT_DIR")
+    converted, failures = convert_tree(args.input, args.output,
+                                       channel=args.channel, workers=args.jobs)
+    for path, error in failures:
+        print(f"{path}: {error}", file=sys.stderr)
+    print(f"Converted {converted} files into {args.output}")
+    return 1 if failures else 0
+
+
+def cmd_diff(args, logger) -> int:
+    from tools.file_format import FILE_HEADER_SIZE, sysex_to_prog_bytes
+    from tools.patch_diff import diff_patches
+
+    a = sysex_to_prog_bytes(load_program(args.a))[FILE_HEADER_SIZE:]
+    b = sysex_to_prog_bytes(load_program(args.b))[FILE_HEADER_SIZE:]
+    diffs = diff_patches(a, b, f"{args.a.name} → {args.b.name}")
+    return 1 if diffs else 0
+
+
+def cmd_import(args, logger) -> int:
+    from model.importer import import_paths
+    from model.library import Library
+
+    library = Library(root=args.library)
+    result = import_paths(library, args.paths, workers=args.jobs)
+    for source, error in result.failed:
+        print(f"{source}: {error}", file=sys.stderr)
+    for path in result.paths:
+        print(path)
+    print(f"Imported {result.imported} patches ({len(result.failed)} files failed)")
+    return 1 if result.failed else 0
+
+
+def cmd_search(args, logger) -> int:
+    from model.library import Library
+    from model.search import PatchIndex, QueryError
+
+    patches = Library(root=args.library).list_patches()
+    index = PatchIndex()
+    index.sync(patches)
+    try:
+        matches = set(index.search(args.query))
+    except QueryError as exc:
+        raise CliError(str(exc))
+    for patch in patches:
+        if patch.source_path in matches:
+            print(f"{patch.name}\t{patch.source_path}")
+    return 0 if matches else 1
+
+
+def cmd_generate(args, logger) -> int:
+    from midi.generator import PatchGenerator
+    from midi.sysex import extract_patch_name
+    from model.library import Library
+    from model.patch import Patch
+
+    base = load_program(args.source) if args.source else None
+    generator = PatchGenerator(base=base, seed=args.seed)
+    if base is None:
+        stack = generator.random(args.count)
+        stem = "Random"
+    else:
+        stack = generator.mutate(base, n=args.count, rate=args.rate, amount=args.amount)
+        stem = extract_patch_name(base) or args.source.stem
+    patches = [Patch(name=f"{stem} {i + 1:04d}", program_number=0, sysex_data=data)
+               for i, data in enumerate(generator.to_bytes(stack))]
+    paths = Library(root=args.library).save_patches(patches)
+    print(f"Generated {len(paths)} patches")
+    return 0
+
+
+def cmd_transform(args, logger) -> int:
+    from model.library import Library
+    from model.search import PatchIndex, QueryError
+    from model.transforms import Pipeline, TransformError, parse_step, transform_library
+
+    try:
+        pipeline = Pipeline([parse_step(step) for step in args.step])
+    except TransformError as exc:
+        raise CliError(str(exc))
+    library = Library(root=args.library)
+    patches = library.list_patches()
+    if args.query:
+        index = PatchIndex()
+        index.sync(patches)
+        try:
+            matches = set(index.search(args.query))
+        except QueryError as exc:
+            raise CliError(str(exc))
+        patches = [p for p in patches if p.source_path in matches]
+    result = transform_library(library, patches, pipeline, apply=args.apply)
+    for patch, diff in result.diffs:
+        changes = ", ".join(f"{name} {old}->{new}" for name, old, new in diff.params)
+        print(f"{patch.name}\t{changes or f'{diff.bytes_changed} bytes'}")
+    if args.apply:
+        print(f"Updated {result.written} of {len(patches)} patches")
+    else:
+        print(f"{len(result.diffs)} of {len(patches)} patches would change (dry run; "
+              "use --apply to write)")
+    return 0
+
+
+def cmd_index_audio(args, logger) -> int:
+    from audio.feature_cache import index_paths, shared_cache
+
+    cache = shared_cache()
+    indexed, failures = index_paths(cache, args.paths, workers=args.jobs)
+    for path, error in failures:
+        print(f"{path}: {error}", file=sys.stderr)
+    print(f"Indexed {indexed} WAV files into {cache.directory}")
+    return 1 if failures else 0
+
+
+def _fingerprint_index(offline: bool):
+    from audio.fingerprint import FINGERPRINT_DIR, OFFLINE_FINGERPRINT_DIR, FingerprintIndex
+    return FingerprintIndex(OFFLINE_FINGERPRINT_DIR if offline else FINGERPRINT_DIR)
+
+
+def cmd_fingerprint(args, logger) -> int:
+    from audio.fingerprint import DeviceProgramRenderer, index_programs, surrogate_renderer
+    from model.library import Library
+
+    index = _fingerprint_index(args.offline)
+    patches = Library(root=args.library).list_patches()
+
+    def on_progress(done, total, name):
+        print(f"[{done}/{total}] {name}")
+
+    if args.offline:
+        indexed, skipped = index_programs(index, patches, surrogate_renderer(),
+                                          on_progress=on_progress)
+    else:
+        from audio.audition import Auditioner, AuditionTimeout
+        device = _open_device(args.port, logger)
+        try:
+            with Auditioner(device, input_device=args.input) as auditioner:
+                auditioner.calibrate()
+                indexed, skipped = index_programs(
+                    index, patches, DeviceProgramRenderer(device, auditioner),
+                    on_progress=on_progress)
+        except AuditionTimeout as exc:
+            raise CliError(f"{exc} (programs fingerprinted so far are kept)")
+        finally:
+            device.disconnect()
+    print(f"Fingerprinted {indexed} programs ({skipped} already indexed) "
+          f"into {index.directory}")
+    return 0
+
+
+def cmd_similar(args, logger) -> int:
+    from audio.engine import AudioRecorder
+    from model.library import Library
+
+    index = _fingerprint_index(args.offline)
+    if not len(index):
+        raise CliError(f"No fingerprints in {index.directory}; run fingerprint first")
+    samples, sr = AudioRecorder.load_wav(args.wav)
+    library = Library(root=args.library)
+    for match in index.query_take(samples, sr, k=args.k):
+        path = library.find_key(match.key)
+        print(f"{match.distance:.3f}\t{match.name}\t{path or '(not in library)'}")
+    return 0
+
+
+# -- entry point --
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="patchmasta",
+        description="Korg RK-100S 2 patch manager. Run without arguments for the GUI.",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="echo MIDI/debug log lines to stdout")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ports", help="list MIDI output ports")
+    p.set_defaults(func=cmd_ports)
+
+    p = sub.add_parser("pull", help="pull programs from the device into the library")
+    which = p.add_mutually_exclusive_group(required=True)
+    which.add_argument("--slot", type=int, help="single slot (1-200)")
+    which.add_argument("--range", help="inclusive slot range, e.g. 1-16")
+    which.add_argument("--all", action="store_true", help="all 200 slots")
+    p.add_argument("--port", help="MIDI port name substring (default: auto-detect)")
+    p.add_argument("--library", type=Path, default=APP_ROOT, help="library root")
+    p.add_argument("--timeout", type=float, default=2.0, help="seconds to wait per slot")
+    p.set_defaults(func=cmd_pull)
+
+    p = sub.add_parser("push", help="write a bank's programs to the device")
+    p.add_argument("bank", type=Path, help="bank JSON file")
+    p.add_argument("--port", help="MIDI port name substring (default: auto-detect)")
+    p.add_argument("--library", type=Path, default=APP_ROOT,
+                   help="library root that bank patch paths are relative to")
+    p.add_argument("--store", action=argparse.BooleanOptionalAction, default=True,
+                   help="send a program write request so each slot is stored; "
+                        "--no-store only loads the edit buffer, for auditioning")
+    p.add_argument("--verify", action="store_true",
+                   help="read each slot back and compare; pacing adapts to the device")
+    p.add_argument("--retries", type=int, default=2, help="retries per slot when verifying")
+    p.add_argument("--delay", type=float, default=0.1,
+                   help="seconds between programs when not verifying")
+    p.set_defaults(func=cmd_push)
+
+    p = sub.add_parser("convert", help="convert between .rk100s2_prog and .syx")
+    p.add_argument("input", type=Path, help="file, or directory tree to convert")
+    p.add_argument("-o", "--output", type=Path)
+    p.add_argument("-j", "--jobs", type=int, help="worker processes for directories "
+                   "(default: CPU count)")
+    p.add_argument("--channel", type=int, default=1, help="MIDI channel for .syx output")
+    p.set_defaults(func=cmd_convert)
+
+    p = sub.add_parser("diff", help="section-aware diff of two programs")
+    p.add_argument("a", type=Path)
+    p.add_argument("b", type=Path)
+    p.set_defaults(func=cmd_diff)
+
+    p = sub.add_parser("import", help="import .rk100s2_prog/.syx files and .zip archives "
+                       "into the library")
+    p.add_argument("paths", type=Path, nargs="+", help="files, directories or zip archives")
+    p.add_argument("--library", type=Path, default=APP_ROOT, help="library root")
+    p.add_argument("-j", "--jobs", type=int, help="worker processes (default: CPU count)")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("search", help="search library patches by text and parameter values",
+                       description="e.g. 't1_osc1_wave=Saw AND t1_filter1_cutoff>90 category:pad'")
+    p.add_argument("query")
+    p.add_argument("--library", type=Path, default=APP_ROOT, help="library root")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("generate", help="add random programs, or mutations of one, "
+                       "to the library")
+    p.add_argument("count", type=int)
+    p.add_argument("--from", dest="source", type=Path,
+                   help="program to mutate (default: fully random programs)")
+    p.add_argument("--rate", type=float, default=0.1,
+                   help="probability that each parameter is mutated")
+    p.add_argument("--amount", type=float, default=0.1,
+                   help="mutation size as a fraction of each parameter's range")
+    p.add_argument("--seed", type=int)
+    p.add_argument("--library", type=Path, default=APP_ROOT, help="library root")
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser("transform", help="apply section-level edits to many library patches "
+                       "(dry run unless --apply)")
+    p.add_argument("--step", action="append", required=True,
+                   help='e.g. "copy Timbre1 Timbre2", "swap-fx", "set fx2_type=Delay", '
+                        '"set fx2.dry_wet=40", "normalize t1_amp_level,t2_amp_level 100"; '
+                        "repeat to chain")
+    p.add_argument("--query", help="only patches matching this search query")
+    p.add_argument("--apply", action="store_true", help="write the changes back")
+    p.add_argument("--library", type=Path, default=APP_ROOT, help="library root")
+    p.set_defaults(func=cmd_transform)
+
+    p = sub.add_parser("index-audio", help="pre-compute audio features for reference WAVs")
+    p.add_argument("paths", type=Path, nargs="+", help="WAV files or directories")
+    p.add_argument("-j", "--jobs", type=int, help="worker processes (default: CPU count)")
+    p.set_defaults(func=cmd_index_audio)
+
+    p = sub.add_parser("fingerprint",
+                       help="audition library programs into the similar-sound index")
+    p.add_argument("--port", help="MIDI port name substring (default: auto-detect)")
+    p.add_argument("--input", help="audio input device (default: system input)")
+    p.add_argument("--offline", action="store_true",
+                   help="render with the built-in approximation instead of the synth")
+    p.add_argument("--library", type=Path, default=APP_ROOT, help="library root")
+    p.set_defaults(func=cmd_fingerprint)
+
+    p = sub.add_parser("similar", help="library programs that sound closest to a WAV")
+    p.add_argument("wav", type=Path, help="reference WAV")
+    p.add_argument("-k", type=int, default=5, help="number of matches (default: 5)")
+    p.add_argument("--offline", action="store_true", help="query the offline index")
+    p.add_argument("--library", type=Path, default=APP_ROOT, help="library root")
+    p.set_defaults(func=cmd_similar)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    from core.logger import AppLogger
+    logger = AppLogger(echo=args.verbose)
+    try:
+        return args.func(args, logger)
+    except CliError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    except (FileNotFoundError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -35,10 +35,14 @@ _DEFAULTS = {
     "ai_backend": "claude",
     "claude_api_key": "",
     "groq_api_key": "",
+    "ai_context_tokens": 8000,
     "audio_input_device": None,
     "midi_port": None,
     "theme": "auto",
     "sysex_write_debounce_ms": 150,
+    "device_poll_interval_ms": 2000,
+    "shadow_trust_minutes": 30,
+    "shadow_spot_check": 0.1,
 }
 
 class AppConfig:
@@ -47,10 +51,14 @@ class AppConfig:
         self.ai_backend: str = _DEFAULTS["ai_backend"]
         self.claude_api_key: str = _DEFAULTS["claude_api_key"]
         self.groq_api_key: str = _DEFAULTS["groq_api_key"]
+        self.ai_context_tokens: int = _DEFAULTS["ai_context_tokens"]
         self.audio_input_device: str | None = _DEFAULTS["audio_input_device"]
         self.midi_port: str | None = _DEFAULTS["midi_port"]
         self.theme: str = _DEFAULTS["theme"]
         self.sysex_write_debounce_ms: int = _DEFAULTS["sysex_write_debounce_ms"]
+        self.device_poll_interval_ms: int = _DEFAULTS["device_poll_interval_ms"]
+        self.shadow_trust_minutes: float = _DEFAULTS["shadow_trust_minutes"]
+        self.shadow_spot_check: float = _DEFAULTS["shadow_spot_check"]
         self._load()
 
     def _load(self) -> None:
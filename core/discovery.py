@@ -0,0 +1,124 @@
+from __future__ import annotations
+import threading
+from typing import Callable
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class DeviceDiscovery(QObject):
+    """Enumerates MIDI ports and audio input devices on a background thread.
+
+    ALSA/CoreMIDI port listing and PortAudio host-API queries can take
+    hundreds of milliseconds, so they never run on the UI thread.  Results
+    are cached and only emitted when they differ from the previous poll.
+    MIDI ports are re-polled every *interval_ms* to detect hotplug; audio
+    devices are enumerated on start and on explicit ``refresh(audio=True)``
+    because re-initialising PortAudio would interrupt running streams.
+    """
+
+    midi_ports_changed = pyqtSignal(list)      # list[str]
+    audio_devices_changed = pyqtSignal(list)   # list[tuple[int, str]]
+    midi_port_appeared = pyqtSignal(str)       # port name
+    midi_port_disappeared = pyqtSignal(str)    # port name
+
+    def __init__(
+        self,
+        list_midi: Callable[[], list[str]] | None = None,
+        list_audio: Callable[[], list[tuple[int, str]]] | None = None,
+        interval_ms: int = 2000,
+        parent: QObject | None = None,
+    ) -> None:
+        super().__init__(parent)
+        if list_midi is None:
+            from midi.device import list_midi_ports as list_midi
+        if list_audio is None:
+            from audio.engine import list_audio_input_devices as list_audio
+        self._list_midi = list_midi
+        self._list_audio = list_audio
+        self._interval_s = interval_ms / 1000.0
+        self._lock = threading.Lock()
+        self._midi_ports: list[str] | None = None
+        self._audio_devices: list[tuple[int, str]] | None = None
+        self._audio_requested = True
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # -- cached results --
+
+    @property
+    def midi_ports(self) -> list[str] | None:
+        """Last enumerated MIDI output ports, or None before the first poll."""
+        with self._lock:
+            return list(self._midi_ports) if self._midi_ports is not None else None
+
+    @property
+    def audio_devices(self) -> list[tuple[int, str]] | None:
+        """Last enumerated audio input devices, or None before the first poll."""
+        with self._lock:
+            return list(self._audio_devices) if self._audio_devices is not None else None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # -- lifecycle --
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._interval_s + 1.0)
+            self._thread = None
+
+    def refresh(self, audio: bool = False) -> None:
+        """Poll immediately instead of waiting for the next interval."""
+        if audio:
+            self._audio_requested = True
+        self._wake.set()
+
+    # -- polling --
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.poll()
+            self._wake.wait(self._interval_s)
+            self._wake.clear()
+
+    def poll(self) -> None:
+        """Enumerate once and emit change signals.  Runs on the worker thread."""
+        try:
+            ports = list(self._list_midi())
+        except Exception:
+            ports = []
+        with self._lock:
+            previous = self._midi_ports
+            self._midi_ports = ports
+        if ports != previous:
+            old = set(previous or [])
+            new = set(ports)
+            self.midi_ports_changed.emit(list(ports))
+            for name in ports:
+                if name not in old:
+                    self.midi_port_appeared.emit(name)
+            for name in previous or []:
+                if name not in new:
+                    self.midi_port_disappeared.emit(name)
+
+        if self._audio_requested:
+            self._audio_requested = False
+            try:
+                devices = list(self._list_audio())
+            except Exception:
+                devices = []
+            with self._lock:
+                previous_audio = self._audio_devices
+                self._audio_devices = devices
+            if devices != previous_audio:
+                self.audio_devices_changed.emit(list(devices))
@@ -1,12 +1,22 @@
 from __future__ import annotations
-from PyQt6.QtCore import QObject, pyqtSignal
+from core.signals import Signal
 
 
-class AppLogger(QObject):
-    message_logged = pyqtSignal(str, str)  # category, message
+class AppLogger:
+    """Category logger shared by the GUI, workers and the headless CLI.
+
+    Qt-free so scripted device/library operations do not pull in PyQt6.
+    ``message_logged`` callbacks run on the logging thread; ``LogPanel``
+    queues onto the GUI thread itself.
+    """
+
+    def __init__(self, echo: bool = True) -> None:
+        self.message_logged = Signal()  # category, message
+        self.echo = echo
 
     def log(self, category: str, message: str) -> None:
-        print(f"[{category}] {message}", flush=True)
+        if self.echo:
+            print(f"[{category}] {message}", flush=True)
         self.message_logged.emit(category, message)
 
     def midi(self, message: str) -> None:
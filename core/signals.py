@@ -0,0 +1,34 @@
+from __future__ import annotations
+import threading
+from typing import Callable
+
+
+class Signal:
+    """Minimal Qt-free signal: a thread-safe list of callbacks.
+
+    Mirrors the ``connect``/``disconnect``/``emit`` surface of ``pyqtSignal``
+    so headless code can publish events without importing PyQt6.  Callbacks
+    run synchronously on the emitting thread; Qt receivers that touch widgets
+    must marshal to the GUI thread themselves (e.g. ``QMetaObject.invokeMethod``).
+    """
+
+    def __init__(self) -> None:
+        self._slots: list[Callable] = []
+        self._lock = threading.Lock()
+
+    def connect(self, slot: Callable) -> None:
+        with self._lock:
+            self._slots.append(slot)
+
+    def disconnect(self, slot: Callable | None = None) -> None:
+        with self._lock:
+            if slot is None:
+                self._slots.clear()
+            elif slot in self._slots:
+                self._slots.remove(slot)
+
+    def emit(self, *args) -> None:
+        with self._lock:
+            slots = list(self._slots)
+        for slot in slots:
+            slot(*args)
@@ -1,13 +1,14 @@
-import signal
 import sys
-from PyQt6.QtCore import QTimer
-from PyQt6.QtWidgets import QApplication
-from core.config import AppConfig
-from core.theme import apply_theme, connect_system_theme_changed
-from ui.main_window import MainWindow
 
 
-def main():
+def run_gui():
+    import signal
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtWidgets import QApplication
+    from core.config import AppConfig
+    from core.theme import apply_theme, connect_system_theme_changed
+    from ui.main_window import MainWindow
+
     app = QApplication(sys.argv)
     app.setApplicationName("Korg RK-100S 2 Patch Manager")
 
@@ -32,5 +33,14 @@ def main():
     sys.exit(app.exec())
 
 
+def main():
+    # Subcommands run headless without importing Qt; no arguments opens the GUI.
+    argv = sys.argv[1:]
+    if argv and (argv[0] in ("-h", "--help", "-v", "--verbose") or not argv[0].startswith("-")):
+        import cli
+        sys.exit(cli.main(argv))
+    run_gui()
+
+
 if __name__ == "__main__":
     main()
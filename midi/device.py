@@ -26,13 +26,17 @@ def find_rk100s2_port(ports: list[str]) -> int | None:
 
 class MidiDevice:
     def __init__(self, logger: AppLogger | None = None) -> None:
-        self._midi_out = rtmidi.MidiOut()
-        self._midi_in = rtmidi.MidiIn()
+        # rtmidi clients are opened on first connect, so constructing a
+        # device (e.g. while the UI is being built) never touches the backend
+        self._midi_out = None
+        self._midi_in = None
         self._connected = False
         self._port_name: str | None = None
         self._logger = logger or AppLogger()
         self._note_callback = None
         self._sysex_callback = None
+        self._control_callback = None
+        self._send_callback = None
 
     @property
     def connected(self) -> bool:
@@ -45,6 +49,9 @@ class MidiDevice:
     def connect(self, port_index: int, port_name: str) -> None:
         if self._connected:
             self.disconnect()
+        if self._midi_out is None:
+            self._midi_out = rtmidi.MidiOut()
+            self._midi_in = rtmidi.MidiIn()
         try:
             self._midi_out.open_port(port_index)
         except rtmidi.SystemError as exc:
@@ -91,20 +98,26 @@ class MidiDevice:
         if not self._connected:
             raise RuntimeError("Not connected to a MIDI device")
         self._midi_out.send_message(message)
+        if self._send_callback is not None:
+            self._send_callback(message)
 
     def send_nrpn(self, channel: int, msb: int, lsb: int, value: int) -> None:
         if not self._connected:
             raise RuntimeError("Not connected to a MIDI device")
         ch = 0xB0 | ((channel - 1) & 0x0F)
-        self._midi_out.send_message([ch, 99, msb & 0x7F])
-        self._midi_out.send_message([ch, 98, lsb & 0x7F])
-        self._midi_out.send_message([ch, 6, value & 0x7F])
+        for message in ([ch, 99, msb & 0x7F], [ch, 98, lsb & 0x7F], [ch, 6, value & 0x7F]):
+            self._midi_out.send_message(message)
+            if self._send_callback is not None:
+                self._send_callback(message)
 
     def send_cc(self, channel: int, cc: int, value: int) -> None:
         if not self._connected:
             raise RuntimeError("Not connected to a MIDI device")
         ch = 0xB0 | ((channel - 1) & 0x0F)
-        self._midi_out.send_message([ch, cc & 0x7F, value & 0x7F])
+        message = [ch, cc & 0x7F, value & 0x7F]
+        self._midi_out.send_message(message)
+        if self._send_callback is not None:
+            self._send_callback(message)
 
     def send_note_on(self, channel: int, note: int, velocity: int) -> None:
         if not self._connected:
@@ -141,12 +154,22 @@ class MidiDevice:
                 self._note_callback(msg[1], 0, False)
             self._logger.midi(f"RX note-off: {msg[1]}")
         else:
+            if self._control_callback is not None:
+                self._control_callback(list(msg))
             self._logger.midi(f"RX raw: {[hex(b) for b in msg]}")
 
     def set_note_callback(self, callback) -> None:
         """Register a callback for incoming note messages: callback(note, velocity, is_on)."""
         self._note_callback = callback
 
+    def set_control_callback(self, callback) -> None:
+        """Register a callback for other incoming messages (CC, program change, ...)."""
+        self._control_callback = callback
+
+    def set_send_callback(self, callback) -> None:
+        """Register a callback observing every message sent to the device."""
+        self._send_callback = callback
+
     def set_sysex_callback(self, callback) -> None:
         """Register a callback for incoming SysEx messages."""
         if not self._connected:
@@ -0,0 +1,113 @@
+"""Byte-level undo/redo journal for ``SysExProgramBuffer``.
+
+Every byte write is recorded as an (offset, old, new) delta in fixed-size
+arrays used as a ring, so the history costs 4 bytes per change no matter
+how many edits are made; the oldest steps fall off when it is full.
+Deltas are grouped into steps.  Consecutive writes with the same
+coalescing key (e.g. one parameter while a knob is dragged) inside
+*coalesce_s* join the current step, updating the ``new`` value of a byte
+already in it, so a drag undoes in one go.  Undo and redo touch only the
+bytes of the step.
+"""
+from __future__ import annotations
+import time
+from array import array
+from collections import deque
+from typing import Callable, Hashable
+
+
+class EditJournal:
+    def __init__(self, capacity: int = 4096, coalesce_s: float = 0.5,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._capacity = capacity
+        self._coalesce_s = coalesce_s
+        self._clock = clock
+        self._offsets = array("H", bytes(2 * capacity))
+        self._old = bytearray(capacity)
+        self._new = bytearray(capacity)
+        self._starts: deque[int] = deque()   # absolute delta index where each step starts
+        self._top = 0                         # absolute index past the last recorded delta
+        self._cursor = 0                      # steps before this index are applied
+        self._last_key: Hashable | None = None
+        self._last_time = 0.0
+
+    def __len__(self) -> int:
+        """Number of steps that can be undone."""
+        return self._cursor
+
+    @property
+    def can_undo(self) -> bool:
+        return self._cursor > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self._cursor < len(self._starts)
+
+    def clear(self) -> None:
+        self._starts.clear()
+        self._top = 0
+        self._cursor = 0
+        self._last_key = None
+
+    def break_step(self) -> None:
+        """Start a new step on the next write even if its key matches."""
+        self._last_key = None
+
+    def _end(self, step: int) -> int:
+        return self._starts[step + 1] if step + 1 < len(self._starts) else self._top
+
+    def _find(self, start: int, end: int, offset: int) -> int | None:
+        for i in range(start, end):
+            if self._offsets[i % self._capacity] == offset:
+                return i % self._capacity
+        return None
+
+    def record(self, offset: int, old: int, new: int, key: Hashable | None = None) -> None:
+        """Note that byte *offset* changed from *old* to *new*."""
+        if self.can_redo:
+            self._top = self._starts[self._cursor]
+            while len(self._starts) > self._cursor:
+                self._starts.pop()
+        now = self._clock()
+        coalesce = (key is not None and key == self._last_key and self._cursor > 0
+                    and now - self._last_time <= self._coalesce_s)
+        self._last_key = key
+        self._last_time = now
+        if coalesce:
+            slot = self._find(self._starts[-1], self._top, offset)
+            if slot is not None:
+                self._new[slot] = new
+                return
+        else:
+            self._starts.append(self._top)
+            self._cursor += 1
+        slot = self._top % self._capacity
+        self._offsets[slot] = offset
+        self._old[slot] = old
+        self._new[slot] = new
+        self._top += 1
+        while self._starts and self._top - self._starts[0] > self._capacity:
+            self._starts.popleft()
+            self._cursor -= 1
+        if not self._starts:
+            self._last_key = None   # a single step outgrew the ring
+
+    def undo(self) -> list[tuple[int, int]]:
+        """(offset, value) writes that revert the last step, or [] if none."""
+        if not self.can_undo:
+            return []
+        self._cursor -= 1
+        self._last_key = None
+        start, end = self._starts[self._cursor], self._end(self._cursor)
+        return [(self._offsets[i % self._capacity], self._old[i % self._capacity])
+                for i in range(end - 1, start - 1, -1)]
+
+    def redo(self) -> list[tuple[int, int]]:
+        """(offset, value) writes that re-apply the next step, or [] if none."""
+        if not self.can_redo:
+            return []
+        start, end = self._starts[self._cursor], self._end(self._cursor)
+        self._cursor += 1
+        self._last_key = None
+        return [(self._offsets[i % self._capacity], self._new[i % self._capacity])
+                for i in range(start, end)]
@@ -11,8 +11,8 @@ SysEx offset mapping (empirically confirmed via patch diffing, 2026-02-23):
   FX2 slot N:   Gap L(66+N), packed=fx_param_packed(2, N)
 """
 from __future__ import annotations
-import math
 from dataclasses import dataclass, field
+from midi.layout import LAYOUT
 
 
 @dataclass
@@ -504,12 +504,10 @@ def get_effect_type(type_id: int) -> EffectTypeDef | None:
 # SysEx offset helpers (Gap section: base=283, k=4)
 # Empirically confirmed via patch diffing against RK-100S 2 device.
 # ---------------------------------------------------------------------------
-_GAP_BASE = 283
-_GAP_K = 4
 
 # Packed SysEx positions for FX type selectors
-FX1_TYPE_PACKED: int = _GAP_BASE + 38 + math.ceil((38 + _GAP_K) / 7)  # = 327
-FX2_TYPE_PACKED: int = _GAP_BASE + 62 + math.ceil((62 + _GAP_K) / 7)  # = 355
+FX1_TYPE_PACKED: int = LAYOUT.offset("Gap", 38)  # = 327
+FX2_TYPE_PACKED: int = LAYOUT.offset("Gap", 62)  # = 355
 
 # Gap logical bases for FX param slots
 FX1_PARAMS_LOGICAL_BASE = 42   # Gap L42 = FX1 slot 0 (dry_wet)
@@ -523,5 +521,4 @@ def fx_param_packed(slot: int, slot_index: int) -> int:
              fx_param_packed(2, 0) == 359  (FX2 dry_wet, Gap L66)
     """
     base = FX1_PARAMS_LOGICAL_BASE if slot == 1 else FX2_PARAMS_LOGICAL_BASE
-    logical = base + slot_index
-    return _GAP_BASE + logical + math.ceil((logical + _GAP_K) / 7)
+    return LAYOUT.offset("Gap", base + slot_index)
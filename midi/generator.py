@@ -0,0 +1,192 @@
+"""Vectorized random generation and mutation of program buffers.
+
+``PatchGenerator`` works on (N, 496) uint8 stacks.  Every SysEx-addressable
+``ParamMap`` parameter is sampled within ``min_val``/``max_val``, restricted
+to its ``value_labels`` or ``sysex_value_map`` choices where it has them,
+and encoded with ``midi.param_codec``, one numpy operation per parameter
+across all rows.  The FX parameter slots are then filled according to the
+effect type chosen for each row (``EFFECT_TYPES``).  Bytes no parameter
+owns (patch name, HB bytes, the checksum tail) are copied from the base
+program untouched.  Parameters that sit on an HB byte or on bit 7 of a
+data byte (which the packing carries in the HB byte) keep their base
+value, so every generated byte stays a valid 7-bit SysEx data byte.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+import numpy as np
+from midi.effects import (
+    EFFECT_TYPES, FX1_TYPE_PACKED, FX2_TYPE_PACKED, EffectParam, fx_param_packed,
+)
+from midi.layout import LAYOUT, PROGRAM_DATA_SIZE
+from midi.param_codec import decodable, decode_stack, encode_stack, uses_bit7
+from midi.params import ParamDef, ParamMap
+
+_FX_TYPE_OFFSETS = {1: FX1_TYPE_PACKED, 2: FX2_TYPE_PACKED}
+
+
+@dataclass(frozen=True)
+class _Domain:
+    lo: int
+    hi: int
+    choices: np.ndarray | None   # allowed values for enumerated params
+
+    @classmethod
+    def of(cls, min_val: int, max_val: int, labels: dict[int, str] | None = None,
+           value_map: dict[int, int] | None = None, bit: bool = False) -> _Domain:
+        if bit:
+            return cls(0, 127, np.array([0, 127], dtype=np.int16))
+        keys = value_map or labels
+        if keys:
+            choices = sorted(k for k in keys if min_val <= k <= max_val)
+            if choices:
+                return cls(min_val, max_val, np.array(choices, dtype=np.int16))
+        return cls(min_val, max_val, None)
+
+
+def _unambiguous(params: list[ParamDef]) -> list[ParamDef]:
+    """Drop whole-byte params whose byte is also claimed by another param.
+
+    Some bytes are defined both as a whole value and as bit fields (or as
+    two whole values) where the exact split is not mapped yet; only the
+    bit fields, or the first whole-byte definition, can be generated
+    consistently.
+    """
+    fields = {p.sysex_offset for p in params
+              if p.sysex_bit is not None or p.sysex_bit_mask is not None}
+    kept: list[ParamDef] = []
+    whole: set[int] = set()
+    for p in params:
+        if p.sysex_bit is None and p.sysex_bit_mask is None:
+            if p.sysex_offset in fields or p.sysex_offset in whole:
+                continue
+            whole.add(p.sysex_offset)
+        kept.append(p)
+    return kept
+
+
+def _param_domain(param: ParamDef) -> _Domain:
+    return _Domain.of(param.min_val, param.max_val, param.value_labels,
+                      param.sysex_value_map, param.sysex_bit is not None)
+
+
+def _fx_domain(param: EffectParam) -> _Domain:
+    return _Domain.of(param.min_val, param.max_val, param.value_labels)
+
+
+def as_stack(programs) -> np.ndarray:
+    """(N, 496) uint8 copy of *programs* (bytes, a list of bytes or an array)."""
+    if isinstance(programs, (bytes, bytearray)):
+        programs = [programs]
+    if isinstance(programs, np.ndarray):
+        stack = np.array(programs, dtype=np.uint8, ndmin=2)
+    else:
+        stack = np.stack([np.frombuffer(bytes(p[:PROGRAM_DATA_SIZE]), dtype=np.uint8)
+                          for p in programs])
+    if stack.shape[1] != PROGRAM_DATA_SIZE:
+        raise ValueError(f"Programs must be {PROGRAM_DATA_SIZE} bytes")
+    return stack
+
+
+class PatchGenerator:
+    """Sample or mutate stacks of valid programs; see module docstring."""
+
+    def __init__(self, param_map: ParamMap | None = None, base: bytes | None = None,
+                 seed: int | None = None, effects: bool = True) -> None:
+        params = [p for p in decodable((param_map or ParamMap()).sysex_params())
+                  if not LAYOUT.is_hb[p.sysex_offset] and not uses_bit7(p)]
+        self.params = _unambiguous(params)
+        self._domains = [_param_domain(p) for p in self.params]
+        self._lo = np.array([d.lo for d in self._domains], dtype=np.int16)
+        self._hi = np.array([d.hi for d in self._domains], dtype=np.int16)
+        self._continuous = np.array([d.choices is None for d in self._domains])
+        self._base = as_stack(base if base is not None else bytes(PROGRAM_DATA_SIZE))[0]
+        self._rng = np.random.default_rng(seed)
+        self._effects = effects
+
+    # -- sampling helpers --
+
+    def _sample(self, domain: _Domain, n: int) -> np.ndarray:
+        if domain.choices is not None:
+            return self._rng.choice(domain.choices, n)
+        return self._rng.integers(domain.lo, domain.hi + 1, n, dtype=np.int16)
+
+    def _perturb(self, domain: _Domain, values: np.ndarray, amount: float) -> np.ndarray:
+        if domain.choices is not None:
+            return self._sample(domain, len(values))
+        noise = self._rng.normal(0.0, amount * (domain.hi - domain.lo), len(values))
+        return np.clip(values + np.rint(noise), domain.lo, domain.hi).astype(np.int16)
+
+    def _fill_effects(self, stack: np.ndarray, old_stack: np.ndarray | None = None,
+                      rate: float = 1.0, amount: float = 0.0) -> None:
+        """Fill FX slot params for each row's effect type.
+
+        Without *old_stack* every slot param is sampled; otherwise rows
+        whose type is unchanged only mutate each param with *rate*.
+        """
+        for slot, offset in _FX_TYPE_OFFSETS.items():
+            types = stack[:, offset]
+            keep = (old_stack[:, offset] == types) if old_stack is not None else None
+            for type_id in np.unique(types):
+                effect = EFFECT_TYPES.get(int(type_id))
+                if effect is None:
+                    continue
+                rows = np.flatnonzero(types == type_id)
+                for param in effect.params:
+                    col = fx_param_packed(slot, param.slot_index)
+                    domain = _fx_domain(param)
+                    values = self._sample(domain, len(rows))
+                    if keep is not None:
+                        current = stack[rows, col].astype(np.int16)
+                        mutated = np.where(self._rng.random(len(rows)) < rate,
+                                           self._perturb(domain, current, amount), current)
+                        values = np.where(keep[rows], mutated, values)
+                    stack[rows, col] = values.astype(np.uint8) & 0x7F
+
+    # -- public API --
+
+    def random(self, n: int) -> np.ndarray:
+        """*n* programs with every parameter drawn uniformly from its domain."""
+        stack = np.tile(self._base, (n, 1))
+        values = np.empty((n, len(self.params)), dtype=np.int16)
+        for j, domain in enumerate(self._domains):
+            values[:, j] = self._sample(domain, n)
+        encode_stack(stack, self.params, values)
+        if self._effects:
+            self._fill_effects(stack)
+        return stack
+
+    def mutate(self, programs, n: int | None = None, rate: float = 0.1,
+               amount: float = 0.1) -> np.ndarray:
+        """Mutated copies of *programs*.
+
+        Each parameter changes with probability *rate*: continuous ones by
+        Gaussian noise of *amount* times their range, enumerated ones to a
+        random choice.  With *n*, the programs are cycled to *n* rows.  A
+        changed FX type resamples that slot's parameters.
+        """
+        source = as_stack(programs)
+        if n is not None:
+            source = source[np.arange(n) % len(source)]
+        stack = source.copy()
+        rows = len(stack)
+        values = decode_stack(stack, self.params)
+        hit = self._rng.random(values.shape) < rate
+        noise = self._rng.normal(0.0, 1.0, values.shape) * amount * (self._hi - self._lo)
+        continuous = np.clip(values + np.rint(noise), self._lo, self._hi).astype(np.int16)
+        mutated = np.where(self._continuous, continuous, values)
+        for j in np.flatnonzero(~self._continuous & hit.any(axis=0)):
+            mutated[:, j] = self._sample(self._domains[j], rows)
+        values = np.where(hit, mutated, values)
+        # only rewrite bytes holding a changed param, so untouched ones keep
+        # their raw contents even where param definitions overlap
+        changed = (values != decode_stack(source, self.params)).any(axis=0)
+        offsets = {self.params[j].sysex_offset for j in np.flatnonzero(changed)}
+        cols = [j for j, p in enumerate(self.params) if p.sysex_offset in offsets]
+        encode_stack(stack, [self.params[j] for j in cols], values[:, cols])
+        if self._effects:
+            self._fill_effects(stack, source, rate, amount)
+        return stack
+
+    @staticmethod
+    def to_bytes(stack: np.ndarray) -> list[bytes]:
+        return [row.tobytes() for row in stack]
@@ -0,0 +1,237 @@
+"""Packed SysEx program layout for the RK-100S 2, computed once at import.
+
+A program is 496 packed bytes.  Bytes 0-17 are the common header (direct
+mapping); the rest use Korg 7-bit packing, where every packed position
+divisible by 8 is an HB byte holding bit 7 of the following seven bytes.
+Within that stream each section's logical byte L lives at
+``pack_offset(L, base, k)``.  In the .rk100s2_prog file the HB bytes are
+stripped: ``file = (packed // 8) * 7 + packed % 8 - 1``.
+
+``LAYOUT`` holds read-only numpy tables for every position so tools and
+runtime code can map packed ↔ file ↔ (section, logical) without
+re-deriving the packing.
+"""
+from __future__ import annotations
+import hashlib
+import math
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+import numpy as np
+
+PROGRAM_DATA_SIZE = 496
+COMMON_SIZE = 18
+
+
+class Section(NamedTuple):
+    name: str
+    base: int
+    k: int | None
+    count: int
+
+
+SECTIONS: tuple[Section, ...] = (
+    Section("Common", 0, None, COMMON_SIZE),  # Direct mapping, no packing formula
+    Section("Timbre1", 18, 3, 96),
+    Section("Timbre2", 128, 1, 96),
+    Section("VocBands", 237, 6, 42),
+    Section("Gap", 283, 4, 88),
+    Section("Arp", 384, 1, 24),
+)
+
+
+def pack_offset(logical: int, base: int, k: int) -> int:
+    """Compute packed SysEx position from section logical offset."""
+    return base + logical + math.ceil((logical + k) / 7)
+
+
+def _readonly(values, dtype) -> np.ndarray:
+    arr = np.array(values, dtype=dtype)
+    arr.setflags(write=False)
+    return arr
+
+
+@dataclass(frozen=True, eq=False)
+class ProgramLayout:
+    """Lookup tables indexed by packed position or file position (0-495).
+
+    Packed-indexed: ``packed_to_file`` (-1 for HB bytes), ``section_id`` /
+    ``logical`` (-1 where no section claims the byte; the first section wins
+    where two overlap), ``is_hb`` and ``in_extra`` (checksum/padding after
+    the last Arp byte).  File-indexed: ``file_to_packed`` and
+    ``file_in_extra``.  ``label_id`` / ``label_index`` give the coarser
+    labels used by diff output, which also name HB bytes per section and
+    the Extra region (``label_names``; -1 = unlabelled).  ``stable_bits``
+    masks out the Extra region, including its bits in the last HB bytes,
+    for content comparisons that ignore the volatile checksum tail.
+    """
+
+    sections: tuple[Section, ...]
+    section_offsets: Mapping[str, np.ndarray]
+    packed_to_file: np.ndarray
+    file_to_packed: np.ndarray
+    section_id: np.ndarray
+    logical: np.ndarray
+    is_hb: np.ndarray
+    in_extra: np.ndarray
+    file_in_extra: np.ndarray
+    label_names: tuple[str, ...]
+    label_id: np.ndarray
+    label_index: np.ndarray
+    stable_bits: np.ndarray
+    last_arp: int
+
+    @classmethod
+    def build(cls, sections: tuple[Section, ...] = SECTIONS) -> ProgramLayout:
+        size = PROGRAM_DATA_SIZE
+        offsets: dict[str, np.ndarray] = {}
+        for s in sections:
+            if s.k is None:
+                offsets[s.name] = _readonly(range(s.base, s.base + s.count), np.int16)
+            else:
+                offsets[s.name] = _readonly(
+                    [pack_offset(L, s.base, s.k) for L in range(s.count)], np.int16)
+
+        def to_file(p: int) -> int:
+            if p < COMMON_SIZE:
+                return p
+            if p % 8 == 0:
+                return -1
+            return (p // 8) * 7 + (p % 8) - 1
+
+        def to_packed(fp: int) -> int:
+            if fp < COMMON_SIZE:
+                return fp
+            return (fp // 7) * 8 + fp % 7 + 1
+
+        section_id = [-1] * size
+        logical = [-1] * size
+        for sid, s in enumerate(sections):
+            for L, p in enumerate(offsets[s.name].tolist()):
+                if p < size and section_id[p] == -1:
+                    section_id[p] = sid
+                    logical[p] = L
+
+        arp = next(s for s in sections if s.name == "Arp")
+        last_arp = int(offsets[arp.name][-1])
+
+        # Diff labels: later sections overwrite shared data bytes, unclaimed
+        # positions at 8-byte strides from a section base are its HB bytes.
+        label_names = [s.name for s in sections]
+        label_names += [f"{s.name}_HB" for s in sections if s.k is not None]
+        label_names.append("Extra")
+        label_of = {name: i for i, name in enumerate(label_names)}
+        label_id = [-1] * size
+        label_index = [-1] * size
+        for s in sections:
+            for L, p in enumerate(offsets[s.name].tolist()):
+                if p < size:
+                    label_id[p] = label_of[s.name]
+                    label_index[p] = L
+            if s.k is None:
+                continue
+            for p in range(s.base, min(size, s.base + s.count + s.count // 7 + 2)):
+                rel = p - s.base
+                if label_id[p] == -1 and rel % 8 == 0:
+                    label_id[p] = label_of[f"{s.name}_HB"]
+                    label_index[p] = rel // 8
+        for p in range(last_arp + 1, size):
+            if label_id[p] == -1:
+                label_id[p] = label_of["Extra"]
+                label_index[p] = p - last_arp - 1
+
+        # HB bit i carries bit 7 of packed byte hb + 1 + i
+        stable_bits = [0 if p > last_arp else 0xFF for p in range(size)]
+        for hb in range(COMMON_SIZE, last_arp + 1):
+            if hb % 8 == 0:
+                stable_bits[hb] = sum(1 << i for i in range(7) if hb + 1 + i <= last_arp)
+
+        return cls(
+            sections=tuple(sections),
+            section_offsets=MappingProxyType(offsets),
+            packed_to_file=_readonly([to_file(p) for p in range(size)], np.int16),
+            file_to_packed=_readonly([to_packed(fp) for fp in range(size)], np.int16),
+            section_id=_readonly(section_id, np.int8),
+            logical=_readonly(logical, np.int16),
+            is_hb=_readonly([p >= COMMON_SIZE and p % 8 == 0 for p in range(size)], bool),
+            in_extra=_readonly([p > last_arp for p in range(size)], bool),
+            file_in_extra=_readonly([to_packed(fp) > last_arp for fp in range(size)], bool),
+            label_names=tuple(label_names),
+            label_id=_readonly(label_id, np.int8),
+            label_index=_readonly(label_index, np.int16),
+            stable_bits=_readonly(stable_bits, np.uint8),
+            last_arp=last_arp,
+        )
+
+    def normalized(self, data: bytes) -> bytes:
+        """*data* with the volatile Extra region (and its HB bits) zeroed."""
+        arr = np.frombuffer(data, dtype=np.uint8, count=min(len(data), PROGRAM_DATA_SIZE))
+        return (arr & self.stable_bits[:len(arr)]).tobytes()
+
+    def _hb_positions(self, section: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(data offsets, HB offsets, HB bit) for *section*; -1 HB for direct bytes.
+
+        A byte is direct when its 8-byte group has no HB byte, as for the
+        Timbre1 bytes at 19-23 whose group starts inside the Common header.
+        """
+        offsets = self.section_offsets[section].astype(np.intp)
+        group = offsets - offsets % 8
+        packed = self.is_hb[group]
+        hb = np.where(packed, group, -1)
+        bit = np.where(packed, offsets % 8 - 1, 0)
+        return offsets, hb, bit
+
+    def read_section(self, stack: np.ndarray, section: str) -> np.ndarray:
+        """(N, count) full 8-bit logical bytes of *section* from an (N, 496) stack.
+
+        Bit 7 of each packed byte is taken from its HB byte.
+        """
+        offsets, hb, bit = self._hb_positions(section)
+        values = stack[:, offsets].astype(np.uint8)
+        packed = hb >= 0
+        high = (stack[:, hb[packed]] >> bit[packed]) & 1
+        values[:, packed] = (values[:, packed] & 0x7F) | (high << 7).astype(np.uint8)
+        return values
+
+    def write_section(self, stack: np.ndarray, section: str, values: np.ndarray,
+                      logical: np.ndarray | None = None) -> None:
+        """Write logical bytes of *section* into *stack* in place, HB bits included.
+
+        *logical* selects which logical positions *values* (N, len) hold;
+        by default all of them.
+        """
+        offsets, hb, bit = self._hb_positions(section)
+        if logical is not None:
+            offsets, hb, bit = offsets[logical], hb[logical], bit[logical]
+        values = np.asarray(values, dtype=np.uint8)
+        packed = hb >= 0
+        stack[:, offsets[~packed]] = values[:, ~packed]
+        stack[:, offsets[packed]] = values[:, packed] & 0x7F
+        for j in np.flatnonzero(packed):
+            mask = np.uint8(1 << bit[j])
+            stack[:, hb[j]] = np.where(values[:, j] & 0x80,
+                                       stack[:, hb[j]] | mask, stack[:, hb[j]] & ~mask)
+
+    def offset(self, section: str, logical: int) -> int:
+        """Packed position of *logical* byte in *section*."""
+        return int(self.section_offsets[section][logical])
+
+    def section(self, packed: int) -> tuple[str, int]:
+        """(section_name, logical) for a data byte, else ("Unknown", packed)."""
+        if 0 <= packed < PROGRAM_DATA_SIZE and self.section_id[packed] >= 0:
+            return (self.sections[self.section_id[packed]].name, int(self.logical[packed]))
+        return ("Unknown", packed)
+
+    def label(self, packed: int) -> tuple[str, int] | None:
+        """Diff label (name, index) for *packed*, or None if unlabelled."""
+        if 0 <= packed < PROGRAM_DATA_SIZE and self.label_id[packed] >= 0:
+            return (self.label_names[self.label_id[packed]], int(self.label_index[packed]))
+        return None
+
+
+LAYOUT = ProgramLayout.build()
+
+
+def content_hash(data: bytes) -> str:
+    """Hash of program data, ignoring the volatile checksum/Extra tail."""
+    return hashlib.blake2b(LAYOUT.normalized(data), digest_size=16).hexdigest()
@@ -0,0 +1,216 @@
+"""Real-time morphing between two programs.
+
+``PatchMorpher`` interpolates every ``ParamMap`` parameter that differs
+between program A and program B.  Continuous parameters move linearly
+with the morph position; stepped ones (bit flags, value maps, labelled
+choices, small ranges) and bytes no parameter describes (FX parameters,
+name) switch from A to B at *threshold*.
+
+Parameters with an NRPN/CC address are streamed as soon as they change,
+most out-of-date first.  Everything else is carried by a full program
+write at most every *program_interval_s*.  Output is paced by a byte
+budget refilled each tick; a program write may overdraw it and is paid
+back over the following ticks, so the average rate never exceeds
+``byte_budget / tick_s``.
+
+The position either ramps over *duration_s* or follows ``set_position``
+(e.g. from a controller), and the engine runs on its own daemon thread.
+``tick`` does one step and can be driven directly.  Qt-free.
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Callable
+from midi.param_codec import decodable, decode_params
+from midi.params import ParamDef, ParamMap
+from midi.sysex import build_program_write
+from midi.sysex_buffer import SysExProgramBuffer
+
+# DIN MIDI carries 3125 bytes/s; 40 bytes per 20 ms tick leaves headroom
+DEFAULT_TICK_S = 0.02
+DEFAULT_BYTE_BUDGET = 40
+
+# Ranges this small are treated as switches rather than continuous knobs
+_MIN_CONTINUOUS_RANGE = 16
+
+
+def is_continuous(param: ParamDef) -> bool:
+    """True if *param* can take intermediate values meaningfully."""
+    return (param.sysex_bit is None and param.sysex_value_map is None
+            and not param.value_labels
+            and param.max_val - param.min_val >= _MIN_CONTINUOUS_RANGE)
+
+
+class PatchMorpher:
+    """Morph the device edit buffer from program *a* to *b*.
+
+    The device is assumed to hold *a* when the morph starts.
+    """
+
+    def __init__(
+        self,
+        device,
+        a: bytes,
+        b: bytes,
+        param_map: ParamMap | None = None,
+        channel: int = 1,
+        tick_s: float = DEFAULT_TICK_S,
+        byte_budget: int = DEFAULT_BYTE_BUDGET,
+        program_interval_s: float = 0.25,
+        threshold: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+        on_tick: Callable[[float], None] | None = None,
+    ) -> None:
+        if len(a) != len(b):
+            raise ValueError("Programs must be the same size")
+        self._device = device
+        self._a = bytes(a)
+        self._b = bytes(b)
+        self._channel = channel
+        self.tick_s = tick_s
+        self.byte_budget = byte_budget
+        self.program_interval_s = program_interval_s
+        self.threshold = threshold
+        self._clock = clock
+        self._on_tick = on_tick
+
+        params = decodable((param_map or ParamMap()).sysex_params())
+        params = [p for p in params if p.sysex_offset < len(a)]
+        va, vb = decode_params(self._a, params), decode_params(self._b, params)
+        self._params = [p for p in params if va[p.name] != vb[p.name]]
+        self._from = va
+        self._to = vb
+        self._realtime = [p for p in self._params if p.is_nrpn or p.cc_number is not None]
+
+        self._lock = threading.Lock()
+        self._position = 0.0
+        self._ramp: tuple[float, float, float] | None = None  # (start_time, start_pos, duration)
+        self._credit = float(byte_budget)
+        self._sent: dict[str, int] = dict(va)   # last value the device has for each param
+        self._device_buf = SysExProgramBuffer(self._a)  # what the device holds now
+        self._ramp_target = 1.0
+        self._last_program_time = float("-inf")
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.bytes_sent = 0
+
+    # -- control --
+
+    @property
+    def position(self) -> float:
+        with self._lock:
+            return self._position
+
+    def set_position(self, position: float) -> None:
+        """Move the morph to *position* (0 = A, 1 = B), cancelling any ramp."""
+        with self._lock:
+            self._ramp = None
+            self._position = min(1.0, max(0.0, position))
+
+    def ramp_to(self, position: float, duration_s: float) -> None:
+        """Glide from the current position to *position* over *duration_s*."""
+        with self._lock:
+            start = self._position
+            self._ramp = (self._clock(), start, duration_s)
+            self._ramp_target = min(1.0, max(0.0, position))
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration_s: float | None = None) -> None:
+        """Run on a daemon thread; with *duration_s*, ramp from A to B and stop."""
+        if self.running:
+            return
+        if duration_s is not None:
+            self.set_position(0.0)
+            self.ramp_to(1.0, duration_s)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(duration_s is not None,),
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def _loop(self, finish_at_end: bool) -> None:
+        next_tick = self._clock()
+        while not self._stop.is_set():
+            self.tick()
+            if finish_at_end and self.settled and self.position >= 1.0:
+                break
+            next_tick += self.tick_s
+            self._stop.wait(max(0.0, next_tick - self._clock()))
+
+    # -- engine --
+
+    def target(self, position: float) -> tuple[dict[str, int], bytes]:
+        """Parameter values and full program for *position*."""
+        switched = position >= self.threshold
+        buf = SysExProgramBuffer(self._b if switched else self._a)
+        values: dict[str, int] = {}
+        for p in self._params:
+            lo, hi = self._from[p.name], self._to[p.name]
+            if is_continuous(p):
+                value = round(lo + (hi - lo) * position)
+            else:
+                value = hi if switched else lo
+            values[p.name] = value
+            buf.set_param(p, value)
+        return values, buf.to_bytes()
+
+    @property
+    def settled(self) -> bool:
+        """The device holds the program for the current position."""
+        with self._lock:
+            ramping = self._ramp is not None
+        return not ramping and self._device_buf.to_bytes() == self.target(self.position)[1]
+
+    def _advance(self, now: float) -> float:
+        with self._lock:
+            if self._ramp is not None:
+                started, start, duration = self._ramp
+                frac = 1.0 if duration <= 0 else min(1.0, (now - started) / duration)
+                self._position = start + (self._ramp_target - start) * frac
+                if frac >= 1.0:
+                    self._ramp = None
+            return self._position
+
+    def _send(self, message: list[int]) -> None:
+        self._device.send(message)
+        self._credit -= len(message)
+        self.bytes_sent += len(message)
+
+    def tick(self) -> None:
+        """Advance the position and send what the byte budget allows."""
+        now = self._clock()
+        position = self._advance(now)
+        self._credit = min(float(self.byte_budget), self._credit + self.byte_budget)
+        values, program = self.target(position)
+
+        # realtime parameters, most out of date first
+        stale = sorted((p for p in self._realtime if self._sent[p.name] != values[p.name]),
+                       key=lambda p: -abs(self._sent[p.name] - values[p.name]))
+        for p in stale:
+            msg = p.build_message(channel=self._channel, value=values[p.name])
+            if len(msg) > self._credit:
+                break
+            for i in range(0, len(msg), 3):
+                self._send(msg[i:i + 3])
+            self._sent[p.name] = values[p.name]
+            self._device_buf.set_param(p, values[p.name])
+
+        # everything else rides on a periodic program write, which may
+        # overdraw the budget and is paid back over the next ticks
+        if (self._credit > 0
+                and now - self._last_program_time >= self.program_interval_s
+                and self._device_buf.to_bytes() != program):
+            self._send(build_program_write(channel=self._channel, data=program))
+            self._device_buf.load(program)
+            self._sent.update(values)
+            self._last_program_time = now
+        if self._on_tick is not None:
+            self._on_tick(position)
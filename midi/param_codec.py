@@ -0,0 +1,110 @@
+"""Vectorized ParamDef decoding over stacks of packed SysEx programs.
+
+``SysExProgramBuffer.get_param`` decodes one parameter of one program;
+this module applies the same rules (bit flags, masked fields with value
+maps or bias, signed bytes) to an (N, 496) uint8 stack column by column,
+so a whole library can be decoded in a handful of numpy operations.
+"""
+from __future__ import annotations
+import numpy as np
+from midi.layout import PROGRAM_DATA_SIZE
+from midi.params import ParamDef
+
+
+def _lookup_table(param: ParamDef) -> np.ndarray:
+    """Raw masked value -> NRPN value, mirroring get_param's inverse map."""
+    table = np.arange(256, dtype=np.int16)
+    for nrpn, sysex in param.sysex_value_map.items():
+        table[sysex] = nrpn
+    return table
+
+
+def decode_column(stack: np.ndarray, param: ParamDef) -> np.ndarray:
+    """Decode *param* for every row of *stack*; returns int16 values."""
+    raw = stack[:, param.sysex_offset].astype(np.int16)
+    if param.sysex_bit is not None:
+        return ((raw >> param.sysex_bit) & 1) * 127
+    if param.sysex_bit_mask is not None:
+        masked = (raw & param.sysex_bit_mask) >> param.sysex_bit_shift
+        if param.sysex_value_map is not None:
+            return _lookup_table(param)[masked]
+        return masked + param.sysex_value_bias
+    if param.sysex_signed:
+        return np.where(raw < 64, raw, raw - 128)
+    return raw
+
+
+def uses_bit7(param: ParamDef) -> bool:
+    """True if *param* sits on bit 7 of a packed byte.
+
+    Valid SysEx data bytes are 7-bit: the packing carries bit 7 in the HB
+    byte, so such params cannot be written in place without corrupting
+    the program.
+    """
+    return param.sysex_bit == 7 or bool((param.sysex_bit_mask or 0) & 0x80)
+
+
+def decodable(params: list[ParamDef]) -> list[ParamDef]:
+    """Params whose SysEx address lies inside a program."""
+    return [p for p in params
+            if p.sysex_offset is not None and p.sysex_offset < PROGRAM_DATA_SIZE]
+
+
+def decode_stack(stack: np.ndarray, params: list[ParamDef]) -> np.ndarray:
+    """(N, len(params)) int16 matrix of decoded values.
+
+    Every param must have a ``sysex_offset`` inside the stack (see
+    ``decodable``).
+    """
+    out = np.empty((len(stack), len(params)), dtype=np.int16)
+    for j, param in enumerate(params):
+        out[:, j] = decode_column(stack, param)
+    return out
+
+
+def decode_params(data: bytes, params: list[ParamDef]) -> dict[str, int]:
+    """Decoded values of *params* for one program (like repeated get_param)."""
+    params = [p for p in decodable(params) if p.sysex_offset < len(data)]
+    row = np.frombuffer(data, dtype=np.uint8, count=min(len(data), PROGRAM_DATA_SIZE))
+    values = decode_stack(row[None, :], params)[0]
+    return {p.name: int(v) for p, v in zip(params, values)}
+
+
+def _encode_table(param: ParamDef) -> np.ndarray:
+    """NRPN value -> raw field value, mirroring set_param's ``map.get(v, v)``."""
+    table = np.arange(256, dtype=np.int16)
+    for nrpn, sysex in param.sysex_value_map.items():
+        table[nrpn] = sysex
+    return table
+
+
+def encode_column(stack: np.ndarray, param: ParamDef, values: np.ndarray) -> None:
+    """Write *values* for *param* into every row of *stack* in place.
+
+    The inverse of ``decode_column``; bits outside the param's field are
+    preserved, so params sharing a byte can be encoded one after another.
+    """
+    col = param.sysex_offset
+    raw = stack[:, col].astype(np.int16)
+    values = np.asarray(values, dtype=np.int16)
+    if param.sysex_bit is not None:
+        bit = 1 << param.sysex_bit
+        new = np.where(values >= 64, raw | bit, raw & ~bit)
+    elif param.sysex_bit_mask is not None:
+        if param.sysex_value_map is not None:
+            field = _encode_table(param)[np.clip(values, 0, 255)]
+        else:
+            field = values - param.sysex_value_bias
+        mask = param.sysex_bit_mask
+        new = (raw & ~mask) | ((field << param.sysex_bit_shift) & mask)
+    elif param.sysex_signed:
+        new = np.where(values < 0, values + 128, values) & 0x7F
+    else:
+        new = values & 0x7F
+    stack[:, col] = new.astype(np.uint8)
+
+
+def encode_stack(stack: np.ndarray, params: list[ParamDef], values: np.ndarray) -> None:
+    """Write an (N, len(params)) value matrix into *stack* in place."""
+    for j, param in enumerate(params):
+        encode_column(stack, param, values[:, j])
@@ -35,6 +35,19 @@ class ParamDef:
     def is_sysex_only(self) -> bool:
         return self.sysex_offset is not None and not self.is_nrpn and self.cc_number is None
 
+    def parse_value(self, text: str) -> int:
+        """A number or one of the value labels (case-insensitive); ValueError otherwise."""
+        try:
+            return int(text)
+        except ValueError:
+            pass
+        for value, label in (self.value_labels or {}).items():
+            if label.lower() == text.lower():
+                return value
+        options = ", ".join((self.value_labels or {}).values())
+        raise ValueError(f"Unknown value {text!r} for {self.name}"
+                         + (f" (expected a number or one of: {options})" if options else ""))
+
     def build_message(self, channel: int, value: int) -> list[int]:
         value = max(self.min_val, min(self.max_val, value))
         ch = (channel - 1) & 0x0F
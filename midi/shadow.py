@@ -0,0 +1,205 @@
+"""Persistent shadow of what the device holds in each slot and its edit buffer.
+
+Every program the app pulls from or writes to the keytar is recorded with
+its content hash, data and provenance, so identical writes can be skipped
+and recently verified slots can be served without another dump.  Incoming
+control messages from the device (knob CC/NRPN, program changes) mean the
+hardware was edited or switched behind our back and invalidate the
+affected entries.  Outgoing traffic is followed the same way, so writes
+from any part of the app keep the edit buffer entry current.
+
+The shadow is keyed by MIDI port name and stored next to the app config.
+Only slots are persisted; the edit buffer is forgotten between sessions.
+"""
+from __future__ import annotations
+import json
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable
+from midi.layout import content_hash
+from midi.sysex import FUNC_PROGRAM_WRITE_REQUEST, parse_program_dump
+
+SHADOW_DIR = Path.home() / ".config" / "patchmasta" / "shadow"
+
+# Provenance of a shadow entry
+PULLED = "pulled"        # dumped from the device
+WRITTEN = "written"      # sent by us, not read back
+VERIFIED = "verified"    # sent by us and read back identical
+
+EDIT_BUFFER = -1
+
+# Performance controllers (mod wheel/ribbon, volume, expression, pedals)
+# change the sound while playing but not the program.
+_PERFORMANCE_CCS = frozenset({1, 2, 4, 7, 11, 64, 65, 66, 67})
+
+
+@dataclass
+class SlotState:
+    hash: str
+    data: bytes
+    source: str
+    updated: float          # time.time() of the last record
+
+    @property
+    def trusted(self) -> bool:
+        """Content was observed on the device rather than only sent."""
+        return self.source in (PULLED, VERIFIED)
+
+
+class DeviceShadow:
+    """Thread-safe slot/edit-buffer cache; see module docstring."""
+
+    def __init__(self, port_name: str = "", path: Path | None = None,
+                 clock: Callable[[], float] = time.time) -> None:
+        slug = re.sub(r"[^\w-]", "-", port_name.lower()).strip("-") or "device"
+        self.path = path or SHADOW_DIR / f"{slug}.json"
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._slots: dict[int, SlotState] = {}
+        self._edit: SlotState | None = None
+        self._current_slot: int | None = None
+        self._bank_lsb = 0
+        self.bytes_skipped = 0
+        self.load()
+
+    # -- persistence --
+
+    def load(self) -> None:
+        try:
+            raw = json.loads(self.path.read_text())
+            slots = {
+                int(slot): SlotState(hash=e["hash"], data=bytes.fromhex(e["data"]),
+                                     source=e["source"], updated=float(e["updated"]))
+                for slot, e in raw.get("slots", {}).items()
+            }
+        except (json.JSONDecodeError, OSError, KeyError, ValueError, AttributeError):
+            return
+        with self._lock:
+            self._slots = slots
+
+    def save(self) -> None:
+        with self._lock:
+            slots = {str(slot): {**asdict(s), "data": s.data.hex()}
+                     for slot, s in sorted(self._slots.items())}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"slots": slots}))
+            tmp.replace(self.path)
+        except OSError:
+            pass
+
+    # -- recording --
+
+    def record(self, slot: int | None, data: bytes, source: str) -> None:
+        """Note that *slot* (None = edit buffer) now holds *data*."""
+        state = SlotState(hash=content_hash(data), data=bytes(data), source=source,
+                          updated=self._clock())
+        with self._lock:
+            if slot is None or slot == EDIT_BUFFER:
+                self._edit = state
+            else:
+                self._slots[slot] = state
+                self._current_slot = slot
+
+    def selected(self, slot: int) -> None:
+        """The device switched to *slot*, loading it into the edit buffer."""
+        with self._lock:
+            self._current_slot = slot
+            stored = self._slots.get(slot)
+            self._edit = (SlotState(stored.hash, stored.data, stored.source, self._clock())
+                          if stored is not None else None)
+
+    def invalidate(self, slot: int | None = None) -> None:
+        """Forget *slot* (None = edit buffer)."""
+        with self._lock:
+            if slot is None or slot == EDIT_BUFFER:
+                self._edit = None
+            else:
+                self._slots.pop(slot, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slots.clear()
+            self._edit = None
+
+    # -- queries --
+
+    def get(self, slot: int | None) -> SlotState | None:
+        with self._lock:
+            return self._edit if slot is None or slot == EDIT_BUFFER else self._slots.get(slot)
+
+    def matches(self, slot: int | None, data: bytes) -> bool:
+        """True if the device is known to hold *data* in *slot* already."""
+        state = self.get(slot)
+        return state is not None and state.hash == content_hash(data)
+
+    def trusted(self, slot: int, max_age_s: float) -> SlotState | None:
+        """The entry for *slot* if it was observed on the device within *max_age_s*."""
+        state = self.get(slot)
+        if state is None or not state.trusted or self._clock() - state.updated > max_age_s:
+            return None
+        return state
+
+    def skipped(self, nbytes: int) -> None:
+        with self._lock:
+            self.bytes_skipped += nbytes
+
+    # -- MIDI traffic --
+
+    def _apply(self, message: list[int], from_device: bool) -> None:
+        kind = message[0] & 0xF0
+        if kind == 0xC0 and len(message) >= 2:
+            self.selected(self._bank_lsb * 128 + message[1])
+        elif kind == 0xB0 and len(message) >= 3:
+            cc = message[1]
+            if cc == 32:
+                self._bank_lsb = message[2]
+            elif cc == 0 or cc in _PERFORMANCE_CCS or cc >= 120:
+                return
+            else:
+                with self._lock:
+                    self._edit = None
+                    if from_device and self._current_slot is not None:
+                        self._slots.pop(self._current_slot, None)
+
+    def on_control_message(self, message: list[int]) -> None:
+        """Invalidate entries affected by a message received from the device.
+
+        Program change: the device switched slots (using the last CC#32
+        bank), so the edit buffer now holds that slot.  Other control
+        changes (knobs, NRPN) are front-panel edits: the edit buffer is
+        dirty, and the current slot may be overwritten if the user then
+        writes it.  Notes, pitch bend, aftertouch, performance CCs and
+        channel mode messages are ignored.
+        """
+        if message:
+            self._apply(message, from_device=True)
+
+    def on_sent(self, message: list[int]) -> None:
+        """Track a message the app sent: program writes, store requests,
+        slot changes and parameter CC/NRPN (which dirty the edit buffer)."""
+        if not message:
+            return
+        if message[0] != 0xF0:
+            self._apply(message, from_device=False)
+            return
+        data = parse_program_dump(message)
+        if data is not None:
+            self.record(None, data, WRITTEN)
+        elif len(message) == 10 and message[6] == FUNC_PROGRAM_WRITE_REQUEST:
+            with self._lock:
+                edit = self._edit
+            slot = message[7] * 128 + message[8]
+            if edit is None:
+                self.invalidate(slot)
+            else:
+                self.record(slot, edit.data, WRITTEN)
+
+    def attach(self, device) -> None:
+        """Follow *device*'s traffic in both directions."""
+        device.set_control_callback(self.on_control_message)
+        device.set_send_callback(self.on_sent)
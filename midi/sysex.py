@@ -5,6 +5,9 @@ MODEL_ID = [0x00, 0x01, 0x22]  # RK-100S 2 model ID (3 bytes, confirmed from Par
 
 FUNC_PROGRAM_DUMP_REQUEST = 0x10
 FUNC_ALL_DUMP_REQUEST = 0x0E
+# Not documented in the RK-100S 2 Parameter Guide; 0x11 follows the Korg
+# convention (microKORG XL / R3) for "store edit buffer to program N".
+FUNC_PROGRAM_WRITE_REQUEST = 0x11
 FUNC_PROGRAM_DUMP = 0x40
 FUNC_ALL_DUMP = 0x4E
 
@@ -52,6 +55,19 @@ def build_program_dump_request(channel: int) -> list[int]:
             FUNC_PROGRAM_DUMP_REQUEST, 0xF7]
 
 
+def build_program_write_request(channel: int, slot: int) -> list[int]:
+    """Ask the device to store the edit buffer into *slot* (0-199).
+
+    Unconfirmed on hardware: the Parameter Guide lists no write request, so
+    this uses the Korg convention of function 0x11 followed by bank and
+    program number (same split as ``build_slot_messages``).
+    """
+    if not (0 <= slot < NUM_PROGRAMS):
+        raise ValueError(f"Slot must be 0-{NUM_PROGRAMS - 1}, got {slot}")
+    return [0xF0, KORG_ID, _channel_byte(channel), *MODEL_ID,
+            FUNC_PROGRAM_WRITE_REQUEST, slot // 128, slot % 128, 0xF7]
+
+
 def build_all_dump_request(channel: int) -> list[int]:
     return [0xF0, KORG_ID, _channel_byte(channel), *MODEL_ID,
             FUNC_ALL_DUMP_REQUEST, 0xF7]
@@ -73,6 +89,21 @@ def parse_program_dump(message: list[int]) -> bytes | None:
     return bytes(message[func_idx + 1:-1])
 
 
+def parse_all_dump(message: list[int]) -> bytes | None:
+    """Payload of an ALL_DUMP message (all programs, packed back to back)."""
+    # Format: F0 42 3n 00 01 22 4E [data] F7
+    if len(message) < 3 + _MODEL_ID_LEN + 3:
+        return None
+    if message[0] != 0xF0 or message[1] != KORG_ID or message[-1] != 0xF7:
+        return None
+    if list(message[3:3 + _MODEL_ID_LEN]) != MODEL_ID:
+        return None
+    func_idx = 3 + _MODEL_ID_LEN
+    if message[func_idx] != FUNC_ALL_DUMP:
+        return None
+    return bytes(message[func_idx + 1:-1])
+
+
 PATCH_NAME_OFFSET = 0
 PATCH_NAME_LENGTH = 12
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
-from PyQt6.QtCore import QObject, QTimer, QMetaObject, Qt, pyqtSignal
+from typing import Hashable
+from midi.edit_journal import EditJournal
 
 
 class SysExProgramBuffer:
@@ -7,11 +8,16 @@ class SysExProgramBuffer:
 
     Provides typed access to individual bytes and parameters via ParamDef
     metadata.  Tracks dirty state so callers know when to write back.
+    Every change goes through an ``EditJournal`` for undo/redo, and named
+    snapshots of the whole program can be swapped in for A/B comparison.
     """
 
-    def __init__(self, data: bytes | bytearray | None = None) -> None:
+    def __init__(self, data: bytes | bytearray | None = None,
+                 journal: EditJournal | None = None) -> None:
         self._data = bytearray(data) if data else bytearray()
         self._dirty = False
+        self._journal = journal or EditJournal()
+        self._snapshots: dict[str, bytes] = {}
 
     # -- raw byte access --
 
@@ -27,8 +33,10 @@ class SysExProgramBuffer:
         self._dirty = False
 
     def load(self, data: bytes | bytearray) -> None:
+        """Replace the program; clears undo history but keeps snapshots."""
         self._data = bytearray(data)
         self._dirty = False
+        self._journal.clear()
 
     def to_bytes(self) -> bytes:
         return bytes(self._data)
@@ -41,10 +49,14 @@ class SysExProgramBuffer:
     def set_byte(self, offset: int, value: int) -> None:
         if offset < 0 or offset >= len(self._data):
             raise IndexError(f"Offset {offset} out of range (size={len(self._data)})")
-        value = value & 0x7F  # Korg uses 7-bit values
-        if self._data[offset] != value:
+        self._write(offset, value & 0x7F, ("byte", offset))  # Korg uses 7-bit values
+
+    def _write(self, offset: int, value: int, key: Hashable | None) -> None:
+        old = self._data[offset]
+        if old != value:
             self._data[offset] = value
             self._dirty = True
+            self._journal.record(offset, old, value, key)
 
     def get_signed(self, offset: int) -> int:
         """Read a 7-bit value and interpret as signed (-64..+63)."""
@@ -101,9 +113,7 @@ class SysExProgramBuffer:
             current = self._data[param_def.sysex_offset]
             bit_mask = 1 << param_def.sysex_bit
             new_val = (current | bit_mask) if value >= 64 else (current & ~bit_mask)
-            if current != new_val:
-                self._data[param_def.sysex_offset] = new_val
-                self._dirty = True
+            self._write(param_def.sysex_offset, new_val, param_def.name)
             return
         if param_def.sysex_bit_mask is not None:
             if param_def.sysex_value_map is not None:
@@ -113,59 +123,83 @@ class SysExProgramBuffer:
             current = self._data[param_def.sysex_offset]
             masked = (sysex_val << param_def.sysex_bit_shift) & param_def.sysex_bit_mask
             new_val = (current & ~param_def.sysex_bit_mask) | masked
-            if current != new_val:
-                self._data[param_def.sysex_offset] = new_val
-                self._dirty = True
+            self._write(param_def.sysex_offset, new_val, param_def.name)
             return
-        if param_def.sysex_signed:
-            self.set_signed(param_def.sysex_offset, value)
-        else:
-            self.set_byte(param_def.sysex_offset, value)
+        if param_def.sysex_offset >= len(self._data):
+            raise IndexError(f"Offset {param_def.sysex_offset} out of range (size={len(self._data)})")
+        if param_def.sysex_signed and value < 0:
+            value += 128
+        self._write(param_def.sysex_offset, value & 0x7F, param_def.name)
 
+    # -- history --
 
-class DebouncedSysExWriter(QObject):
-    """Debounces SysEx program writes to avoid flooding the device.
+    @property
+    def can_undo(self) -> bool:
+        return self._journal.can_undo
 
-    When a parameter changes, call `schedule()`.  After the debounce interval
-    elapses with no further calls, `write_requested` is emitted so the caller
-    can perform the actual SysEx write.
-    """
+    @property
+    def can_redo(self) -> bool:
+        return self._journal.can_redo
 
-    write_requested = pyqtSignal()
+    def _replay(self, writes: list[tuple[int, int]]) -> list[int]:
+        for offset, value in writes:
+            self._data[offset] = value
+        if writes:
+            self._dirty = True
+        return sorted({offset for offset, _ in writes})
 
-    def __init__(self, debounce_ms: int = 150, parent: QObject | None = None) -> None:
-        super().__init__(parent)
-        self._timer = QTimer(self)
-        self._timer.setSingleShot(True)
-        self._timer.setInterval(debounce_ms)
-        self._timer.timeout.connect(self.write_requested.emit)
-        self._suppressed = False
+    def undo(self) -> list[int]:
+        """Revert the last edit step; returns the offsets that changed."""
+        return self._replay(self._journal.undo())
 
-    @property
-    def debounce_ms(self) -> int:
-        return self._timer.interval()
+    def redo(self) -> list[int]:
+        """Re-apply the last undone step; returns the offsets that changed."""
+        return self._replay(self._journal.redo())
 
-    @debounce_ms.setter
-    def debounce_ms(self, value: int) -> None:
-        self._timer.setInterval(value)
+    # -- snapshots --
 
-    def schedule(self) -> None:
-        """(Re)start the debounce timer. Thread-safe via QMetaObject.
+    def snapshot(self, name: str) -> None:
+        """Remember the current program under *name* (replacing any previous)."""
+        self._snapshots[name] = bytes(self._data)
 
-        No-op while suppressed (e.g. during MIDI file playback to avoid
-        large SysEx writes blocking the output port).
+    def has_snapshot(self, name: str) -> bool:
+        return name in self._snapshots
+
+    def snapshot_names(self) -> list[str]:
+        return list(self._snapshots)
+
+    def delete_snapshot(self, name: str) -> None:
+        self._snapshots.pop(name, None)
+
+    def diff(self, name: str) -> list[int]:
+        """Offsets where the current program differs from snapshot *name*."""
+        other = self._snapshots[name]
+        if len(other) != len(self._data):
+            return list(range(max(len(other), len(self._data))))
+        return [i for i, (a, b) in enumerate(zip(self._data, other)) if a != b]
+
+    def restore(self, name: str) -> list[int]:
+        """Swap snapshot *name* into the buffer as one undoable step.
+
+        Only the differing bytes are written; returns their offsets.
         """
-        if self._suppressed:
-            return
-        QMetaObject.invokeMethod(
-            self._timer, "start", Qt.ConnectionType.AutoConnection,
-        )
+        other = self._snapshots[name]
+        if len(other) != len(self._data):
+            self.load(other)
+            self._dirty = True
+            return list(range(len(other)))
+        return self.replace(other, ("restore", name))
 
-    def cancel(self) -> None:
-        QMetaObject.invokeMethod(
-            self._timer, "stop", Qt.ConnectionType.AutoConnection,
-        )
+    def replace(self, data: bytes, key: Hashable = "replace") -> list[int]:
+        """Write *data* (a program of the same size) over the buffer as one undoable step.
 
-    @property
-    def is_pending(self) -> bool:
-        return self._timer.isActive()
+        Only the differing bytes are written; returns their offsets.
+        """
+        if len(data) != len(self._data):
+            raise ValueError(f"Program size {len(data)} does not match buffer size {len(self._data)}")
+        changed = [i for i, (a, b) in enumerate(zip(self._data, data)) if a != b]
+        self._journal.break_step()
+        for offset in changed:
+            self._write(offset, data[offset], key)
+        self._journal.break_step()
+        return changed
@@ -0,0 +1,50 @@
+from __future__ import annotations
+from PyQt6.QtCore import QObject, QTimer, QMetaObject, Qt, pyqtSignal
+
+
+class DebouncedSysExWriter(QObject):
+    """Debounces SysEx program writes to avoid flooding the device.
+
+    When a parameter changes, call `schedule()`.  After the debounce interval
+    elapses with no further calls, `write_requested` is emitted so the caller
+    can perform the actual SysEx write.
+    """
+
+    write_requested = pyqtSignal()
+
+    def __init__(self, debounce_ms: int = 150, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self.write_requested.emit)
+        self._suppressed = False
+
+    @property
+    def debounce_ms(self) -> int:
+        return self._timer.interval()
+
+    @debounce_ms.setter
+    def debounce_ms(self, value: int) -> None:
+        self._timer.setInterval(value)
+
+    def schedule(self) -> None:
+        """(Re)start the debounce timer. Thread-safe via QMetaObject.
+
+        No-op while suppressed (e.g. during MIDI file playback to avoid
+        large SysEx writes blocking the output port).
+        """
+        if self._suppressed:
+            return
+        QMetaObject.invokeMethod(
+            self._timer, "start", Qt.ConnectionType.AutoConnection,
+        )
+
+    def cancel(self) -> None:
+        QMetaObject.invokeMethod(
+            self._timer, "stop", Qt.ConnectionType.AutoConnection,
+        )
+
+    @property
+    def is_pending(self) -> bool:
+        return self._timer.isActive()
@@ -0,0 +1,409 @@
+from __future__ import annotations
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+from core.logger import AppLogger
+from midi.layout import LAYOUT
+from midi.param_codec import decodable, decode_params
+from midi.params import ParamDef
+from midi.shadow import PULLED, VERIFIED, WRITTEN, DeviceShadow
+from midi.sysex import (
+    build_slot_messages, build_program_dump_request, build_program_write,
+    build_program_write_request, parse_program_dump, extract_patch_name,
+)
+from midi.sysex_buffer import SysExProgramBuffer
+from model.patch import Patch
+
+SLOT_SWITCH_DELAY_S = 0.05  # let the device switch programs before dumping
+
+
+def select_slot(device, slot: int, channel: int = 1) -> int:
+    """Send bank select + program change for *slot* (0-199); returns bytes sent."""
+    sent = 0
+    for m in build_slot_messages(channel=channel, slot=slot):
+        device.send(m)
+        sent += len(m)
+    return sent
+
+
+def request_program(device, channel: int = 1, timeout: float = 2.0,
+                    logger: AppLogger | None = None) -> bytes | None:
+    """Request a dump of the current edit buffer and wait for the reply.
+
+    Returns the packed program payload, or None on timeout.
+    """
+    received: list[bytes] = []
+    event = threading.Event()
+
+    def on_sysex(midi_event, data=None):
+        message, _ = midi_event
+        if logger is not None:
+            logger.midi(f"RX: {[hex(b) for b in message[:12]]}{'...' if len(message) > 12 else ''}")
+        parsed = parse_program_dump(list(message))
+        if parsed is not None:
+            received.append(parsed)
+            event.set()
+
+    device.set_sysex_callback(on_sysex)
+    try:
+        device.send(build_program_dump_request(channel=channel))
+        event.wait(timeout=timeout)
+    finally:
+        # Clear callback so a late reply is not attributed to the next slot
+        try:
+            device.set_sysex_callback(lambda e, d=None: None)
+        except Exception:
+            pass
+    return received[0] if received else None
+
+
+def pull_program(device, slot: int | None = None, channel: int = 1,
+                 timeout: float = 2.0, logger: AppLogger | None = None) -> Patch | None:
+    """Pull one program from the device.
+
+    When *slot* is given the device is switched to it first; otherwise the
+    current edit buffer is dumped.  Returns None if the device did not reply.
+    """
+    if slot is not None:
+        select_slot(device, slot, channel)
+        time.sleep(SLOT_SWITCH_DELAY_S)
+    data = request_program(device, channel=channel, timeout=timeout, logger=logger)
+    if data is None:
+        return None
+    number = slot if slot is not None else 0
+    name = extract_patch_name(data) or f"Program {number + 1:03d}"
+    return Patch(name=name, program_number=number, sysex_data=data)
+
+
+def pull_slots(
+    device,
+    slots: list[int],
+    channel: int = 1,
+    timeout: float = 2.0,
+    logger: AppLogger | None = None,
+    on_progress: Callable[[int, int, int], None] | None = None,
+    on_patch: Callable[[int, Patch | None], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+    restore_slot: int | None = None,
+    shadow: DeviceShadow | None = None,
+    trust_s: float = 0.0,
+    spot_check: float = 0.0,
+) -> list[Patch]:
+    """Pull several slots in order.
+
+    *on_progress(done, total, slot)* is called before each slot and
+    *on_patch(slot, patch_or_None)* after it.  If *restore_slot* is given
+    the device is switched back to it afterwards unless cancelled.
+
+    With a *shadow*, slots it saw on the device within *trust_s* seconds
+    are served from it without a dump, except for a random *spot_check*
+    fraction that is pulled anyway; every pulled slot is recorded.
+    """
+    total = len(slots)
+    patches: list[Patch] = []
+    cancelled = False
+    try:
+        for i, slot in enumerate(slots):
+            if is_cancelled is not None and is_cancelled():
+                cancelled = True
+                break
+            if on_progress is not None:
+                on_progress(i, total, slot)
+            cached = shadow.trusted(slot, trust_s) if shadow is not None and trust_s > 0 else None
+            if cached is not None and random.random() >= spot_check:
+                shadow.skipped(len(build_program_write(channel, cached.data)))
+                patch = Patch(name=extract_patch_name(cached.data) or f"Program {slot + 1:03d}",
+                              program_number=slot, sysex_data=cached.data)
+            else:
+                patch = pull_program(device, slot=slot, channel=channel,
+                                     timeout=timeout, logger=logger)
+                if shadow is not None and patch is not None:
+                    if cached is not None and not shadow.matches(slot, patch.sysex_data):
+                        if logger is not None:
+                            logger.midi(f"Slot {slot + 1:03d}: spot check found a hardware change")
+                    shadow.record(slot, patch.sysex_data, PULLED)
+                    shadow.selected(slot)
+            if patch is not None:
+                patches.append(patch)
+            if on_patch is not None:
+                on_patch(slot, patch)
+    finally:
+        if restore_slot is not None and not cancelled:
+            try:
+                select_slot(device, restore_slot, channel)
+                if logger is not None:
+                    logger.midi(f"Restored device to slot {restore_slot}")
+            except Exception:
+                pass
+        if shadow is not None:
+            shadow.save()
+    return patches
+
+
+def push_program(device, data: bytes, slot: int | None = None,
+                 channel: int = 1, store: bool = False) -> int:
+    """Write *data* to the device edit buffer; returns the MIDI bytes sent.
+
+    With *slot*, the device is switched to that slot first so the program
+    lands there; with *store* a program write request is sent afterwards to
+    commit the edit buffer to the slot's memory.
+    """
+    sent = 0
+    if slot is not None:
+        sent += select_slot(device, slot, channel)
+        time.sleep(SLOT_SWITCH_DELAY_S)
+    message = build_program_write(channel=channel, data=data)
+    device.send(message)
+    sent += len(message)
+    if store and slot is not None:
+        request = build_program_write_request(channel=channel, slot=slot)
+        device.send(request)
+        sent += len(request)
+    return sent
+
+
+def write_edit_buffer(device, data: bytes, channel: int = 1,
+                      shadow: DeviceShadow | None = None) -> int:
+    """Send *data* to the edit buffer unless *shadow* says it is already there.
+
+    Returns the MIDI bytes sent (0 when skipped).
+    """
+    message = build_program_write(channel=channel, data=data)
+    if shadow is not None and shadow.matches(None, data):
+        shadow.skipped(len(message))
+        return 0
+    device.send(message)
+    return len(message)
+
+
+def parameter_messages(before: bytes, after: bytes, params: list[ParamDef],
+                       channel: int = 1) -> list[list[int]] | None:
+    """Realtime NRPN/CC messages that turn program *before* into *after*.
+
+    Returns None if a changed byte is not fully explained by parameters
+    with a realtime address, in which case a program write is needed.
+    """
+    if len(before) != len(after):
+        return None
+    changed = {i for i, (a, b) in enumerate(zip(before, after)) if a != b}
+    if not changed:
+        return []
+    params = [p for p in decodable(params) if p.sysex_offset in changed]
+    old, new = decode_params(before, params), decode_params(after, params)
+    rebuilt = SysExProgramBuffer(before)
+    messages: list[list[int]] = []
+    for p in params:
+        value = new[p.name]
+        if value == old[p.name]:
+            continue
+        if not (p.is_nrpn or p.cc_number is not None) or not p.min_val <= value <= p.max_val:
+            return None
+        rebuilt.set_param(p, value)
+        msg = p.build_message(channel=channel, value=value)
+        messages.extend(msg[i:i + 3] for i in range(0, len(msg), 3))
+    if rebuilt.to_bytes() != bytes(after):
+        return None
+    return messages
+
+
+def update_edit_buffer(device, before: bytes, after: bytes, params: list[ParamDef],
+                       channel: int = 1, shadow: DeviceShadow | None = None) -> int:
+    """Move the device edit buffer from *before* to *after* with the fewest bytes.
+
+    Small differences go out as parameter messages, anything else as a
+    full program write.  Returns the MIDI bytes sent.
+    """
+    messages = parameter_messages(before, after, params, channel)
+    full = len(build_program_write(channel=channel, data=after))
+    if messages is None or sum(len(m) for m in messages) >= full:
+        return write_edit_buffer(device, after, channel, shadow)
+    known = shadow is not None and shadow.matches(None, before)
+    for message in messages:
+        device.send(message)
+    if known:
+        shadow.record(None, after, WRITTEN)
+    return sum(len(m) for m in messages)
+
+
+# -- bank push --
+
+class WritePacer:
+    """Adaptive gap between program writes.
+
+    The gap starts at *gap* seconds (typically seeded from a measured dump
+    round trip) and follows additive-increase/multiplicative-decrease on
+    verification results: each confirmed write shortens it, each failure
+    doubles it, within [*min_gap*, *max_gap*].
+    """
+
+    def __init__(self, gap: float = 0.1, min_gap: float = 0.01, max_gap: float = 2.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        self.min_gap = min_gap
+        self.max_gap = max_gap
+        self.gap = min(max(gap, min_gap), max_gap)
+        self._clock = clock
+        self._sleep = sleep
+        self._last_sent: float | None = None
+
+    def wait(self) -> None:
+        """Block until *gap* seconds have passed since the previous write."""
+        if self._last_sent is not None:
+            remaining = self._last_sent + self.gap - self._clock()
+            if remaining > 0:
+                self._sleep(remaining)
+
+    def sent(self) -> None:
+        self._last_sent = self._clock()
+
+    def success(self) -> None:
+        self.gap = max(self.min_gap, self.gap * 0.8)
+
+    def failure(self) -> None:
+        self.gap = min(self.max_gap, self.gap * 2)
+
+
+@dataclass
+class PushReport:
+    total: int = 0
+    written: list[int] = field(default_factory=list)
+    failed: dict[int, str] = field(default_factory=dict)   # slot -> reason
+    skipped: list[int] = field(default_factory=list)       # already on the device
+    attempts: int = 0
+    bytes_sent: int = 0
+    elapsed_s: float = 0.0
+    verified: bool = False
+    cancelled: bool = False
+
+    @property
+    def programs_per_s(self) -> float:
+        return len(self.written) / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    @property
+    def bytes_per_s(self) -> float:
+        return self.bytes_sent / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    def summary(self) -> str:
+        text = (f"{len(self.written)} of {self.total} programs "
+                f"{'verified' if self.verified else 'written'} in {self.elapsed_s:.1f}s "
+                f"({self.programs_per_s:.1f} programs/s, {self.bytes_per_s / 1024:.1f} KB/s)")
+        if self.skipped:
+            text += f", {len(self.skipped)} already on the device"
+        if self.failed:
+            text += f", {len(self.failed)} failed"
+        return text
+
+
+def measure_round_trip(device, channel: int = 1, timeout: float = 2.0,
+                       logger: AppLogger | None = None) -> float | None:
+    """Seconds for a dump request/reply of the edit buffer, or None on timeout."""
+    start = time.monotonic()
+    if request_program(device, channel=channel, timeout=timeout, logger=logger) is None:
+        return None
+    return time.monotonic() - start
+
+
+def push_bank(
+    device,
+    programs: list[tuple[int, bytes]],
+    channel: int = 1,
+    store: bool = True,
+    verify: bool = False,
+    retries: int = 2,
+    timeout: float = 2.0,
+    pacer: WritePacer | None = None,
+    logger: AppLogger | None = None,
+    on_progress: Callable[[int, int, int], None] | None = None,
+    on_result: Callable[[int, bool, str], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+    restore_slot: int | None = None,
+    shadow: DeviceShadow | None = None,
+) -> PushReport:
+    """Write (slot, data) programs to the device, optionally verifying each.
+
+    Writes are spaced by *pacer*.  When none is given and *verify* is set,
+    the pacer is seeded from a measured dump round trip.  With *verify*
+    each slot is read back (re-selected first when *store* is set, so the
+    stored copy is checked, not the edit buffer) and compared ignoring the
+    checksum/Extra tail.  Mismatches and missing replies are retried up to
+    *retries* times.  *on_progress(done, total, slot)* is called before
+    each slot, *on_result(slot, ok, reason)* after it.
+
+    With a *shadow*, slots the shadow saw holding the program on the
+    device (pulled or verified) are skipped; a slot we only sent a store
+    request for is written again, since the device never confirms a
+    store.  Verified slots are recorded as such and failed ones forgotten.
+    """
+    report = PushReport(total=len(programs), verified=verify)
+    start = time.monotonic()
+    if pacer is None:
+        pacer = WritePacer()
+        if verify and programs:
+            rtt = measure_round_trip(device, channel=channel, timeout=timeout, logger=logger)
+            if rtt is not None:
+                pacer.gap = min(max(rtt, pacer.min_gap), pacer.max_gap)
+                if logger is not None:
+                    logger.midi(f"Measured dump round trip {rtt * 1000:.0f} ms")
+    try:
+        for i, (slot, data) in enumerate(programs):
+            if is_cancelled is not None and is_cancelled():
+                report.cancelled = True
+                break
+            if on_progress is not None:
+                on_progress(i, len(programs), slot)
+            if shadow is not None and store and shadow.matches(slot, data) \
+                    and shadow.get(slot).trusted:
+                shadow.skipped(len(build_program_write(channel, data)))
+                report.skipped.append(slot)
+                report.written.append(slot)
+                if on_result is not None:
+                    on_result(slot, True, "")
+                continue
+            expected = LAYOUT.normalized(data)
+            reason = ""
+            for _ in range(retries + 1):
+                pacer.wait()
+                report.bytes_sent += push_program(device, data, slot=slot,
+                                                  channel=channel, store=store)
+                pacer.sent()
+                report.attempts += 1
+                if not verify:
+                    reason = ""
+                    break
+                if store:
+                    select_slot(device, slot, channel)
+                    time.sleep(SLOT_SWITCH_DELAY_S)
+                reply = request_program(device, channel=channel, timeout=timeout, logger=logger)
+                if reply is None:
+                    reason = "no reply to verification dump"
+                elif LAYOUT.normalized(reply) != expected:
+                    reason = "read-back differs from written program"
+                else:
+                    reason = ""
+                    pacer.success()
+                    if shadow is not None and store:
+                        shadow.record(slot, data, VERIFIED)
+                    break
+                pacer.failure()
+                if logger is not None:
+                    logger.midi(f"Slot {slot + 1:03d}: {reason}; gap now {pacer.gap * 1000:.0f} ms")
+            if reason:
+                report.failed[slot] = reason
+                if shadow is not None:
+                    shadow.invalidate(slot)
+            else:
+                report.written.append(slot)
+            if on_result is not None:
+                on_result(slot, not reason, reason)
+    finally:
+        if restore_slot is not None and not report.cancelled:
+            try:
+                select_slot(device, restore_slot, channel)
+            except Exception:
+                pass
+        report.elapsed_s = time.monotonic() - start
+        if shadow is not None:
+            shadow.save()
+    return report
@@ -0,0 +1,257 @@
+"""Bulk import of .syx / .rk100s2_prog files, directories and zip archives.
+
+Sources are decoded on a process pool and committed to the ``Library`` in
+batches.  ``.syx`` files are memory-mapped and scanned for F0 ... F7
+messages, so multi-program banks and ALL_DUMP payloads are split without
+reading them into Python lists.  Qt-free; the GUI runs it on a QThread.
+"""
+from __future__ import annotations
+import mmap
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Callable, Iterator
+from midi.layout import PROGRAM_DATA_SIZE
+from midi.sysex import extract_patch_name, parse_all_dump, parse_program_dump
+from model.library import Library
+from model.patch import Patch
+
+PROG_SUFFIX = ".rk100s2_prog"
+SYX_SUFFIX = ".syx"
+ZIP_SUFFIX = ".zip"
+PATCH_SUFFIXES = (PROG_SUFFIX, SYX_SUFFIX)
+
+# (path, archive member or None) — a member is read from inside the zip
+Source = tuple[str, str | None]
+# (source label, program number or None, packed program data)
+Program = tuple[str, int | None, bytes]
+
+
+@dataclass
+class ImportResult:
+    paths: list[Path] = field(default_factory=list)
+    failed: list[tuple[str, str]] = field(default_factory=list)  # (source, error)
+    cancelled: bool = False
+
+    @property
+    def imported(self) -> int:
+        return len(self.paths)
+
+
+# -- parsing --
+
+def iter_sysex_messages(buf) -> Iterator[bytes]:
+    """Yield each F0 ... F7 message in *buf* (bytes or mmap)."""
+    pos = 0
+    while True:
+        start = buf.find(b"\xF0", pos)
+        if start < 0:
+            return
+        end = buf.find(b"\xF7", start + 1)
+        if end < 0:
+            return
+        yield buf[start:end + 1]
+        pos = end + 1
+
+
+def programs_from_syx(buf) -> list[tuple[int | None, bytes]]:
+    """Split a .syx buffer into (program_number, data) pairs.
+
+    Handles single PROGRAM_DUMP messages, banks of several, ALL_DUMP
+    payloads (programs packed back to back, 496 bytes each; the index is
+    the program number) and the raw, unwrapped payloads the library writes
+    itself.  Raises ValueError for a dump too short to hold its programs.
+    """
+    if len(buf) == 0:
+        return []
+    if buf[:1] != b"\xF0":
+        data = bytes(buf)
+        return [(None, data)] if len(data) >= PROGRAM_DATA_SIZE else []
+    programs: list[tuple[int | None, bytes]] = []
+    for message in iter_sysex_messages(buf):
+        data = parse_program_dump(message)
+        if data is not None:
+            if len(data) < PROGRAM_DATA_SIZE:
+                raise ValueError(f"Program dump {len(programs) + 1} is truncated: "
+                                 f"{len(data)} of {PROGRAM_DATA_SIZE} bytes")
+            programs.append((len(programs), data))
+            continue
+        payload = parse_all_dump(message)
+        if payload is not None:
+            count, extra = divmod(len(payload), PROGRAM_DATA_SIZE)
+            if count == 0 or extra:
+                raise ValueError(f"All-programs dump of {len(payload)} bytes is not a "
+                                 f"whole number of {PROGRAM_DATA_SIZE}-byte programs")
+            for i in range(count):
+                programs.append((i, payload[i * PROGRAM_DATA_SIZE:(i + 1) * PROGRAM_DATA_SIZE]))
+    if len(programs) == 1:
+        return [(None, programs[0][1])]
+    return programs
+
+
+def _read_syx(path: str):
+    """mmap a file for scanning; falls back to bytes for empty files."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def decode_source(path: str, member: str | None = None,
+                  archive: zipfile.ZipFile | None = None) -> list[Program]:
+    """Decode one file (or zip member) into programs; raises ValueError/OSError."""
+    from tools.file_format import parse_prog_bytes, prog_file_to_sysex
+    name = member or path
+    label = f"{path}!{member}" if member else path
+    if member is not None:
+        if archive is None:
+            with zipfile.ZipFile(path) as archive:
+                buf = archive.read(member)
+        else:
+            buf = archive.read(member)
+    elif name.lower().endswith(SYX_SUFFIX):
+        buf = _read_syx(path)
+    else:
+        buf = Path(path).read_bytes()
+
+    try:
+        if name.lower().endswith(PROG_SUFFIX):
+            return [(label, None, prog_file_to_sysex(parse_prog_bytes(buf)))]
+        programs = programs_from_syx(buf)
+        if not programs:
+            raise ValueError("No RK-100S 2 program data found")
+        return [(label, number, data) for number, data in programs]
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+
+
+def _decode_chunk(sources: list[Source]) -> tuple[list[Program], list[tuple[str, str]]]:
+    programs: list[Program] = []
+    failures: list[tuple[str, str]] = []
+    archives: dict[str, zipfile.ZipFile] = {}
+    try:
+        for path, member in sources:
+            label = f"{path}!{member}" if member else path
+            try:
+                archive = None
+                if member is not None:
+                    archive = archives.get(path) or archives.setdefault(path, zipfile.ZipFile(path))
+                programs.extend(decode_source(path, member, archive))
+            except (ValueError, OSError, KeyError, zipfile.BadZipFile) as exc:
+                failures.append((label, str(exc)))
+    finally:
+        for archive in archives.values():
+            archive.close()
+    return programs, failures
+
+
+def find_sources(paths: list[Path]) -> tuple[list[Source], list[tuple[str, str]]]:
+    """Expand files, directories and zip archives into importable sources."""
+    sources: list[Source] = []
+    failures: list[tuple[str, str]] = []
+
+    def add_file(path: Path) -> None:
+        suffix = path.suffix.lower()
+        if suffix in PATCH_SUFFIXES:
+            sources.append((str(path), None))
+        elif suffix == ZIP_SUFFIX:
+            try:
+                with zipfile.ZipFile(path) as archive:
+                    for member in sorted(archive.namelist()):
+                        if PurePosixPath(member).suffix.lower() in PATCH_SUFFIXES:
+                            sources.append((str(path), member))
+            except (OSError, zipfile.BadZipFile) as exc:
+                failures.append((str(path), str(exc)))
+
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            for child in sorted(path.rglob("*")):
+                if child.is_file():
+                    add_file(child)
+        elif path.exists():
+            add_file(path)
+        else:
+            failures.append((str(path), "File not found"))
+    return sources, failures
+
+
+def _patch_for(program: Program) -> Patch:
+    label, number, data = program
+    stem = PurePosixPath(label.split("!")[-1]).stem
+    name = extract_patch_name(data)
+    if name is None:
+        name = stem if number is None else f"{stem} {number + 1:03d}"
+    return Patch(name=name, program_number=number or 0, sysex_data=data)
+
+
+def import_paths(
+    library: Library,
+    paths: list[Path],
+    workers: int | None = None,
+    chunk_size: int = 64,
+    batch_size: int = 500,
+    on_progress: Callable[[int, int, str], None] | None = None,
+    is_cancelled: Callable[[], bool] | None = None,
+) -> ImportResult:
+    """Decode every patch under *paths* and save them to *library*.
+
+    Decoding is spread across *workers* processes (default: CPU count) in
+    chunks of *chunk_size* sources; patches are then written in batches of
+    *batch_size* via ``Library.save_patches``.  *on_progress(done, total,
+    message)* reports decoding and saving separately.
+    """
+    sources, failures = find_sources(paths)
+    result = ImportResult(failed=failures)
+    chunks = [sources[i:i + chunk_size] for i in range(0, len(sources), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    def report(done: int) -> None:
+        if on_progress:
+            on_progress(done, len(sources), f"Reading {done} of {len(sources)} files...")
+
+    results: list[tuple[list[Program], list[tuple[str, str]]] | None] = [None] * len(chunks)
+    done = 0
+    if len(chunks) <= 1 or workers == 1:
+        for i, chunk in enumerate(chunks):
+            if is_cancelled is not None and is_cancelled():
+                result.cancelled = True
+                return result
+            results[i] = _decode_chunk(chunk)
+            done += len(chunk)
+            report(done)
+    else:
+        # spawn: forking a process that runs Qt/MIDI threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                                 mp_context=context) as pool:
+            futures = {pool.submit(_decode_chunk, chunk): i for i, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                if is_cancelled is not None and is_cancelled():
+                    result.cancelled = True
+                    for f in futures:
+                        f.cancel()
+                    return result
+                i = futures[future]
+                results[i] = future.result()
+                done += len(chunks[i])
+                report(done)
+
+    programs: list[Program] = []
+    for decoded, failed in results:
+        programs.extend(decoded)
+        result.failed.extend(failed)
+    patches = [_patch_for(p) for p in programs]
+
+    def saved(done: int, total: int) -> None:
+        if on_progress:
+            on_progress(done, total, f"Saving {done} of {total} patches...")
+
+    result.paths = library.save_patches(patches, batch_size=batch_size,
+                                        on_progress=saved, is_cancelled=is_cancelled)
+    result.cancelled = len(result.paths) < len(patches)
+    return result
@@ -1,18 +1,87 @@
 from __future__ import annotations
 import json
 from pathlib import Path
+from typing import Callable
+from midi.layout import content_hash
 from model.patch import Patch
 from model.bank import Bank
 
 
 class Library:
+    """Patch and bank files under *root*.
+
+    Patches with SysEx data are content-addressed: ``patch_index.json``
+    maps ``content_hash`` to the stored patch file, so saving a program the
+    library already holds returns the existing path instead of writing a
+    copy.  The index is rebuilt from the .syx files if missing or corrupt.
+    """
+
     def __init__(self, root: Path) -> None:
         self.root = Path(root)
         self._patches_dir = self.root / "patches"
         self._banks_dir = self.root / "banks"
+        self._index_path = self.root / "patch_index.json"
+        self._index: dict[str, str] | None = None
         self._patches_dir.mkdir(parents=True, exist_ok=True)
         self._banks_dir.mkdir(parents=True, exist_ok=True)
 
+    # -- content index --
+
+    def _load_index(self) -> dict[str, str]:
+        if self._index is None:
+            try:
+                index = json.loads(self._index_path.read_text())
+                if not isinstance(index, dict):
+                    raise ValueError("patch index is not an object")
+                self._index = index
+            except (json.JSONDecodeError, ValueError, OSError):
+                self.rebuild_index()
+        return self._index
+
+    def _write_index(self) -> None:
+        tmp = self._index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._index, indent=2, sort_keys=True))
+        tmp.replace(self._index_path)
+
+    def rebuild_index(self) -> None:
+        """Re-hash every stored patch; for duplicates the first file by name wins."""
+        index: dict[str, str] = {}
+        for syx in sorted(self._patches_dir.glob("*.syx")):
+            if not syx.with_suffix(".json").exists():
+                continue
+            try:
+                index.setdefault(content_hash(syx.read_bytes()), syx.stem + ".json")
+            except OSError:
+                pass
+        self._index = index
+        self._write_index()
+
+    def _lookup(self, key: str) -> Path | None:
+        name = self._load_index().get(key)
+        if name is None:
+            return None
+        path = self._patches_dir / name
+        # Patches edited in place leave stale entries; verify before trusting
+        try:
+            if path.exists() and content_hash(path.with_suffix(".syx").read_bytes()) == key:
+                return path
+        except OSError:
+            pass
+        del self._index[key]
+        self._write_index()
+        return None
+
+    def find_content(self, data: bytes) -> Path | None:
+        """Path of a stored patch with the same program content, if any."""
+        return self._lookup(content_hash(data))
+
+    def find_key(self, key: str) -> Path | None:
+        """Path of the stored patch whose ``content_hash`` is *key*, if any."""
+        return self._lookup(key)
+
+    def has_content(self, data: bytes) -> bool:
+        return self.find_content(data) is not None
+
     def _unique_path(self, directory: Path, slug: str, suffix: str) -> Path:
         path = directory / f"{slug}{suffix}"
         counter = 1
@@ -22,10 +91,115 @@ class Library:
         return path
 
     def save_patch(self, patch: Patch) -> Path:
+        """Save *patch*, or return the stored path if its program is already here."""
+        if patch.sysex_data is not None:
+            existing = self.find_content(patch.sysex_data)
+            if existing is not None:
+                return existing
         path = self._unique_path(self._patches_dir, patch.slug, ".json")
         patch.save(path)
+        if patch.sysex_data is not None:
+            self._index[content_hash(patch.sysex_data)] = path.name
+            self._write_index()
         return path
 
+    def save_patches(
+        self,
+        patches: list[Patch],
+        batch_size: int = 500,
+        on_progress: Callable[[int, int], None] | None = None,
+        is_cancelled: Callable[[], bool] | None = None,
+    ) -> list[Path]:
+        """Save many patches, reserving unique names in memory.
+
+        The patches directory is listed once rather than probed per file.
+        Programs already in the library (or earlier in *patches*) resolve
+        to the stored path, as in ``save_patch``.  Patches are written
+        *batch_size* at a time and the index is updated once per batch; if
+        a write fails the files of the unfinished batch are removed before
+        the error is re-raised, so earlier batches stay complete.
+        """
+        index = self._load_index()
+        taken = {f.name for f in self._patches_dir.iterdir()}
+        saved: list[Path] = []
+        total = len(patches)
+        for start in range(0, total, batch_size):
+            if is_cancelled is not None and is_cancelled():
+                break
+            batch: list[Path] = []
+            written: list[Path] = []
+            added: list[str] = []
+            try:
+                for patch in patches[start:start + batch_size]:
+                    key = None
+                    if patch.sysex_data is not None:
+                        key = content_hash(patch.sysex_data)
+                        existing = self._lookup(key)
+                        if existing is not None:
+                            batch.append(existing)
+                            continue
+                    name = f"{patch.slug}.json"
+                    counter = 1
+                    while name in taken:
+                        name = f"{patch.slug}-{counter}.json"
+                        counter += 1
+                    taken.add(name)
+                    path = self._patches_dir / name
+                    written.append(path)
+                    patch.save(path)
+                    batch.append(path)
+                    if key is not None:
+                        index[key] = name
+                        added.append(key)
+            except OSError:
+                for key in added:
+                    del index[key]
+                for path in written:
+                    self.delete_patch(path)
+                raise
+            if added:
+                self._write_index()
+            saved.extend(batch)
+            if on_progress:
+                on_progress(len(saved), total)
+        return saved
+
+    def update_programs(
+        self,
+        items: list[tuple[Path, bytes]],
+        batch_size: int = 500,
+        on_progress: Callable[[int, int], None] | None = None,
+    ) -> int:
+        """Replace the program data of stored patches in place.
+
+        *items* are (patch JSON path, new data).  Each .syx file is replaced
+        atomically and the index is updated once per batch.  Returns the
+        number of patches written.
+        """
+        index = self._load_index()
+        key_of = {name: key for key, name in index.items()}
+        total = len(items)
+        done = 0
+        for start in range(0, total, batch_size):
+            for json_path, data in items[start:start + batch_size]:
+                syx = Path(json_path).with_suffix(".syx")
+                tmp = syx.with_suffix(".tmp")
+                tmp.write_bytes(data)
+                tmp.replace(syx)
+                name = Path(json_path).name
+                old = key_of.pop(name, None)
+                if old is not None and index.get(old) == name:
+                    del index[old]
+                key = content_hash(data)
+                if key not in index:
+                    index[key] = name
+                    key_of[name] = key
+                done += 1
+            self._write_index()
+            if on_progress:
+                on_progress(done, total)
+        return done
+
     def list_patches(self) -> list[Patch]:
         result = []
         for f in sorted(self._patches_dir.glob("*.json")):
@@ -43,6 +217,8 @@ class Library:
             if syx.exists():
                 syx.unlink()
             f.unlink()
+        self._index = {}
+        self._write_index()
 
     def delete_patch(self, json_path: Path) -> None:
         syx = json_path.with_suffix(".syx")
@@ -50,6 +226,12 @@ class Library:
             syx.unlink()
         if json_path.exists():
             json_path.unlink()
+        index = self._load_index()
+        stale = [key for key, name in index.items() if name == json_path.name]
+        for key in stale:
+            del index[key]
+        if stale:
+            self._write_index()
 
     def save_bank(self, bank: Bank) -> Path:
         path = self._unique_path(self._banks_dir, bank.slug, ".json")
@@ -0,0 +1,318 @@
+"""Text and decoded-parameter search over library patches.
+
+``PatchIndex`` keeps an inverted word index over name, category and notes,
+plus an (N, P) matrix of every SysEx-addressable parameter decoded with
+``midi.param_codec``.  Queries evaluate to boolean numpy masks, so
+parameter filters over tens of thousands of patches cost a few vector
+comparisons.  Rows are added, replaced or removed individually;
+``sync`` applies only the differences against a fresh library listing.
+
+Query syntax::
+
+    t1_osc1_wave=Saw AND fx1_type=Delay AND t1_filter1_cutoff>90
+    pad OR "warm strings"          # word prefix / quoted phrase
+    category:bass NOT notes:old    # field-restricted text
+    (arp_on_off=On OR voice_mode=Layer) t1_amp_level>=100
+
+Terms next to each other are ANDed.  Parameter values may be numbers or
+the parameter's value labels (case-insensitive).
+"""
+from __future__ import annotations
+import bisect
+import re
+from pathlib import Path
+from typing import Callable
+import numpy as np
+from midi.layout import PROGRAM_DATA_SIZE
+from midi.param_codec import decodable, decode_stack
+from midi.params import ParamDef, ParamMap
+from model.patch import Patch
+
+TEXT_FIELDS = ("name", "category", "notes")
+
+_TOKEN_RE = re.compile(r'\s*(\(|\)|"[^"]*"|!=|<=|>=|=|<|>|:|[^\s()=<>!:"]+)')
+_WORD_RE = re.compile(r"\w+")
+_COMPARE: dict[str, Callable[[np.ndarray, int], np.ndarray]] = {
+    "=": np.equal, "!=": np.not_equal, "<": np.less,
+    "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+}
+
+
+class QueryError(ValueError):
+    """Raised for malformed queries, unknown parameters or value labels."""
+
+
+def _words(text: str) -> set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def _tokenize(query: str) -> list[str]:
+    tokens: list[str] = []
+    pos = 0
+    query = query.strip()
+    while pos < len(query):
+        match = _TOKEN_RE.match(query, pos)
+        if match is None:
+            raise QueryError(f"Unexpected character at {pos}: {query[pos:]!r}")
+        tokens.append(match.group(1))
+        pos = match.end()
+    return tokens
+
+
+class PatchIndex:
+    """Incrementally maintained search index keyed by patch path."""
+
+    def __init__(self, param_map: ParamMap | None = None, capacity: int = 256) -> None:
+        self._params: list[ParamDef] = decodable((param_map or ParamMap()).sysex_params())
+        self._param_col = {p.name: j for j, p in enumerate(self._params)}
+        self._values = np.zeros((capacity, len(self._params)), dtype=np.int16)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._decoded = np.zeros(capacity, dtype=bool)  # has full program data
+        self._keys: list[Path | None] = []
+        self._rows: dict[Path, int] = {}
+        self._free: list[int] = []
+        self._fingerprints: dict[int, tuple] = {}
+        self._row_words: dict[int, dict[str, set[str]]] = {}
+        self._postings: dict[str, dict[str, set[int]]] = {f: {} for f in TEXT_FIELDS}
+        self._vocab: dict[str, list[str] | None] = {f: None for f in TEXT_FIELDS}
+        self._text: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: Path) -> bool:
+        return Path(key) in self._rows
+
+    # -- maintenance --
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        values = np.zeros((capacity, len(self._params)), dtype=np.int16)
+        values[:len(self._values)] = self._values
+        self._values = values
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), bool)])
+        self._decoded = np.concatenate(
+            [self._decoded, np.zeros(capacity - len(self._decoded), bool)])
+
+    @staticmethod
+    def _fingerprint(patch: Patch) -> tuple:
+        return (patch.name, patch.category, patch.notes, patch.sysex_data)
+
+    def _index_text(self, row: int, patch: Patch) -> None:
+        words = {f: _words(getattr(patch, f)) for f in TEXT_FIELDS}
+        for f, ws in words.items():
+            postings = self._postings[f]
+            for w in ws:
+                if w not in postings:
+                    postings[w] = set()
+                    self._vocab[f] = None
+                postings[w].add(row)
+        self._row_words[row] = words
+        self._text[row] = "\n".join(
+            " ".join(_WORD_RE.findall(getattr(patch, f).lower())) for f in TEXT_FIELDS)
+
+    def _unindex_text(self, row: int) -> None:
+        for f, ws in self._row_words.pop(row, {}).items():
+            postings = self._postings[f]
+            for w in ws:
+                rows = postings.get(w)
+                if rows is not None:
+                    rows.discard(row)
+                    if not rows:
+                        del postings[w]
+                        self._vocab[f] = None
+        self._text.pop(row, None)
+
+    def add_many(self, items: list[tuple[Path, Patch]]) -> None:
+        """Add or replace several patches, decoding their programs in one pass."""
+        decode_rows: list[int] = []
+        decode_data: list[bytes] = []
+        for key, patch in items:
+            key = Path(key)
+            row = self._rows.get(key)
+            if row is None:
+                row = self._free.pop() if self._free else len(self._keys)
+                if row == len(self._keys):
+                    self._keys.append(key)
+                    self._grow(len(self._keys))
+                else:
+                    self._keys[row] = key
+                self._rows[key] = row
+            else:
+                self._unindex_text(row)
+            self._alive[row] = True
+            self._fingerprints[row] = self._fingerprint(patch)
+            self._index_text(row, patch)
+            data = patch.sysex_data
+            self._decoded[row] = data is not None and len(data) >= PROGRAM_DATA_SIZE
+            if self._decoded[row]:
+                decode_rows.append(row)
+                decode_data.append(bytes(data[:PROGRAM_DATA_SIZE]))
+        if decode_rows:
+            stack = np.frombuffer(b"".join(decode_data), dtype=np.uint8)
+            stack = stack.reshape(len(decode_rows), PROGRAM_DATA_SIZE)
+            self._values[decode_rows] = decode_stack(stack, self._params)
+
+    def add(self, key: Path, patch: Patch) -> None:
+        """Add *patch* under *key*, replacing any previous entry."""
+        self.add_many([(key, patch)])
+
+    def remove(self, key: Path) -> None:
+        row = self._rows.pop(Path(key), None)
+        if row is None:
+            return
+        self._unindex_text(row)
+        self._fingerprints.pop(row, None)
+        self._alive[row] = False
+        self._decoded[row] = False
+        self._keys[row] = None
+        self._free.append(row)
+
+    def sync(self, patches: list[Patch]) -> None:
+        """Bring the index in line with *patches* (keyed by ``source_path``).
+
+        Only new or changed patches are re-indexed, and entries whose file
+        is gone are dropped.
+        """
+        seen: set[Path] = set()
+        changed: list[tuple[Path, Patch]] = []
+        for patch in patches:
+            if patch.source_path is None:
+                continue
+            key = Path(patch.source_path)
+            seen.add(key)
+            row = self._rows.get(key)
+            if row is None or self._fingerprints.get(row) != self._fingerprint(patch):
+                changed.append((key, patch))
+        for key in [k for k in self._rows if k not in seen]:
+            self.remove(key)
+        self.add_many(changed)
+
+    # -- queries --
+
+    def _mask_for_rows(self, rows) -> np.ndarray:
+        mask = np.zeros(len(self._alive), dtype=bool)
+        mask[list(rows)] = True
+        return mask
+
+    def _prefix_rows(self, field: str, prefix: str) -> set[int]:
+        vocab = self._vocab[field]
+        if vocab is None:
+            vocab = self._vocab[field] = sorted(self._postings[field])
+        rows: set[int] = set()
+        i = bisect.bisect_left(vocab, prefix)
+        while i < len(vocab) and vocab[i].startswith(prefix):
+            rows |= self._postings[field][vocab[i]]
+            i += 1
+        return rows
+
+    def _text_mask(self, term: str, fields: tuple[str, ...] = TEXT_FIELDS) -> np.ndarray:
+        words = _WORD_RE.findall(term.lower())
+        if not words:
+            return self._alive.copy()
+        if len(words) == 1 and fields:
+            rows: set[int] = set()
+            for f in fields:
+                rows |= self._prefix_rows(f, words[0])
+            return self._mask_for_rows(rows)
+        # quoted phrase: substring of the combined text
+        phrase = " ".join(words)
+        if fields == TEXT_FIELDS:
+            rows = {r for r, text in self._text.items() if phrase in text}
+        else:
+            rows = {r for r in self._text
+                    if any(phrase in self._field_text(r, f) for f in fields)}
+        return self._mask_for_rows(rows)
+
+    def _field_text(self, row: int, field: str) -> str:
+        return self._text[row].split("\n")[TEXT_FIELDS.index(field)]
+
+    def _param_value(self, param: ParamDef, text: str) -> int:
+        try:
+            return param.parse_value(text)
+        except ValueError as exc:
+            raise QueryError(str(exc)) from None
+
+    def _param_mask(self, name: str, op: str, text: str) -> np.ndarray:
+        col = self._param_col.get(name)
+        if col is None:
+            raise QueryError(f"Unknown parameter {name!r}")
+        value = self._param_value(self._params[col], text)
+        return _COMPARE[op](self._values[:, col], value) & self._decoded
+
+    def query_mask(self, query: str) -> np.ndarray:
+        """Boolean mask over index rows matching *query*."""
+        tokens = _tokenize(query)
+        if not tokens:
+            return self._alive.copy()
+        pos = 0
+
+        def peek() -> str | None:
+            return tokens[pos] if pos < len(tokens) else None
+
+        def take() -> str:
+            nonlocal pos
+            if pos >= len(tokens):
+                raise QueryError("Unexpected end of query")
+            pos += 1
+            return tokens[pos - 1]
+
+        def keyword(token: str | None) -> str | None:
+            return token.upper() if token and token.upper() in ("AND", "OR", "NOT") else None
+
+        def parse_or() -> np.ndarray:
+            mask = parse_and()
+            while keyword(peek()) == "OR":
+                take()
+                mask = mask | parse_and()
+            return mask
+
+        def parse_and() -> np.ndarray:
+            mask = parse_not()
+            while peek() is not None and peek() != ")" and keyword(peek()) != "OR":
+                if keyword(peek()) == "AND":
+                    take()
+                mask = mask & parse_not()
+            return mask
+
+        def parse_not() -> np.ndarray:
+            if keyword(peek()) == "NOT":
+                take()
+                return ~parse_not()
+            return parse_atom()
+
+        def parse_atom() -> np.ndarray:
+            token = take()
+            if token == "(":
+                mask = parse_or()
+                if take() != ")":
+                    raise QueryError("Expected ')'")
+                return mask
+            if token == ")" or token in _COMPARE or token == ":":
+                raise QueryError(f"Unexpected {token!r}")
+            if token.startswith('"'):
+                return self._text_mask(token.strip('"'))
+            op = peek()
+            if op in _COMPARE:
+                take()
+                return self._param_mask(token, op, take().strip('"'))
+            if op == ":":
+                take()
+                if token.lower() not in TEXT_FIELDS:
+                    raise QueryError(f"Unknown field {token!r} (expected one of: "
+                                     f"{', '.join(TEXT_FIELDS)})")
+                return self._text_mask(take().strip('"'), (token.lower(),))
+            return self._text_mask(token)
+
+        mask = parse_or()
+        if pos != len(tokens):
+            raise QueryError(f"Unexpected {tokens[pos]!r}")
+        return mask & self._alive
+
+    def search(self, query: str) -> list[Path]:
+        """Paths of matching patches, in index order."""
+        return [self._keys[row] for row in np.flatnonzero(self.query_mask(query))]
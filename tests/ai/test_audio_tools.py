@@ -2,6 +2,14 @@ import numpy as np
 from pathlib import Path
 from audio.engine import generate_test_tone
 from scipy.io import wavfile
+import pytest
+import audio.feature_cache
+from audio.takes import TakeRegistry
+
+
+@pytest.fixture(autouse=True)
+def _feature_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio.feature_cache, "FEATURE_CACHE_DIR", tmp_path / "features")
 
 def test_analyze_audio_tool(tmp_path):
     # Create a test WAV
@@ -13,6 +21,50 @@ def test_analyze_audio_tool(tmp_path):
     # Test the tool method directly
     ctrl = AIController.__new__(AIController)
     ctrl._logger = type("L", (), {"ai": lambda self, m: None, "audio": lambda self, m: None})()
+    ctrl._takes = TakeRegistry()
     result = ctrl._tool_analyze_audio(str(wav_path))
     assert "fundamental_hz" in result
     assert "440" in result or "439" in result or "441" in result
+
+
+def test_compare_audio_tool_reuses_target_analysis(tmp_path):
+    target = tmp_path / "target.wav"
+    wavfile.write(str(target), 44100, np.int16(generate_test_tone(440.0, 1.0, 44100) * 32767))
+    takes = []
+    for i, freq in enumerate((440.0, 880.0)):
+        takes.append(tmp_path / f"take{i}.wav")
+        wavfile.write(str(takes[-1]), 44100, np.int16(generate_test_tone(freq, 1.0, 44100) * 32767))
+
+    from ai.controller import AIController
+    ctrl = AIController.__new__(AIController)
+    ctrl._logger = type("L", (), {"ai": lambda self, m: None, "audio": lambda self, m: None})()
+    ctrl._takes = TakeRegistry()
+    same = ctrl._tool_compare_audio(str(target), str(takes[0]))
+    cache = audio.feature_cache.shared_cache()
+    hits = cache.hits
+    other = ctrl._tool_compare_audio(str(target), str(takes[1]))
+    assert cache.hits == hits + 1 and cache.misses == 2
+    assert "spectral_distance" in same and "envelope_distance" in same and same != other
+
+
+def test_audition_tool_needs_device():
+    from ai.controller import AIController
+    ctrl = AIController.__new__(AIController)
+    ctrl._device = type("D", (), {"connected": False})()
+    assert ctrl._tool_audition(60, 100, 500) == "Device not connected"
+
+
+def test_audio_tools_accept_take_ids(tmp_path):
+    from ai.controller import AIController
+    ctrl = AIController.__new__(AIController)
+    ctrl._logger = type("L", (), {"ai": lambda self, m: None, "audio": lambda self, m: None})()
+    ctrl._takes = TakeRegistry()
+    target = ctrl._takes.add(generate_test_tone(440.0, 1.0, 44100), 44100)
+    take = ctrl._takes.add(generate_test_tone(440.0, 1.0, 44100), 44100)
+    assert "fundamental_hz" in ctrl._tool_analyze_audio(take)
+    assert "'distance': 0.0" in ctrl._tool_compare_audio(target, take)
+    assert "Unknown take" in ctrl._tool_analyze_audio("take-99")
+    assert not list(tmp_path.glob("*.wav"))
+    assert not list((tmp_path / "features").glob("*.npz"))   # takes stay off the disk cache
+    assert ctrl._tool_save_take(take, str(tmp_path / "keep.wav")).startswith("Saved")
+    assert (tmp_path / "keep.wav").exists()
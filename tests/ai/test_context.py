@@ -0,0 +1,85 @@
+from ai.context import ConversationContext, estimate_tokens
+from ai.llm import Message
+
+LISTING = "\n".join(f"p{i}: Param {i} [0-127] current={i}" for i in range(200))
+
+
+def _assistant(text="", tool="list_parameters"):
+    return Message(role="assistant", content=text,
+                   tool_calls=[{"id": "1", "name": tool, "input": {}}])
+
+
+def test_token_estimate_counts_tool_calls():
+    plain = Message(role="assistant", content="x" * 400)
+    assert estimate_tokens(plain) == 104
+    assert estimate_tokens(_assistant("x" * 400)) > estimate_tokens(plain)
+
+
+def test_repeated_listing_is_stored_as_a_diff():
+    ctx = ConversationContext()
+    ctx.append(Message(role="user", content="make it brighter"))
+    first = ctx.add_tool_result("list_parameters", LISTING)
+    assert first.endswith(LISTING)
+    again = ctx.add_tool_result("list_parameters", LISTING)
+    assert "unchanged since the last listing" in again
+    changed = LISTING.replace("p7: Param 7 [0-127] current=7", "p7: Param 7 [0-127] current=90")
+    diff = ctx.add_tool_result("list_parameters", changed.replace("p199:", "gone:"))
+    assert "p7: Param 7 [0-127] current=90" in diff
+    assert "p8:" not in diff
+    assert "no longer listed: p199" in diff
+    assert "unchanged" in ctx.add_tool_result("list_parameters", changed.replace("p199:", "gone:"))
+
+
+def test_stale_tool_results_are_shortened_but_live_listing_kept():
+    ctx = ConversationContext(budget_tokens=100_000, keep_recent=2)
+    ctx.append(Message(role="user", content="hi"))
+    ctx.append(_assistant(tool="list_parameters"))
+    ctx.add_tool_result("list_parameters", LISTING)
+    ctx.append(_assistant(tool="analyze_audio"))
+    ctx.add_tool_result("analyze_audio", "summary line\n" + "detail\n" * 50)
+    for i in range(3):
+        ctx.append(Message(role="assistant", content=f"turn {i}"))
+    messages = ctx.request()
+    assert messages[2].content.endswith(LISTING)
+    assert messages[4].content == ("Tool result for analyze_audio: summary line "
+                                   "[50 more lines omitted; call analyze_audio again if needed]")
+
+
+def test_budget_drops_oldest_and_starts_with_a_user_turn():
+    ctx = ConversationContext(budget_tokens=2500, keep_recent=4)
+    for turn in range(10):
+        ctx.append(Message(role="user", content=f"request {turn} " + "x" * 400))
+        ctx.append(_assistant(f"reply {turn}"))
+        ctx.add_tool_result("list_parameters", LISTING)
+    messages = ctx.request()
+    assert ctx.tokens <= 2500
+    assert ctx.dropped > 0
+    assert messages[0].role == "user"
+    assert messages[0].content.startswith(f"[{ctx.dropped} earlier messages omitted")
+    assert not any("request 0" in m.content for m in messages)
+    assert "request 9" in messages[-3].content
+    # later results are diffs against the first listing, so it survives
+    assert sum(m.content.endswith(LISTING) for m in messages) == 1
+    assert "unchanged" in messages[-1].content
+
+
+def test_dropped_listing_resets_the_diff_baseline():
+    ctx = ConversationContext(budget_tokens=200, keep_recent=1)
+    ctx.append(Message(role="user", content="hi"))
+    ctx.add_tool_result("list_parameters", LISTING)
+    ctx.append(Message(role="user", content="next"))
+    ctx.request()
+    assert ctx.add_tool_result("list_parameters", LISTING).endswith(LISTING)
+
+
+def test_session_size_stays_flat():
+    ctx = ConversationContext(budget_tokens=4000)
+    sizes = []
+    for turn in range(200):
+        ctx.append(Message(role="user", content=f"tweak {turn}"))
+        ctx.append(_assistant(tool="audition"))
+        ctx.add_tool_result("audition", f"take t{turn}\n" + "band detail\n" * 40)
+        ctx.add_tool_result("list_parameters", LISTING.replace("current=3", f"current={turn}"))
+        sizes.append(sum(estimate_tokens(m) for m in ctx.request()))
+    assert max(sizes[50:]) <= 4000 + 20
+    assert len(ctx) < 100
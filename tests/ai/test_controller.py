@@ -188,3 +188,106 @@ def test_list_parameters_both_slots():
     assert "--- FX1: Delay ---" in output
     assert "--- FX2: Chorus ---" in output
     assert "fx2_mod_depth" in output
+
+
+# ---------------------------------------------------------------------------
+# optimize_match
+# ---------------------------------------------------------------------------
+
+def test_optimize_match_requires_device_and_known_params():
+    ctrl, _ = _make_controller()
+    assert "Cannot optimize" in ctrl._tool_optimize_match("t.wav", ["t1_filter1_cutoff", "nope"])
+    ctrl._device.connected = False
+    assert ctrl._tool_optimize_match("t.wav") == "Device not connected"
+
+
+def test_optimize_match_applies_best_values_as_one_step(monkeypatch, tmp_path):
+    import numpy as np
+    from scipy.io import wavfile
+    from ai.optimizer import MatchOptimizer, MatchResult
+
+    class FakeAuditioner:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+        def calibrate(self, *args):
+            return 0.01
+
+    best = {"t1_filter1_cutoff": 42, "t1_amp_eg_release": 7}
+    monkeypatch.setattr("audio.audition.Auditioner", FakeAuditioner)
+    monkeypatch.setattr(MatchOptimizer, "run", lambda self, start, *a, **k: MatchResult(
+        best, 0.1, 0.9, 30, 3, 10.0, False))
+    target = tmp_path / "target.wav"
+    wavfile.write(str(target), 44100, np.zeros(4410, dtype=np.int16))
+    ctrl, buf = _make_controller()
+    changed = []
+    ctrl.parameter_changed.connect(lambda n, v: changed.append((n, v)))
+
+    result = ctrl._tool_optimize_match(str(target), list(best))
+    assert result.startswith("Best match distance 0.1000")
+    pm = ParamMap()
+    assert {n: buf.get_param(pm.get(n)) for n in best} == best
+    assert changed == list(best.items()) and not buf.dirty
+    assert ctrl._device.send.call_args[0][0][0] == 0xF0
+    buf.undo()
+    assert buf.get_param(pm.get("t1_filter1_cutoff")) == 0
+
+
+# ---------------------------------------------------------------------------
+# conversation context
+# ---------------------------------------------------------------------------
+
+def test_repeated_parameter_listing_is_sent_as_a_diff():
+    from ai.llm import Message
+    ctrl, buf = _make_controller(fx1_type=6)
+    call = {"id": "1", "name": "list_parameters", "input": {}}
+    sent = []
+
+    def chat(messages, system, tools):
+        sent.append([m.content for m in messages])
+        if len(sent) == 2:
+            buf.set_byte(fx_param_packed(1, 0), 33)
+        if len(sent) <= 2:
+            return Message(role="assistant", content="", tool_calls=[call])
+        return Message(role="assistant", content="done")
+
+    ctrl._backend.chat.side_effect = chat
+    ctrl._context.append(Message(role="user", content="what is set?"))
+    ctrl._run_chat()
+    assert len(sent) == 3
+    listing, diff = sent[2][2], sent[2][4]
+    assert "--- FX1: Delay ---" in listing
+    assert diff.startswith("Tool result for list_parameters: changed since the last listing")
+    assert diff.count("\n") == 1 and "current=33" in diff
+
+
+def test_audition_reports_a_stalled_input(monkeypatch):
+    import audio.audition
+    from audio.audition import AuditionTimeout
+
+    class StalledAuditioner:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+        def play(self, *args, **kwargs):
+            raise AuditionTimeout("No audio from the input device")
+
+    monkeypatch.setattr(audio.audition, "Auditioner", StalledAuditioner)
+    ctrl, _ = _make_controller()
+    ctrl._audition_latency_s = 0.0
+    notes = []
+    ctrl.note_played.connect(lambda *a: notes.append(a))
+    assert ctrl._tool_audition(60, 100, 200) == "Audition failed: No audio from the input device"
+    assert notes == [(60, 100, True), (60, 0, False)]
@@ -0,0 +1,123 @@
+import threading
+import time
+import numpy as np
+import pytest
+from scipy.signal import lfilter
+from ai.optimizer import CMAES, DeviceRenderer, MatchOptimizer, ParamSpace, prescreen
+from audio.compare import SoundMatcher
+from midi.params import ParamMap
+from midi.sysex_buffer import SysExProgramBuffer
+
+SR = 22050
+NAMES = ["t1_filter1_cutoff", "t1_amp_eg_attack", "t1_amp_eg_release"]
+TARGET = {"t1_filter1_cutoff": 40, "t1_amp_eg_attack": 70, "t1_amp_eg_release": 20}
+START = {"t1_filter1_cutoff": 100, "t1_amp_eg_attack": 10, "t1_amp_eg_release": 90}
+
+
+@pytest.fixture(scope="module")
+def space():
+    pm = ParamMap()
+    return ParamSpace([pm.get(n) for n in NAMES])
+
+
+def _render(values):
+    """A filtered saw whose cutoff and envelope follow the parameters."""
+    t = np.arange(int(0.6 * SR)) / SR
+    attack = 1 - np.exp(-t / (0.001 + values["t1_amp_eg_attack"] / 127 * 0.3))
+    release = 0.01 + values["t1_amp_eg_release"] / 127 * 0.5
+    env = np.where(t < 0.3, attack, attack * np.exp(-(t - 0.3) / release))
+    c = np.exp(-2 * np.pi * (100 + values["t1_filter1_cutoff"] / 127 * 8000) / SR)
+    return (lfilter([1 - c], [1, -c], 2 * (t * 220 % 1) - 1) * env).astype(np.float32), SR
+
+
+def test_param_space_round_trips_values(space):
+    assert space.names == NAMES
+    assert space.to_values(space.to_unit(TARGET)) == TARGET
+    assert space.to_values(np.array([-1.0, 2.0, 0.5])) == {
+        "t1_filter1_cutoff": 0, "t1_amp_eg_attack": 127, "t1_amp_eg_release": 64}
+    with pytest.raises(ValueError):
+        ParamSpace([])
+
+
+def test_cmaes_minimises_shifted_sphere():
+    es = CMAES(np.zeros(4), sigma0=0.5, seed=0)
+    goal = np.array([0.3, -0.2, 0.1, 0.4])
+    for _ in range(80):
+        xs = es.ask()
+        es.tell(xs, np.sum((xs - goal) ** 2, axis=1))
+    assert np.allclose(es.mean, goal, atol=1e-3)
+
+
+def test_optimizer_converges_toward_target(space):
+    matcher = SoundMatcher(_render(TARGET)[0], SR)
+    renders = []
+
+    def render(values):
+        renders.append(tuple(values.values()))
+        return _render(values)
+
+    result = MatchOptimizer(space, render, matcher, seed=1).run(START, max_evaluations=80)
+    assert result.evaluations == len(renders) == len(set(renders)) <= 80
+    assert result.distance < 0.15 * result.start_distance
+    assert result.history == sorted(result.history, reverse=True)
+    assert abs(result.values["t1_amp_eg_release"] - TARGET["t1_amp_eg_release"]) <= 10
+
+
+def test_next_render_overlaps_scoring(space):
+    scoring = threading.Event()
+    overlapped = []
+
+    class SlowMatcher:
+        def compare(self, samples, sample_rate):
+            scoring.set()
+            time.sleep(0.02)
+            scoring.clear()
+            return type("C", (), {"distance": float(np.abs(samples).mean())})()
+
+    def render(values):
+        time.sleep(0.01)        # playing the note
+        overlapped.append(scoring.is_set())
+        return np.full(10, values["t1_filter1_cutoff"] / 127, dtype=np.float32), SR
+
+    result = MatchOptimizer(space, render, SlowMatcher(), popsize=6, seed=0).run(
+        START, max_evaluations=13)
+    assert result.evaluations == 13
+    assert sum(overlapped) >= 6
+
+
+def test_stops_early_on_target_or_request(space):
+    matcher = SoundMatcher(_render(TARGET)[0], SR)
+    at_target = MatchOptimizer(space, _render, matcher).run(TARGET, target_distance=0.01)
+    assert at_target.evaluations == 1 and at_target.values == TARGET
+    stopped = MatchOptimizer(space, _render, matcher).run(START, should_stop=lambda: True)
+    assert stopped.evaluations == 1 and stopped.values == START
+
+
+def test_device_renderer_writes_candidate_program(space):
+    program = bytes(496)
+    sent = []
+    device = type("D", (), {"send": lambda self, msg: sent.append(bytes(msg))})()
+    take = type("T", (), {"samples": np.zeros(4, dtype=np.float32), "sample_rate": SR})()
+    played = []
+    auditioner = type("A", (), {"play": lambda self, *a, **k: played.append(a) or take})()
+    renderer = DeviceRenderer(device, program, space, auditioner, note=64, sleep=lambda s: None)
+    samples, rate = renderer(TARGET)
+    assert rate == SR and played == [(64, 100, 0.5)]
+    assert sent[0][0] == 0xF0 and sent[0][-1] == 0xF7
+    candidate = SysExProgramBuffer(renderer.program_for(TARGET))
+    assert candidate.get_param(space.params[0]) == 40
+    assert program == bytes(496)
+
+
+def test_prescreen_on_surrogate_moves_toward_target(space):
+    from audio.surrogate import SAMPLE_RATE, render
+    target = render(TARGET)
+    matcher = SoundMatcher(target, SAMPLE_RATE)
+    results = prescreen(space, START, matcher, candidates=300, sigma=0.4, keep=3, seed=0,
+                        workers=1)
+    assert len(results) == 3 and results[0][0] <= results[-1][0]
+    start_distance = matcher.compare(render(START), SAMPLE_RATE).distance
+    best_distance, best = results[0]
+    assert best_distance < 0.5 * start_distance
+    assert abs(best["t1_filter1_cutoff"] - TARGET["t1_filter1_cutoff"]) < \
+        abs(START["t1_filter1_cutoff"] - TARGET["t1_filter1_cutoff"])
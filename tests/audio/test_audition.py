@@ -0,0 +1,163 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from audio.audition import STALL_TIMEOUT_S, Auditioner, AuditionTimeout, RingBuffer
+
+SR = 8000
+BLOCK = 64
+
+
+class FakeSynth:
+    """Device + input stream: a tone that starts *latency_s* after note-on
+    and decays after note-off, on a clock advanced one block per sleep."""
+
+    def __init__(self, latency_s=0.02, release_tau=0.03, noise=1e-4):
+        self.latency_s = latency_s
+        self.release_tau = release_tau
+        self.noise = noise
+        self.emitted = 0
+        self.on_time = self.off_time = None
+        self.callback = None
+        self.notes = []
+        self._rng = np.random.default_rng(0)
+
+    # MidiDevice side
+    def send_note_on(self, channel, note, velocity):
+        self.notes.append(("on", note, velocity))
+        self.on_time, self.off_time = self.time, None
+
+    def send_note_off(self, channel, note):
+        self.notes.append(("off", note))
+        self.off_time = self.time
+
+    # stream side
+    def __call__(self, callback, **kwargs):
+        self.callback = callback
+        return self
+
+    @property
+    def time(self):
+        return self.emitted / SR
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _level(self, t):
+        level = np.zeros_like(t)
+        if self.on_time is None:
+            return level
+        start = self.on_time + self.latency_s
+        held = t >= start
+        if self.off_time is not None:
+            stop = self.off_time + self.latency_s
+            level = np.where(held & (t < stop), 0.5, 0.0)
+            level = np.where(t >= stop, 0.5 * np.exp(-(t - stop) / self.release_tau), level)
+            return level
+        return np.where(held, 0.5, 0.0)
+
+    def advance(self, _seconds=None):
+        t = (self.emitted + np.arange(BLOCK)) / SR
+        block = self._level(t) * np.sin(2 * np.pi * 440 * t)
+        block += self.noise * self._rng.standard_normal(BLOCK)
+        self.callback(block.astype(np.float32)[:, None], BLOCK,
+                      SimpleNamespace(inputBufferAdcTime=self.emitted / SR), None)
+        self.emitted += BLOCK
+
+
+def _auditioner(synth, **kwargs):
+    return Auditioner(synth, sample_rate=SR, stream_factory=synth, sleep=synth.advance, **kwargs)
+
+
+def test_ring_buffer_wraps_and_zero_fills():
+    ring = RingBuffer(8)
+    ring.write(np.arange(6))
+    ring.write(np.arange(6, 12))
+    assert ring.written == 12
+    assert ring.read(4, 12).tolist() == list(range(4, 12))
+    assert ring.read(2, 6).tolist() == [0, 0, 4, 5]
+    assert ring.read(10, 14).tolist() == [10, 11, 0, 0]
+
+
+def test_take_covers_note_and_release_only():
+    synth = FakeSynth()
+    with _auditioner(synth) as aud:
+        take = aud.play(note=64, velocity=90, duration_s=0.2, max_release_s=1.0)
+    assert synth.notes == [("on", 64, 90), ("off", 64)]
+    # 200 ms held plus ~3 release time constants to -50 dB re peak, no more
+    assert 0.2 < take.duration_s < 0.2 + 0.5
+    assert 0.1 < take.release_s < 0.5
+    assert take.onset_s == pytest.approx(0.02, abs=0.005)
+    assert np.abs(take.samples[:int(0.01 * SR)]).max() > 0.1    # attack kept
+
+
+def test_calibrated_latency_aligns_onset():
+    synth = FakeSynth(latency_s=0.035)
+    aud = _auditioner(synth)
+    assert aud.calibrate(repeats=2) == pytest.approx(0.035, abs=0.003)
+    take = aud.play(duration_s=0.1, trim=False)
+    aud.close()
+    assert take.onset_s < 0.003
+    assert np.sqrt(np.mean(take.samples[:int(0.02 * SR)] ** 2)) > 0.3   # sound from frame 0
+
+
+def test_release_capture_is_capped():
+    synth = FakeSynth(release_tau=10.0)
+    with _auditioner(synth) as aud:
+        take = aud.play(duration_s=0.1, max_release_s=0.3)
+    assert take.release_s == pytest.approx(0.3, abs=0.01)
+
+
+class SilentStream:
+    """An input stream that opens but never calls back."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.time = 0.0
+
+    def __call__(self, callback, **kwargs):
+        return self
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_play_times_out_when_the_stream_delivers_nothing():
+    stream = SilentStream()
+    synth = FakeSynth()
+    aud = Auditioner(synth, sample_rate=SR, stream_factory=stream, sleep=stream.sleep,
+                     clock=lambda: stream.now)
+    with pytest.raises(AuditionTimeout):
+        aud.play(duration_s=0.2, max_release_s=1.0)
+    assert stream.now == pytest.approx(0.2 + 1.0 + STALL_TIMEOUT_S, abs=0.01)
+    assert synth.notes == []
+
+
+def test_stall_after_note_on_still_sends_note_off():
+    synth = FakeSynth()
+    clock = {"now": 0.0}
+
+    def sleep(seconds):
+        clock["now"] += seconds
+        if synth.on_time is None:      # audio stops right after note-on
+            synth.advance()
+
+    aud = Auditioner(synth, sample_rate=SR, stream_factory=synth, sleep=sleep,
+                     clock=lambda: clock["now"])
+    with pytest.raises(AuditionTimeout):
+        aud.play(note=62, duration_s=0.2, max_release_s=0.5)
+    assert synth.notes == [("on", 62, 100), ("off", 62)]
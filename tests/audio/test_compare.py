@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from scipy.io import wavfile
+from scipy.signal import butter, lfilter
+from audio.compare import SoundMatcher, compare, dtw_distance, matcher_for_file, resample
+from audio.engine import generate_test_tone
+
+SR = 44100
+
+
+def _pluck(freq=220.0, attack=0.01, cutoff=None, noise=0.0, rate=SR, delay_s=0.0):
+    t = np.arange(rate) / rate
+    x = (2 * (t * freq % 1) - 1) * np.minimum(1, t / attack) * np.exp(-t * 2)
+    if cutoff:
+        b, a = butter(2, cutoff / (rate / 2))
+        x = lfilter(b, a, x)
+    x = x + noise * np.random.default_rng(0).standard_normal(len(x))
+    x = np.concatenate([np.zeros(int(delay_s * rate)), x])
+    return x.astype(np.float32)
+
+
+def test_identical_and_delayed_sounds_match():
+    matcher = SoundMatcher(_pluck(), SR)
+    same, delayed = matcher.compare_batch([_pluck(), _pluck(delay_s=0.05)])
+    assert same.distance == pytest.approx(0.0, abs=1e-6)
+    assert delayed.distance < 0.2
+
+
+def test_distance_sees_envelope_noise_and_filter():
+    matcher = SoundMatcher(_pluck(), SR)
+    near = matcher.compare(_pluck(delay_s=0.05))
+    slow, noisy, dark = matcher.compare_batch([_pluck(attack=0.3), _pluck(noise=0.2),
+                                               _pluck(cutoff=1000.0)])
+    assert slow.envelope > 5 * max(near.envelope, 1e-3)
+    assert noisy.noise > 0.1 and dark.noise <= 0.0
+    assert min(slow.distance, noisy.distance, dark.distance) > 5 * near.distance
+    worst = dark.worst_bands(1)[0]
+    assert worst.low_hz >= 4000 and worst.bias_db < -10
+
+
+def test_batch_matches_single_comparisons():
+    matcher = SoundMatcher(_pluck(), SR)
+    candidates = [_pluck(330.0), _pluck(noise=0.1)]
+    batch = matcher.compare_batch(candidates)
+    for candidate, result in zip(candidates, batch):
+        assert matcher.compare(candidate).distance == pytest.approx(result.distance, rel=1e-5)
+
+
+def test_sample_rate_mismatch_is_resampled():
+    tone = generate_test_tone(440.0, 1.0, SR)
+    result = compare(tone, SR, generate_test_tone(440.0, 1.0, 48000), 48000)
+    assert result.distance < 0.05
+    assert len(resample(tone, SR, 22050)) == len(tone) // 2
+
+
+def test_dtw_tolerates_shift_within_radius():
+    a = np.sin(np.linspace(0, 3, 100))
+    shifted = np.roll(a, 3)[None]
+    assert dtw_distance(a, a[None])[0] == 0.0
+    assert dtw_distance(a, shifted, radius=5)[0] < np.abs(a - shifted[0]).mean() / 2
+
+
+def test_matcher_for_file_is_reused_until_changed(tmp_path):
+    path = tmp_path / "target.wav"
+    wavfile.write(str(path), SR, np.int16(_pluck() * 32767))
+    first = matcher_for_file(path)
+    assert matcher_for_file(path) is first
+    result = first.compare(_pluck())
+    assert result.to_dict()["distance"] < 0.01
@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 from audio.engine import AudioAnalyzer, AudioMonitor, generate_test_tone
 
 def test_generate_test_tone():
@@ -37,3 +38,12 @@ def test_audio_monitor_instantiates():
 def test_audio_monitor_not_running_initially():
     monitor = AudioMonitor()
     assert monitor.is_running is False
+
+def test_audio_monitor_callback_applies_gain_and_meters_input():
+    monitor = AudioMonitor(gain=2.0)
+    indata = np.full((256, 1), 0.25, dtype=np.float32)
+    outdata = np.zeros_like(indata)
+    monitor._callback(indata, outdata, 256, None, None)
+    assert np.allclose(outdata, 0.5)
+    assert monitor.meter.ring.written == 256
+    assert monitor.meter.analyze().peak_db == pytest.approx(-12.04, abs=0.01)
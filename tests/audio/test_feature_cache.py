@@ -0,0 +1,90 @@
+import numpy as np
+from scipy.io import wavfile
+import audio.feature_cache as fc
+from audio.engine import generate_test_tone
+from audio.feature_cache import FeatureCache, audio_key, index_paths
+
+SR = 44100
+
+
+def _wav(path, freq, duration=0.5):
+    wavfile.write(str(path), SR, np.int16(generate_test_tone(freq, duration, SR) * 32767))
+    return path
+
+
+def test_same_audio_is_analyzed_once(tmp_path):
+    cache = FeatureCache(tmp_path / "cache")
+    tone = generate_test_tone(330.0, 0.5, SR)
+    first = cache.get(tone, SR)
+    second = cache.get(tone.copy(), SR)
+    assert second is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert audio_key(tone, SR) != audio_key(tone, 48000)
+
+
+def test_disk_entries_survive_restart(tmp_path):
+    tone = generate_test_tone(330.0, 0.5, SR)
+    before = FeatureCache(tmp_path).get(tone, SR)
+    cache = FeatureCache(tmp_path)
+    after = cache.get(tone, SR)
+    assert cache.misses == 0
+    assert after.summary() == before.summary()
+    np.testing.assert_array_equal(after.mfcc, before.mfcc)
+
+
+def test_version_bump_invalidates(tmp_path, monkeypatch):
+    tone = generate_test_tone(330.0, 0.5, SR)
+    FeatureCache(tmp_path).get(tone, SR)
+    monkeypatch.setattr(fc, "FEATURES_VERSION", fc.FEATURES_VERSION + 1)
+    cache = FeatureCache(tmp_path)
+    cache.get(tone, SR)
+    assert cache.misses == 1
+
+
+def test_lru_eviction_keeps_disk_copy(tmp_path):
+    cache = FeatureCache(tmp_path, max_entries=2)
+    tones = [generate_test_tone(f, 0.2, SR) for f in (200.0, 300.0, 400.0)]
+    for tone in tones:
+        cache.get(tone, SR)
+    assert len(cache._memory) == 2
+    memory_only = FeatureCache(None, max_entries=2)
+    for tone in tones + tones[:1]:
+        memory_only.get(tone, SR)
+    assert memory_only.misses == 4
+    cache.get(tones[0], SR)
+    assert cache.misses == 3
+
+
+def test_unchanged_file_is_not_reread(tmp_path, monkeypatch):
+    path = _wav(tmp_path / "a.wav", 220.0)
+    cache = FeatureCache(tmp_path / "cache")
+    first = cache.get_file(path)
+    def reread(p):
+        raise AssertionError(f"{p} was read again")
+    monkeypatch.setattr(fc, "_load_wav", reread)
+    assert FeatureCache(tmp_path / "cache").get_file(path).summary() == first.summary()
+
+
+def test_prune_drops_oldest_entries(tmp_path):
+    cache = FeatureCache(tmp_path, max_files=1)
+    for f in (200.0, 300.0):
+        cache.get_file(_wav(tmp_path / f"{int(f)}.wav", f, 0.2))
+    assert cache.prune() == 1
+    assert len(list(tmp_path.glob("*.npz"))) == 1
+    assert len(cache._files) == 1
+
+
+def test_index_paths_uses_workers_and_skips_known(tmp_path):
+    refs = tmp_path / "refs"
+    (refs / "sub").mkdir(parents=True)
+    for i, f in enumerate((110.0, 220.0, 330.0)):
+        _wav(refs / ("sub" if i else "") / f"{i}.wav", f)
+    (refs / "broken.wav").write_bytes(b"not a wav")
+    cache = FeatureCache(tmp_path / "cache")
+    indexed, failures = index_paths(cache, [refs], workers=2, chunk_size=1)
+    assert indexed == 3
+    assert [p for p, _ in failures] == [str((refs / "broken.wav").resolve())]
+    indexed, failures = index_paths(cache, [refs], workers=2)
+    assert indexed == 0 and len(failures) == 1
+    assert cache.get_file(refs / "sub" / "1.wav") is not None
+    assert cache.misses == 0
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from audio.engine import generate_test_tone
+from audio.features import N_MFCC, envelope_rms, extract, extract_batch, get_extractor
+
+SR = 44100
+
+
+def _saw(freq: float, duration: float) -> np.ndarray:
+    t = np.arange(int(SR * duration)) / SR
+    return (2 * (t * freq % 1) - 1).astype(np.float32)
+
+
+@pytest.mark.parametrize("freq", [55.0, 220.0, 440.0, 1000.0])
+def test_pitch_track_follows_tone(freq):
+    features = extract(generate_test_tone(freq, 1.0, SR), SR)
+    assert features.voiced.mean() > 0.9
+    assert abs(features.fundamental_hz - freq) < freq * 0.01
+
+
+def test_saw_is_brighter_and_more_harmonic_than_sine():
+    sine = extract(generate_test_tone(220.0, 1.0, SR), SR).summary()
+    saw = extract(_saw(220.0, 1.0), SR).summary()
+    assert abs(saw["fundamental_hz"] - 220.0) < 3
+    assert saw["spectral_centroid_hz"] > 2 * sine["spectral_centroid_hz"]
+    assert saw["spectral_rolloff_hz"] > sine["spectral_rolloff_hz"]
+    assert saw["harmonic_ratio"] > sine["harmonic_ratio"]
+    assert len(saw["mfcc"]) == N_MFCC
+
+
+def test_noise_is_unvoiced():
+    noise = np.random.default_rng(0).standard_normal(SR).astype(np.float32)
+    features = extract(noise, SR)
+    assert features.voiced.mean() < 0.1
+    assert features.summary()["spectral_centroid_hz"] > 5000
+
+
+def test_adsr_estimates():
+    t = np.arange(2 * SR) / SR
+    level = np.minimum(1.0, t / 0.2)                              # 200 ms attack
+    level = np.where(t < 0.2, level, 0.5 + 0.5 * np.exp(-(t - 0.2) * 10))
+    level = np.where(t < 1.5, level, level * np.exp(-(t - 1.5) * 30))
+    adsr = extract(_saw(220.0, 2.0) * level.astype(np.float32), SR).adsr
+    assert 0.1 < adsr["attack_s"] < 0.25
+    assert 0.1 < adsr["decay_s"] < 0.6
+    assert 0.4 < adsr["sustain_level"] < 0.7
+    assert 0.02 < adsr["release_s"] < 0.3
+
+
+def test_batch_matches_single_and_handles_lengths():
+    signals = [generate_test_tone(300.0, 0.5, SR), _saw(150.0, 1.0)]
+    batch = extract_batch(signals, SR)
+    for signal, features in zip(signals, batch):
+        single = extract(signal, SR)
+        assert len(features.rms) == len(single.rms)
+        np.testing.assert_allclose(features.centroid_hz, single.centroid_hz, rtol=1e-4)
+        np.testing.assert_allclose(features.spectrum, single.spectrum, rtol=1e-4, atol=1e-6)
+    assert batch[0].duration_s == pytest.approx(0.5)
+
+
+def test_extractor_is_shared_and_silence_is_safe():
+    assert get_extractor(SR) is get_extractor(SR)
+    summary = extract(np.zeros(SR // 2, dtype=np.float32), SR).summary()
+    assert summary["fundamental_hz"] >= 0 and summary["voiced_fraction"] == 0
+
+
+def test_envelope_rms_windows():
+    env = envelope_rms(np.ones(int(SR * 0.12), dtype=np.float32), SR)
+    assert len(env) == 3
+    np.testing.assert_allclose(env, 1.0)
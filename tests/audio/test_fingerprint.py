@@ -0,0 +1,132 @@
+import time
+import numpy as np
+import audio.fingerprint as fp
+from audio.engine import generate_test_tone
+from audio.fingerprint import (DIM, NOTES, DeviceProgramRenderer, FingerprintIndex,
+                               fingerprint, index_programs, nearest_note)
+from midi.layout import content_hash
+from model.patch import Patch
+
+SR = 22050
+
+
+def _tone(note, bright, duration=0.4):
+    t = np.arange(int(duration * SR)) / SR
+    f0 = 440.0 * 2 ** ((note - 69) / 12)
+    partials = sum(bright ** (h - 1) * np.sin(2 * np.pi * h * f0 * t) / h for h in range(1, 9))
+    return (0.3 * partials * np.minimum(1.0, t / 0.01)).astype(np.float32)
+
+
+def _render(program):
+    """Brightness is set by the first program byte."""
+    return [(_tone(note, program[0] / 127), SR) for note in NOTES]
+
+
+def _patch(i):
+    data = bytes([i % 128]) + bytes(495)
+    return Patch(name=f"Patch {i}", program_number=0, sysex_data=data)
+
+
+def test_fingerprint_shape_and_note_choice():
+    vectors = fingerprint([(_tone(60, 0.2), SR), (_tone(60, 0.9), SR),
+                           (generate_test_tone(440.0, 0.3, 44100), 44100)])
+    assert vectors.shape == (3, DIM)
+    assert not np.allclose(vectors[0], vectors[1])
+    assert nearest_note(261.6) == NOTES.index(60)
+    assert nearest_note(70.0) == 0
+    assert nearest_note(0.0) == 1
+
+
+def test_index_resumes_and_skips_known_programs(tmp_path):
+    patches = [_patch(i) for i in (10, 60, 120)]
+    index = FingerprintIndex(tmp_path)
+    calls = []
+
+    def render(program):
+        calls.append(program)
+        return _render(program)
+
+    stop_after_one = lambda: len(calls) >= 1
+    assert index_programs(index, patches, render, should_stop=stop_after_one) == (1, 0)
+    index = FingerprintIndex(tmp_path)
+    assert len(index) == 1
+    progress = []
+    assert index_programs(index, patches + [patches[0]], render,
+                          on_progress=lambda *a: progress.append(a)) == (2, 2)
+    assert len(calls) == 3
+    assert [p[:2] for p in progress] == [(1, 2), (2, 2)]
+    reloaded = FingerprintIndex(tmp_path)
+    assert reloaded.keys == [content_hash(p.sysex_data) for p in patches]
+    np.testing.assert_array_equal(reloaded.matrix, index.matrix)
+
+
+def test_torn_row_and_version_change(tmp_path, monkeypatch):
+    index = FingerprintIndex(tmp_path)
+    index_programs(index, [_patch(5), _patch(90)], _render)
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(b"\0" * 10)
+    reloaded = FingerprintIndex(tmp_path)
+    assert len(reloaded) == 2
+    reloaded.add("k", "Next", np.zeros((len(NOTES), DIM)))
+    assert FingerprintIndex(tmp_path).names[-1] == "Next"
+    monkeypatch.setattr(fp, "FINGERPRINT_VERSION", fp.FINGERPRINT_VERSION + 1)
+    assert len(FingerprintIndex(tmp_path)) == 0
+
+
+def test_query_take_finds_the_closest_timbre(tmp_path):
+    index = FingerprintIndex(tmp_path)
+    index_programs(index, [_patch(i) for i in (0, 30, 60, 90, 127)], _render)
+    best = index.query_take(_tone(84, 65 / 127, 0.6), SR, k=2)
+    assert best[0].name == "Patch 60"
+    assert best[0].distance <= best[1].distance
+
+
+def test_inverted_file_agrees_with_exact_search(monkeypatch):
+    rng = np.random.default_rng(1)
+    centres = rng.normal(size=(40, DIM)) * 4
+    rows = centres[rng.integers(0, 40, 20000)] + rng.normal(size=(20000, DIM))
+    index = FingerprintIndex(None, notes=(60,))
+    for i, row in enumerate(rows):
+        index.add(str(i), f"p{i}", row)
+    queries = rows[rng.integers(0, len(rows), 20)] + 0.1 * rng.normal(size=(20, DIM))
+    index.query(queries[0])     # builds the inverted file
+    start = time.perf_counter()
+    approx = [[n.key for n in index.query(q, k=5)] for q in queries]
+    per_query = (time.perf_counter() - start) / len(queries)
+    monkeypatch.setattr(fp, "IVF_MIN_SIZE", len(rows) + 1)
+    exact = FingerprintIndex(None, notes=(60,))
+    exact.keys, exact.names, exact._matrix = index.keys, index.names, index.matrix
+    truth = [[n.key for n in exact.query(q, k=5)] for q in queries]
+    recall = np.mean([len(set(a) & set(t)) / 5 for a, t in zip(approx, truth)])
+    assert recall >= 0.9
+    assert per_query < 0.05
+
+
+class FakeDevice:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, msg):
+        self.sent.append(msg)
+
+
+class FakeTake:
+    def __init__(self, note):
+        self.samples, self.sample_rate = _tone(note, 0.5), SR
+
+
+class FakeAuditioner:
+    def __init__(self):
+        self.played = []
+
+    def play(self, note, velocity, duration_s, max_release_s):
+        self.played.append(note)
+        return FakeTake(note)
+
+
+def test_device_renderer_writes_then_plays_each_note():
+    device, auditioner = FakeDevice(), FakeAuditioner()
+    takes = DeviceProgramRenderer(device, auditioner, sleep=lambda s: None)(bytes(496))
+    assert len(device.sent) == 1 and device.sent[0][0] == 0xF0
+    assert auditioner.played == list(NOTES)
+    assert [sr for _, sr in takes] == [SR] * len(NOTES)
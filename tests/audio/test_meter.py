@@ -0,0 +1,75 @@
+import time
+import tracemalloc
+import numpy as np
+import pytest
+from audio.engine import generate_test_tone
+from audio.meter import FLOOR_DB, BlockRing, LevelMeter
+
+SR = 44100
+
+
+def test_block_ring_wraps_and_keeps_channel_zero():
+    ring = BlockRing(8)
+    ring.write(np.arange(6, dtype=np.float32))
+    ring.write(np.stack([np.arange(6, 12), -np.ones(6)], axis=1).astype(np.float32))
+    out = np.zeros(5, dtype=np.float32)
+    ring.read_into(ring.written, out)
+    assert ring.written == 12 and out.tolist() == [7, 8, 9, 10, 11]
+    ring.write(np.arange(20, dtype=np.float32))      # longer than the ring
+    ring.read_into(ring.written, out)
+    assert out.tolist() == [15, 16, 17, 18, 19]
+
+
+def test_push_does_not_allocate_arrays():
+    meter = LevelMeter(SR)
+    block = np.zeros((1024, 1), dtype=np.float32)
+    meter.push(block)
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for _ in range(50):
+            meter.push(block)
+        assert tracemalloc.get_traced_memory()[1] - base < block.nbytes
+    finally:
+        tracemalloc.stop()
+
+
+def test_sine_levels_and_spectrum():
+    meter = LevelMeter(SR)
+    tone = 0.5 * generate_test_tone(1000.0, 0.5, SR)
+    for start in range(0, len(tone), 256):
+        meter.push(tone[start:start + 256, None])
+    levels = meter.analyze()
+    assert levels.peak_db == pytest.approx(-6.02, abs=0.1)
+    assert levels.rms_db == pytest.approx(-9.03, abs=0.1)
+    top = int(np.argmax(levels.spectrum_db))
+    assert levels.spectrum_db[top] == pytest.approx(-6.0, abs=0.5)
+    assert levels.band_hz[top] == pytest.approx(1000.0, rel=0.1)
+    assert not levels.clipped
+
+
+def test_peak_hold_and_spectrum_fall_slowly():
+    meter = LevelMeter(SR)
+    meter.push(generate_test_tone(1000.0, 0.1, SR))
+    loud = meter.analyze(0.1)
+    meter.push(np.zeros(SR // 2, dtype=np.float32))
+    quiet = meter.analyze(0.5)
+    assert quiet.peak_db == FLOOR_DB and quiet.hold_db == loud.hold_db
+    assert quiet.spectrum_db.max() == pytest.approx(loud.spectrum_db.max() - 12.0)
+    later = meter.analyze(1.0)
+    assert later.hold_db == pytest.approx(loud.hold_db - 24.0)
+
+
+def test_analysis_thread_publishes_and_stops():
+    meter = LevelMeter(SR, rate_hz=200)
+    meter.start()
+    try:
+        meter.push(generate_test_tone(440.0, 0.2, SR))
+        deadline = time.monotonic() + 2.0
+        while meter.levels.peak_db < -1.0 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert meter.levels.peak_db > -1.0
+    finally:
+        meter.stop()
+    assert not meter.is_running and meter.levels.peak_db == FLOOR_DB
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from audio.features import extract
+from audio.surrogate import SAMPLE_RATE, render, render_batch, values_from_program
+from midi.effects import FX1_TYPE_PACKED
+from midi.params import ParamMap
+from midi.sysex_buffer import SysExProgramBuffer
+
+
+def _centroid(samples):
+    return float(np.nanmedian(extract(samples, SAMPLE_RATE).centroid_hz[:20]))
+
+
+def _rms(samples):
+    return float(np.sqrt(np.mean(samples.astype(float) ** 2)))
+
+
+def test_batch_matches_single_renders():
+    candidates = [{"t1_filter1_cutoff": 50}, {"t1_osc1_wave": 2, "fx1_type": 11}]
+    batch = render_batch(candidates, duration_s=0.2, release_s=0.1)
+    assert batch.shape == (2, int(0.3 * SAMPLE_RATE)) and batch.dtype == np.float32
+    for candidate, row in zip(candidates, batch):
+        assert np.allclose(render(candidate, duration_s=0.2, release_s=0.1), row, atol=1e-5)
+
+
+def test_process_pool_matches_sequential():
+    candidates = [{"t1_filter1_cutoff": c} for c in range(20, 120, 10)]
+    seq = render_batch(candidates, duration_s=0.1, release_s=0.0, workers=1, chunk_size=4)
+    par = render_batch(candidates, duration_s=0.1, release_s=0.0, workers=2, chunk_size=4)
+    assert np.allclose(seq, par)
+
+
+def test_filter_cutoff_type_and_eg():
+    dark, bright = render_batch([{"t1_filter1_cutoff": 50}, {"t1_filter1_cutoff": 110}])
+    assert _centroid(bright) > 2 * _centroid(dark)
+    highpass = render({"t1_filter1_cutoff": 90, "t1_filter1_balance": 64})
+    lowpass = render({"t1_filter1_cutoff": 90, "t1_filter1_balance": 0})
+    assert _centroid(highpass) > 2 * _centroid(lowpass)
+    sweep = extract(render({"t1_filter1_cutoff": 40, "t1_filter1_eg_int": 63,
+                            "t1_filter_eg_decay": 60, "t1_filter_eg_sustain": 0}),
+                    SAMPLE_RATE).centroid_hz
+    assert sweep[2] > 1.3 * sweep[15]
+
+
+def test_amp_envelope_and_waves():
+    fast, slow = render_batch([{"t1_amp_eg_attack": 0}, {"t1_amp_eg_attack": 100}])
+    head = slice(0, SAMPLE_RATE // 20)
+    assert _rms(fast[head]) > 5 * _rms(slow[head])
+    short, long = render_batch([{"t1_amp_eg_release": 0}, {"t1_amp_eg_release": 100}])
+    tail = slice(int(0.7 * SAMPLE_RATE), None)
+    assert _rms(long[tail]) > 10 * _rms(short[tail])
+    assert not render({"t1_osc1_wave": 7}).any()           # Audio In
+    sine, saw = render_batch([{"t1_osc1_wave": 3}, {"t1_osc1_wave": 0}])
+    assert _centroid(saw) > 2 * _centroid(sine)
+
+
+@pytest.mark.parametrize("fx", [4, 5, 6, 11, 12, 15, 16])
+def test_effects_change_the_sound(fx):
+    dry = render({"t1_amp_eg_release": 80})
+    wet = render({"t1_amp_eg_release": 80, "fx1_type": fx, "fx1_dry_wet": 127})
+    assert np.isfinite(wet).all() and not np.allclose(dry, wet, atol=1e-3)
+
+
+def test_values_from_program_reads_params_and_fx():
+    pm = ParamMap()
+    buf = SysExProgramBuffer(bytes(496))
+    buf.set_param(pm.get("t1_filter1_cutoff"), 77)
+    buf.set_byte(FX1_TYPE_PACKED, 6)
+    values = values_from_program(buf.to_bytes())
+    assert values["t1_filter1_cutoff"] == 77
+    assert values["fx1_type"] == 6 and "fx1_feedback" in values
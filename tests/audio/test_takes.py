@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from scipy.io import wavfile
+from audio.engine import generate_test_tone
+from audio.takes import TakeRegistry, is_take_id
+
+SR = 8000
+
+
+def test_add_get_and_ids():
+    takes = TakeRegistry()
+    first = takes.add(generate_test_tone(440.0, 0.1, SR), SR, "a")
+    second = takes.add(np.zeros(10), SR)
+    assert (first, second) == ("take-1", "take-2")
+    take = takes.get(first)
+    assert take.sample_rate == SR and take.label == "a" and take.samples.dtype == np.float32
+    assert not take.samples.flags.writeable
+    assert takes.ids() == [second, first] and len(takes) == 2    # LRU order
+    with pytest.raises(KeyError):
+        takes.get("take-3")
+
+
+def test_evicts_least_recently_used_by_bytes():
+    takes = TakeRegistry(max_bytes=3 * 4000)
+    ids = [takes.add(np.zeros(1000), SR) for _ in range(3)]
+    takes.get(ids[0])                      # now most recently used
+    newest = takes.add(np.zeros(1000), SR)
+    assert ids[1] not in takes and ids[0] in takes
+    assert takes.nbytes == 3 * 4000
+    huge = takes.add(np.zeros(10000), SR)
+    assert takes.ids() == [huge] and newest not in takes
+    assert takes.nbytes == 40000
+
+
+def test_save_and_load(tmp_path):
+    takes = TakeRegistry()
+    take_id = takes.add(generate_test_tone(440.0, 0.1, SR), SR)
+    path = takes.save(take_id, tmp_path / "take.wav")
+    rate, data = wavfile.read(str(path))
+    assert rate == SR and data.dtype == np.int16 and len(data) == int(0.1 * SR)
+    samples, rate = takes.load(str(path))
+    assert rate == SR
+    assert np.allclose(samples, takes.load(take_id)[0], atol=1e-3)
+
+
+def test_is_take_id():
+    assert is_take_id("take-12") and is_take_id(" take-3 ")
+    assert not is_take_id("take-3.wav") and not is_take_id("/tmp/take-3")
+
+
+def test_features_are_computed_once_per_take(monkeypatch):
+    import audio.features
+    takes = TakeRegistry()
+    take_id = takes.add(generate_test_tone(440.0, 0.3, SR), SR)
+    first = takes.features(take_id)
+    monkeypatch.setattr(audio.features, "extract", lambda *a: pytest.fail("re-analyzed"))
+    assert takes.features(take_id) is first
+    assert 430 < first.fundamental_hz < 450
@@ -6,6 +6,7 @@ def test_config_defaults(tmp_path):
     assert cfg.ai_backend == "claude"
     assert cfg.claude_api_key == ""
     assert cfg.groq_api_key == ""
+    assert cfg.ai_context_tokens == 8000
     assert cfg.audio_input_device is None
 
 def test_config_save_and_load(tmp_path):
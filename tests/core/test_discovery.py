@@ -0,0 +1,78 @@
+import sys
+import pytest
+from PyQt6.QtWidgets import QApplication
+from core.discovery import DeviceDiscovery
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication(sys.argv)
+
+
+def test_first_poll_emits_ports_and_devices(app):
+    disc = DeviceDiscovery(list_midi=lambda: ["A", "B"],
+                           list_audio=lambda: [(0, "Mic")])
+    ports, devices, appeared = [], [], []
+    disc.midi_ports_changed.connect(ports.append)
+    disc.audio_devices_changed.connect(devices.append)
+    disc.midi_port_appeared.connect(appeared.append)
+    disc.poll()
+    assert ports == [["A", "B"]]
+    assert devices == [[(0, "Mic")]]
+    assert appeared == ["A", "B"]
+    assert disc.midi_ports == ["A", "B"]
+
+
+def test_unchanged_poll_emits_nothing(app):
+    disc = DeviceDiscovery(list_midi=lambda: ["A"], list_audio=lambda: [])
+    disc.poll()
+    ports = []
+    disc.midi_ports_changed.connect(ports.append)
+    disc.poll()
+    assert ports == []
+
+
+def test_hotplug_diff(app):
+    current = [["A"]]
+    disc = DeviceDiscovery(list_midi=lambda: current[0], list_audio=lambda: [])
+    disc.poll()
+    appeared, gone = [], []
+    disc.midi_port_appeared.connect(appeared.append)
+    disc.midi_port_disappeared.connect(gone.append)
+    current[0] = ["B"]
+    disc.poll()
+    assert appeared == ["B"]
+    assert gone == ["A"]
+
+
+def test_audio_enumerated_only_on_request(app):
+    calls = []
+    disc = DeviceDiscovery(list_midi=lambda: [],
+                           list_audio=lambda: calls.append(1) or [])
+    disc.poll()
+    disc.poll()
+    assert len(calls) == 1
+    disc.refresh(audio=True)
+    disc.poll()
+    assert len(calls) == 2
+
+
+def test_enumeration_errors_yield_empty_list(app):
+    def boom():
+        raise OSError("ALSA unavailable")
+    disc = DeviceDiscovery(list_midi=boom, list_audio=boom)
+    disc.poll()
+    assert disc.midi_ports == []
+    assert disc.audio_devices == []
+
+
+def test_background_thread_start_stop(app, qtbot):
+    disc = DeviceDiscovery(list_midi=lambda: ["A"], list_audio=lambda: [],
+                           interval_ms=50)
+    received = []
+    disc.midi_ports_changed.connect(received.append)
+    disc.start()
+    assert disc.is_running
+    qtbot.waitUntil(lambda: received == [["A"]], timeout=2000)
+    disc.stop()
+    assert not disc.is_running
@@ -28,3 +28,9 @@ def test_logger_categories(app):
     logger.ai("Thinking...")
     logger.general("Ready")
     assert received == ["MIDI", "AUDIO", "AI", "GENERAL"]
+
+
+def test_logger_echo_disabled(capsys):
+    logger = AppLogger(echo=False)
+    logger.general("quiet")
+    assert capsys.readouterr().out == ""
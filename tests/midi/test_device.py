@@ -92,3 +92,37 @@ def test_send_note_off_not_connected(mock_rtmidi):
     dev._connected = False
     with pytest.raises(RuntimeError, match="Not connected"):
         dev.send_note_off(channel=1, note=60)
+
+
+def test_send_callback_sees_outgoing_messages(mock_rtmidi):
+    from midi.device import MidiDevice
+    dev = MidiDevice()
+    dev._connected = True
+    dev._midi_out = MagicMock()
+    seen = []
+    dev.set_send_callback(seen.append)
+    dev.send_cc(channel=1, cc=7, value=100)
+    dev.send_nrpn(channel=1, msb=0x05, lsb=0x00, value=63)
+    dev.send([0xC0, 3])
+    assert seen == [[0xB0, 7, 100], [0xB0, 99, 5], [0xB0, 98, 0], [0xB0, 6, 63], [0xC0, 3]]
+
+
+def test_control_callback_receives_program_change(mock_rtmidi):
+    from midi.device import MidiDevice
+    dev = MidiDevice()
+    seen = []
+    dev.set_control_callback(seen.append)
+    dev._dispatch_midi_input(([0xC0, 12], 0.0))
+    assert seen == [[0xC0, 12]]
+
+
+def test_rtmidi_clients_open_on_first_connect(mock_rtmidi):
+    from midi.device import MidiDevice
+    dev = MidiDevice()
+    mock_rtmidi.MidiOut.assert_not_called()
+    mock_rtmidi.MidiIn.return_value.get_ports.return_value = ["RK-100S 2 SOUND"]
+    dev.connect(0, "RK-100S 2 SOUND")
+    dev.disconnect()
+    dev.connect(0, "RK-100S 2 SOUND")
+    assert dev.connected
+    assert mock_rtmidi.MidiOut.call_count == 1 and mock_rtmidi.MidiIn.call_count == 1
@@ -0,0 +1,63 @@
+from midi.edit_journal import EditJournal
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_undo_redo_single_steps():
+    journal = EditJournal(clock=Clock())
+    journal.record(10, 0, 5)
+    journal.record(11, 0, 6)
+    assert len(journal) == 2
+    assert journal.undo() == [(11, 0)]
+    assert journal.undo() == [(10, 0)]
+    assert journal.undo() == []
+    assert journal.redo() == [(10, 5)]
+    assert journal.can_redo
+
+
+def test_same_key_within_window_coalesces():
+    clock = Clock()
+    journal = EditJournal(coalesce_s=0.5, clock=clock)
+    for value in range(1, 40):
+        clock.now += 0.05
+        journal.record(10, value - 1, value, key="cutoff")
+    assert len(journal) == 1
+    assert journal.undo() == [(10, 0)]
+    assert journal.redo() == [(10, 39)]
+
+
+def test_pause_or_other_key_starts_new_step():
+    clock = Clock()
+    journal = EditJournal(coalesce_s=0.5, clock=clock)
+    journal.record(10, 0, 1, key="cutoff")
+    clock.now += 1.0
+    journal.record(10, 1, 2, key="cutoff")
+    journal.record(20, 0, 3, key="reso")
+    assert len(journal) == 3
+
+
+def test_new_edit_discards_redo():
+    journal = EditJournal(clock=Clock())
+    journal.record(1, 0, 1)
+    journal.record(2, 0, 1)
+    journal.undo()
+    journal.record(3, 0, 1)
+    assert not journal.can_redo
+    assert journal.undo() == [(3, 0)]
+    assert journal.undo() == [(1, 0)]
+
+
+def test_ring_drops_oldest_steps():
+    journal = EditJournal(capacity=8, clock=Clock())
+    for i in range(20):
+        journal.record(i, 0, 1)
+    assert len(journal) == 8
+    undone = [journal.undo()[0][0] for _ in range(8)]
+    assert undone == list(range(19, 11, -1))
+    assert not journal.can_undo
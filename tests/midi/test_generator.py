@@ -0,0 +1,64 @@
+import numpy as np
+from midi.effects import EFFECT_TYPES, FX1_TYPE_PACKED, fx_param_packed
+from midi.generator import PatchGenerator, as_stack
+from midi.layout import LAYOUT
+from midi.param_codec import decode_stack
+from midi.sysex import build_program_write
+
+
+def _base() -> bytes:
+    data = bytearray(496)
+    data[0:8] = b"BasePtch"
+    return bytes(data)
+
+
+def test_random_programs_are_valid_and_in_range():
+    gen = PatchGenerator(base=_base(), seed=3)
+    stack = gen.random(500)
+    assert stack.shape == (500, 496)
+    assert stack.max() <= 0x7F
+    build_program_write(1, stack[0].tobytes())
+    values = decode_stack(stack, gen.params)
+    for j, p in enumerate(gen.params):
+        col = values[:, j]
+        if p.sysex_bit is not None:
+            assert set(col.tolist()) == {0, 127}, p.name
+            continue
+        assert col.min() >= p.min_val and col.max() <= p.max_val, p.name
+        if p.value_labels:
+            assert set(col.tolist()) <= set(p.value_labels), p.name
+
+
+def test_non_parameter_bytes_are_untouched():
+    gen = PatchGenerator(base=_base(), seed=4)
+    stack = gen.random(50)
+    assert (stack[:, 0:8] == np.frombuffer(b"BasePtch", dtype=np.uint8)).all()
+    assert (stack[:, LAYOUT.is_hb] == 0).all()
+    assert (stack[:, LAYOUT.in_extra] == 0).all()
+
+
+def test_fx_params_follow_effect_type():
+    gen = PatchGenerator(seed=5)
+    stack = gen.random(300)
+    for row in stack[:50]:
+        effect = EFFECT_TYPES[int(row[FX1_TYPE_PACKED])]
+        for param in effect.params:
+            assert param.min_val <= row[fx_param_packed(1, param.slot_index)] <= param.max_val
+
+
+def test_mutate_changes_some_params_and_keeps_rest():
+    gen = PatchGenerator(seed=6)
+    parent = gen.random(1)
+    children = gen.mutate(parent, n=200, rate=0.05, amount=0.1)
+    assert children.shape == (200, 496)
+    assert children.max() <= 0x7F
+    before = decode_stack(parent, gen.params)[0]
+    after = decode_stack(children, gen.params)
+    changed = (after != before).mean()
+    assert 0.0 < changed < 0.2
+    assert (gen.mutate(parent, rate=0.0) == parent).all()
+
+
+def test_as_stack_accepts_bytes_and_lists():
+    assert as_stack(bytes(496)).shape == (1, 496)
+    assert as_stack([bytes(496), bytes(500)]).shape == (2, 496)
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from midi.layout import LAYOUT, PROGRAM_DATA_SIZE, SECTIONS, pack_offset
+
+
+def test_section_offsets_match_pack_formula():
+    for name, base, k, count in SECTIONS:
+        for logical in range(count):
+            expected = base + logical if k is None else pack_offset(logical, base, k)
+            assert LAYOUT.offset(name, logical) == expected
+
+
+def test_packed_file_round_trip():
+    for p in range(PROGRAM_DATA_SIZE):
+        fp = int(LAYOUT.packed_to_file[p])
+        if LAYOUT.is_hb[p]:
+            assert fp == -1
+        elif p > 20:  # packed 18-20 land on common file bytes 15-17
+            assert LAYOUT.file_to_packed[fp] == p
+
+
+def test_section_lookup_and_unknown():
+    assert LAYOUT.section(19) == ("Timbre1", 0)
+    assert LAYOUT.section(385) == ("Arp", 0)
+    assert LAYOUT.section(24) == ("Unknown", 24)   # HB byte
+    assert LAYOUT.section(600) == ("Unknown", 600)
+    # VocBands L40/41 and Gap L0/1 share packed 284/285; first section wins
+    assert LAYOUT.section(284) == ("VocBands", 40)
+
+
+def test_diff_labels():
+    assert LAYOUT.label(284) == ("Gap", 0)
+    assert LAYOUT.label(18) == ("Timbre1_HB", 0)
+    assert LAYOUT.label(LAYOUT.last_arp + 1) == ("Extra", 0)
+    assert LAYOUT.label(24) is None
+
+
+def test_extra_region():
+    assert LAYOUT.last_arp == 411
+    assert not LAYOUT.in_extra[411] and LAYOUT.in_extra[412]
+    assert LAYOUT.file_in_extra[int(LAYOUT.packed_to_file[413])]
+
+
+def test_layout_is_immutable():
+    with pytest.raises(ValueError):
+        LAYOUT.packed_to_file[0] = 1
+    with pytest.raises(TypeError):
+        LAYOUT.section_offsets["Gap"] = None
+    with pytest.raises(AttributeError):
+        LAYOUT.last_arp = 0
+
+
+def test_normalized_ignores_extra_region():
+    data = bytearray(range(128)) * 4
+    data = bytes(data[:PROGRAM_DATA_SIZE])
+    edited = bytearray(data)
+    edited[LAYOUT.last_arp + 5] ^= 0x7F
+    edited[408] ^= 0x40          # HB bit 6 -> packed 415 (Extra)
+    assert LAYOUT.normalized(bytes(edited)) == LAYOUT.normalized(data)
+    edited[408] ^= 0x04          # HB bit 2 -> packed 411 (last Arp byte)
+    assert LAYOUT.normalized(bytes(edited)) != LAYOUT.normalized(data)
+    assert LAYOUT.normalized(data)[:408] == data[:408]
+
+
+def test_section_read_write_carries_bit7_through_hb():
+    stack = np.zeros((2, PROGRAM_DATA_SIZE), dtype=np.uint8)
+    count = len(LAYOUT.section_offsets["Timbre1"])
+    values = np.tile(np.arange(count, dtype=np.uint8) * 3, (2, 1))
+    LAYOUT.write_section(stack, "Timbre1", values)
+    assert stack.max() <= 0x7F
+    assert (LAYOUT.read_section(stack, "Timbre1") == values).all()
+    LAYOUT.write_section(stack, "Timbre2", LAYOUT.read_section(stack, "Timbre1"))
+    assert (LAYOUT.read_section(stack, "Timbre2") == values).all()
+    assert (LAYOUT.read_section(stack, "Timbre1") == values).all()
+
+
+def test_section_bytes_before_first_hb_are_direct():
+    stack = np.zeros((1, PROGRAM_DATA_SIZE), dtype=np.uint8)
+    stack[0, 16] = 0x7C          # Common byte sharing an 8-byte group with Timbre1 19-23
+    stack[0, 19] = 0x05
+    assert not LAYOUT.is_hb[16]
+    assert LAYOUT.read_section(stack, "Timbre1")[0, 0] == 0x05
+    values = LAYOUT.read_section(stack, "Timbre1")
+    values[0, :5] = 0x7F
+    LAYOUT.write_section(stack, "Timbre1", values)
+    assert stack[0, 16] == 0x7C
+    LAYOUT.write_section(stack, "Timbre2", LAYOUT.read_section(stack, "Timbre1"))
+    assert stack[0, 16] == 0x7C
+    assert (LAYOUT.read_section(stack, "Timbre2")[0, :5] == 0x7F).all()
@@ -0,0 +1,97 @@
+from midi.morph import PatchMorpher, is_continuous
+from midi.params import ParamDef, ParamMap
+from midi.sysex import FUNC_PROGRAM_DUMP
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.sent: list[list[int]] = []
+
+    def send(self, message: list[int]) -> None:
+        self.sent.append(message)
+
+
+_GATE = ParamDef("arp_gate", "", "", 0, 127, sysex_offset=389, nrpn_msb=0x00, nrpn_lsb=0x0A)
+_LEVEL = ParamDef("level", "", "", 0, 127, sysex_offset=390)
+_SWITCH = ParamDef("switch", "", "", 0, 127, sysex_offset=391, sysex_bit=0)
+
+
+class _Map(ParamMap):
+    def sysex_params(self):
+        return [_GATE, _LEVEL, _SWITCH]
+
+
+def _programs() -> tuple[bytes, bytes]:
+    a = bytearray(496)
+    b = bytearray(496)
+    b[389], b[390], b[391] = 100, 120, 1
+    b[0:4] = b"Name"
+    return bytes(a), bytes(b)
+
+
+def _morpher(**kwargs) -> tuple[PatchMorpher, Recorder, Clock]:
+    device, clock = Recorder(), Clock()
+    a, b = _programs()
+    morph = PatchMorpher(device, a, b, param_map=_Map(), clock=clock, **kwargs)
+    return morph, device, clock
+
+
+def test_is_continuous():
+    assert is_continuous(_GATE)
+    assert not is_continuous(_SWITCH)
+    assert not is_continuous(ParamDef("mode", "", "", 0, 3, sysex_offset=1))
+
+
+def test_target_interpolates_and_switches_at_threshold():
+    morph, _, _ = _morpher()
+    values, program = morph.target(0.25)
+    assert values == {"arp_gate": 25, "level": 30, "switch": 0}
+    assert program[0:4] == bytes(4)
+    values, program = morph.target(0.5)
+    assert values["switch"] == 127
+    assert program[0:4] == b"Name"
+    assert morph.target(1.0)[1] == _programs()[1]
+
+
+def test_realtime_params_stream_as_nrpn():
+    morph, device, _ = _morpher(program_interval_s=10.0)
+    morph._last_program_time = 0.0
+    morph.set_position(0.2)
+    morph.tick()
+    assert device.sent == [[0xB0, 99, 0x00], [0xB0, 98, 0x0A], [0xB0, 6, 20]]
+
+
+def test_byte_budget_limits_average_rate():
+    morph, device, clock = _morpher(byte_budget=40, tick_s=0.02)
+    morph.ramp_to(1.0, 1.0)
+    ticks = 0
+    while not (morph.settled and morph.position >= 1.0) and ticks < 500:
+        clock.now += 0.02
+        morph.tick()
+        ticks += 1
+    assert morph.settled
+    assert morph.bytes_sent <= 40 * ticks + 504
+    assert any(m[0] == 0xF0 and m[6] == FUNC_PROGRAM_DUMP for m in device.sent)
+    assert morph._device_buf.to_bytes() == _programs()[1]
+
+
+def test_thread_runs_ramp_to_completion():
+    import time
+    device = Recorder()
+    a, b = _programs()
+    morph = PatchMorpher(device, a, b, param_map=_Map(), tick_s=0.005, byte_budget=600)
+    morph.start(duration_s=0.05)
+    deadline = time.monotonic() + 2.0
+    while morph.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    morph.stop()
+    assert morph.position == 1.0
+    assert morph.settled
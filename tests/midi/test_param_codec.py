@@ -0,0 +1,46 @@
+import numpy as np
+from midi.param_codec import decodable, decode_params, decode_stack
+from midi.params import ParamMap
+from midi.sysex_buffer import SysExProgramBuffer
+
+
+def test_decode_matches_sysex_buffer():
+    params = decodable(ParamMap().sysex_params())
+    rng = np.random.default_rng(1)
+    stack = rng.integers(0, 128, size=(20, 496), dtype=np.uint8)
+    values = decode_stack(stack, params)
+    for row, data in zip(values, stack):
+        buf = SysExProgramBuffer(data.tobytes())
+        assert [int(v) for v in row] == [buf.get_param(p) for p in params]
+
+
+def test_decode_params_single_program():
+    pm = ParamMap()
+    data = bytearray(496)
+    data[53] = 90                      # t1_filter1_cutoff
+    data[55] = 0x7F                    # t1_filter1_eg_int, signed -1
+    data[387] = 1                      # arp_type raw 1 -> Down (22)
+    values = decode_params(bytes(data), pm.sysex_params())
+    assert values["t1_filter1_cutoff"] == 90
+    assert values["t1_filter1_eg_int"] == -1
+    assert values["arp_type"] == 22
+
+
+def test_decode_params_skips_offsets_past_short_data():
+    values = decode_params(bytes(40), ParamMap().sysex_params())
+    assert "t1_osc1_wave" in values
+    assert "t1_filter1_cutoff" not in values
+
+
+def test_encode_round_trips_through_sysex_buffer():
+    from midi.param_codec import encode_column
+    pm = ParamMap()
+    for name, value in [("t1_filter1_cutoff", 77), ("t1_filter1_eg_int", -5),
+                        ("arp_type", 43), ("arp_last_step", 6), ("scale_key", 127)]:
+        param = pm.get(name)
+        stack = np.zeros((2, 496), dtype=np.uint8)
+        encode_column(stack, param, np.array([value, value]))
+        buf = SysExProgramBuffer(bytes(496))
+        buf.set_param(param, value)
+        assert stack[0].tobytes() == buf.to_bytes(), name
+        assert decode_stack(stack, [param])[0, 0] == buf.get_param(param)
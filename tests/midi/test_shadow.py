@@ -0,0 +1,108 @@
+from midi.shadow import PULLED, VERIFIED, WRITTEN, DeviceShadow
+from midi.sysex import build_program_write, build_program_write_request
+
+
+def _program(fill: int) -> bytes:
+    return bytes([fill]) * 412 + bytes(84)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_record_matches_ignoring_extra_region(tmp_path):
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.record(5, _program(1), PULLED)
+    assert shadow.matches(5, _program(1))
+    assert shadow.matches(5, _program(1)[:420] + bytes([9]) * 76)
+    assert not shadow.matches(5, _program(2))
+    assert not shadow.matches(6, _program(1))
+
+
+def test_trusted_respects_source_and_age(tmp_path):
+    clock = Clock()
+    shadow = DeviceShadow(path=tmp_path / "s.json", clock=clock)
+    shadow.record(1, _program(1), PULLED)
+    shadow.record(2, _program(2), WRITTEN)
+    assert shadow.trusted(1, 60) is not None
+    assert shadow.trusted(2, 60) is None
+    clock.now += 61
+    assert shadow.trusted(1, 60) is None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "shadow" / "s.json"
+    shadow = DeviceShadow(path=path)
+    shadow.record(200, _program(3), VERIFIED)
+    shadow.record(None, _program(4), WRITTEN)
+    shadow.save()
+    loaded = DeviceShadow(path=path)
+    assert loaded.matches(200, _program(3))
+    assert loaded.get(200).source == VERIFIED
+    assert loaded.get(None) is None
+
+
+def test_corrupt_file_is_ignored(tmp_path):
+    path = tmp_path / "s.json"
+    path.write_text("{not json")
+    assert DeviceShadow(path=path).get(0) is None
+
+
+def test_sent_write_request_stores_edit_buffer(tmp_path):
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.on_sent(build_program_write(channel=1, data=_program(7)))
+    assert shadow.matches(None, _program(7))
+    shadow.on_sent(build_program_write_request(channel=1, slot=130))
+    assert shadow.matches(130, _program(7))
+    assert shadow.get(130).source == WRITTEN
+
+
+def test_write_request_with_unknown_edit_buffer_forgets_slot(tmp_path):
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.record(3, _program(1), PULLED)
+    shadow.invalidate(None)
+    shadow.on_sent(build_program_write_request(channel=1, slot=3))
+    assert shadow.get(3) is None
+
+
+def test_program_change_uses_bank_select(tmp_path):
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.record(129, _program(5), PULLED)
+    shadow.on_control_message([0xB0, 32, 1])
+    shadow.on_control_message([0xC0, 1])
+    assert shadow.matches(None, _program(5))
+    shadow.on_control_message([0xB0, 32, 0])
+    shadow.on_control_message([0xC0, 1])
+    assert shadow.get(None) is None
+
+
+def test_hardware_knob_invalidates_edit_buffer_and_current_slot(tmp_path):
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.record(4, _program(1), PULLED)
+    shadow.selected(4)
+    shadow.on_control_message([0xB0, 74, 10])
+    assert shadow.get(None) is None
+    assert shadow.get(4) is None
+
+
+def test_sent_parameter_cc_only_dirties_edit_buffer(tmp_path):
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.record(4, _program(1), PULLED)
+    shadow.selected(4)
+    shadow.on_sent([0xB0, 99, 5])
+    assert shadow.get(None) is None
+    assert shadow.matches(4, _program(1))
+
+
+def test_performance_controllers_are_ignored(tmp_path):
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.record(4, _program(1), PULLED)
+    shadow.selected(4)
+    for message in ([0xB0, 1, 64], [0xB0, 64, 127], [0xB0, 123, 0], [0x90, 60, 100]):
+        shadow.on_control_message(message)
+    assert shadow.matches(None, _program(1))
+    assert shadow.matches(4, _program(1))
@@ -1,7 +1,7 @@
 from midi.sysex import (
     build_program_change, build_slot_messages, build_program_dump_request,
-    build_all_dump_request, parse_program_dump, build_program_write,
-    extract_patch_name, KORG_ID, MODEL_ID, NUM_PROGRAMS,
+    build_all_dump_request, parse_program_dump, parse_all_dump, build_program_write,
+    extract_patch_name, build_program_write_request, KORG_ID, MODEL_ID, NUM_PROGRAMS,
 )
 
 def test_korg_id():
@@ -39,6 +39,12 @@ def test_parse_program_dump_returns_bytes():
     assert isinstance(result, bytes)
     assert len(result) > 0
 
+def test_parse_all_dump_returns_payload():
+    msg = [0xF0, 0x42, 0x30, *MODEL_ID, 0x4E, 0x01, 0x02, 0xF7]
+    assert parse_all_dump(msg) == bytes([0x01, 0x02])
+    assert parse_program_dump(msg) is None
+    assert parse_all_dump([0xF0, 0x42, 0x30, *MODEL_ID, 0x40, 0x01, 0xF7]) is None
+
 def test_parse_program_dump_rejects_non_korg():
     bad = [0xF0, 0x41, 0x30, *MODEL_ID, 0x40, 0x01, 0xF7]
     assert parse_program_dump(bad) is None
@@ -119,3 +125,12 @@ def test_build_slot_messages_invalid():
         build_slot_messages(channel=1, slot=200)
     with pytest.raises(ValueError):
         build_slot_messages(channel=0, slot=0)
+
+
+def test_program_write_request_bank_split():
+    msg = build_program_write_request(channel=1, slot=130)
+    assert msg[:6] == [0xF0, 0x42, 0x30, 0x00, 0x01, 0x22]
+    assert msg[6:] == [0x11, 1, 2, 0xF7]
+    import pytest
+    with pytest.raises(ValueError):
+        build_program_write_request(channel=1, slot=NUM_PROGRAMS)
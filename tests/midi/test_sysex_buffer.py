@@ -1,5 +1,5 @@
 import pytest
-from midi.sysex_buffer import SysExProgramBuffer, DebouncedSysExWriter
+from midi.sysex_buffer import SysExProgramBuffer
 from midi.params import ParamDef
 
 
@@ -223,22 +223,54 @@ def test_set_param_value_bias():
     assert buf.get_param(latch) == 127     # latch still On
 
 
-def test_debounced_writer_properties(qtbot):
-    writer = DebouncedSysExWriter(debounce_ms=200)
-    assert writer.debounce_ms == 200
-    writer.debounce_ms = 100
-    assert writer.debounce_ms == 100
+def test_undo_redo_restores_bytes():
+    param = ParamDef("cutoff", "", "", 0, 127, sysex_offset=3)
+    buf = SysExProgramBuffer(bytes(16))
+    buf.set_param(param, 50)
+    buf.set_byte(7, 9)
+    assert buf.undo() == [7]
+    assert buf.get_byte(7) == 0
+    assert buf.undo() == [3]
+    assert buf.to_bytes() == bytes(16)
+    assert not buf.can_undo
+    assert buf.redo() == [3]
+    assert buf.get_byte(3) == 50
+
+
+def test_load_clears_history():
+    buf = SysExProgramBuffer(bytes(16))
+    buf.set_byte(0, 1)
+    buf.load(bytes(16))
+    assert not buf.can_undo
 
 
-def test_debounced_writer_emits_signal(qtbot):
-    writer = DebouncedSysExWriter(debounce_ms=50)
-    with qtbot.waitSignal(writer.write_requested, timeout=500):
-        writer.schedule()
+def test_snapshot_restore_is_one_undoable_step():
+    buf = SysExProgramBuffer(bytes(16))
+    buf.snapshot("A")
+    for offset in (1, 2, 3):
+        buf.set_byte(offset, 7)
+    buf.snapshot("B")
+    assert buf.diff("A") == [1, 2, 3]
+    assert buf.restore("A") == [1, 2, 3]
+    assert buf.to_bytes() == bytes(16)
+    assert buf.undo() == [1, 2, 3]
+    assert buf.diff("B") == []
+
+
+def test_replace_is_one_undoable_step():
+    buf = SysExProgramBuffer(bytes(16))
+    program = bytearray(16)
+    program[4] = program[9] = 5
+    assert buf.replace(bytes(program)) == [4, 9]
+    assert buf.to_bytes() == bytes(program) and buf.dirty
+    assert buf.undo() == [4, 9]
+    assert buf.to_bytes() == bytes(16)
+    with pytest.raises(ValueError):
+        buf.replace(bytes(8))
 
 
-def test_debounced_writer_cancel(qtbot):
-    writer = DebouncedSysExWriter(debounce_ms=50)
-    writer.schedule()
-    assert writer.is_pending
-    writer.cancel()
-    assert not writer.is_pending
+def test_restore_identical_snapshot_changes_nothing():
+    buf = SysExProgramBuffer(bytes(16))
+    buf.snapshot("A")
+    assert buf.restore("A") == []
+    assert not buf.dirty
@@ -0,0 +1,22 @@
+from midi.sysex_writer import DebouncedSysExWriter
+
+
+def test_debounced_writer_properties(qtbot):
+    writer = DebouncedSysExWriter(debounce_ms=200)
+    assert writer.debounce_ms == 200
+    writer.debounce_ms = 100
+    assert writer.debounce_ms == 100
+
+
+def test_debounced_writer_emits_signal(qtbot):
+    writer = DebouncedSysExWriter(debounce_ms=50)
+    with qtbot.waitSignal(writer.write_requested, timeout=500):
+        writer.schedule()
+
+
+def test_debounced_writer_cancel(qtbot):
+    writer = DebouncedSysExWriter(debounce_ms=50)
+    writer.schedule()
+    assert writer.is_pending
+    writer.cancel()
+    assert not writer.is_pending
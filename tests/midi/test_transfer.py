@@ -0,0 +1,246 @@
+import pytest
+from midi.sysex import (
+    FUNC_PROGRAM_DUMP, FUNC_PROGRAM_DUMP_REQUEST, FUNC_PROGRAM_WRITE_REQUEST, MODEL_ID,
+)
+from midi.shadow import PULLED, VERIFIED, WRITTEN, DeviceShadow
+from midi.transfer import (
+    PushReport, WritePacer, parameter_messages, pull_slots, push_bank, push_program,
+    update_edit_buffer, write_edit_buffer,
+)
+from midi.params import ParamDef
+
+
+class FakeDevice:
+    """Edit buffer + program memory; selecting a slot loads it into the buffer."""
+
+    def __init__(self, programs: dict[int, bytes], drop_stores: int = 0) -> None:
+        self.programs = programs
+        self.sent: list[list[int]] = []
+        self.drop_stores = drop_stores   # ignore this many write requests
+        self._bank = 0
+        self._slot = 0
+        self._edit: bytes | None = None
+        self._callback = None
+        self._send_callback = None
+
+    def set_sysex_callback(self, callback) -> None:
+        self._callback = callback
+
+    def set_control_callback(self, callback) -> None:
+        pass
+
+    def set_send_callback(self, callback) -> None:
+        self._send_callback = callback
+
+    def send(self, message: list[int]) -> None:
+        self.sent.append(message)
+        if self._send_callback is not None:
+            self._send_callback(message)
+        status = message[0]
+        if status & 0xF0 == 0xB0 and message[1] == 32:
+            self._bank = message[2]
+        elif status & 0xF0 == 0xC0:
+            self._slot = self._bank * 128 + message[1]
+            self._edit = self.programs.get(self._slot)
+        elif status != 0xF0:
+            return
+        elif message[6] == FUNC_PROGRAM_DUMP:
+            self._edit = bytes(message[7:-1])
+        elif message[6] == FUNC_PROGRAM_WRITE_REQUEST:
+            if self.drop_stores:
+                self.drop_stores -= 1
+            else:
+                self.programs[message[7] * 128 + message[8]] = self._edit
+        elif message[-2] == FUNC_PROGRAM_DUMP_REQUEST:
+            if self._edit is not None:
+                reply = [0xF0, 0x42, 0x30, *MODEL_ID, 0x40, *self._edit, 0xF7]
+                self._callback((reply, 0.0))
+
+
+def test_pull_slots_reports_missing_and_restores():
+    device = FakeDevice({0: b"Alpha\x00\x00\x00" + bytes(10), 129: b"Beta" + bytes(14)})
+    seen = []
+    patches = pull_slots(device, [0, 5, 129], timeout=0.05,
+                         on_patch=lambda slot, p: seen.append((slot, p and p.name)),
+                         restore_slot=3)
+    assert [p.program_number for p in patches] == [0, 129]
+    assert seen == [(0, "Alpha"), (5, None), (129, "Beta")]
+    assert device.sent[-1] == [0xC0, 3]
+
+
+def test_pull_slots_cancel_skips_restore():
+    device = FakeDevice({})
+    patches = pull_slots(device, [0, 1], timeout=0.01,
+                         is_cancelled=lambda: True, restore_slot=3)
+    assert patches == []
+    assert device.sent == []
+
+
+def test_push_program_selects_slot_and_stores():
+    device = FakeDevice({})
+    push_program(device, bytes(4), slot=200 - 1, store=True)
+    assert device.sent[1] == [0xB0, 32, 1]
+    assert device.sent[3][-6:-1] == [0x40, 0, 0, 0, 0]
+    assert device.sent[4][6:] == [FUNC_PROGRAM_WRITE_REQUEST, 1, 71, 0xF7]
+
+
+def _program(fill: int) -> bytes:
+    return bytes([fill]) * 412 + bytes(84)
+
+
+def test_push_bank_stores_and_verifies():
+    device = FakeDevice({})
+    programs = [(0, _program(1)), (130, _program(2))]
+    results = []
+    report = push_bank(device, programs, verify=True, timeout=0.05,
+                       pacer=WritePacer(gap=0, min_gap=0),
+                       on_result=lambda slot, ok, reason: results.append((slot, ok)))
+    assert device.programs[0] == _program(1)
+    assert device.programs[130] == _program(2)
+    assert results == [(0, True), (130, True)]
+    assert report.written == [0, 130] and not report.failed
+    assert report.attempts == 2 and report.bytes_sent > 2 * 496
+    assert "2 of 2 programs verified" in report.summary()
+
+
+def test_push_bank_retries_failed_store_and_backs_off():
+    device = FakeDevice({5: _program(9)}, drop_stores=1)
+    pacer = WritePacer(gap=0.001, min_gap=0.001)
+    report = push_bank(device, [(5, _program(3))], verify=True, timeout=0.05, pacer=pacer)
+    assert report.written == [5] and report.attempts == 2
+    assert device.programs[5] == _program(3)
+
+
+def test_push_bank_reports_failure_after_retries():
+    device = FakeDevice({}, drop_stores=10)
+    report = push_bank(device, [(1, _program(3))], verify=True, retries=1, timeout=0.02,
+                       pacer=WritePacer(gap=0, min_gap=0))
+    assert report.failed == {1: "no reply to verification dump"}
+    assert report.attempts == 2
+
+
+def test_push_bank_without_verify_and_cancel():
+    device = FakeDevice({})
+    report = push_bank(device, [(0, _program(1)), (1, _program(2))],
+                       pacer=WritePacer(gap=0, min_gap=0))
+    assert report.written == [0, 1] and not report.verified
+    assert not any(m[-2] == FUNC_PROGRAM_DUMP_REQUEST for m in device.sent)
+    cancelled = push_bank(FakeDevice({}), [(0, _program(1))], is_cancelled=lambda: True)
+    assert cancelled.cancelled and cancelled.written == []
+
+
+def test_write_pacer_waits_and_adapts():
+    now = [0.0]
+    slept = []
+    pacer = WritePacer(gap=0.1, min_gap=0.05, max_gap=0.3,
+                       clock=lambda: now[0], sleep=slept.append)
+    pacer.wait()
+    pacer.sent()
+    now[0] = 0.04
+    pacer.wait()
+    assert slept == [pytest.approx(0.06)]
+    pacer.failure(); pacer.failure()
+    assert pacer.gap == 0.3
+    for _ in range(20):
+        pacer.success()
+    assert pacer.gap == 0.05
+
+
+def test_push_report_rates():
+    report = PushReport(total=2, written=[0, 1], bytes_sent=2048, elapsed_s=2.0)
+    assert report.programs_per_s == 1.0
+    assert report.bytes_per_s == 1024.0
+
+
+def _dumps(device: FakeDevice) -> int:
+    return sum(1 for m in device.sent if m[0] == 0xF0 and m[-2] == FUNC_PROGRAM_DUMP_REQUEST)
+
+
+def test_pull_slots_serves_trusted_slots_from_shadow(tmp_path):
+    device = FakeDevice({0: _program(1), 1: _program(2)})
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.attach(device)
+    pull_slots(device, [0, 1], timeout=0.05, shadow=shadow, trust_s=60)
+    assert _dumps(device) == 2
+    assert shadow.get(1).source == PULLED
+    device.sent.clear()
+    patches = pull_slots(device, [0, 1], timeout=0.05, shadow=shadow, trust_s=60)
+    assert _dumps(device) == 0
+    assert [p.sysex_data for p in patches] == [_program(1), _program(2)]
+    assert shadow.bytes_skipped > 0
+    assert (tmp_path / "s.json").exists()
+
+
+def test_pull_slots_spot_check_refreshes_shadow(tmp_path):
+    device = FakeDevice({0: _program(1)})
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.record(0, _program(9), PULLED)
+    patches = pull_slots(device, [0], timeout=0.05, shadow=shadow, trust_s=60, spot_check=1.0)
+    assert patches[0].sysex_data == _program(1)
+    assert shadow.matches(0, _program(1))
+
+
+def test_write_edit_buffer_skips_known_program(tmp_path):
+    device = FakeDevice({})
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.attach(device)
+    assert write_edit_buffer(device, _program(3), shadow=shadow) > 0
+    assert write_edit_buffer(device, _program(3), shadow=shadow) == 0
+    assert len(device.sent) == 1
+    device.send([0xB0, 99, 5])  # parameter edit dirties the edit buffer
+    assert write_edit_buffer(device, _program(3), shadow=shadow) > 0
+
+
+def test_push_bank_skips_slots_already_on_device(tmp_path):
+    device = FakeDevice({})
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.attach(device)
+    programs = [(0, _program(1)), (1, _program(2))]
+    first = push_bank(device, programs, verify=True, timeout=0.2, shadow=shadow)
+    assert first.written == [0, 1] and first.skipped == []
+    assert shadow.get(0).source == VERIFIED
+    device.sent.clear()
+    second = push_bank(device, programs, verify=True, timeout=0.2, shadow=shadow)
+    assert second.written == [0, 1] and second.skipped == [0, 1]
+    assert not any(m[0] == 0xF0 and m[6] == FUNC_PROGRAM_DUMP for m in device.sent)
+    assert "2 already on the device" in second.summary()
+
+
+def test_push_bank_rewrites_unconfirmed_stores(tmp_path):
+    device = FakeDevice({})
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.attach(device)
+    push_bank(device, [(0, _program(1))], shadow=shadow)
+    assert shadow.get(0).source == WRITTEN
+    # the store may have been refused (write protect), so it is not trusted
+    assert push_bank(device, [(0, _program(1))], shadow=shadow).skipped == []
+    report = push_bank(device, [(0, _program(1))], verify=True, timeout=0.2, shadow=shadow)
+    assert report.skipped == [] and report.written == [0]
+
+
+_ARP_GATE = ParamDef("arp_gate", "", "", 0, 127, sysex_offset=389, nrpn_msb=0x00, nrpn_lsb=0x0A)
+_SYSEX_ONLY = ParamDef("level", "", "", 0, 127, sysex_offset=390)
+
+
+def test_parameter_messages_for_realtime_params():
+    before = _program(1)
+    after = bytearray(before)
+    after[389] = 100
+    assert parameter_messages(before, bytes(after), [_ARP_GATE, _SYSEX_ONLY]) == [
+        [0xB0, 99, 0x00], [0xB0, 98, 0x0A], [0xB0, 6, 100]]
+    after[390] = 5
+    assert parameter_messages(before, bytes(after), [_ARP_GATE, _SYSEX_ONLY]) is None
+    assert parameter_messages(before, before, [_ARP_GATE]) == []
+
+
+def test_update_edit_buffer_sends_nrpn_and_tracks_shadow(tmp_path):
+    device = FakeDevice({})
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.attach(device)
+    write_edit_buffer(device, _program(1), shadow=shadow)
+    after = bytearray(_program(1))
+    after[389] = 100
+    assert update_edit_buffer(device, _program(1), bytes(after), [_ARP_GATE], shadow=shadow) == 9
+    assert shadow.matches(None, bytes(after))
+    after[390] = 5
+    assert update_edit_buffer(device, _program(1), bytes(after), [_ARP_GATE], shadow=shadow) > 400
@@ -0,0 +1,110 @@
+import zipfile
+import pytest
+from model.importer import (
+    find_sources, import_paths, iter_sysex_messages, programs_from_syx,
+)
+from model.library import Library
+from midi.sysex import MODEL_ID, build_program_write
+from tools.file_format import sysex_to_prog_bytes
+
+
+def _program(name: bytes) -> bytes:
+    data = bytearray(496)
+    data[:len(name)] = name
+    for p in range(17, 412, 3):
+        if p % 8:
+            data[p] = p & 0x7F
+    return bytes(data)
+
+
+def _dump(name: bytes) -> bytes:
+    return bytes(build_program_write(channel=1, data=_program(name)))
+
+
+def _all_dump(names: list[bytes]) -> bytes:
+    payload = b"".join(_program(n) for n in names)
+    return bytes([0xF0, 0x42, 0x30, *MODEL_ID, 0x4E]) + payload + b"\xF7"
+
+
+def test_iter_sysex_messages_splits_bank():
+    buf = _dump(b"A") + b"\x00\x00" + _dump(b"B")
+    messages = list(iter_sysex_messages(buf))
+    assert len(messages) == 2
+    assert all(m[0] == 0xF0 and m[-1] == 0xF7 for m in messages)
+
+
+def test_programs_from_multi_message_syx():
+    programs = programs_from_syx(_dump(b"A") + _dump(b"B") + _dump(b"C"))
+    assert [n for n, _ in programs] == [0, 1, 2]
+    assert programs[2][1] == _program(b"C")
+
+
+def test_programs_from_all_dump():
+    programs = programs_from_syx(_all_dump([b"A", b"B"]))
+    assert [(n, d) for n, d in programs] == [(0, _program(b"A")), (1, _program(b"B"))]
+
+
+def test_single_and_raw_programs_have_no_number():
+    assert programs_from_syx(_dump(b"A")) == [(None, _program(b"A"))]
+    assert programs_from_syx(_program(b"Raw")) == [(None, _program(b"Raw"))]
+    assert programs_from_syx(b"") == []
+
+
+def test_truncated_dumps_are_rejected():
+    with pytest.raises(ValueError, match="Program dump 2 is truncated: 495 of 496"):
+        programs_from_syx(_dump(b"A") + _dump(b"B")[:-2] + b"\xF7")
+    with pytest.raises(ValueError, match="All-programs dump of 984 bytes"):
+        programs_from_syx(_all_dump([b"A", b"B"])[:-9] + b"\xF7")
+
+
+def test_find_sources_expands_dirs_and_zips(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.syx").write_bytes(_dump(b"A"))
+    (tmp_path / "readme.txt").write_text("ignored")
+    with zipfile.ZipFile(tmp_path / "pack.zip", "w") as z:
+        z.writestr("x/b.rk100s2_prog", sysex_to_prog_bytes(_program(b"B")))
+        z.writestr("notes.txt", "ignored")
+    sources, failures = find_sources([tmp_path, tmp_path / "missing.syx"])
+    assert sources == [(str(tmp_path / "pack.zip"), "x/b.rk100s2_prog"),
+                       (str(tmp_path / "sub" / "a.syx"), None)]
+    assert failures == [(str(tmp_path / "missing.syx"), "File not found")]
+
+
+def test_import_paths_saves_every_program(tmp_path):
+    src = tmp_path / "in"
+    src.mkdir()
+    (src / "bank.syx").write_bytes(_dump(b"A") + _dump(b"B"))
+    (src / "all.syx").write_bytes(_all_dump([b"C", b"D", b"E"]))
+    (src / "f.rk100s2_prog").write_bytes(sysex_to_prog_bytes(_program(b"F")))
+    (src / "bad.syx").write_bytes(b"\x00\x01")
+    (src / "short.syx").write_bytes(_dump(b"H")[:100] + b"\xF7")
+    with zipfile.ZipFile(src / "pack.zip", "w") as z:
+        z.writestr("g.syx", _dump(b"G"))
+    library = Library(root=tmp_path / "lib")
+    progress = []
+    result = import_paths(library, [src], workers=1, chunk_size=2,
+                          on_progress=lambda *a: progress.append(a))
+    assert result.imported == 7
+    assert [s for s, _ in result.failed] == [str(src / "bad.syx"), str(src / "short.syx")]
+    assert not result.cancelled
+    names = sorted(p.name for p in library.list_patches())
+    assert names == ["A", "B", "C", "D", "E", "F", "G"]
+    assert progress[-1][:2] == (7, 7)
+
+
+def test_import_paths_uses_process_pool(tmp_path):
+    for i in range(4):
+        (tmp_path / f"p{i}.syx").write_bytes(_dump(f"P{i}".encode()))
+    library = Library(root=tmp_path / "lib")
+    result = import_paths(library, [tmp_path / f"p{i}.syx" for i in range(4)],
+                          workers=2, chunk_size=1)
+    assert sorted(p.name for p in library.list_patches()) == ["P0", "P1", "P2", "P3"]
+    assert result.imported == 4
+
+
+def test_import_paths_cancel(tmp_path):
+    (tmp_path / "a.syx").write_bytes(_dump(b"A"))
+    library = Library(root=tmp_path / "lib")
+    result = import_paths(library, [tmp_path], workers=1, is_cancelled=lambda: True)
+    assert result.cancelled
+    assert library.list_patches() == []
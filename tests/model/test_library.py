@@ -1,3 +1,4 @@
+import pytest
 from pathlib import Path
 from model.patch import Patch
 from model.bank import Bank
@@ -36,3 +37,86 @@ def test_library_delete_patch(tmp_path):
     path = lib.save_patch(p)
     lib.delete_patch(path)
     assert len(lib.list_patches()) == 0
+
+def test_library_save_patches_assigns_unique_names(tmp_path):
+    lib = Library(root=tmp_path)
+    lib.save_patch(Patch(name="Pad", program_number=0))
+    paths = lib.save_patches([Patch(name="Pad", program_number=i) for i in range(3)])
+    assert [p.name for p in paths] == ["pad-1.json", "pad-2.json", "pad-3.json"]
+    assert len(lib.list_patches()) == 4
+
+def test_library_save_patches_reports_batches(tmp_path):
+    lib = Library(root=tmp_path)
+    progress = []
+    lib.save_patches([Patch(name=f"P{i}", program_number=i) for i in range(5)],
+                     batch_size=2, on_progress=lambda done, total: progress.append((done, total)))
+    assert progress == [(2, 5), (4, 5), (5, 5)]
+
+def test_library_save_patches_rolls_back_failed_batch(tmp_path, monkeypatch):
+    lib = Library(root=tmp_path)
+    patches = [Patch(name=f"P{i}", program_number=i, sysex_data=bytes([i])) for i in range(4)]
+    original = Patch.save
+    def save(self, path):
+        if self.name == "P3":
+            raise OSError("disk full")
+        original(self, path)
+    monkeypatch.setattr(Patch, "save", save)
+    with pytest.raises(OSError):
+        lib.save_patches(patches, batch_size=2)
+    assert sorted(p.name for p in lib.list_patches()) == ["P0", "P1"]
+    assert not (tmp_path / "patches" / "p2.syx").exists()
+
+def _program(fill: int) -> bytes:
+    data = bytearray([fill]) * 496
+    data[412:] = bytes(84)
+    return bytes(data)
+
+def test_library_save_patch_dedups_content(tmp_path):
+    lib = Library(root=tmp_path)
+    first = lib.save_patch(Patch(name="Bass", program_number=0, sysex_data=_program(1)))
+    tail_changed = bytearray(_program(1))
+    tail_changed[450] = 0x55
+    again = lib.save_patch(Patch(name="Bass copy", program_number=3,
+                                 sysex_data=bytes(tail_changed)))
+    assert again == first
+    assert [p.name for p in lib.list_patches()] == ["Bass"]
+    assert lib.has_content(_program(1))
+    assert not lib.has_content(_program(2))
+
+def test_library_save_patches_dedups_within_batch(tmp_path):
+    lib = Library(root=tmp_path)
+    paths = lib.save_patches([Patch(name=n, program_number=0, sysex_data=_program(f))
+                              for n, f in (("A", 1), ("B", 2), ("A2", 1))])
+    assert paths[0] == paths[2]
+    assert len(lib.list_patches()) == 2
+
+def test_library_index_survives_reload_and_rebuild(tmp_path):
+    lib = Library(root=tmp_path)
+    path = lib.save_patch(Patch(name="Keys", program_number=0, sysex_data=_program(3)))
+    assert Library(root=tmp_path).find_content(_program(3)) == path
+    (tmp_path / "patch_index.json").write_text("not json")
+    assert Library(root=tmp_path).find_content(_program(3)) == path
+
+def test_library_index_drops_deleted_and_edited_patches(tmp_path):
+    lib = Library(root=tmp_path)
+    path = lib.save_patch(Patch(name="Keys", program_number=0, sysex_data=_program(3)))
+    Patch(name="Keys", program_number=0, sysex_data=_program(4)).save(path)
+    assert not lib.has_content(_program(3))
+    other = lib.save_patch(Patch(name="Pad", program_number=0, sysex_data=_program(5)))
+    lib.delete_patch(other)
+    assert not lib.has_content(_program(5))
+    assert lib.save_patch(Patch(name="Pad", program_number=0, sysex_data=_program(5))).exists()
+
+def test_library_update_programs_rewrites_data_and_index(tmp_path):
+    lib = Library(root=tmp_path)
+    paths = lib.save_patches([Patch(name=n, program_number=0, sysex_data=_program(f))
+                              for n, f in (("A", 1), ("B", 2))])
+    progress = []
+    assert lib.update_programs([(paths[0], _program(7))], batch_size=1,
+                               on_progress=lambda d, t: progress.append((d, t))) == 1
+    assert progress == [(1, 1)]
+    assert Patch.load(paths[0]).sysex_data == _program(7)
+    assert not list(tmp_path.rglob("*.tmp"))
+    assert lib.find_content(_program(7)) == paths[0]
+    assert not lib.has_content(_program(1))
+    assert Library(root=tmp_path).find_content(_program(2)) == paths[1]
@@ -0,0 +1,79 @@
+from pathlib import Path
+import pytest
+from model.patch import Patch
+from model.search import PatchIndex, QueryError
+
+
+def _program(**bytes_at) -> bytes:
+    data = bytearray(496)
+    for offset, value in bytes_at.items():
+        data[int(offset[1:])] = value
+    return bytes(data)
+
+
+def _patch(name, category="", notes="", **bytes_at) -> Patch:
+    patch = Patch(name=name, program_number=0, category=category, notes=notes,
+                  sysex_data=_program(**bytes_at) if bytes_at else None)
+    patch.source_path = Path(f"/lib/{name}.json")
+    return patch
+
+
+@pytest.fixture
+def index():
+    idx = PatchIndex()
+    idx.sync([
+        _patch("Saw Lead", "lead", "bright", p37=0, p53=100, p327=6),  # wave Saw, FX Delay
+        _patch("Pulse Bass", "bass", "warm round", p37=1, p53=40, p327=6),
+        _patch("Warm Pad", "pad", "slow strings", p37=0, p53=95, p327=11),
+        _patch("Empty", "pad"),                                        # no SysEx
+    ])
+    return idx
+
+
+def _names(index, query):
+    return sorted(p.stem for p in index.search(query))
+
+
+def test_parameter_query_with_labels(index):
+    assert _names(index, "t1_osc1_wave=Saw AND fx1_type=Delay AND t1_filter1_cutoff>90") == \
+        ["Saw Lead"]
+    assert _names(index, "t1_filter1_cutoff<=95") == ["Pulse Bass", "Warm Pad"]
+    assert _names(index, "fx1_type!=chorus") == ["Pulse Bass", "Saw Lead"]
+
+
+def test_text_query_prefix_phrase_and_fields(index):
+    assert _names(index, "warm") == ["Pulse Bass", "Warm Pad"]
+    assert _names(index, "name:warm") == ["Warm Pad"]
+    assert _names(index, '"slow strings"') == ["Warm Pad"]
+    assert _names(index, "category:pa") == ["Empty", "Warm Pad"]
+
+
+def test_boolean_operators(index):
+    assert _names(index, "lead OR bass") == ["Pulse Bass", "Saw Lead"]
+    assert _names(index, "category:pad NOT t1_filter1_cutoff>90") == ["Empty"]
+    assert _names(index, "(lead OR pad) t1_osc1_wave=Saw") == ["Saw Lead", "Warm Pad"]
+    assert len(index.search("")) == 4
+
+
+def test_query_errors(index):
+    for query in ("nope_param=1", "t1_osc1_wave=Banjo", "(lead", "t1_filter1_cutoff>",
+                  "color:red", "lead )"):
+        with pytest.raises(QueryError):
+            index.search(query)
+
+
+def test_sync_updates_incrementally(index):
+    changed = _patch("Pulse Bass", "bass", "", p37=1, p53=120, p327=6)
+    index.sync([changed, _patch("Saw Lead", "lead", "bright", p37=0, p53=100, p327=6),
+                _patch("New", "fx", p53=127)])
+    assert len(index) == 3
+    assert _names(index, "t1_filter1_cutoff>110") == ["New", "Pulse Bass"]
+    assert _names(index, "warm") == []
+    index.remove(Path("/lib/New.json"))
+    assert _names(index, "t1_filter1_cutoff>110") == ["Pulse Bass"]
+
+
+def test_index_grows_past_capacity():
+    idx = PatchIndex(capacity=2)
+    idx.add_many([(Path(f"/lib/{i}.json"), _patch(f"P{i}", p53=i)) for i in range(10)])
+    assert len(idx.search("t1_filter1_cutoff>=5")) == 5
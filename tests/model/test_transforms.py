@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from midi.effects import EFFECT_TYPES, FX1_TYPE_PACKED, FX2_TYPE_PACKED, fx_param_packed
+from midi.generator import PatchGenerator
+from midi.layout import LAYOUT
+from midi.param_codec import decode_stack
+from midi.params import ParamMap
+from model.library import Library
+from model.patch import Patch
+from model.transforms import (
+    Pipeline, SetFXParam, TransformError, parse_step, swap_fx, transform_library,
+)
+
+PM = ParamMap()
+
+
+def _stack(n: int = 50) -> np.ndarray:
+    return PatchGenerator(seed=5).random(n)
+
+
+def test_copy_timbre1_to_timbre2_maps_every_param():
+    before = _stack()
+    after = Pipeline([parse_step("copy Timbre1 Timbre2", PM)]).run(before)
+    assert after.max() <= 0x7F
+    t1 = [p for p in PM.sysex_params() if p.name.startswith("t1_")]
+    t2 = [PM.get("t2_" + p.name[3:]) for p in t1]
+    pairs = [(a, b) for a, b in zip(t1, t2) if b is not None and b.sysex_offset is not None]
+    assert pairs
+    src = decode_stack(after, [a for a, _ in pairs])
+    dst = decode_stack(after, [b for _, b in pairs])
+    assert (src == dst).all()
+    assert (LAYOUT.read_section(after, "Timbre1") == LAYOUT.read_section(before, "Timbre1")).all()
+
+
+def test_swap_fx_twice_is_identity():
+    before = _stack()
+    once = Pipeline([swap_fx()]).run(before)
+    assert (once[:, FX1_TYPE_PACKED] == before[:, FX2_TYPE_PACKED]).all()
+    assert (once[:, FX2_TYPE_PACKED] == before[:, FX1_TYPE_PACKED]).all()
+    assert (once[:, fx_param_packed(1, 0)] == before[:, fx_param_packed(2, 0)]).all()
+    assert (Pipeline([swap_fx()]).run(once) == before).all()
+
+
+def test_set_fx_type_and_dry_wet():
+    pipeline = Pipeline([parse_step("set fx2_type=Delay", PM),
+                         parse_step("set fx2.dry_wet=40", PM)])
+    after = pipeline.run(_stack())
+    assert (after[:, FX2_TYPE_PACKED] == 6).all()
+    step = SetFXParam(2, "dry_wet", 40)
+    assert step.describe() == "set fx2.dry_wet=40"
+    slot = next(p.slot_index for p in EFFECT_TYPES[6].params if p.key == "dry_wet")
+    assert (after[:, fx_param_packed(2, slot)] == 40).all()
+
+
+def test_normalize_scales_loudest_to_target():
+    params = [PM.get("t1_amp_level"), PM.get("t2_amp_level")]
+    after = Pipeline([parse_step("normalize t1_amp_level,t2_amp_level 100", PM)]).run(_stack())
+    values = decode_stack(after, params)
+    peaks = values.max(axis=1)
+    assert (peaks[peaks > 0] == 100).all()
+
+
+def test_preview_lists_changed_params_only():
+    before = _stack(10)
+    before[3, FX2_TYPE_PACKED] = 6
+    pipeline = Pipeline([parse_step("set fx2_type=6", PM)])
+    after = pipeline.run(before)
+    diffs = pipeline.preview(before, after)
+    assert 3 not in [d.row for d in diffs]
+    assert all(("fx2_type", int(before[d.row, FX2_TYPE_PACKED]), 6) in d.params for d in diffs)
+
+
+@pytest.mark.parametrize("text", ["", "copy Timbre1", "copy Timbre1 Nope",
+                                  "set no_such_param=1", "set fx2_type=Bogus",
+                                  "set fx1.bogus_key=5",
+                                  "normalize t1_amp_level loud", "explode"])
+def test_parse_step_rejects_bad_input(text):
+    with pytest.raises(TransformError):
+        parse_step(text, PM)
+
+
+def test_transform_library_dry_run_then_apply(tmp_path):
+    lib = Library(root=tmp_path)
+    programs = PatchGenerator(seed=2).to_bytes(_stack(4))
+    lib.save_patches([Patch(name=f"P{i}", program_number=0, sysex_data=d)
+                      for i, d in enumerate(programs)])
+    patches = lib.list_patches()
+    pipeline = Pipeline([parse_step("copy Timbre1 Timbre2", PM)])
+
+    dry = transform_library(lib, patches, pipeline)
+    assert dry.diffs and dry.written == 0
+    assert [p.sysex_data for p in lib.list_patches()] == [p.sysex_data for p in patches]
+
+    done = transform_library(lib, patches, pipeline, apply=True)
+    assert done.written == len(done.diffs)
+    again = transform_library(lib, lib.list_patches(), pipeline)
+    assert again.diffs == []
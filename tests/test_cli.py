@@ -0,0 +1,188 @@
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+import cli
+from model.library import Library
+from tools.file_format import read_patch, sysex_to_prog_bytes
+
+ROOT = Path(__file__).parent.parent
+
+
+def _program(name: bytes) -> bytes:
+    data = bytearray(496)
+    data[:len(name)] = name
+    for p in range(17, 412, 3):
+        if p % 8:
+            data[p] = p & 0x7F
+    return bytes(data)
+
+
+def test_convert_round_trip(tmp_path):
+    prog = tmp_path / "lead.rk100s2_prog"
+    prog.write_bytes(sysex_to_prog_bytes(_program(b"Lead")))
+    assert cli.main(["convert", str(prog)]) == 0
+    syx = tmp_path / "lead.syx"
+    raw = syx.read_bytes()
+    assert raw[0] == 0xF0 and raw[-1] == 0xF7
+    back = tmp_path / "back.rk100s2_prog"
+    assert cli.main(["convert", str(syx), "-o", str(back)]) == 0
+    assert read_patch(back) == read_patch(prog)
+
+
+class FakeDevice:
+    def __init__(self):
+        self.sent = []
+        self.connected = True
+
+    def send(self, message):
+        self.sent.append(list(message))
+
+    def disconnect(self):
+        self.connected = False
+
+
+def _push(tmp_path, monkeypatch, *flags):
+    import midi.transfer
+    from model.bank import Bank
+    from model.patch import Patch
+
+    Patch(name="Lead", program_number=0, sysex_data=_program(b"Lead")).save(tmp_path / "lead.json")
+    bank = Bank(name="Live")
+    bank.assign(4, Path("lead.json"))
+    bank.save(tmp_path / "live.json")
+    device = FakeDevice()
+    monkeypatch.setattr(cli, "_open_device", lambda port, logger: device)
+    monkeypatch.setattr(midi.transfer, "SLOT_SWITCH_DELAY_S", 0)
+    status = cli.main(["push", str(tmp_path / "live.json"), "--library", str(tmp_path),
+                       "--delay", "0", *flags])
+    return status, device
+
+
+def test_push_stores_each_slot_by_default(tmp_path, monkeypatch):
+    from midi.sysex import build_program_write_request
+    status, device = _push(tmp_path, monkeypatch)
+    assert status == 0 and not device.connected
+    assert device.sent[-1] == build_program_write_request(channel=1, slot=4)
+    status, device = _push(tmp_path, monkeypatch, "--no-store")
+    assert status == 0
+    assert device.sent[-1][0] == 0xF0 and len(device.sent[-1]) > 400
+
+
+def test_push_rejects_verify_without_store(tmp_path, monkeypatch, capsys):
+    assert _push(tmp_path, monkeypatch, "--no-store", "--verify")[0] == 2
+    assert "--no-store" in capsys.readouterr().err
+
+
+def test_diff_exit_status(tmp_path, capsys):
+    a = tmp_path / "a.syx"
+    b = tmp_path / "b.syx"
+    a.write_bytes(_program(b"Same"))
+    b.write_bytes(_program(b"Same"))
+    assert cli.main(["diff", str(a), str(b)]) == 0
+    b.write_bytes(_program(b"Diff"))
+    assert cli.main(["diff", str(a), str(b)]) == 1
+    assert "Total diffs" in capsys.readouterr().out
+
+
+def test_import_directory(tmp_path):
+    src = tmp_path / "in"
+    src.mkdir()
+    (src / "one.rk100s2_prog").write_bytes(sysex_to_prog_bytes(_program(b"One")))
+    (src / "two.syx").write_bytes(_program(b"Two"))
+    lib = tmp_path / "lib"
+    assert cli.main(["import", str(src), "--library", str(lib)]) == 0
+    names = sorted(p.name for p in Library(root=lib).list_patches())
+    assert names == ["One", "Two"]
+
+
+def test_search(tmp_path, capsys):
+    lib = tmp_path / "lib"
+    src = tmp_path / "in"
+    src.mkdir()
+    (src / "one.syx").write_bytes(_program(b"One"))
+    (src / "two.syx").write_bytes(_program(b"Two"))
+    cli.main(["import", str(src), "--library", str(lib)])
+    capsys.readouterr()
+    assert cli.main(["search", "name:two", "--library", str(lib)]) == 0
+    assert capsys.readouterr().out.startswith("Two\t")
+    assert cli.main(["search", "bogus_param>1", "--library", str(lib)]) == 2
+
+
+def test_generate_mutations(tmp_path):
+    src = tmp_path / "base.syx"
+    src.write_bytes(_program(b"Base"))
+    lib = tmp_path / "lib"
+    assert cli.main(["generate", "5", "--from", str(src), "--rate", "0.5",
+                     "--seed", "1", "--library", str(lib)]) == 0
+    patches = Library(root=lib).list_patches()
+    assert len(patches) == 5
+    assert all(p.name.startswith("Base ") for p in patches)
+
+
+def test_range_validation():
+    assert cli._parse_range("1-3") == [0, 1, 2]
+    with pytest.raises(cli.CliError):
+        cli._parse_range("0-3")
+
+
+def test_cli_does_not_import_qt(tmp_path):
+    prog = tmp_path / "x.rk100s2_prog"
+    prog.write_bytes(sysex_to_prog_bytes(_program(b"X")))
+    code = (
+        "import sys, main\n"
+        f"sys.argv = ['patchmasta', 'convert', {str(prog)!r}]\n"
+        "try:\n    main.main()\n"
+        "except SystemExit as e:\n    assert e.code == 0, e.code\n"
+        "assert not any(m.startswith('PyQt6') for m in sys.modules), 'PyQt6 imported'\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+
+def test_transform_is_dry_run_until_applied(tmp_path, capsys):
+    lib = tmp_path / "lib"
+    assert cli.main(["generate", "3", "--seed", "4", "--library", str(lib)]) == 0
+    before = [p.sysex_data for p in Library(root=lib).list_patches()]
+    args = ["transform", "--step", "set fx2_type=Delay", "--library", str(lib)]
+    assert cli.main(args) == 0
+    assert "dry run" in capsys.readouterr().out
+    assert [p.sysex_data for p in Library(root=lib).list_patches()] == before
+    assert cli.main(args + ["--apply"]) == 0
+    assert all(p.sysex_data[355] == 6 for p in Library(root=lib).list_patches())
+    assert cli.main(["transform", "--step", "bogus", "--library", str(lib)]) == 2
+
+
+def test_index_audio(tmp_path, monkeypatch, capsys):
+    import numpy as np
+    from scipy.io import wavfile
+    import audio.feature_cache
+    from audio.engine import generate_test_tone
+
+    monkeypatch.setattr(audio.feature_cache, "FEATURE_CACHE_DIR", tmp_path / "cache")
+    wavfile.write(str(tmp_path / "ref.wav"), 44100,
+                  np.int16(generate_test_tone(220.0, 0.3, 44100) * 32767))
+    assert cli.main(["index-audio", str(tmp_path), "--jobs", "1"]) == 0
+    assert "Indexed 1 WAV files" in capsys.readouterr().out
+    assert len(list((tmp_path / "cache").glob("*.npz"))) == 1
+
+
+def test_fingerprint_and_similar_offline(tmp_path, monkeypatch, capsys):
+    import numpy as np
+    from scipy.io import wavfile
+    import audio.fingerprint
+    from audio.fingerprint import surrogate_renderer
+
+    monkeypatch.setattr(audio.fingerprint, "OFFLINE_FINGERPRINT_DIR", tmp_path / "fp")
+    lib = tmp_path / "lib"
+    assert cli.main(["generate", "3", "--seed", "2", "--library", str(lib)]) == 0
+    assert cli.main(["fingerprint", "--offline", "--library", str(lib)]) == 0
+    assert "Fingerprinted 3 programs (0 already indexed)" in capsys.readouterr().out
+    assert cli.main(["fingerprint", "--offline", "--library", str(lib)]) == 0
+    assert "Fingerprinted 0 programs (3 already indexed)" in capsys.readouterr().out
+
+    patch = Library(root=lib).list_patches()[1]
+    samples, sr = surrogate_renderer(notes=(60,))(patch.sysex_data)[0]
+    wavfile.write(str(tmp_path / "ref.wav"), sr, np.int16(samples * 32767))
+    assert cli.main(["similar", str(tmp_path / "ref.wav"), "-k", "1", "--offline",
+                     "--library", str(lib)]) == 0
+    assert capsys.readouterr().out.split("\t")[1:] == [patch.name, f"{patch.source_path}\n"]
@@ -0,0 +1,89 @@
+"""Tests for tools/collection_stats.py."""
+import json
+import numpy as np
+from tools.collection_stats import (
+    analyze, byte_entropy, byte_histograms, cluster, covariation,
+    find_patch_files, load_collection, pairwise_distances, save_report, summarize,
+)
+from tools.file_format import sysex_to_prog_bytes
+
+
+def _stack() -> np.ndarray:
+    base = np.zeros((6, 496), dtype=np.uint8)
+    base[:3, 19] = [1, 1, 1]        # group A
+    base[3:, 19] = [9, 9, 9]        # group B
+    base[:, 20] = [0, 1, 2, 3, 4, 5]
+    base[:, 21] = base[:, 20] * 2   # perfectly correlated with 20
+    base[:, 450] = np.arange(6)     # extra region, ignored by default
+    return base
+
+
+def test_histograms_and_entropy():
+    stack = _stack()
+    hist = byte_histograms(stack)
+    assert hist.shape == (496, 256)
+    assert hist[19, 1] == 3 and hist[19, 9] == 3
+    entropy = byte_entropy(hist)
+    assert entropy[0] == 0
+    assert np.isclose(entropy[19], 1.0)
+    assert np.isclose(entropy[20], np.log2(6))
+
+
+def test_covariation_skips_extra_region():
+    offsets, corr = covariation(_stack())
+    assert list(offsets) == [19, 20, 21]
+    assert np.isclose(corr[1, 2], 1.0)
+
+
+def test_pairwise_distances_match_serial_and_pool():
+    stack = _stack()
+    expected = np.array([[int((a != b)[:412].sum()) for b in stack] for a in stack])
+    assert (pairwise_distances(stack, workers=1) == expected).all()
+    assert (pairwise_distances(stack, workers=2, rows_per_task=2) == expected).all()
+
+
+def test_clusters_separate_groups():
+    stack = _stack()
+    stack[:, 20:22] = 0
+    labels = cluster(pairwise_distances(stack, workers=1), n_clusters=2)
+    assert len(set(labels[:3])) == 1 and len(set(labels[3:])) == 1
+    assert labels[0] != labels[3]
+
+
+def test_load_analyze_and_report(tmp_path):
+    stack = _stack()
+    stack[:, 20:22] = 0
+    paths = []
+    for i, row in enumerate(stack):
+        path = tmp_path / f"p{i}.syx"
+        path.write_bytes(row.tobytes())
+        paths.append(path)
+    (tmp_path / "junk.syx").write_bytes(b"\x00")
+    paths.append(tmp_path / "junk.syx")
+    prog = tmp_path / "p.rk100s2_prog"
+    prog.write_bytes(sysex_to_prog_bytes(stack[0].tobytes()))
+    paths.append(prog)
+    names, loaded = load_collection(paths, workers=2, chunk_size=3)
+    assert len(names) == 7 and loaded.shape == (7, 496)
+    report = analyze(loaded, names, n_clusters=2, workers=1)
+    save_report(tmp_path / "r.npz", report)
+    with np.load(tmp_path / "r.npz") as saved:
+        assert saved["distances"].shape == (7, 7)
+    summary = summarize(report, loaded)
+    json.dumps(summary)
+    assert summary["most_variable"][0]["label"] == "Timbre1 L0"
+    assert len(summary["clusters"]) == 2
+
+
+def test_library_directory_counts_each_patch_once(tmp_path):
+    from model.library import Library
+    from model.patch import Patch
+    library = Library(root=tmp_path)
+    library.save_patches([Patch(name=f"P{i}", program_number=0,
+                                sysex_data=bytes([i + 1]) + bytes(495)) for i in range(5)])
+    assert list(tmp_path.rglob("patch_index.json"))
+    files = find_patch_files([tmp_path])
+    assert len(files) == 5
+    assert all(f.suffix == ".syx" for f in files)
+    names, loaded = load_collection(files, workers=1)
+    assert loaded.shape == (5, 496)
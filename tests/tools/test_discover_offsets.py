@@ -0,0 +1,97 @@
+"""Tests for group-testing offset discovery in tools/discover_offsets.py."""
+from midi.params import ParamDef
+from midi.sysex import MODEL_ID
+from tools.discover_offsets import OffsetDiscovery, decode_group_test, group_test_plan
+
+
+class FakeParamMap:
+    def __init__(self, params):
+        self._params = params
+
+    def nrpn_params(self):
+        return list(self._params)
+
+
+class FakeSynth:
+    """Program buffer driven by NRPN; *fields* maps NRPN lsb → (offset, mask, shift)."""
+
+    def __init__(self, fields, interacting=None):
+        self.fields = fields
+        self.interacting = interacting or {}
+        self.values = {lsb: 0 for lsb in fields}
+        self.dumps = 0
+        self.writes = []
+        self._callback = None
+
+    def program(self) -> bytes:
+        data = bytearray(496)
+        for lsb, (offset, mask, shift) in self.fields.items():
+            low_bit = (mask & -mask).bit_length() - 1
+            data[offset] |= ((self.values[lsb] >> shift) << low_bit) & mask
+        # Bit set when either of two params is high (shared flag)
+        for offset, (a, b) in self.interacting.items():
+            if self.values[a] or self.values[b]:
+                data[offset] |= 0x01
+        data[450] = sum(data) & 0x7F  # checksum-like tail byte
+        return bytes(data)
+
+    def set_sysex_callback(self, callback):
+        self._callback = callback
+
+    def send_nrpn(self, channel, msb, lsb, value):
+        self.values[lsb] = value
+
+    def send(self, message):
+        if message[-2] == 0x10:  # program dump request
+            self.dumps += 1
+            self._callback(([0xF0, 0x42, 0x30, *MODEL_ID, 0x40, *self.program(), 0xF7], 0))
+        elif message[-1] == 0xF7:
+            self.writes.append(message)
+
+
+def _param(name, lsb):
+    return ParamDef(name, name, "", 0, 127, nrpn_msb=0, nrpn_lsb=lsb)
+
+
+def test_plan_size_is_logarithmic():
+    assert len(group_test_plan(50)) == 2 + 2 * 6
+    assert len(group_test_plan(1)) == 4
+
+
+def test_decode_attributes_bits_and_flags_interactions():
+    fields = {i: (100 + i, 0x7F, 0) for i in range(5)}
+    synth = FakeSynth(fields, interacting={300: (0, 1)})
+    states = group_test_plan(5)
+    dumps = []
+    for _, state in states:
+        for u, hi in enumerate(state):
+            synth.values[u] = 127 if hi else 0
+        dumps.append(synth.program())
+    result = decode_group_test(dumps[0], dumps[1], list(zip(dumps[2::2], dumps[3::2])), 5)
+    assert result.bits[3] == {103: 0x7F}
+    assert 450 not in result.unexplained
+    assert result.unexplained == {300: 0x01}
+    assert result.ambiguous_units() == [0, 1]
+
+
+def test_discover_nrpn_offsets_with_fake_device(monkeypatch):
+    monkeypatch.setattr("tools.discover_offsets.time.sleep", lambda s: None)
+    # Two params share byte 8 via bit fields; one is split across an HB byte
+    fields = {i: (120 + i * 2 + (i // 3), 0x7F, 0) for i in range(20)}
+    fields[20] = (8, 0x30, 5)   # bits 4-5
+    fields[21] = (8, 0x03, 5)   # bits 0-1
+    synth = FakeSynth(fields, interacting={300: (2, 3)})
+    params = [_param(f"p{i}", i) for i in fields]
+    params.append(_param("alias_of_p4", 4))
+    discovery = OffsetDiscovery(synth, FakeParamMap(params))
+    offsets = discovery.discover_nrpn_offsets(settle_time=0)
+
+    for i, (offset, _, _) in fields.items():
+        assert offsets[f"p{i}"] == offset
+    assert offsets["alias_of_p4"] == fields[4][0]
+    assert discovery.last_result.bits[20] == {8: 0x30}
+    # 1 baseline + 12 group-test dumps + single checks for p2 and p3
+    assert synth.dumps == 1 + len(group_test_plan(22)) + 2
+    assert len(synth.writes) == 1  # restored once at the end
+    assert discovery.last_result.bits[2][300] == 0x01
+    assert discovery.last_result.unexplained == {}
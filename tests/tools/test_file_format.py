@@ -65,3 +65,44 @@ def test_prog_file_to_sysex_hb_bytes_are_zero():
     for p in range(18, 496):
         if p % 8 == 0:
             assert sysex[p] == 0, f"HB byte at packed {p} should be 0"
+
+
+def test_batch_matches_single_conversion():
+    import numpy as np
+    from tools.file_format import sysex_to_prog_batch, prog_to_sysex_batch
+    rng = np.random.default_rng(1)
+    stack = rng.integers(0, 128, (8, PROGRAM_DATA_SIZE), dtype=np.uint8)
+    files = sysex_to_prog_batch(stack)
+    for row, out in zip(stack, files):
+        assert sysex_to_prog_bytes(row.tobytes())[FILE_HEADER_SIZE:] == out.tobytes()
+    back = prog_to_sysex_batch(files)
+    for row, out in zip(files, back):
+        assert prog_file_to_sysex(row.tobytes()) == out.tobytes()
+
+
+def test_sysex_to_prog_later_packed_bytes_win():
+    # Packed 18-20 map onto file 15-17 after the direct common copy
+    sysex = bytearray(PROGRAM_DATA_SIZE)
+    sysex[15:21] = bytes([1, 2, 3, 4, 5, 6])
+    file_data = sysex_to_prog_bytes(bytes(sysex))[FILE_HEADER_SIZE:]
+    assert list(file_data[15:18]) == [4, 5, 6]
+
+
+def test_convert_tree_round_trip(tmp_path):
+    from tools.file_format import convert_tree
+    src = tmp_path / "src" / "nested"
+    src.mkdir(parents=True)
+    for i in range(5):
+        sysex = bytes([(i + j) & 0x7F for j in range(PROGRAM_DATA_SIZE)])
+        (src / f"p{i}.rk100s2_prog").write_bytes(
+            sysex_to_prog_bytes(prog_file_to_sysex(sysex_to_prog_bytes(sysex)[FILE_HEADER_SIZE:])))
+    (src / "broken.rk100s2_prog").write_bytes(b"nope")
+    converted, failures = convert_tree(tmp_path / "src", tmp_path / "syx",
+                                       workers=2, chunk_size=2)
+    assert converted == 5
+    assert [Path(p).name for p, _ in failures] == ["broken.rk100s2_prog"]
+    converted, failures = convert_tree(tmp_path / "syx", tmp_path / "back", workers=1)
+    assert converted == 5 and failures == []
+    for i in range(5):
+        name = f"nested/p{i}.rk100s2_prog"
+        assert (tmp_path / "back" / name).read_bytes() == (tmp_path / "src" / name).read_bytes()
@@ -1,6 +1,7 @@
 import pytest
 from PyQt6.QtWidgets import QApplication
-from ui.widgets import ParamKnob, ParamToggle
+import numpy as np
+from ui.widgets import LevelMeterWidget, ParamKnob, ParamToggle
 
 
 @pytest.fixture(scope="module")
@@ -130,3 +131,25 @@ def test_toggle_fixed_height(app):
     toggle = ParamToggle("test", ["Off", "On"], [(0, 63), (64, 127)], lambda n, v: None)
     assert toggle.height() == 24
     assert toggle.minimumWidth() == 100
+
+
+# --- LevelMeterWidget ---
+
+def test_level_meter_repaints_only_new_snapshots(app):
+    from audio.meter import LevelMeter
+    meter = LevelMeter(8000)
+    widget = LevelMeterWidget(lambda: meter.levels, max_fps=20)
+    widget.resize(200, 60)
+    assert widget._timer.interval() == 50
+    widget.start()
+    widget._poll()
+    first = widget._levels
+    widget._poll()
+    assert widget._levels is first
+    meter.push(np.full(512, 0.5, dtype=np.float32))
+    meter.analyze()
+    widget._poll()
+    assert widget._levels is meter.levels and widget._levels is not first
+    widget.grab()       # paints bars without error
+    widget.stop()
+    assert not widget.is_running and widget._levels is None
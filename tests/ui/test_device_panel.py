@@ -1,61 +1,95 @@
 import sys
 import pytest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from PyQt6.QtWidgets import QApplication
 
 @pytest.fixture(scope="module")
 def app():
     return QApplication.instance() or QApplication(sys.argv)
 
-def test_device_panel_buttons_disabled_when_disconnected(app):
-    with patch("midi.device.rtmidi"):
-        from ui.device_panel import DevicePanel
-        panel = DevicePanel()
-        assert not panel.send_btn.isEnabled()
-        assert not panel.pull_btn.isEnabled()
-        assert not panel.load_all_btn.isEnabled()
-        assert not panel.load_range_btn.isEnabled()
+@pytest.fixture
+def make_panel(app):
+    """Build DevicePanels whose discovery threads are stopped before rtmidi is unpatched."""
+    panels = []
 
-def test_monitor_btn_exists_and_starts_disabled(app):
-    with patch("midi.device.rtmidi"):
+    def make():
         from ui.device_panel import DevicePanel
         panel = DevicePanel()
-        assert hasattr(panel, "monitor_btn")
-        assert not panel.monitor_btn.isEnabled()
+        panels.append(panel)
+        return panel
 
-def test_monitor_btn_enabled_on_connect(app):
-    with patch("midi.device.rtmidi"):
-        from ui.device_panel import DevicePanel
-        panel = DevicePanel()
-        panel._set_connected(True)
-        assert panel.monitor_btn.isEnabled()
+    yield make
+    for panel in panels:
+        panel.shutdown()
 
-def test_monitor_btn_disabled_on_disconnect(app):
-    with patch("midi.device.rtmidi"), \
-         patch("ui.device_panel.AudioMonitor"):
-        from ui.device_panel import DevicePanel
-        panel = DevicePanel()
+def test_device_panel_buttons_disabled_when_disconnected(make_panel):
+    panel = make_panel()
+    assert not panel.send_btn.isEnabled()
+    assert not panel.pull_btn.isEnabled()
+    assert not panel.load_all_btn.isEnabled()
+    assert not panel.load_range_btn.isEnabled()
+    assert not panel.push_bank_btn.isEnabled()
+
+def test_monitor_btn_exists_and_starts_disabled(make_panel):
+    panel = make_panel()
+    assert hasattr(panel, "monitor_btn")
+    assert not panel.monitor_btn.isEnabled()
+
+def test_monitor_btn_enabled_on_connect(make_panel):
+    panel = make_panel()
+    panel._set_connected(True)
+    assert panel.monitor_btn.isEnabled()
+
+def test_monitor_btn_disabled_on_disconnect(make_panel):
+    with patch("ui.device_panel.AudioMonitor"):
+        panel = make_panel()
         panel._set_connected(True)
         panel.monitor_btn.setChecked(True)
         panel._set_connected(False)
         assert not panel.monitor_btn.isEnabled()
         assert not panel.monitor_btn.isChecked()
 
-def test_audio_device_combo_exists_with_default(app):
-    with patch("midi.device.rtmidi"), \
-         patch("ui.device_panel.list_audio_input_devices", return_value=[]):
-        from ui.device_panel import DevicePanel
-        panel = DevicePanel()
+def test_audio_device_combo_exists_with_default(make_panel, qtbot):
+    with patch("ui.device_panel.list_audio_input_devices", return_value=[]):
+        panel = make_panel()
+        qtbot.waitUntil(lambda: panel.audio_device_combo.count() >= 1, timeout=2000)
         assert hasattr(panel, "audio_device_combo")
         assert panel.audio_device_combo.count() >= 1
         assert panel.audio_device_combo.itemText(0) == "(default)"
 
-def test_audio_device_combo_shows_devices(app):
+def test_audio_device_combo_shows_devices(make_panel, qtbot):
     fake_devices = [(0, "Built-in Mic"), (2, "USB Audio")]
-    with patch("midi.device.rtmidi"), \
-         patch("ui.device_panel.list_audio_input_devices", return_value=fake_devices):
-        from ui.device_panel import DevicePanel
-        panel = DevicePanel()
+    with patch("ui.device_panel.list_audio_input_devices", return_value=fake_devices):
+        panel = make_panel()
+        qtbot.waitUntil(lambda: panel.audio_device_combo.count() == 3, timeout=2000)
         assert panel.audio_device_combo.count() == 3
         assert panel.audio_device_combo.itemText(1) == "Built-in Mic"
         assert panel.audio_device_combo.itemText(2) == "USB Audio"
+
+def test_port_combo_populated_from_discovery(make_panel, qtbot):
+    with patch("ui.device_panel.list_midi_ports", return_value=["Other", "RK-100S 2 SOUND"]), \
+         patch("ui.device_panel.list_audio_input_devices", return_value=[]):
+        panel = make_panel()
+        qtbot.waitUntil(lambda: panel.port_combo.count() == 2, timeout=2000)
+        assert panel.port_combo.currentText() == "RK-100S 2 SOUND"
+
+def test_port_disappearing_disconnects(make_panel):
+    panel = make_panel()
+    panel.shutdown()
+    panel._device._midi_out, panel._device._midi_in = MagicMock(), MagicMock()
+    panel._device._connected = True
+    panel._device._port_name = "RK-100S 2 SOUND"
+    panel._on_midi_port_disappeared("RK-100S 2 SOUND")
+    assert not panel.device.connected
+    assert not panel.send_btn.isEnabled()
+    assert panel._reconnect_port == "RK-100S 2 SOUND"
+
+def test_level_meter_follows_monitor_toggle(make_panel):
+    with patch("ui.device_panel.AudioMonitor"):
+        panel = make_panel()
+        panel.shutdown()
+        panel._set_connected(True)
+        panel.monitor_btn.setChecked(True)
+        assert panel.level_meter.is_running and not panel.level_meter.isHidden()
+        panel.monitor_btn.setChecked(False)
+        assert not panel.level_meter.is_running and panel.level_meter.isHidden()
@@ -36,6 +36,31 @@ def test_load_file_button_exists_and_emits_signal(app):
     assert spy.called
 
 
+def test_import_folder_button_emits_signal(app):
+    from unittest.mock import MagicMock
+    from ui.library_panel import LibraryPanel
+    panel = LibraryPanel()
+    spy = MagicMock()
+    panel.import_folder_requested.connect(spy)
+    panel._import_folder_btn.click()
+    assert spy.called
+
+
+def test_library_panel_filter_hides_rows(app):
+    from pathlib import Path
+    from ui.library_panel import LibraryPanel
+    panel = LibraryPanel()
+    a = Patch(name="A", program_number=0)
+    b = Patch(name="B", program_number=1)
+    a.source_path, b.source_path = Path("/lib/a.json"), Path("/lib/b.json")
+    panel.populate(banks=[], patches=[a, b])
+    panel.set_filter({Path("/lib/b.json")})
+    visible = [panel.table.item(r, 1).text() for r in range(2) if not panel.table.isRowHidden(r)]
+    assert visible == ["B"]
+    panel.set_filter(None)
+    assert not any(panel.table.isRowHidden(r) for r in range(2))
+
+
 def test_library_panel_columns(app):
     from ui.library_panel import LibraryPanel
     panel = LibraryPanel()
@@ -98,3 +98,39 @@ def test_save_patch_writes_file(editor, tmp_path):
     assert dest.exists()
     assert len(dest.read_bytes()) == 528  # 32-byte header + 496 data
     assert dest.read_bytes()[:8] == b"12100PgD"
+
+
+def test_load_program_skips_write_already_in_edit_buffer(app, tmp_path):
+    from midi.shadow import WRITTEN, DeviceShadow
+    mock_device = MagicMock()
+    mock_device.connected = True
+    from ui.synth_editor_window import SynthEditorWindow
+    win = SynthEditorWindow(
+        device=mock_device, param_map=ParamMap(),
+        config=AppConfig(), logger=AppLogger(),
+    )
+    shadow = DeviceShadow(path=tmp_path / "s.json")
+    shadow.record(None, bytes(496), WRITTEN)
+    win.set_device_shadow(shadow)
+    win.load_program_data(bytes(496), send_to_device=True)
+    assert not mock_device.send.called
+    win.load_program_data(bytes([1]) + bytes(495), send_to_device=True)
+    assert mock_device.send.called
+
+
+def test_undo_and_ab_switch_update_buffer(editor):
+    param = editor._param_map.get("arp_gate")
+    data = bytearray(496)
+    data[param.sysex_offset] = 10
+    editor.load_program_data(bytes(data))
+    assert not editor._undo_action.isEnabled()
+    editor._sysex_buffer.set_param(param, 90)
+    editor._update_history_actions()
+    assert editor._undo_action.isEnabled()
+    editor._ab_action.setChecked(True)      # compare against the loaded patch
+    assert editor._sysex_buffer.get_param(param) == 10
+    editor._ab_action.setChecked(False)     # back to the edits
+    assert editor._sysex_buffer.get_param(param) == 90
+    editor._on_undo()
+    assert editor._sysex_buffer.get_param(param) == 10
+    assert editor._redo_action.isEnabled()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""Byte-variability statistics and bulk diffs over a whole patch collection.
+
+Stacks every program into an (N, 496) packed SysEx matrix and computes,
+vectorized over the stack:
+  - per-byte value histograms and Shannon entropy
+  - correlation between the values of every pair of varying offsets
+  - all-pairs diff counts (bytes that differ), optionally clustered
+
+Loading and the all-pairs distance matrix are split across a process pool.
+Results go to a compact .npz report (arrays) and an optional JSON summary
+with layout labels, instead of being printed pair by pair.
+
+Usage:
+    python tools/collection_stats.py DIR_OR_FILES... -o report.npz
+        [--summary report.json] [--pairs] [--clusters N | --threshold T]
+        [--include-extra] [--jobs N]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from midi.layout import LAYOUT, PROGRAM_DATA_SIZE
+
+PATCH_SUFFIXES = (".rk100s2_prog", ".syx", ".json")
+NOT_PATCHES = ("patch_index.json",)
+
+
+# -- loading --
+
+def _load_one(path: str) -> bytes | None:
+    from tools.file_format import read_patch, prog_file_to_sysex
+    from tools.sysex_diff import load_syx
+    p = Path(path)
+    try:
+        suffix = p.suffix.lower()
+        if suffix == ".rk100s2_prog":
+            data = prog_file_to_sysex(read_patch(p))
+        elif suffix == ".json":
+            from model.patch import Patch
+            data = Patch.load(p).sysex_data
+        else:
+            data = load_syx(p)
+    except (ValueError, OSError, KeyError):
+        return None
+    if data is None or len(data) < PROGRAM_DATA_SIZE:
+        return None
+    return bytes(data[:PROGRAM_DATA_SIZE])
+
+
+def _load_chunk(paths: list[str]) -> list[bytes | None]:
+    return [_load_one(p) for p in paths]
+
+
+def _is_patch_file(path: Path) -> bool:
+    if path.suffix.lower() not in PATCH_SUFFIXES or path.name in NOT_PATCHES:
+        return False
+    # the library keeps each patch as .json metadata next to its .syx data
+    return not (path.suffix.lower() == ".json" and path.with_suffix(".syx").exists())
+
+
+def find_patch_files(inputs: list[Path]) -> list[Path]:
+    """Patch files under *inputs*, one per program (a library's .json/.syx pair counts once)."""
+    files: list[Path] = []
+    for path in inputs:
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if _is_patch_file(p)))
+        else:
+            files.append(path)
+    return files
+
+
+def load_collection(paths: list[Path], workers: int | None = None,
+                    chunk_size: int = 256) -> tuple[list[str], np.ndarray]:
+    """Load programs into an (N, 496) uint8 stack; unreadable files are skipped."""
+    names = [str(p) for p in paths]
+    chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if len(chunks) <= 1 or workers == 1:
+        results = [_load_chunk(c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(_load_chunk, chunks))
+    kept: list[str] = []
+    rows: list[bytes] = []
+    for chunk, datas in zip(chunks, results):
+        for name, data in zip(chunk, datas):
+            if data is not None:
+                kept.append(name)
+                rows.append(data)
+    stack = np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows), PROGRAM_DATA_SIZE)
+    return kept, stack
+
+
+# -- per-byte statistics --
+
+def byte_histograms(stack: np.ndarray) -> np.ndarray:
+    """(496, 256) count of each value at each packed offset."""
+    n, width = stack.shape
+    flat = (np.arange(width, dtype=np.int64) * 256 + stack).ravel()
+    return np.bincount(flat, minlength=width * 256).reshape(width, 256)
+
+
+def byte_entropy(hist: np.ndarray) -> np.ndarray:
+    """Shannon entropy in bits per offset from ``byte_histograms`` output."""
+    totals = hist.sum(axis=1, keepdims=True)
+    p = hist / np.maximum(totals, 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(p > 0, -p * np.log2(p), 0.0)
+    return terms.sum(axis=1)
+
+
+def offset_mask(include_extra: bool = False) -> np.ndarray:
+    """Offsets to analyse; the checksum/extra tail changes with every edit."""
+    if include_extra:
+        return np.ones(PROGRAM_DATA_SIZE, dtype=bool)
+    return ~LAYOUT.in_extra
+
+
+def covariation(stack: np.ndarray, mask: np.ndarray | None = None,
+                ) -> tuple[np.ndarray, np.ndarray]:
+    """Correlation of byte values between varying offsets.
+
+    Returns (offsets, corr) where *offsets* are the packed positions that
+    take more than one value and *corr* is their Pearson correlation matrix.
+    """
+    if mask is None:
+        mask = offset_mask()
+    varying = np.flatnonzero(mask & (stack.min(axis=0) != stack.max(axis=0)))
+    if len(stack) < 2 or len(varying) == 0:
+        return varying, np.zeros((len(varying), len(varying)))
+    x = stack[:, varying].astype(np.float64)
+    x -= x.mean(axis=0)
+    x /= np.linalg.norm(x, axis=0)
+    return varying, x.T @ x
+
+
+# -- all-pairs diffs --
+
+_SHARED: np.ndarray | None = None
+
+
+def _init_shared(stack: np.ndarray) -> None:
+    global _SHARED
+    _SHARED = stack
+
+
+def _distance_rows(bounds: tuple[int, int], block: int = 16) -> np.ndarray:
+    start, stop = bounds
+    stack = _SHARED
+    out = np.empty((stop - start, len(stack)), dtype=np.int32)
+    for i in range(start, stop, block):
+        j = min(i + block, stop)
+        out[i - start:j - start] = (stack[i:j, None, :] != stack[None, :, :]).sum(axis=2)
+    return out
+
+
+def pairwise_distances(stack: np.ndarray, mask: np.ndarray | None = None,
+                       workers: int | None = None, rows_per_task: int = 256,
+                       ) -> np.ndarray:
+    """(N, N) number of differing bytes between every pair of programs."""
+    if mask is None:
+        mask = offset_mask()
+    masked = np.ascontiguousarray(stack[:, mask])
+    n = len(masked)
+    tasks = [(i, min(i + rows_per_task, n)) for i in range(0, n, rows_per_task)]
+    workers = workers or os.cpu_count() or 1
+    if len(tasks) <= 1 or workers == 1:
+        _init_shared(masked)
+        parts = [_distance_rows(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                 initializer=_init_shared, initargs=(masked,)) as pool:
+            parts = list(pool.map(_distance_rows, tasks))
+    return np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.int32)
+
+
+def cluster(distances: np.ndarray, n_clusters: int | None = None,
+            threshold: float | None = None) -> np.ndarray:
+    """Average-linkage clusters from a distance matrix; returns 1-based labels."""
+    from scipy.cluster.hierarchy import fcluster, linkage
+    from scipy.spatial.distance import squareform
+    n = len(distances)
+    if n < 2:
+        return np.ones(n, dtype=np.int32)
+    tree = linkage(squareform(distances, checks=False).astype(np.float64), method="average")
+    if n_clusters is not None:
+        return fcluster(tree, n_clusters, criterion="maxclust").astype(np.int32)
+    return fcluster(tree, threshold if threshold is not None else 0.0,
+                    criterion="distance").astype(np.int32)
+
+
+def cluster_varying_offsets(stack: np.ndarray, labels: np.ndarray,
+                            mask: np.ndarray | None = None) -> dict[int, np.ndarray]:
+    """Packed offsets that vary within each cluster (its members' shared diff)."""
+    if mask is None:
+        mask = offset_mask()
+    result = {}
+    for label in np.unique(labels):
+        members = stack[labels == label]
+        varies = (members.min(axis=0) != members.max(axis=0)) & mask
+        result[int(label)] = np.flatnonzero(varies)
+    return result
+
+
+# -- report --
+
+def _label(packed: int) -> str:
+    label = LAYOUT.label(packed)
+    return f"{label[0]} L{label[1]}" if label else f"packed {packed}"
+
+
+def analyze(stack: np.ndarray, names: list[str], pairs: bool = False,
+            n_clusters: int | None = None, threshold: float | None = None,
+            include_extra: bool = False, workers: int | None = None) -> dict:
+    """Run all statistics; returns a dict of numpy arrays for ``save_report``."""
+    mask = offset_mask(include_extra)
+    hist = byte_histograms(stack)
+    report = {
+        "names": np.array(names),
+        "histograms": hist.astype(np.int32),
+        "entropy": byte_entropy(hist),
+        "offset_mask": mask,
+    }
+    report["cov_offsets"], report["correlation"] = covariation(stack, mask)
+    if pairs or n_clusters is not None or threshold is not None:
+        distances = pairwise_distances(stack, mask, workers=workers)
+        report["distances"] = distances
+        if n_clusters is not None or threshold is not None:
+            report["clusters"] = cluster(distances, n_clusters, threshold)
+    return report
+
+
+def summarize(report: dict, stack: np.ndarray, top: int = 20,
+              min_correlation: float = 0.95, max_pairs: int = 200) -> dict:
+    """JSON-friendly summary: most variable offsets, coupled offsets, clusters."""
+    entropy = report["entropy"]
+    mask = report["offset_mask"]
+    ranked = [int(p) for p in np.argsort(-entropy) if mask[p] and entropy[p] > 0][:top]
+    summary = {
+        "programs": len(report["names"]),
+        "varying_offsets": int(((entropy > 0) & mask).sum()),
+        "most_variable": [
+            {"packed": p, "label": _label(p), "entropy_bits": round(float(entropy[p]), 3),
+             "distinct_values": int((report["histograms"][p] > 0).sum())}
+            for p in ranked
+        ],
+    }
+    offsets, corr = report["cov_offsets"], report["correlation"]
+    i, j = np.nonzero(np.triu(np.abs(corr) >= min_correlation, k=1))
+    strongest = np.argsort(-np.abs(corr[i, j]), kind="stable")[:max_pairs]
+    i, j = i[strongest], j[strongest]
+    summary["coupled_offsets"] = [
+        {"a": _label(int(offsets[a])), "b": _label(int(offsets[b])),
+         "correlation": round(float(corr[a, b]), 3)}
+        for a, b in zip(i, j)
+    ]
+    if "clusters" in report:
+        labels = report["clusters"]
+        varying = cluster_varying_offsets(stack, labels, mask)
+        summary["clusters"] = [
+            {"id": label,
+             "members": [str(n) for n in report["names"][labels == label]],
+             "varying_offsets": [_label(int(p)) for p in offsets_]}
+            for label, offsets_ in varying.items()
+        ]
+    return summary
+
+
+def save_report(path: Path, report: dict) -> None:
+    np.savez_compressed(path, **report)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", type=Path, nargs="+", help="patch files or directories")
+    parser.add_argument("-o", "--out", type=Path, required=True, help=".npz report path")
+    parser.add_argument("--summary", type=Path, help="also write a JSON summary")
+    parser.add_argument("--pairs", action="store_true", help="compute all-pairs diff counts")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--clusters", type=int, help="cut the cluster tree into N clusters")
+    group.add_argument("--threshold", type=float,
+                       help="cluster programs whose average diff is within T bytes")
+    parser.add_argument("--include-extra", action="store_true",
+                        help="include the checksum/extra tail in the analysis")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    files = find_patch_files(args.inputs)
+    names, stack = load_collection(files, workers=args.jobs)
+    if len(names) == 0:
+        print("No readable patches found")
+        sys.exit(1)
+    report = analyze(stack, names, pairs=args.pairs, n_clusters=args.clusters,
+                     threshold=args.threshold, include_extra=args.include_extra,
+                     workers=args.jobs)
+    save_report(args.out, report)
+    if args.summary:
+        args.summary.write_text(json.dumps(summarize(report, stack), indent=2))
+    print(f"Analyzed {len(names)} of {len(files)} files -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,10 +20,13 @@ display-name parameter table (confirmed against NRPN-discovered offsets).
 """
 
 import json
-import math
+import sys
 from pathlib import Path
 from collections import OrderedDict
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from midi.layout import LAYOUT
+
 OUTPUT_PATH = Path.home() / ".config" / "patchmasta" / "offsets.json"
 
 # Ground-truth NRPN-discovered offsets (from device testing via midi/nrpn_scanner.py).
@@ -82,11 +85,6 @@ NRPN_GROUND_TRUTH = {
 }
 
 
-def pack_offset(logical: int, base: int, k: int) -> int:
-    """physical = base + logical + ceil((logical + k) / 7)"""
-    return base + logical + math.ceil((logical + k) / 7)
-
-
 # ======================================================================
 # Logical byte offsets within each section (from binary extraction)
 # ======================================================================
@@ -350,17 +348,17 @@ def compute_physical(section: str, logical: int) -> int:
     if section == "common":
         return logical  # Direct mapping, no packing
     elif section == "timbre1":
-        return pack_offset(logical, base=18, k=3)
+        return LAYOUT.offset("Timbre1", logical)
     elif section == "timbre2":
-        return pack_offset(logical, base=128, k=1)
+        return LAYOUT.offset("Timbre2", logical)
     elif section == "vocoder_band":
-        return pack_offset(logical, base=237, k=6)
+        return LAYOUT.offset("VocBands", logical)
     elif section == "vocoder_header":
         return logical  # Direct physical offset
     elif section == "gap":
-        return pack_offset(logical, base=283, k=4)
+        return LAYOUT.offset("Gap", logical)
     elif section == "arp":
-        return pack_offset(logical, base=384, k=1)
+        return LAYOUT.offset("Arp", logical)
     elif section == "arp_msb":
         return 384  # HB byte for arp section (bit-packed booleans)
     elif section == "arp_msb2":
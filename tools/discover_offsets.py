@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """Automated SysEx byte-offset discovery for the RK-100S 2.
 
-For NRPN-addressable parameters, this tool toggles each one between its min
-and max values via NRPN, pulls program dumps before and after, and diffs to
-find which byte(s) changed.  The results are saved to a JSON mapping file
+For NRPN-addressable parameters, this tool group-tests them: many params are
+switched between min and max at once in binary-coded patterns, and the bits
+that move in each program dump identify which param owns them.  About
+2 * (log2(params) + 1) dumps cover the whole table; ambiguous params are
+re-checked one at a time.  The results are saved to a JSON mapping file
 that can be loaded to populate ParamDef.sysex_offset fields at runtime.
 
 For SysEx-only parameters (no NRPN address), an interactive mode prompts the
@@ -23,18 +25,117 @@ from __future__ import annotations
 
 import json
 import sys
-import threading
 import time
+from dataclasses import dataclass, field
 from pathlib import Path
 
-from midi.sysex import (
-    build_program_dump_request,
-    build_program_write,
-    parse_program_dump,
-)
+import numpy as np
+
+from midi.layout import LAYOUT, PROGRAM_DATA_SIZE
+from midi.sysex import build_program_write
+from midi.transfer import request_program
 from midi.params import ParamDef, ParamMap
 
 
+def group_test_plan(n_units: int) -> list[tuple[str, np.ndarray]]:
+    """Lo/hi states for each dump: all-lo, all-hi, then per index bit and complement."""
+    index = np.arange(n_units)
+    plan = [("all low", np.zeros(n_units, dtype=bool)),
+            ("all high", np.ones(n_units, dtype=bool))]
+    for r in range(max(1, (n_units - 1).bit_length())):
+        bit = ((index >> r) & 1).astype(bool)
+        plan.append((f"bit {r}", bit))
+        plan.append((f"bit {r} complement", ~bit))
+    return plan
+
+
+def changed_bits(a: bytes, b: bytes) -> dict[int, int]:
+    """{offset: xor mask} for differing bytes outside the checksum/extra tail."""
+    n = min(len(a), len(b), PROGRAM_DATA_SIZE)
+    va = np.frombuffer(bytes(a[:n]), dtype=np.uint8)
+    vb = np.frombuffer(bytes(b[:n]), dtype=np.uint8)
+    xor = (va ^ vb) * ~LAYOUT.in_extra[:n]
+    return {int(i): int(xor[i]) for i in np.flatnonzero(xor)}
+
+
+def primary_offset(found: dict[int, int]) -> int:
+    """Lowest data byte a param moved, preferring it over HB (bit 7) bytes."""
+    data = [o for o in found if not LAYOUT.is_hb[o]]
+    return min(data or found)
+
+
+@dataclass
+class GroupTestResult:
+    """Decoded bits per test unit: ``bits[unit] = {offset: bitmask}``.
+
+    ``unexplained`` holds bits that changed between the all-low and all-high
+    dumps but whose round signatures were inconsistent (params interacting
+    on the same bits) or decoded to no unit.  ``suspects`` are the units
+    that could explain them if the bit were an OR or AND of several units.
+    """
+    n_units: int
+    bits: dict[int, dict[int, int]] = field(default_factory=dict)
+    unexplained: dict[int, int] = field(default_factory=dict)
+    suspects: set[int] = field(default_factory=set)
+
+    def ambiguous_units(self) -> list[int]:
+        """Units that need a single-param check: suspects plus units
+        whose decoded bytes also hold unexplained bits."""
+        return [u for u in range(self.n_units)
+                if u in self.suspects
+                or any(o in self.unexplained for o in self.bits.get(u, {}))]
+
+
+def decode_group_test(dump_lo: bytes, dump_hi: bytes,
+                      rounds: list[tuple[bytes, bytes]], n_units: int) -> GroupTestResult:
+    """Attribute changed bits to units from group-test dumps.
+
+    In ``rounds[r][0]`` unit u was high iff bit r of u is set; in
+    ``rounds[r][1]`` the complement.  A bit controlled by a single unit is
+    at its high value in exactly one dump of every pair, and the pattern of
+    rounds where it is high spells the unit index.  Bits failing that test
+    are reported as unexplained.
+    """
+    def bits(dump: bytes) -> np.ndarray:
+        row = np.frombuffer(bytes(dump[:PROGRAM_DATA_SIZE]), dtype=np.uint8)
+        return np.unpackbits(row, bitorder="little").astype(bool)
+
+    dumps = [dump_lo, dump_hi] + [d for pair in rounds for d in pair]
+    states = np.array([state for _, state in group_test_plan(n_units)][:len(dumps)])
+    lo, hi = bits(dump_lo), bits(dump_hi)
+    n_bits = min(len(lo), len(hi))
+    lo, hi = lo[:n_bits], hi[:n_bits]
+    valid = ~np.repeat(LAYOUT.in_extra[:n_bits // 8], 8)
+    moved = np.flatnonzero((lo != hi) & valid)
+
+    code = np.zeros(len(moved), dtype=np.int64)
+    consistent = np.ones(len(moved), dtype=bool)
+    for r, (dump_r, dump_c) in enumerate(rounds):
+        high_r = bits(dump_r)[moved] == hi[moved]
+        high_c = bits(dump_c)[moved] == hi[moved]
+        consistent &= high_r != high_c
+        code |= high_r.astype(np.int64) << r
+    consistent &= code < n_units
+
+    result = GroupTestResult(n_units=n_units)
+    for bit, unit, ok in zip(moved, code, consistent):
+        offset, mask = int(bit) // 8, 1 << (int(bit) % 8)
+        target = result.bits.setdefault(int(unit), {}) if ok else result.unexplained
+        target[offset] = target.get(offset, 0) | mask
+
+    # OR model: no contributor is high in a dump where the bit stayed low.
+    # AND model: every contributor is high in each dump where the bit is high.
+    unexplained = moved[~consistent]
+    if len(unexplained):
+        high = np.array([bits(d)[unexplained] == hi[unexplained] for d in dumps])
+        for k in range(len(unexplained)):
+            on = high[:, k]
+            or_units = ~states[~on].any(axis=0)
+            and_units = states[on].all(axis=0)
+            result.suspects.update(int(u) for u in np.flatnonzero(or_units | and_units))
+    return result
+
+
 class OffsetDiscovery:
     """Discovers SysEx byte offsets by toggling params and diffing dumps."""
 
@@ -42,27 +143,13 @@ class OffsetDiscovery:
         self._device = device
         self._param_map = param_map
         self._channel = channel
+        self.last_result: GroupTestResult | None = None
 
     # -- Low-level helpers ---------------------------------------------------
 
     def pull_program(self, timeout: float = 2.0) -> bytes | None:
         """Pull current program dump from device (blocking)."""
-        received: list[bytes] = []
-        event = threading.Event()
-
-        def on_sysex(midi_event, data=None):
-            message, _ = midi_event
-            parsed = parse_program_dump(list(message))
-            if parsed is not None:
-                received.append(parsed)
-                event.set()
-
-        self._device.set_sysex_callback(on_sysex)
-        self._device.send(build_program_dump_request(channel=self._channel))
-        event.wait(timeout=timeout)
-        # Clear callback
-        self._device.set_sysex_callback(lambda e, d=None: None)
-        return received[0] if received else None
+        return request_program(self._device, channel=self._channel, timeout=timeout)
 
     def write_program(self, data: bytes) -> None:
         """Write a full program dump to the device."""
@@ -90,6 +177,26 @@ class OffsetDiscovery:
 
     # -- NRPN auto-discovery -------------------------------------------------
 
+    def _nrpn_units(self) -> list[list[ParamDef]]:
+        """NRPN params grouped by address; params sharing one are tested together."""
+        units: dict[tuple[int, int], list[ParamDef]] = {}
+        for param in self._param_map.nrpn_params():
+            if max(0, param.min_val) == min(127, param.max_val):
+                continue  # can't diff a param with only one possible value
+            units.setdefault((param.nrpn_msb, param.nrpn_lsb), []).append(param)
+        return list(units.values())
+
+    def _apply_state(self, units: list[list[ParamDef]], state: np.ndarray,
+                     current: np.ndarray | None, settle_time: float) -> np.ndarray:
+        """Send NRPNs for units whose lo/hi state differs from *current*."""
+        for u, hi in enumerate(state):
+            if current is not None and current[u] == hi:
+                continue
+            param = units[u][0]
+            self._send_nrpn(param, min(127, param.max_val) if hi else max(0, param.min_val))
+        time.sleep(settle_time)
+        return state.copy()
+
     def discover_nrpn_offsets(
         self,
         on_progress: callable | None = None,
@@ -97,76 +204,89 @@ class OffsetDiscovery:
     ) -> dict[str, int]:
         """Auto-discover SysEx offsets for all NRPN-addressable params.
 
-        For each NRPN param:
-          1. Send min value via NRPN, pull dump
-          2. Send max value via NRPN, pull dump
-          3. Diff to find which byte(s) changed
-          4. Restore the program to its original state
+        Uses group testing instead of one param at a time:
+          1. Dump with every param at its low value, then at its high value
+          2. For each bit r of the param index, dump with the params whose bit
+             is set at high (and the rest low), then the complement
+          3. Decode which bits moved for each param (``decode_group_test``)
+          4. Re-test ambiguous params one at a time against the all-low dump
+          5. Restore the original program once at the end
 
         Args:
-            on_progress: callback(index, total, param_name) for progress updates
-            settle_time: seconds to wait after NRPN send before pulling
+            on_progress: callback(index, total, label) per program dump
+            settle_time: seconds to wait after NRPN sends before pulling
 
         Returns:
             dict mapping param name → SysEx byte offset
         """
-        # Pull baseline for restore
         baseline = self.pull_program()
         if baseline is None:
             raise RuntimeError("Failed to pull baseline program from device")
 
-        nrpn_params = self._param_map.nrpn_params()
-        total = len(nrpn_params)
+        units = self._nrpn_units()
+        plan = group_test_plan(len(units))
+        total = len(plan)
         offsets: dict[str, int] = {}
-        ambiguous: dict[str, list[tuple[int, int, int]]] = {}
+        if not units:
+            return offsets
 
         try:
-            for i, param in enumerate(nrpn_params):
+            dumps: list[bytes] = []
+            current = None
+            for i, (label, state) in enumerate(plan):
                 if on_progress:
-                    on_progress(i, total, param.name)
-
-                # Clamp test values to valid NRPN range (0-127)
-                val_lo = max(0, param.min_val)
-                val_hi = min(127, param.max_val)
-                if val_lo == val_hi:
-                    continue  # can't diff a param with only one possible value
-
-                # Set to low value, pull
-                self._send_nrpn(param, val_lo)
-                time.sleep(settle_time)
-                dump_lo = self.pull_program()
-
-                # Set to high value, pull
-                self._send_nrpn(param, val_hi)
-                time.sleep(settle_time)
-                dump_hi = self.pull_program()
-
-                if dump_lo is None or dump_hi is None:
-                    continue
-
-                diffs = self._diff_bytes(dump_lo, dump_hi)
-
-                if len(diffs) == 1:
-                    offsets[param.name] = diffs[0][0]
-                elif len(diffs) > 1:
-                    # Multiple bytes changed — record the first but flag it
-                    offsets[param.name] = diffs[0][0]
-                    ambiguous[param.name] = diffs
-
-                # Restore original program state
-                self.write_program(baseline)
+                    on_progress(i, total, label)
+                current = self._apply_state(units, state, current, settle_time)
+                dump = self.pull_program()
+                if dump is None:
+                    raise RuntimeError(f"No program dump received ({label})")
+                dumps.append(dump)
+
+            result = decode_group_test(dumps[0], dumps[1], list(zip(dumps[2::2], dumps[3::2])),
+                                       len(units))
+
+            # Adaptive verification: single-param lo→hi diffs for ambiguous units
+            all_lo = np.zeros(len(units), dtype=bool)
+            ambiguous = result.ambiguous_units()
+            for j, u in enumerate(ambiguous):
+                if on_progress:
+                    on_progress(total + j, total + len(ambiguous), f"verify {units[u][0].name}")
+                state = all_lo.copy()
+                state[u] = True
+                current = self._apply_state(units, state, current, settle_time)
+                dump = self.pull_program()
+                if dump is not None:
+                    result.bits[u] = changed_bits(dumps[0], dump)
+                    for offset, mask in result.bits[u].items():
+                        left = result.unexplained.pop(offset, 0) & ~mask
+                        if left:
+                            result.unexplained[offset] = left
+            self.last_result = result
         finally:
             # Always restore baseline, even if interrupted or an error occurs
             self.write_program(baseline)
 
+        multi_byte: dict[str, list[int]] = {}
+        for u, params in enumerate(units):
+            found = result.bits.get(u)
+            if not found:
+                continue
+            offset = primary_offset(found)
+            for param in params:
+                offsets[param.name] = offset
+                if len(found) > 1:
+                    multi_byte[param.name] = sorted(found)
+
         if on_progress:
             on_progress(total, total, "done")
 
-        if ambiguous:
-            print(f"\nNote: {len(ambiguous)} param(s) changed multiple bytes:")
-            for name, diffs in ambiguous.items():
-                offsets_str = ", ".join(f"{d[0]}" for d in diffs)
-                print(f"  {name}: offsets [{offsets_str}]")
+        if multi_byte:
+            print(f"\nNote: {len(multi_byte)} param(s) changed multiple bytes:")
+            for name, found in multi_byte.items():
+                print(f"  {name}: offsets [{', '.join(str(o) for o in found)}]")
+        if result.unexplained:
+            print(f"Note: {len(result.unexplained)} byte(s) changed without a "
+                  f"consistent param signature: {sorted(result.unexplained)}")
 
         return offsets
 
@@ -21,10 +21,13 @@ Next boundary at +48 or later (variable stride for some entries).
 
 import struct
 import json
-import math
+import sys
 from pathlib import Path
 from collections import defaultdict, OrderedDict
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from midi.layout import pack_offset
+
 BINARY_PATH = "/tmp/RK100S 2 Sound Editor.exe"
 NRPN_OFFSETS_PATH = Path.home() / ".config" / "patchmasta" / "offsets.json"
 IMAGE_BASE = 0x00400000
@@ -128,11 +131,6 @@ def extract_entry(data, boundary_off, next_boundary_off=None):
     }
 
 
-def pack_offset(logical, base, k=3):
-    """physical = base + logical + ceil((logical + k) / 7)"""
-    return base + logical + math.ceil((logical + k) / 7)
-
-
 def main():
     data = read_binary()
     nrpn_offsets = json.loads(NRPN_OFFSETS_PATH.read_text())
@@ -36,40 +36,30 @@ Usage:
 """
 
 from __future__ import annotations
-import math
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from midi.layout import LAYOUT, COMMON_SIZE, PROGRAM_DATA_SIZE, SECTIONS, pack_offset
 
 
 FILE_HEADER_SIZE = 32
-PROGRAM_DATA_SIZE = 496
 FILE_MAGIC = b"12100PgD"
 
-# Section definitions: (name, packed_base, k_value, logical_count)
-SECTIONS = [
-    ("Common", 0, None, 18),       # Direct mapping, no packing formula
-    ("Timbre1", 18, 3, 96),
-    ("Timbre2", 128, 1, 96),
-    ("VocBands", 237, 6, 42),
-    ("Gap", 283, 4, 88),
-    ("Arp", 384, 1, 24),
-]
-
-
-def pack_offset(logical: int, base: int, k: int) -> int:
-    """Compute packed SysEx position from section logical offset."""
-    return base + logical + math.ceil((logical + k) / 7)
-
 
 def packed_to_file(packed: int) -> int | None:
     """Convert packed SysEx position to .rk100s2_prog file position.
 
     Returns None for HB byte positions (no file equivalent in data section).
     """
-    if packed < 18:
-        return packed  # Common header: direct mapping
+    if 0 <= packed < PROGRAM_DATA_SIZE:
+        fp = int(LAYOUT.packed_to_file[packed])
+        return None if fp < 0 else fp
     if packed % 8 == 0:
-        return None  # HB byte in global packing, no direct file equivalent
+        return None
     return (packed // 8) * 7 + (packed % 8) - 1
 
 
@@ -79,13 +69,9 @@ def file_to_packed(file_pos: int) -> int:
     For common header (file_pos < 18): returns file_pos directly.
     For data section: applies inverse of global unpacking formula.
     """
-    if file_pos < 18:
-        return file_pos  # Common header: direct mapping
-    # Inverse of: file = (packed // 8) * 7 + (packed % 8) - 1
-    # = (u // 7) * 8 + (u % 7) + 1  where u = file_pos
-    group = file_pos // 7
-    pos = file_pos % 7
-    return group * 8 + pos + 1
+    if 0 <= file_pos < PROGRAM_DATA_SIZE:
+        return int(LAYOUT.file_to_packed[file_pos])
+    return (file_pos // 7) * 8 + file_pos % 7 + 1
 
 
 def packed_to_section(packed: int) -> tuple[str, int]:
@@ -93,33 +79,16 @@ def packed_to_section(packed: int) -> tuple[str, int]:
 
     Returns (section_name, logical_offset) or ("Unknown", packed_offset).
     """
-    if packed < 18:
-        return ("Common", packed)
-
-    # Build reverse map for each section
-    for name, base, k, count in SECTIONS:
-        if name == "Common":
-            continue
-        for L in range(count):
-            pk = pack_offset(L, base, k)
-            if pk == packed:
-                return (name, L)
-
-        # Check if this is an HB byte in this section
-        # HB bytes are at positions where (pos - base) maps to group boundaries
-        if base <= packed:
-            rel = packed - base
-            if rel >= 0 and rel // 8 <= count // 7 + 1:
-                if rel % 8 == 0 or (rel == 0 and k > 0):
-                    # Could be an HB byte for this section
-                    pass  # Continue checking other sections
-
-    return ("Unknown", packed)
+    return LAYOUT.section(packed)
 
 
 def read_patch(path: Path) -> bytes:
     """Read program data from a .rk100s2_prog file (strips 32-byte header)."""
-    data = path.read_bytes()
+    return parse_prog_bytes(path.read_bytes())
+
+
+def parse_prog_bytes(data: bytes) -> bytes:
+    """Validate .rk100s2_prog file contents and return the program data."""
     if len(data) < FILE_HEADER_SIZE + PROGRAM_DATA_SIZE:
         raise ValueError(f"File too small: {len(data)} bytes "
                          f"(expected {FILE_HEADER_SIZE + PROGRAM_DATA_SIZE})")
@@ -135,6 +104,67 @@ _FILE_HEADER = bytes.fromhex(
 _FF_PAD_START = 474
 
 
+def _build_index_maps() -> tuple[np.ndarray, np.ndarray]:
+    """Precompute gather indices for both conversion directions.
+
+    Sources are indexed into a row extended with sentinel columns:
+    ``PROGRAM_DATA_SIZE`` holds 0 and ``PROGRAM_DATA_SIZE + 1`` holds 0xFF.
+    Packed positions are visited in order so later writes win, matching the
+    byte-by-byte mapping (packed 18-20 overwrite common bytes 15-17).
+    """
+    zero, ff = PROGRAM_DATA_SIZE, PROGRAM_DATA_SIZE + 1
+    packed = np.arange(PROGRAM_DATA_SIZE)
+    files = LAYOUT.packed_to_file.astype(np.intp)
+    mapped = files >= 0
+    to_file = np.full(PROGRAM_DATA_SIZE, zero, dtype=np.intp)
+    # Common bytes first, then the (injective) packed data section on top
+    common = packed < COMMON_SIZE
+    for part in (mapped & common, mapped & ~common):
+        to_file[files[part]] = packed[part]
+    to_file[_FF_PAD_START:] = ff
+    to_sysex = np.where(mapped, files, zero)
+    to_file.setflags(write=False)
+    to_sysex.setflags(write=False)
+    return to_file, to_sysex
+
+
+# file_data = extended_sysex[SYSEX_TO_FILE_INDEX]; sysex = extended_file[FILE_TO_SYSEX_INDEX]
+SYSEX_TO_FILE_INDEX, FILE_TO_SYSEX_INDEX = _build_index_maps()
+
+
+def _as_stack(data, name: str) -> np.ndarray:
+    """Return an (N, PROGRAM_DATA_SIZE) uint8 view, validating the row length."""
+    stack = np.asarray(data, dtype=np.uint8)
+    if stack.ndim != 2:
+        raise ValueError(f"{name} must be a 2-D (N, {PROGRAM_DATA_SIZE}) array")
+    if stack.shape[1] < PROGRAM_DATA_SIZE:
+        raise ValueError(f"{name} too short: {stack.shape[1]} bytes "
+                         f"(need {PROGRAM_DATA_SIZE})")
+    return stack[:, :PROGRAM_DATA_SIZE]
+
+
+def _gather(stack: np.ndarray, index: np.ndarray) -> np.ndarray:
+    extended = np.empty((stack.shape[0], PROGRAM_DATA_SIZE + 2), dtype=np.uint8)
+    extended[:, :PROGRAM_DATA_SIZE] = stack
+    extended[:, PROGRAM_DATA_SIZE] = 0
+    extended[:, PROGRAM_DATA_SIZE + 1] = 0xFF
+    return extended[:, index]
+
+
+def sysex_to_prog_batch(stack) -> np.ndarray:
+    """Convert an (N, 496) stack of packed SysEx programs to file program data.
+
+    Returns an (N, 496) uint8 array of program data without the 32-byte
+    file header (``sysex_to_prog_bytes`` adds it for single programs).
+    """
+    return _gather(_as_stack(stack, "SysEx data"), SYSEX_TO_FILE_INDEX)
+
+
+def prog_to_sysex_batch(stack) -> np.ndarray:
+    """Convert an (N, 496) stack of file program data to packed SysEx (HB bytes = 0)."""
+    return _gather(_as_stack(stack, "File data"), FILE_TO_SYSEX_INDEX)
+
+
 def sysex_to_prog_bytes(sysex: bytes) -> bytes:
     """Convert packed SysEx buffer data to a complete .rk100s2_prog file.
 
@@ -144,20 +174,8 @@ def sysex_to_prog_bytes(sysex: bytes) -> bytes:
     if len(sysex) < PROGRAM_DATA_SIZE:
         raise ValueError(f"SysEx data too short: {len(sysex)} bytes "
                          f"(need {PROGRAM_DATA_SIZE})")
-    file_data = bytearray(PROGRAM_DATA_SIZE)
-    # Common header: direct mapping (positions 0-17)
-    for p in range(18):
-        file_data[p] = sysex[p]
-    # Data section: skip HB bytes, map to file positions
-    for p in range(18, min(len(sysex), PROGRAM_DATA_SIZE)):
-        if p % 8 != 0:
-            fp = packed_to_file(p)
-            if fp is not None and fp < PROGRAM_DATA_SIZE:
-                file_data[fp] = sysex[p]
-    # Fixed 0xFF padding at end
-    for i in range(_FF_PAD_START, PROGRAM_DATA_SIZE):
-        file_data[i] = 0xFF
-    return bytes(_FILE_HEADER) + bytes(file_data)
+    row = np.frombuffer(bytes(sysex[:PROGRAM_DATA_SIZE]), dtype=np.uint8)
+    return _FILE_HEADER + sysex_to_prog_batch(row[None, :]).tobytes()
 
 
 def prog_file_to_sysex(file_data: bytes) -> bytes:
@@ -169,19 +187,89 @@ def prog_file_to_sysex(file_data: bytes) -> bytes:
     if len(file_data) < PROGRAM_DATA_SIZE:
         raise ValueError(f"File data too short: {len(file_data)} bytes "
                          f"(need {PROGRAM_DATA_SIZE})")
-    sysex = bytearray(PROGRAM_DATA_SIZE)
-    # Common header: direct mapping
-    for p in range(18):
-        sysex[p] = file_data[p]
-    # Data section: fill non-HB positions from file positions
-    for p in range(18, PROGRAM_DATA_SIZE):
-        if p % 8 == 0:
-            sysex[p] = 0  # HB byte
+    row = np.frombuffer(bytes(file_data[:PROGRAM_DATA_SIZE]), dtype=np.uint8)
+    return prog_to_sysex_batch(row[None, :]).tobytes()
+
+
+# -- directory tree conversion --
+
+PROG_SUFFIX = ".rk100s2_prog"
+SYX_SUFFIX = ".syx"
+
+
+def _convert_chunk(jobs: list[tuple[str, str]], channel: int) -> list[tuple[str, str]]:
+    """Convert (src, dest) pairs in one batch; returns (src, error) failures."""
+    from midi.sysex import build_program_write
+    from tools.sysex_diff import load_syx
+    failures: list[tuple[str, str]] = []
+    prog_rows, prog_jobs, syx_rows, syx_dests = [], [], [], []
+    for src, dest in jobs:
+        try:
+            if src.lower().endswith(PROG_SUFFIX):
+                prog_rows.append(read_patch(Path(src)))
+                prog_jobs.append((src, dest))
+            else:
+                payload = load_syx(Path(src))
+                if len(payload) < PROGRAM_DATA_SIZE:
+                    raise ValueError(f"SysEx data too short: {len(payload)} bytes "
+                                     f"(need {PROGRAM_DATA_SIZE})")
+                syx_rows.append(payload[:PROGRAM_DATA_SIZE])
+                syx_dests.append(dest)
+        except (ValueError, OSError) as exc:
+            failures.append((src, str(exc)))
+
+    def frombytes(rows: list[bytes]) -> np.ndarray:
+        return np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows), -1)
+
+    if prog_rows:
+        sysex = prog_to_sysex_batch(frombytes(prog_rows))
+        prefix = bytes(build_program_write(channel=channel, data=b"")[:-1])
+        invalid = (sysex & 0x80).any(axis=1)
+        for row, (src, dest), bad in zip(sysex, prog_jobs, invalid):
+            if bad:
+                failures.append((src, "SysEx data bytes must all be <= 0x7F"))
+                continue
+            Path(dest).parent.mkdir(parents=True, exist_ok=True)
+            Path(dest).write_bytes(prefix + row.tobytes() + b"\xF7")
+    if syx_rows:
+        files = sysex_to_prog_batch(frombytes(syx_rows))
+        for row, dest in zip(files, syx_dests):
+            Path(dest).parent.mkdir(parents=True, exist_ok=True)
+            Path(dest).write_bytes(_FILE_HEADER + row.tobytes())
+    return failures
+
+
+def convert_tree(src: Path, dest: Path, channel: int = 1,
+                 workers: int | None = None, chunk_size: int = 256,
+                 ) -> tuple[int, list[tuple[str, str]]]:
+    """Convert every .rk100s2_prog/.syx under *src* into the other format.
+
+    The directory structure is mirrored under *dest*.  Files are converted
+    in batches of *chunk_size*, spread across *workers* processes (default:
+    CPU count).  Returns (files_converted, [(path, error), ...]).
+    """
+    src, dest = Path(src), Path(dest)
+    jobs: list[tuple[str, str]] = []
+    for path in sorted(src.rglob("*")):
+        suffix = path.suffix.lower()
+        if suffix == PROG_SUFFIX:
+            out = dest / path.relative_to(src).with_suffix(SYX_SUFFIX)
+        elif suffix == SYX_SUFFIX:
+            out = dest / path.relative_to(src).with_suffix(PROG_SUFFIX)
         else:
-            fp = packed_to_file(p)
-            if fp is not None and fp < len(file_data):
-                sysex[p] = file_data[fp]
-    return bytes(sysex)
+            continue
+        jobs.append((str(path), str(out)))
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    failures: list[tuple[str, str]] = []
+    workers = workers or os.cpu_count() or 1
+    if len(chunks) <= 1 or workers == 1:
+        for chunk in chunks:
+            failures.extend(_convert_chunk(chunk, channel))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            for result in pool.map(_convert_chunk, chunks, [channel] * len(chunks)):
+                failures.extend(result)
+    return len(jobs) - len(failures), failures
 
 
 def analyze_patch(data: bytes) -> None:
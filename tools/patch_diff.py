@@ -13,50 +13,20 @@ making it easy to identify which parameter changed.
 """
 
 from __future__ import annotations
-import math
 import sys
 from pathlib import Path
 
 # Import from sibling module
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from tools.file_format import (
-    FILE_HEADER_SIZE, PROGRAM_DATA_SIZE, read_patch,
-    pack_offset, packed_to_file, file_to_packed, packed_to_section,
-)
+import numpy as np
+from midi.layout import LAYOUT
+from tools.file_format import FILE_HEADER_SIZE, PROGRAM_DATA_SIZE, read_patch
 
 
 def build_reverse_map() -> dict[int, tuple[str, int]]:
     """Build packed_position → (section_name, logical_offset) map."""
-    rev = {}
-    for i in range(18):
-        rev[i] = ("Common", i)
-
-    sections = [
-        ("Timbre1", 18, 3, 96),
-        ("Timbre2", 128, 1, 96),
-        ("VocBands", 237, 6, 42),
-        ("Gap", 283, 4, 88),
-        ("Arp", 384, 1, 24),
-    ]
-
-    for name, base, k, count in sections:
-        for L in range(count):
-            pk = pack_offset(L, base, k)
-            rev[pk] = (name, L)
-        # HB bytes
-        for pos in range(base, base + count + count // 7 + 2):
-            if pos not in rev:
-                rel = pos - base
-                if rel >= 0 and rel % 8 == 0:
-                    rev[pos] = (f"{name}_HB", rel // 8)
-
-    # Mark positions beyond arp as "Extra" (checksum/padding)
-    last_arp = pack_offset(23, 384, 1)  # = 411
-    for pos in range(last_arp + 1, 500):
-        if pos not in rev:
-            rev[pos] = ("Extra", pos - last_arp - 1)
-
-    return rev
+    return {p: LAYOUT.label(p) for p in range(PROGRAM_DATA_SIZE)
+            if LAYOUT.label_id[p] >= 0}
 
 
 # Known param names at specific logical offsets (for labeling)
@@ -88,12 +58,10 @@ KNOWN_PARAMS = {
 
 def diff_patches(a: bytes, b: bytes, label: str = "") -> list[tuple[int, int, int]]:
     """Diff two patch data buffers and print results with section labeling."""
-    rev = build_reverse_map()
-
-    diffs = []
-    for file_pos in range(min(len(a), len(b))):
-        if a[file_pos] != b[file_pos]:
-            diffs.append((file_pos, a[file_pos], b[file_pos]))
+    n = min(len(a), len(b))
+    va = np.frombuffer(bytes(a[:n]), dtype=np.uint8)
+    vb = np.frombuffer(bytes(b[:n]), dtype=np.uint8)
+    diffs = [(int(fp), int(va[fp]), int(vb[fp])) for fp in np.flatnonzero(va != vb)]
 
     if label:
         print(f"\n{'=' * 75}")
@@ -105,18 +73,11 @@ def diff_patches(a: bytes, b: bytes, label: str = "") -> list[tuple[int, int, in
         return diffs
 
     # Separate meaningful changes from checksum/extra area
-    # Extra region starts after last arp byte (packed 411+)
-    last_arp = pack_offset(23, 384, 1)  # = 411
-    last_arp_file = packed_to_file(last_arp)
-    checksum_packed = set()
-    for pk in range(last_arp + 1, 500):
-        checksum_packed.add(pk)
-
+    # (everything after the last arp byte, packed 411)
     meaningful = []
     checksums = []
     for file_pos, old, new in diffs:
-        packed = file_to_packed(file_pos)
-        if packed in checksum_packed:
+        if file_pos >= PROGRAM_DATA_SIZE or LAYOUT.file_in_extra[file_pos]:
             checksums.append((file_pos, old, new))
         else:
             meaningful.append((file_pos, old, new))
@@ -131,8 +92,8 @@ def diff_patches(a: bytes, b: bytes, label: str = "") -> list[tuple[int, int, in
         print(f"  {'-' * 70}")
 
         for file_pos, old, new in meaningful:
-            packed = file_to_packed(file_pos)
-            section, logical = rev.get(packed, ("???", packed))
+            packed = int(LAYOUT.file_to_packed[file_pos])
+            section, logical = LAYOUT.label(packed) or ("???", packed)
             param_name = KNOWN_PARAMS.get((section, logical), "")
 
             print(f"  {file_pos:>5} {packed:>6} {section:>10} L{logical:<3d} "
@@ -8,6 +8,8 @@ from PyQt6.QtCore import pyqtSignal
 from midi.device import MidiDevice, list_midi_ports, find_rk100s2_port
 from audio.engine import AudioMonitor, list_audio_input_devices
 from core.config import AppConfig
+from core.discovery import DeviceDiscovery
+from ui.widgets import LevelMeterWidget
 
 
 class DevicePanel(QWidget):
@@ -17,6 +19,7 @@ class DevicePanel(QWidget):
     pull_requested = pyqtSignal()
     load_all_requested = pyqtSignal()
     load_range_requested = pyqtSignal()
+    push_bank_requested = pyqtSignal()
     synth_editor_requested = pyqtSignal()
 
     def __init__(self, config: AppConfig | None = None, parent=None) -> None:
@@ -24,11 +27,23 @@ class DevicePanel(QWidget):
         self._config = config or AppConfig()
         self._device = MidiDevice()
         self._audio_monitor = AudioMonitor()
+        # Port name to (re)connect to as soon as discovery reports it
+        self._reconnect_port: str | None = None
         self._build_ui()
-        self._refresh_ports()
-        self._refresh_audio_devices()
-        # Now that the combo is populated, init monitor with the resolved index
-        self._audio_monitor = AudioMonitor(device=self.audio_device_combo.currentData())
+        # Enumeration runs off the UI thread; combos fill in when results arrive.
+        # Lambdas resolve the module-level enumerators at call time.  The
+        # service is deliberately unparented: its polling thread keeps it
+        # alive, so it can never be destroyed underneath a running poll.
+        self._discovery = DeviceDiscovery(
+            list_midi=lambda: list_midi_ports(),
+            list_audio=lambda: list_audio_input_devices(),
+            interval_ms=getattr(self._config, "device_poll_interval_ms", 2000),
+        )
+        self._discovery.midi_ports_changed.connect(self._on_midi_ports_changed)
+        self._discovery.audio_devices_changed.connect(self._on_audio_devices_changed)
+        self._discovery.midi_port_appeared.connect(self._on_midi_port_appeared)
+        self._discovery.midi_port_disappeared.connect(self._on_midi_port_disappeared)
+        self._discovery.start()
 
     def _build_ui(self) -> None:
         layout = QVBoxLayout(self)
@@ -76,6 +91,11 @@ class DevicePanel(QWidget):
         monitor_row.addWidget(self.gain_slider, stretch=1)
         conn_layout.addLayout(monitor_row)
 
+        # the lambda follows the monitor when it is rebuilt for another device
+        self.level_meter = LevelMeterWidget(lambda: self._audio_monitor.meter.levels)
+        self.level_meter.setVisible(False)
+        conn_layout.addWidget(self.level_meter)
+
         layout.addWidget(conn_group)
 
         action_group = QGroupBox("Actions")
@@ -102,6 +122,11 @@ class DevicePanel(QWidget):
         self.load_range_btn.clicked.connect(self.load_range_requested)
         action_layout.addWidget(self.load_range_btn)
 
+        self.push_bank_btn = QPushButton("Push Bank to Device...")
+        self.push_bank_btn.setEnabled(False)
+        self.push_bank_btn.clicked.connect(self.push_bank_requested)
+        action_layout.addWidget(self.push_bank_btn)
+
         layout.addWidget(action_group)
 
         self.synth_editor_btn = QPushButton("Synth Editor")
@@ -111,30 +136,54 @@ class DevicePanel(QWidget):
         layout.addStretch()
 
     def _on_refresh(self) -> None:
-        self._refresh_ports()
-        self._refresh_audio_devices()
+        self._discovery.refresh(audio=True)
 
-    def _refresh_ports(self) -> None:
+    def _on_midi_ports_changed(self, ports: list[str]) -> None:
+        if self._device.connected and self._device.port_name:
+            current = self._device.port_name
+        else:
+            current = self.port_combo.currentText()
+        self.port_combo.blockSignals(True)
         self.port_combo.clear()
-        ports = list_midi_ports()
         for name in ports:
             self.port_combo.addItem(name)
-        idx = find_rk100s2_port(ports)
-        if idx is not None:
-            self.port_combo.setCurrentIndex(idx)
+        if current in ports:
+            self.port_combo.setCurrentIndex(ports.index(current))
+        else:
+            idx = find_rk100s2_port(ports)
+            if idx is not None:
+                self.port_combo.setCurrentIndex(idx)
+        self.port_combo.blockSignals(False)
 
-    def _refresh_audio_devices(self) -> None:
+    def _on_audio_devices_changed(self, devices: list[tuple[int, str]]) -> None:
         self.audio_device_combo.blockSignals(True)
         self.audio_device_combo.clear()
         self.audio_device_combo.addItem("(default)", None)
         saved = self._config.audio_input_device
         select = 0
-        for dev_index, name in list_audio_input_devices():
+        for dev_index, name in devices:
             self.audio_device_combo.addItem(name, dev_index)
             if saved is not None and name == saved:
                 select = self.audio_device_combo.count() - 1
         self.audio_device_combo.setCurrentIndex(select)
         self.audio_device_combo.blockSignals(False)
+        # Re-bind the monitor to the resolved device index (indices can shift)
+        if not self._audio_monitor.is_running:
+            self._audio_monitor = AudioMonitor(device=self.audio_device_combo.currentData())
+
+    def _on_midi_port_appeared(self, name: str) -> None:
+        if self._device.connected or self._reconnect_port != name:
+            return
+        ports = self._discovery.midi_ports or []
+        if name in ports:
+            self._connect_to(ports.index(name), name, quiet=True)
+
+    def _on_midi_port_disappeared(self, name: str) -> None:
+        if self._device.connected and self._device.port_name == name:
+            self._device.disconnect()
+            self._set_connected(False)
+            self._reconnect_port = name
+            self.status_label.setText(f"Device lost: {name} (waiting to reconnect)")
 
     def _on_audio_device_changed(self, idx: int) -> None:
         dev_index = self.audio_device_combo.currentData()
@@ -149,35 +198,49 @@ class DevicePanel(QWidget):
 
     def _toggle_connect(self) -> None:
         if self._device.connected:
+            self._reconnect_port = None
             self._device.disconnect()
             self._set_connected(False)
         else:
             idx = self.port_combo.currentIndex()
             name = self.port_combo.currentText()
             if idx >= 0:
-                try:
-                    self._device.connect(idx, name)
-                    self._set_connected(True)
-                except Exception as exc:
-                    QMessageBox.critical(self, "Connection Failed", str(exc))
+                self._connect_to(idx, name)
+
+    def _connect_to(self, idx: int, name: str, quiet: bool = False) -> bool:
+        if self.port_combo.itemText(idx) == name:
+            self.port_combo.setCurrentIndex(idx)
+        try:
+            self._device.connect(idx, name)
+        except Exception as exc:
+            if not quiet:
+                QMessageBox.critical(self, "Connection Failed", str(exc))
+            return False
+        self._reconnect_port = None
+        self._set_connected(True)
+        return True
 
     def auto_connect(self) -> None:
-        """Try to connect to the last used MIDI port from config."""
+        """Connect to the last used MIDI port from config once it is discovered.
+
+        Connects immediately if the port is already in the cached port list;
+        otherwise the connection is made as soon as discovery reports it.
+        """
         saved = self._config.midi_port
-        if not saved:
+        if not saved or self._device.connected:
             return
-        for i in range(self.port_combo.count()):
-            if self.port_combo.itemText(i) == saved:
-                self.port_combo.setCurrentIndex(i)
-                try:
-                    self._device.connect(i, saved)
-                    self._set_connected(True)
-                except Exception:
-                    pass
-                return
+        self._reconnect_port = saved
+        ports = self._discovery.midi_ports
+        if ports and saved in ports:
+            self._connect_to(ports.index(saved), saved, quiet=True)
+
+    def shutdown(self) -> None:
+        """Stop background device discovery (call on application exit)."""
+        self._discovery.stop()
 
     def _set_connected(self, state: bool) -> None:
-        for btn in (self.send_btn, self.pull_btn, self.load_all_btn, self.load_range_btn):
+        for btn in (self.send_btn, self.pull_btn, self.load_all_btn, self.load_range_btn,
+                    self.push_bank_btn):
             btn.setEnabled(state)
         if state:
             self.connect_btn.setText("Disconnect")
@@ -198,9 +261,13 @@ class DevicePanel(QWidget):
         if checked:
             self._audio_monitor.start()
             self.monitor_btn.setText("Stop Monitor")
+            self.level_meter.setVisible(True)
+            self.level_meter.start()
         else:
             self._audio_monitor.stop()
             self.monitor_btn.setText("Monitor Audio")
+            self.level_meter.stop()
+            self.level_meter.setVisible(False)
 
     def _on_gain_changed(self, value: int) -> None:
         gain = value / 10.0
@@ -210,3 +277,7 @@ class DevicePanel(QWidget):
     @property
     def device(self) -> MidiDevice:
         return self._device
+
+    @property
+    def discovery(self) -> DeviceDiscovery:
+        return self._discovery
@@ -1,6 +1,7 @@
 from __future__ import annotations
+from pathlib import Path
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout,
+    QWidget, QVBoxLayout, QHBoxLayout, QLineEdit,
     QPushButton, QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView,
 )
 from PyQt6.QtCore import pyqtSignal, Qt
@@ -16,6 +17,8 @@ class LibraryPanel(QWidget):
     add_bank_requested = pyqtSignal()
     add_patch_requested = pyqtSignal()
     load_file_requested = pyqtSignal()
+    import_folder_requested = pyqtSignal()
+    search_changed = pyqtSignal(str)
 
     def __init__(self, parent=None) -> None:
         super().__init__(parent)
@@ -24,6 +27,12 @@ class LibraryPanel(QWidget):
     def _build_ui(self) -> None:
         layout = QVBoxLayout(self)
 
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search, e.g. category:pad t1_filter1_cutoff>90")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.search_changed)
+        layout.addWidget(self.search_edit)
+
         self.table = QTableWidget(0, len(_COLUMNS))
         self.table.setHorizontalHeaderLabels(_COLUMNS)
         self.table.setSortingEnabled(True)
@@ -44,12 +53,15 @@ class LibraryPanel(QWidget):
         self._add_patch_btn = QPushButton("+ Patch from Device")
         self._add_patch_btn.setEnabled(False)
         self._load_file_btn = QPushButton("Load File...")
+        self._import_folder_btn = QPushButton("Import Folder...")
         add_bank_btn.clicked.connect(self.add_bank_requested)
         self._add_patch_btn.clicked.connect(self.add_patch_requested)
         self._load_file_btn.clicked.connect(self.load_file_requested)
+        self._import_folder_btn.clicked.connect(self.import_folder_requested)
         btn_row.addWidget(add_bank_btn)
         btn_row.addWidget(self._add_patch_btn)
         btn_row.addWidget(self._load_file_btn)
+        btn_row.addWidget(self._import_folder_btn)
         layout.addLayout(btn_row)
 
     def populate(self, banks: list[Bank], patches: list[Patch]) -> None:
@@ -71,6 +83,17 @@ class LibraryPanel(QWidget):
         self.table.setSortingEnabled(True)
         self.table.sortByColumn(0, Qt.SortOrder.AscendingOrder)
 
+    def set_filter(self, paths: set[Path] | None) -> None:
+        """Show only patches whose source_path is in *paths* (None shows all)."""
+        for row in range(self.table.rowCount()):
+            patch = self.table.item(row, 0).data(Qt.ItemDataRole.UserRole)
+            hidden = paths is not None and (
+                not isinstance(patch, Patch) or patch.source_path not in paths)
+            self.table.setRowHidden(row, hidden)
+
+    def set_search_error(self, message: str | None) -> None:
+        self.search_edit.setToolTip(message or "")
+
     def set_device_connected(self, connected: bool) -> None:
         self._add_patch_btn.setEnabled(connected)
 
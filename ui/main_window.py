@@ -1,5 +1,4 @@
 from __future__ import annotations
-import threading
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QHBoxLayout, QVBoxLayout,
@@ -7,15 +6,14 @@ from PyQt6.QtWidgets import (
     QFileDialog,
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
-import time
 from core.logger import AppLogger
-from midi.sysex import (
-    build_program_change, build_slot_messages, build_program_dump_request,
-    build_program_write, parse_program_dump, extract_patch_name, NUM_PROGRAMS,
-)
-from tools.file_format import read_patch, prog_file_to_sysex
+from midi.sysex import NUM_PROGRAMS
+from midi.shadow import DeviceShadow
+from midi.transfer import PushReport, push_bank, pull_slots, write_edit_buffer
 from model.patch import Patch
 from model.library import Library
+from model.importer import ImportResult, import_paths
+from model.search import PatchIndex, QueryError
 from ui.library_panel import LibraryPanel
 from ui.patch_detail import PatchDetailPanel
 from ui.device_panel import DevicePanel
@@ -36,12 +34,16 @@ class PullWorker(QThread):
     finished = pyqtSignal(int, int)        # patches_received, slots_total
 
     def __init__(self, device, slots: list[int], logger: AppLogger | None = None,
-                 restore_slot: int | None = None, parent=None) -> None:
+                 restore_slot: int | None = None, shadow: DeviceShadow | None = None,
+                 trust_s: float = 0.0, spot_check: float = 0.0, parent=None) -> None:
         super().__init__(parent)
         self._device = device
         self._slots = slots
         self._logger = logger or AppLogger()
         self._restore_slot = restore_slot
+        self._shadow = shadow
+        self._trust_s = trust_s
+        self._spot_check = spot_check
         self._cancelled = False
 
     def cancel(self) -> None:
@@ -49,65 +51,96 @@ class PullWorker(QThread):
 
     def run(self) -> None:
         total = len(self._slots)
-        received_count = 0
+        received: list[Patch] = []
+
+        def on_patch(slot: int, patch: Patch | None) -> None:
+            if patch is not None:
+                received.append(patch)
+            self.patch_ready.emit(patch)
+
         try:
-            for i, slot in enumerate(self._slots):
-                if self._cancelled:
-                    break
-                self.progress.emit(i, total, f"Slot {slot + 1} of {total}...")
-                received: list[bytes] = []
-                event = threading.Event()
-
-                def on_sysex(midi_event, data=None, _recv=received, _evt=event):
-                    message, _ = midi_event
-                    self._logger.midi(f"RX: {[hex(b) for b in message[:12]]}{'...' if len(message) > 12 else ''}")
-                    parsed = parse_program_dump(list(message))
-                    if parsed is not None:
-                        _recv.append(parsed)
-                        _evt.set()
-
-                # Select the program slot (with bank select for slots >= 128), then dump
-                slot_msgs = build_slot_messages(channel=1, slot=slot)
-                for m in slot_msgs:
-                    self._device.send(m)
-                time.sleep(0.05)  # let the device switch programs
-
-                msg = build_program_dump_request(channel=1)
-                if i == 0:
-                    self._logger.midi(f"TX: slot {slot}: bank_sel+pc={[[hex(b) for b in m] for m in slot_msgs]} dump={[hex(b) for b in msg]}")
-                self._device.set_sysex_callback(on_sysex)
-                self._device.send(msg)
-                event.wait(timeout=2.0)
-
-                # Clear callback before next slot to prevent cross-slot attribution
-                try:
-                    self._device.set_sysex_callback(lambda e, d=None: None)
-                except Exception:
-                    pass
-
-                if received:
-                    received_count += 1
-                    name = extract_patch_name(received[0]) or f"Program {slot + 1:03d}"
-                    self.patch_ready.emit(Patch(
-                        name=name,
-                        program_number=slot,
-                        sysex_data=received[0],
-                    ))
-                else:
-                    self.patch_ready.emit(None)
+            pull_slots(
+                self._device, self._slots, logger=self._logger,
+                on_progress=lambda i, n, slot: self.progress.emit(
+                    i, n, f"Slot {slot + 1} of {n}..."),
+                on_patch=on_patch,
+                is_cancelled=lambda: self._cancelled,
+                restore_slot=self._restore_slot,
+                shadow=self._shadow,
+                trust_s=self._trust_s,
+                spot_check=self._spot_check,
+            )
         except Exception:
             pass
         finally:
-            # Restore device to the original slot after a multi-slot pull
-            if self._restore_slot is not None and not self._cancelled:
-                try:
-                    restore_msgs = build_slot_messages(channel=1, slot=self._restore_slot)
-                    for m in restore_msgs:
-                        self._device.send(m)
-                    self._logger.midi(f"Restored device to slot {self._restore_slot}")
-                except Exception:
-                    pass
-            self.finished.emit(received_count, total)
+            self.finished.emit(len(received), total)
+
+
+class PushWorker(QThread):
+    """Writes a bank's programs to the device on a background thread."""
+    progress = pyqtSignal(int, int, str)   # slots_done, slots_total, status_message
+    finished = pyqtSignal(object)          # PushReport
+
+    def __init__(self, device, programs: list[tuple[int, bytes]], verify: bool,
+                 logger: AppLogger | None = None, restore_slot: int | None = None,
+                 shadow: DeviceShadow | None = None, parent=None) -> None:
+        super().__init__(parent)
+        self._device = device
+        self._programs = programs
+        self._verify = verify
+        self._logger = logger or AppLogger()
+        self._restore_slot = restore_slot
+        self._shadow = shadow
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def run(self) -> None:
+        report = PushReport(total=len(self._programs))
+        try:
+            report = push_bank(
+                self._device, self._programs, verify=self._verify, logger=self._logger,
+                on_progress=lambda i, n, slot: self.progress.emit(
+                    i, n, f"Writing slot {slot + 1} ({i + 1} of {n})..."),
+                on_result=lambda slot, ok, reason: None if ok else self._logger.midi(
+                    f"Slot {slot + 1:03d} failed: {reason}"),
+                is_cancelled=lambda: self._cancelled,
+                restore_slot=self._restore_slot,
+                shadow=self._shadow,
+            )
+        except Exception as e:
+            self._logger.midi(f"Bank push aborted: {e}")
+        finally:
+            self.finished.emit(report)
+
+
+class ImportWorker(QThread):
+    """Imports patch files, folders and archives on a background thread."""
+    progress = pyqtSignal(int, int, str)   # done, total, status_message
+    finished = pyqtSignal(object)          # ImportResult
+
+    def __init__(self, library: Library, paths: list[Path], parent=None) -> None:
+        super().__init__(parent)
+        self._library = library
+        self._paths = paths
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    def run(self) -> None:
+        result = ImportResult()
+        try:
+            result = import_paths(
+                self._library, self._paths,
+                on_progress=self.progress.emit,
+                is_cancelled=lambda: self._cancelled,
+            )
+        except Exception as e:
+            result.failed.append(("import", str(e)))
+        finally:
+            self.finished.emit(result)
 
 
 class MainWindow(QMainWindow):
@@ -120,10 +153,14 @@ class MainWindow(QMainWindow):
         self._selected_patch: Patch | None = None
         self._selected_patch_path: Path | None = None
         self._pull_worker: PullWorker | None = None
+        self._import_worker: ImportWorker | None = None
+        self._push_worker: PushWorker | None = None
         self._last_device_slot: int = 0
         self._config = AppConfig()
         self._param_map = ParamMap()
+        self._search_index = PatchIndex(self._param_map)
         self._synth_editor: SynthEditorWindow | None = None
+        self._shadow: DeviceShadow | None = None
         self._build_ui()
         self._connect_signals()
         self._refresh_library()
@@ -169,11 +206,14 @@ class MainWindow(QMainWindow):
         self._library_panel.patch_double_clicked.connect(self._on_patch_double_clicked)
         self._library_panel.add_patch_requested.connect(self._on_pull_prompted)
         self._library_panel.load_file_requested.connect(self._on_load_file)
+        self._library_panel.import_folder_requested.connect(self._on_import_folder)
+        self._library_panel.search_changed.connect(self._apply_search)
         self._detail_panel.patch_saved.connect(self._on_patch_saved)
         self._device_panel.pull_requested.connect(self._on_pull_prompted)
         self._device_panel.send_requested.connect(self._on_send_patch)
         self._device_panel.load_all_requested.connect(self._on_load_all)
         self._device_panel.load_range_requested.connect(self._on_load_range)
+        self._device_panel.push_bank_requested.connect(self._on_push_bank)
         self._device_panel.connected.connect(lambda _: self._library_panel.set_device_connected(True))
         self._device_panel.disconnected.connect(lambda: self._library_panel.set_device_connected(False))
         self._device_panel.connected.connect(self._on_device_connected)
@@ -185,7 +225,23 @@ class MainWindow(QMainWindow):
     def _refresh_library(self) -> None:
         banks = self._library.list_banks()
         patches = self._library.list_patches()
+        self._search_index.sync(patches)
         self._library_panel.populate(banks=banks, patches=patches)
+        self._apply_search(self._library_panel.search_edit.text())
+
+    def _apply_search(self, query: str) -> None:
+        if not query.strip():
+            self._library_panel.set_search_error(None)
+            self._library_panel.set_filter(None)
+            return
+        try:
+            matches = set(self._search_index.search(query))
+        except QueryError as e:
+            self._library_panel.set_search_error(str(e))
+            self.statusBar().showMessage(str(e), 5000)
+            return
+        self._library_panel.set_search_error(None)
+        self._library_panel.set_filter(matches)
 
     def _on_patch_selected(self, patch: Patch) -> None:
         self._selected_patch = patch
@@ -201,23 +257,51 @@ class MainWindow(QMainWindow):
         self._refresh_library()
 
     def _on_load_file(self) -> None:
-        path, _ = QFileDialog.getOpenFileName(
-            self, "Load Patch File", downloads_dir(),
-            "RK-100S 2 Patch (*.rk100s2_prog);;All Files (*)",
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "Load Patch Files", downloads_dir(),
+            "RK-100S 2 Patches (*.rk100s2_prog *.syx *.zip);;All Files (*)",
         )
-        if not path:
-            return
-        try:
-            file_data = read_patch(Path(path))
-            sysex_data = prog_file_to_sysex(file_data)
-            name = extract_patch_name(sysex_data) or Path(path).stem
-            patch = Patch(name=name, sysex_data=sysex_data)
-            patch.source_path = Path(path)
-            self._library.save_patch(patch)
-            self._refresh_library()
-            self._logger.general(f"Loaded patch from {path}")
-        except Exception as e:
-            QMessageBox.critical(self, "Load Error", str(e))
+        if paths:
+            self._start_import([Path(p) for p in paths])
+
+    def _on_import_folder(self) -> None:
+        path = QFileDialog.getExistingDirectory(self, "Import Patch Folder", downloads_dir())
+        if path:
+            self._start_import([Path(path)])
+
+    def _start_import(self, paths: list[Path]) -> None:
+        self._import_dialog = QProgressDialog("Reading files...", "Cancel", 0, 0, self)
+        self._import_dialog.setWindowTitle("Importing Patches")
+        self._import_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self._import_dialog.setMinimumDuration(0)
+
+        worker = ImportWorker(self._library, paths, parent=self)
+        self._import_worker = worker
+        self._import_dialog.canceled.connect(worker.cancel)
+        worker.progress.connect(self._on_import_progress)
+        worker.finished.connect(self._on_import_finished)
+        worker.start()
+
+    def _on_import_progress(self, done: int, total: int, message: str) -> None:
+        self._import_dialog.setMaximum(total)
+        self._import_dialog.setValue(done)
+        self._import_dialog.setLabelText(message)
+
+    def _on_import_finished(self, result: ImportResult) -> None:
+        self._import_dialog.close()
+        self._import_worker = None
+        self._refresh_library()
+        for source, error in result.failed:
+            self._logger.general(f"Import failed: {source}: {error}")
+        self._logger.general(f"Imported {result.imported} patches")
+        self.statusBar().showMessage(
+            f"Imported {result.imported} patches"
+            + (f", {len(result.failed)} files failed" if result.failed else "")
+            + (" (cancelled)" if result.cancelled else ""), 5000
+        )
+        if result.failed and not result.imported:
+            QMessageBox.critical(self, "Load Error",
+                                 "\n".join(f"{s}: {e}" for s, e in result.failed[:10]))
 
     def _start_pull(self, slots: list[int], restore_slot: int | None = None) -> None:
         device = self._device_panel.device
@@ -235,7 +319,9 @@ class MainWindow(QMainWindow):
         self._progress_dialog.setValue(0)
 
         worker = PullWorker(device, slots, logger=self._logger,
-                            restore_slot=restore_slot, parent=self)
+                            restore_slot=restore_slot, shadow=self._shadow,
+                            trust_s=self._config.shadow_trust_minutes * 60,
+                            spot_check=self._config.shadow_spot_check, parent=self)
         self._pull_worker = worker
         self._progress_dialog.canceled.connect(worker.cancel)
         worker.patch_ready.connect(self._on_patch_ready)
@@ -266,6 +352,7 @@ class MainWindow(QMainWindow):
             self._device_panel.pull_btn,
             self._device_panel.load_all_btn,
             self._device_panel.load_range_btn,
+            self._device_panel.push_bank_btn,
         ):
             btn.setEnabled(enabled)
 
@@ -285,10 +372,73 @@ class MainWindow(QMainWindow):
         if patch.sysex_data is None:
             QMessageBox.warning(self, "No SysEx data", "This patch has no SysEx data to send.")
             return
-        self._device_panel.device.send(
-            build_program_write(channel=1, data=patch.sysex_data)
+        if write_edit_buffer(self._device_panel.device, patch.sysex_data, shadow=self._shadow):
+            self._logger.midi(f"Sent patch: {patch.name}")
+        else:
+            self._logger.midi(f"Patch already on the device: {patch.name}")
+
+    def _on_push_bank(self) -> None:
+        device = self._device_panel.device
+        if not device.connected:
+            return
+        banks = self._library.list_banks()
+        if not banks:
+            QMessageBox.information(self, "No banks", "Create a bank in the library first.")
+            return
+        name, ok = QInputDialog.getItem(
+            self, "Push Bank", "Bank to write to the device:",
+            [b.name for b in banks], 0, False,
         )
-        self._logger.midi(f"Sent patch: {patch.name}")
+        if not ok:
+            return
+        bank = next(b for b in banks if b.name == name)
+        programs: list[tuple[int, bytes]] = []
+        for slot, patch_file in bank.ordered_slots():
+            path = self._library.root / patch_file
+            try:
+                patch = Patch.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                QMessageBox.critical(self, "Push Bank", f"Slot {slot + 1}: {e}")
+                return
+            if patch.sysex_data is None:
+                QMessageBox.critical(self, "Push Bank", f"Slot {slot + 1}: {path.name} has no SysEx data")
+                return
+            programs.append((slot, patch.sysex_data))
+        verify = QMessageBox.question(
+            self, "Push Bank",
+            f"Write {len(programs)} programs from '{bank.name}' to the device, "
+            "overwriting those slots.\n\nRead each slot back to verify it?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            | QMessageBox.StandardButton.Cancel,
+        )
+        if verify == QMessageBox.StandardButton.Cancel:
+            return
+        self._set_action_buttons_enabled(False)
+        self._progress_dialog = QProgressDialog(
+            "Writing programs...", "Cancel", 0, len(programs), self
+        )
+        self._progress_dialog.setWindowTitle("Pushing Bank")
+        self._progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self._progress_dialog.setMinimumDuration(0)
+
+        worker = PushWorker(device, programs, verify=verify == QMessageBox.StandardButton.Yes,
+                            logger=self._logger, restore_slot=self._last_device_slot,
+                            shadow=self._shadow, parent=self)
+        self._push_worker = worker
+        self._progress_dialog.canceled.connect(worker.cancel)
+        worker.progress.connect(self._on_pull_progress)
+        worker.finished.connect(self._on_push_finished)
+        worker.start()
+
+    def _on_push_finished(self, report: PushReport) -> None:
+        self._progress_dialog.close()
+        self._push_worker = None
+        self._set_action_buttons_enabled(self._device_panel.device.connected)
+        self._logger.midi(f"Bank push: {report.summary()}")
+        self.statusBar().showMessage(report.summary(), 8000)
+        if report.failed:
+            slots = ", ".join(str(s + 1) for s in sorted(report.failed))
+            QMessageBox.warning(self, "Push Bank", f"Failed slots: {slots}")
 
     def _on_load_all(self) -> None:
         reply = QMessageBox.question(
@@ -328,20 +478,39 @@ class MainWindow(QMainWindow):
                 parent=None,
             )
             # Sync current connection state
+            self._synth_editor.set_device_shadow(self._shadow)
             if self._device_panel.device.connected:
                 self._synth_editor.set_device_connected(True)
         return self._synth_editor
 
     def _on_device_connected(self, port_name: str) -> None:
         self._logger.midi(f"Connected to {port_name}")
+        self._shadow = DeviceShadow(port_name)
+        self._shadow.attach(self._device_panel.device)
         if self._synth_editor is not None:
+            self._synth_editor.set_device_shadow(self._shadow)
             self._synth_editor.set_device_connected(True)
 
     def _on_device_disconnected(self) -> None:
         self._logger.midi("Disconnected")
+        self._release_shadow()
         if self._synth_editor is not None:
             self._synth_editor.set_device_connected(False)
 
+    def _release_shadow(self) -> None:
+        if self._shadow is None:
+            return
+        self._shadow.save()
+        if self._shadow.bytes_skipped:
+            self._logger.midi(
+                f"Skipped {self._shadow.bytes_skipped / 1024:.1f} KB of redundant transfers")
+        device = self._device_panel.device
+        device.set_control_callback(None)
+        device.set_send_callback(None)
+        self._shadow = None
+        if self._synth_editor is not None:
+            self._synth_editor.set_device_shadow(None)
+
     def _on_patch_double_clicked(self, patch: Patch) -> None:
         editor = self._get_or_create_synth_editor()
         editor.setWindowTitle(f"Synth Editor — {patch.name}")
@@ -377,6 +546,8 @@ class MainWindow(QMainWindow):
     # -- Window lifecycle --
 
     def closeEvent(self, event) -> None:
+        self._release_shadow()
+        self._device_panel.shutdown()
         if self._synth_editor is not None:
             self._synth_editor.close()
             self._synth_editor.deleteLater()
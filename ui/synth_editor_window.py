@@ -5,7 +5,7 @@ from PyQt6.QtWidgets import (
     QMessageBox, QTabWidget, QToolBar, QFileDialog,
 )
 from PyQt6.QtCore import Qt, QObject, pyqtSignal
-from PyQt6.QtGui import QAction
+from PyQt6.QtGui import QAction, QKeySequence
 from ui.chat_panel import ChatPanel
 from ui.keyboard_widget import KeyboardPanel, TransportPanel
 from ui.synth_params_panel import SynthParamsPanel
@@ -15,8 +15,10 @@ from ui.synth_tabs import (
 from ai.controller import AIController
 from ai.llm import ClaudeBackend, GroqBackend
 from midi.params import ParamMap
-from midi.sysex_buffer import SysExProgramBuffer, DebouncedSysExWriter
-from midi.sysex import build_program_write, extract_patch_name
+from midi.sysex_buffer import SysExProgramBuffer
+from midi.sysex_writer import DebouncedSysExWriter
+from midi.sysex import extract_patch_name
+from midi.transfer import update_edit_buffer, write_edit_buffer
 from midi.player import MidiFilePlayer
 from tools.file_format import sysex_to_prog_bytes
 from core.config import AppConfig, downloads_dir
@@ -57,6 +59,8 @@ class SynthEditorWindow(QMainWindow):
         self._sysex_writer.write_requested.connect(self._flush_sysex)
         self._note_bridge = _NoteSignalBridge(self)
         self._midi_player: MidiFilePlayer | None = None
+        self._shadow = None
+        self._unsent_sysex = False   # buffer edits not yet on the device
         self._build_ui()
         self._connect_signals()
 
@@ -161,6 +165,27 @@ class SynthEditorWindow(QMainWindow):
         self._save_action.triggered.connect(self._on_save_patch)
         toolbar.addAction(self._save_action)
 
+        toolbar.addSeparator()
+        self._undo_action = QAction("Undo", self)
+        self._undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self._undo_action.setEnabled(False)
+        self._undo_action.triggered.connect(self._on_undo)
+        toolbar.addAction(self._undo_action)
+
+        self._redo_action = QAction("Redo", self)
+        self._redo_action.setShortcut(QKeySequence.StandardKey.Redo)
+        self._redo_action.setEnabled(False)
+        self._redo_action.triggered.connect(self._on_redo)
+        toolbar.addAction(self._redo_action)
+
+        # A = the patch as loaded, B = the working copy; edits on either side are kept
+        self._ab_action = QAction("A/B", self)
+        self._ab_action.setCheckable(True)
+        self._ab_action.setEnabled(False)
+        self._ab_action.setToolTip("Switch between the loaded patch (A) and your edits (B)")
+        self._ab_action.toggled.connect(self._on_ab_toggled)
+        toolbar.addAction(self._ab_action)
+
     def _connect_signals(self) -> None:
         self._chat_panel.message_sent.connect(self._on_chat_message)
         self._chat_panel.match_requested.connect(self._on_match_sound)
@@ -222,6 +247,8 @@ class SynthEditorWindow(QMainWindow):
                 packed = self._effects_tab.get_fx_sysex_offset(name)
                 if packed is not None and self._sysex_buffer.size > 0:
                     self._sysex_buffer.set_byte(packed, value)
+                    self._unsent_sysex = True
+                    self._update_history_actions()
             return
 
         if not self._device.connected:
@@ -236,16 +263,20 @@ class SynthEditorWindow(QMainWindow):
         # SysEx-only params: update buffer (written on explicit "Write to Device")
         if param.sysex_offset is not None and self._sysex_buffer.size > 0:
             self._sysex_buffer.set_param(param, value)
+            if param.is_sysex_only:
+                self._unsent_sysex = True
+            self._update_history_actions()
 
     def _flush_sysex(self) -> None:
         """Write the full program buffer to the device via SysEx."""
         if not self._sysex_buffer.dirty or not self._device.connected:
             return
         data = self._sysex_buffer.to_bytes()
-        msg = build_program_write(channel=1, data=data)
-        self._device.send(msg)
+        sent = write_edit_buffer(self._device, data, shadow=self._shadow)
         self._sysex_buffer.mark_clean()
-        self._logger.midi("SysEx program write sent")
+        self._unsent_sysex = False
+        if sent:
+            self._logger.midi("SysEx program write sent")
 
     def load_program_data(self, data: bytes, *, send_to_device: bool = False) -> None:
         """Load program SysEx data into buffer and update all UI widgets.
@@ -254,12 +285,23 @@ class SynthEditorWindow(QMainWindow):
         Korg so the user hears the loaded patch immediately.
         """
         self._sysex_buffer.load(data)
+        self._unsent_sysex = not (send_to_device and self._device.connected)
+        self._sysex_buffer.snapshot("A")
+        self._sysex_buffer.delete_snapshot("B")
+        self._ab_action.blockSignals(True)
+        self._ab_action.setChecked(False)
+        self._ab_action.blockSignals(False)
         if send_to_device and self._device.connected:
-            msg = build_program_write(channel=1, data=data)
-            self._device.send(msg)
-            self._logger.midi("SysEx program write sent (patch load)")
+            if write_edit_buffer(self._device, data, shadow=self._shadow):
+                self._logger.midi("SysEx program write sent (patch load)")
         self._write_action.setEnabled(True)
         self._save_action.setEnabled(True)
+        self._ab_action.setEnabled(True)
+        self._refresh_from_buffer()
+
+    def _refresh_from_buffer(self) -> None:
+        """Push every buffer value into the widgets."""
+        self._update_history_actions()
         # Update UI from buffer for all ParamMap params (includes fx1_type/fx2_type,
         # which triggers dynamic FX widget rebuild in EffectsTab)
         for p in self._param_map.list_all():
@@ -273,6 +315,43 @@ class SynthEditorWindow(QMainWindow):
                 val = self._sysex_buffer.get_byte(packed)
                 self._effects_tab.on_param_changed(name, val)
 
+    def _update_history_actions(self) -> None:
+        self._undo_action.setEnabled(self._sysex_buffer.can_undo)
+        self._redo_action.setEnabled(self._sysex_buffer.can_redo)
+
+    def _apply_buffer_change(self, change) -> None:
+        """Run *change* (returns changed offsets) and bring device and UI along."""
+        before = self._sysex_buffer.to_bytes()
+        changed = change()
+        if changed and self._device.connected:
+            after = self._sysex_buffer.to_bytes()
+            if self._unsent_sysex:
+                # the device lacks buffered SysEx-only edits, so it is not at *before*
+                sent = write_edit_buffer(self._device, after, shadow=self._shadow)
+            else:
+                sent = update_edit_buffer(self._device, before, after,
+                                          self._param_map.list_all(), shadow=self._shadow)
+            self._sysex_buffer.mark_clean()
+            self._unsent_sysex = False
+            self._logger.midi(f"Sent {len(changed)} changed bytes as {sent} MIDI bytes")
+        if changed:
+            self._refresh_from_buffer()
+        else:
+            self._update_history_actions()
+
+    def _on_undo(self) -> None:
+        self._apply_buffer_change(self._sysex_buffer.undo)
+
+    def _on_redo(self) -> None:
+        self._apply_buffer_change(self._sysex_buffer.redo)
+
+    def _on_ab_toggled(self, showing_a: bool) -> None:
+        leaving, target = ("B", "A") if showing_a else ("A", "B")
+        self._sysex_buffer.snapshot(leaving)
+        if self._sysex_buffer.has_snapshot(target):
+            self._apply_buffer_change(lambda: self._sysex_buffer.restore(target))
+        self._logger.midi(f"Comparing: {target}")
+
     def _dispatch_param_to_ui(self, name: str, value: int) -> None:
         """Update the correct tab widget for a parameter change."""
         self._params_panel.on_param_changed(name, value)
@@ -303,6 +382,10 @@ class SynthEditorWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Save Error", str(e))
 
+    def set_device_shadow(self, shadow) -> None:
+        """Use *shadow* (a DeviceShadow or None) to skip redundant program writes."""
+        self._shadow = shadow
+
     def set_device_connected(self, connected: bool) -> None:
         self._chat_panel.set_device_connected(connected)
         if connected:
@@ -456,6 +539,7 @@ class SynthEditorWindow(QMainWindow):
             logger=self._logger,
             sysex_buffer=self._sysex_buffer,
             sysex_writer=self._sysex_writer,
+            context_budget_tokens=self._config.ai_context_tokens,
         )
         ctrl.response_ready.connect(self._on_ai_response)
         ctrl.tool_executed.connect(self._on_ai_tool)
@@ -9,7 +9,7 @@ from PyQt6.QtWidgets import (
     QWidget, QHBoxLayout, QLabel, QComboBox, QSlider,
     QRadioButton, QButtonGroup, QStyleOption, QStyle,
 )
-from PyQt6.QtCore import Qt as QtCore_Qt, QRectF, QPointF
+from PyQt6.QtCore import Qt as QtCore_Qt, QRectF, QPointF, QTimer
 from PyQt6.QtGui import QPainter, QPen, QColor, QPalette, QFont
 
 
@@ -384,3 +384,85 @@ class ParamToggle(QWidget):
             idx = 0 if event.position().x() < self.width() / 2 else 1
             self._set_selected_interactive(idx)
             event.accept()
+
+
+class LevelMeterWidget(QWidget):
+    """Input level bar and log-frequency spectrum.
+
+    Polls *source* (returning an ``audio.meter.Levels`` or None) at no more
+    than *max_fps* and repaints only when a new snapshot has been published,
+    so the meter costs nothing while the input is idle.
+    """
+
+    _FLOOR_DB = -72.0
+    _BAR_H = 8
+
+    def __init__(
+        self,
+        source: Callable[[], object],
+        max_fps: int = 30,
+        parent: QWidget | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self._source = source
+        self._levels = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(max(1, round(1000 / max_fps)))
+        self._timer.timeout.connect(self._poll)
+        self.setMinimumHeight(48)
+
+    @property
+    def is_running(self) -> bool:
+        return self._timer.isActive()
+
+    def start(self) -> None:
+        self._timer.start()
+
+    def stop(self) -> None:
+        self._timer.stop()
+        self._levels = None
+        self.update()
+
+    def _poll(self) -> None:
+        levels = self._source()
+        if levels is not self._levels:
+            self._levels = levels
+            self.update()
+
+    def _fraction(self, db: float) -> float:
+        return min(1.0, max(0.0, 1.0 - db / self._FLOOR_DB))
+
+    def paintEvent(self, event) -> None:  # noqa: N802
+        painter = QPainter(self)
+        pal = self.palette()
+        w = self.width()
+        h = self.height()
+        painter.fillRect(0, 0, w, h, pal.color(QPalette.ColorRole.Base))
+        levels = self._levels
+        if levels is None:
+            painter.end()
+            return
+
+        # spectrum bars above the level bar
+        spec_h = h - self._BAR_H - 2
+        bands = levels.spectrum_db
+        bar_w = w / max(1, len(bands))
+        painter.setPen(QtCore_Qt.PenStyle.NoPen)
+        painter.setBrush(pal.color(QPalette.ColorRole.Highlight))
+        for i, db in enumerate(bands):
+            bar_h = spec_h * self._fraction(float(db))
+            painter.drawRect(QRectF(i * bar_w, spec_h - bar_h, max(1.0, bar_w - 1), bar_h))
+
+        # level bar: RMS filled, peak lighter, hold as a tick
+        top = h - self._BAR_H
+        if levels.clipped:
+            peak = QColor(QtCore_Qt.GlobalColor.red)
+        else:
+            peak = pal.color(QPalette.ColorRole.Highlight).lighter(150)
+        painter.fillRect(QRectF(0, top, w * self._fraction(levels.peak_db), self._BAR_H), peak)
+        painter.fillRect(QRectF(0, top, w * self._fraction(levels.rms_db), self._BAR_H),
+                         pal.color(QPalette.ColorRole.Highlight))
+        hold_x = w * self._fraction(levels.hold_db)
+        painter.setPen(QPen(pal.color(QPalette.ColorRole.Text), 1))
+        painter.drawLine(QPointF(hold_x, top), QPointF(hold_x, h))
+        painter.end()